@@ -15,8 +15,14 @@ from datetime import datetime
 action_path = Path(__file__).parent.parent
 sys.path.insert(0, str(action_path))
 
-from style_checker.reviewer import StyleReviewer
-from style_checker.github_handler import GitHubHandler
+from style_checker.categories import VALID_CATEGORIES
+from style_checker.citation_analyzer import Bibliography, bibtex_files
+from style_checker.lecture_index import LectureIndex
+from style_checker.memo import CorpusIndex, ReviewMemo
+from style_checker.planner import estimate_tokens, format_plan, plan_review
+from style_checker.providers import OpenAICompatibleProvider
+from style_checker.reviewer import RESPONSE_FORMATS, SCHEDULES, AnthropicProvider, StyleReviewer
+from style_checker.github_handler import GitHubHandler, LocalRepoHandler
 from style_checker import __version__
 
 
@@ -150,10 +156,26 @@ def review_bulk_lectures(
     lectures_path: str,
     create_pr: bool,
     pr_branch_prefix: str,
-    pr_labels: str = ''
+    pr_labels: str = '',
+    pack_tokens: int = 0,
+    commit_per_lecture: bool = False,
 ) -> dict:
     """
     Review all lectures in directory and create single PR
+
+    Sections and cells that repeat across lectures are checked once per rule:
+    the reviewer gets an in-memory ReviewMemo if it has none, and its findings
+    for a repeated fragment are replayed in every other lecture.
+
+    With `pack_tokens`, lectures shorter than half of it are reviewed together
+    (StyleReviewer.review_lectures_packed), several to a prompt per rule.
+
+    Lectures are downloaded concurrently, a few ahead of the one under review
+    (GitHubHandler.prefetch_lectures); packing waits for all of them.
+
+    The branch is created after the review and all fixes land in it at once
+    (GitHubHandler.commit_files): as one commit, or with `commit_per_lecture`
+    as a chain of one commit per lecture.
     
     Returns:
         Dictionary with summary of all reviews and PR info
@@ -170,48 +192,67 @@ def review_bulk_lectures(
         print("❌ No lectures found")
         return {'error': 'No lectures found'}
     
-    # Create branch for all changes — create_branch may append a collision-avoidance
-    # suffix, so always use the name it returns for subsequent commits + PR.
-    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-    requested_branch = f"{pr_branch_prefix}/bulk-review-{timestamp}"
-    branch_name = requested_branch
+    if reviewer.memo is None:
+        reviewer.memo = ReviewMemo()
 
-    if create_pr:
-        branch_name = gh_handler.create_branch(requested_branch)
-        print(f"✓ Created branch: {branch_name}\n")
+    # Lectures are downloaded concurrently a few ahead of the review
+    fetched = gh_handler.prefetch_lectures(lectures)
+
+    # Short lectures share one prompt per rule
+    packed = {}
+    if pack_tokens:
+        # Packing needs every lecture's size, so the downloads finish first
+        fetched = list(fetched)
+        contents = {lecture_file: content for lecture_file, content, _ in fetched if content is not None}
+        small = [
+            lecture_file for lecture_file, content in contents.items()
+            if estimate_tokens(content, reviewer.calibration) <= pack_tokens // 2
+        ]
+        if len(small) > 1:
+            print(f"📦 Packing {len(small)} short lectures into shared prompts (up to {pack_tokens:,} tokens each)")
+            results = reviewer.review_lectures_packed(
+                [(Path(lecture_file).stem, contents[lecture_file]) for lecture_file in small],
+                list(VALID_CATEGORIES),
+                pack_tokens=pack_tokens,
+            )
+            packed = dict(zip(small, results))
     
     # Review each lecture
     all_results = []
     total_issues = 0
+    changes = []
+    changed_lectures = []
+    corpus = CorpusIndex()
 
-    for i, lecture_file in enumerate(lectures, 1):
+    for i, (lecture_file, content, fetch_error) in enumerate(fetched, 1):
         lecture_name = Path(lecture_file).stem
         print(f"\n[{i}/{len(lectures)}] Reviewing: {lecture_name}")
 
         try:
-            # Get content
-            content = gh_handler.get_lecture_content(lecture_file)
+            if fetch_error is not None:
+                raise fetch_error
+            corpus.add(lecture_name, content)
 
-            # Review using sequential category processing
-            result = reviewer.review_lecture_smart(content, lecture_name)
+            if lecture_file in packed:
+                result = packed[lecture_file]
+            else:
+                # Review using sequential category processing
+                result = reviewer.review_lecture_smart(content, lecture_name)
 
             issues_found = result.get('issues_found', 0)
             total_issues += issues_found
             print(f"  → {issues_found} issues found")
 
-            # Commit if there are changes
-            if create_pr and issues_found > 0:
+            # Collect the fixes; they are committed together after the review.
+            # Lectures with only style suggestions have nothing to commit.
+            corrected_content = result.get('corrected_content', content)
+            if create_pr and issues_found > 0 and corrected_content != content:
                 commit_msg = gh_handler.format_commit_message(
                     result.get('violations', []),
                     lecture_name
                 )
-                gh_handler.commit_changes(
-                    lecture_file,
-                    result.get('corrected_content', content),
-                    commit_msg,
-                    branch_name
-                )
-                print(f"  ✓ Committed fixes")
+                changes.append((lecture_file, corrected_content, commit_msg))
+                changed_lectures.append((lecture_name, issues_found))
 
             all_results.append(result)
 
@@ -219,6 +260,11 @@ def review_bulk_lectures(
             print(f"  ❌ Error: {e}")
             all_results.append({'error': str(e), 'lecture': lecture_name})
 
+    shared = corpus.summary()
+    if shared['shared_units']:
+        print(f"\n🔁 {shared['shared_units']} sections/cells repeated across lectures "
+              f"({shared['duplicate_chars']:,} characters were checked once instead of again)")
+
     # Track per-lecture outcomes so the summary and the GH Actions outputs are accurate.
     lectures_with_issues = sum(1 for r in all_results if r.get('issues_found', 0) > 0)
     errors_count = sum(1 for r in all_results if 'error' in r)
@@ -235,8 +281,31 @@ def review_bulk_lectures(
             f"First error: {next(r['error'] for r in all_results if 'error' in r)}"
         )
 
+    summary = {
+        'lectures_reviewed': len(lectures),
+        'lectures_with_issues': lectures_with_issues,
+        'errors_count': errors_count,
+        'total_issues': total_issues,
+        'results': all_results
+    }
+
     # Create single PR with all changes
-    if create_pr and total_issues > 0:
+    if create_pr and changes:
+        # create_branch may append a collision-avoidance suffix, so always use
+        # the name it returns for the commit + PR.
+        try:
+            timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            branch_name = gh_handler.create_branch(f"{pr_branch_prefix}/bulk-review-{timestamp}")
+            print(f"\n✓ Created branch: {branch_name}")
+            message = None if commit_per_lecture else gh_handler.format_bulk_commit_message(changed_lectures)
+            gh_handler.commit_files(changes, branch_name, message)
+        except Exception as e:
+            # Keep the review results (and their summary) rather than losing the sweep
+            print(f"\n❌ Failed to commit fixes: {e}")
+            return {**summary, 'error': f"Failed to commit fixes: {e}"}
+        print(f"✓ Committed fixes to {len(changes)} lectures in "
+              f"{len(changes) if commit_per_lecture else 1} commit(s)")
+
         print(f"\n📝 Creating pull request for bulk review...")
         
         pr_title = f"Style guide bulk review ({len(lectures)} lectures)"
@@ -256,23 +325,96 @@ def review_bulk_lectures(
         )
         print(f"✓ Created PR #{pr_number}: {pr_url}")
         
-        return {
-            'lectures_reviewed': len(lectures),
-            'lectures_with_issues': lectures_with_issues,
-            'errors_count': errors_count,
-            'total_issues': total_issues,
-            'pr_number': pr_number,
-            'pr_url': pr_url,
-            'results': all_results
-        }
-
-    return {
-        'lectures_reviewed': len(lectures),
-        'lectures_with_issues': lectures_with_issues,
-        'errors_count': errors_count,
-        'total_issues': total_issues,
-        'results': all_results
+        return {**summary, 'pr_number': pr_number, 'pr_url': pr_url}
+
+    return summary
+
+
+def read_book_file(gh_handler: GitHubHandler, lectures_path: str, name: str) -> Optional[str]:
+    """Content of a file of the book (e.g. `_config.yml`), or None if it doesn't exist."""
+    tree = gh_handler.tree_index()
+    if tree is not None and f"{lectures_path}{name}" not in tree:
+        return None
+    try:
+        return gh_handler.get_lecture_content(f"{lectures_path}{name}")
+    except Exception:
+        return None
+
+
+def load_lecture_index(gh_handler: GitHubHandler, lectures_path: str) -> LectureIndex:
+    """
+    Index the repository's lecture series once per run, for the link rules.
+
+    Built from the lecture listing plus the book's `_toc.yml` (documents) and
+    `_config.yml` (its own URL and intersphinx prefixes), when they exist.
+    """
+    paths = [
+        path[len(lectures_path):] if path.startswith(lectures_path) else path
+        for path in gh_handler.get_all_lectures(lectures_path)
+    ]
+    index = LectureIndex.from_files(paths, toc=read_book_file(gh_handler, lectures_path, '_toc.yml'),
+                                    config=read_book_file(gh_handler, lectures_path, '_config.yml'))
+    print(f"🗂️  Indexed {len(index.lectures)} lectures"
+          + (f" of the '{index.series}' series" if index.series else " (series URL unknown)"))
+    return index
+
+
+def load_bibliography(gh_handler: GitHubHandler, lectures_path: str) -> Optional[Bibliography]:
+    """
+    Load the book's .bib files once per run, for the citation rule.
+
+    The files are those `_config.yml` lists in `bibtex_bibfiles`; None if
+    there are none.
+    """
+    config = read_book_file(gh_handler, lectures_path, '_config.yml') or ''
+    texts = [read_book_file(gh_handler, lectures_path, name) for name in bibtex_files(config)]
+    bibliography = Bibliography.from_texts(text for text in texts if text)
+    if not len(bibliography):
+        print("📚 No bibliography found; citations are checked by the LLM")
+        return None
+    print(f"📚 Loaded {len(bibliography)} bibliography entries")
+    return bibliography
+
+
+def plan_lectures(
+    gh_handler: GitHubHandler,
+    lecture_files: List[str],
+    categories: Optional[List[str]] = None,
+    model: Optional[str] = None,
+    schedule: str = 'sequential',
+    static_analysis: bool = False,
+    lecture_index: Optional[LectureIndex] = None,
+    bibliography: Optional[Bibliography] = None,
+) -> dict:
+    """
+    Estimate tokens, cost and wall time for reviewing lectures, without LLM calls.
+
+    Args:
+        gh_handler: GitHub API handler (used only to read lecture content)
+        lecture_files: Repository paths of the lectures to plan for
+        categories: Categories to check (None = all)
+        model: Claude model, for pricing
+        schedule: Schedule to project wall time for
+        static_analysis: Plan for checking the code-cell, math and directive rules without the LLM
+        lecture_index: With static_analysis, the link rules are planned as checked against it
+        bibliography: With static_analysis, the citation rule is planned as checked against it
+
+    Returns:
+        planner.plan_review() result
+    """
+    lectures = {
+        Path(lecture_file).stem: gh_handler.get_lecture_content(lecture_file)
+        for lecture_file in lecture_files
     }
+    return plan_review(
+        lectures,
+        categories=categories,
+        model=model or 'claude-sonnet-4-5-20250929',
+        schedule=schedule,
+        static_analysis=static_analysis,
+        lecture_index=lecture_index,
+        bibliography=bibliography,
+    )
 
 
 def format_bulk_pr_body(results: List[dict], total_issues: int) -> str:
@@ -321,6 +463,45 @@ def format_bulk_pr_body(results: List[dict], total_issues: int) -> str:
     return body
 
 
+def run_plan(args: argparse.Namespace, gh_handler: GitHubHandler) -> None:
+    """Plan mode: print the estimate, add it to the job summary and set outputs."""
+    categories = None
+    if args.mode == 'single':
+        result = gh_handler.extract_lecture_from_comment(args.comment_body or '')
+        if not result:
+            print("❌ Could not extract lecture name from comment")
+            sys.exit(1)
+        lecture_name, categories = result
+        lecture_file = gh_handler.find_lecture_file(lecture_name, args.lectures_path)
+        if not lecture_file:
+            print(f"❌ Lecture file not found: {lecture_name}")
+            sys.exit(1)
+        lecture_files = [lecture_file]
+        if categories == ['all']:
+            categories = None
+    else:
+        lecture_files = gh_handler.get_all_lectures(args.lectures_path)
+
+    static_analysis = args.static_analysis.lower() == 'true'
+    lecture_index = load_lecture_index(gh_handler, args.lectures_path) if static_analysis else None
+    bibliography = load_bibliography(gh_handler, args.lectures_path) if static_analysis else None
+    plan = plan_lectures(gh_handler, lecture_files, categories, args.llm_model, args.schedule,
+                         static_analysis, lecture_index, bibliography)
+    report = format_plan(plan)
+    print(report)
+
+    step_summary = os.environ.get('GITHUB_STEP_SUMMARY')
+    if step_summary:
+        with open(step_summary, 'a') as f:
+            f.write(report)
+    github_output = os.environ.get('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a') as f:
+            f.write(f"estimated-cost-usd={plan['cost_usd']:.2f}\n")
+            f.write(f"estimated-minutes={math.ceil(plan['seconds'] / 60)}\n")
+            f.write(f"lectures-reviewed=0\n")
+
+
 def main():
     """Main entry point"""
     # Print version information
@@ -337,17 +518,48 @@ def main():
     parser.add_argument('--llm-model', help='Specific Claude model (default: claude-sonnet-4-5-20250929)')
     parser.add_argument('--temperature', type=float, default=1.0,
                        help='LLM temperature (default: 1.0, required for extended thinking)')
+    parser.add_argument('--triage-model', default='',
+                       help='Cheaper model that screens rules before the full check (default: off)')
+    parser.add_argument('--triage-base-url', default='',
+                       help='OpenAI-compatible endpoint serving the triage model (default: Anthropic API)')
+    parser.add_argument('--mechanical-model', default='',
+                       help='Model that checks the mechanical rules (default: the main model)')
+    parser.add_argument('--mechanical-base-url', default='',
+                       help='OpenAI-compatible endpoint serving the mechanical model (default: Anthropic API)')
+    parser.add_argument('--schedule', default='sequential', choices=SCHEDULES,
+                       help='How rule checks are ordered: sequential, speculative, or graph')
+    parser.add_argument('--prompt-cache', default='false',
+                       help='Keep the original lecture as a cached prompt prefix, sending fixes as edits')
+    parser.add_argument('--hedge-budget', type=float, default=0.0,
+                       help='Fraction of rule checks that may be duplicated when slower than p95 (default: 0 = off)')
+    parser.add_argument('--response-format', default='markdown', choices=RESPONSE_FORMATS,
+                       help='How the model reports violations: markdown report or report_violations tool call')
+    parser.add_argument('--requote', default='false',
+                       help='Re-quote fixes whose text is not found verbatim in a small follow-up call')
+    parser.add_argument('--static-analysis', default='false',
+                       help='Check code-cell, math, directive, link and citation rules by parsing them instead of calling the LLM')
+    parser.add_argument('--memo-path', default='',
+                       help='JSON memo of per-section findings; unchanged sections are replayed (default: off)')
+    parser.add_argument('--pack-tokens', type=int, default=0,
+                       help='Bulk mode: review short lectures together, up to this many context tokens per prompt (default: 0 = off)')
     parser.add_argument('--rule-categories', default='',
                        help='Comma-separated rule categories to check')
     parser.add_argument('--create-pr', default='true',
                        help='Whether to create PR')
     parser.add_argument('--pr-branch-prefix', default='style-guide',
                        help='Prefix for PR branches')
+    parser.add_argument('--commit-per-lecture', default='false',
+                       help='Bulk mode: one commit per lecture instead of a single commit (default: false)')
+    parser.add_argument('--local-checkout', default='',
+                       help='Checkout to read lectures from and commit fixes to with git, '
+                            'relative to GITHUB_WORKSPACE (default: use the GitHub API)')
     parser.add_argument('--pr-labels', default='',
                        help='Comma-separated PR labels')
     parser.add_argument('--comment-body', help='Issue comment body (for single mode)')
     parser.add_argument('--repository', required=True,
                        help='GitHub repository (owner/repo)')
+    parser.add_argument('--plan', default='false',
+                       help='Only estimate tokens, cost and wall time (no LLM calls, no PR)')
     
     args = parser.parse_args()
     
@@ -360,8 +572,44 @@ def main():
     create_pr = args.create_pr.lower() == 'true'
     
     # Initialize handlers
-    gh_handler = GitHubHandler(github_token, args.repository)
-    reviewer = StyleReviewer(model=args.llm_model, temperature=args.temperature)
+    if args.local_checkout:
+        root = Path(os.environ.get('GITHUB_WORKSPACE', '.')) / args.local_checkout
+        gh_handler = LocalRepoHandler(github_token, args.repository, str(root))
+        print(f"📂 Using local checkout: {gh_handler.root}")
+    else:
+        gh_handler = GitHubHandler(github_token, args.repository)
+
+    if args.plan.lower() == 'true':
+        run_plan(args, gh_handler)
+        return
+
+    triage_provider = None
+    if args.triage_base_url and args.triage_model:
+        triage_provider = OpenAICompatibleProvider(args.triage_base_url, args.triage_model)
+    mechanical_provider = None
+    if args.mechanical_model and args.mechanical_base_url:
+        mechanical_provider = OpenAICompatibleProvider(args.mechanical_base_url, args.mechanical_model)
+    elif args.mechanical_model:
+        mechanical_provider = AnthropicProvider(os.environ.get('ANTHROPIC_API_KEY', ''), args.mechanical_model,
+                                                temperature=args.temperature)
+
+    static_analysis = args.static_analysis.lower() == 'true'
+    reviewer = StyleReviewer(
+        model=args.llm_model,
+        temperature=args.temperature,
+        triage_model=args.triage_model or None,
+        schedule=args.schedule,
+        prompt_cache=args.prompt_cache.lower() == 'true',
+        memo=ReviewMemo(args.memo_path) if args.memo_path else None,
+        hedge_budget=args.hedge_budget,
+        response_format=args.response_format,
+        requote=args.requote.lower() == 'true',
+        triage_provider=triage_provider,
+        mechanical_provider=mechanical_provider,
+        static_analysis=static_analysis,
+        lecture_index=load_lecture_index(gh_handler, args.lectures_path) if static_analysis else None,
+        bibliography=load_bibliography(gh_handler, args.lectures_path) if static_analysis else None,
+    )
     
     # Run review
     try:
@@ -431,7 +679,9 @@ def main():
                 lectures_path=args.lectures_path,
                 create_pr=create_pr,
                 pr_branch_prefix=args.pr_branch_prefix,
-                pr_labels=args.pr_labels
+                pr_labels=args.pr_labels,
+                pack_tokens=args.pack_tokens,
+                commit_per_lecture=args.commit_per_lecture.lower() == 'true',
             )
             
             # Set outputs for GitHub Actions (using environment file)
@@ -468,6 +718,10 @@ def main():
                 sys.exit(1)  # Exit with failure code
             print(f"{'='*60}\n")
         
+        if reviewer.memo is not None:
+            reviewer.memo.save()
+            print(f"♻️  Memo: {reviewer.memo.hits} section check(s) replayed, {reviewer.memo.misses} sent")
+
         print(f"\n{'='*60}")
         print(f"✅ Review complete!")
         print(f"{'='*60}\n")
@@ -0,0 +1,55 @@
+"""
+Registry of the static analyzers.
+
+Rules in ANALYZED_RULES can be checked without the LLM: the code and figure
+rules by code_analyzer (Python syntax trees of the code cells), the
+mechanical math rules by math_analyzer (LaTeX tokens of every formula) and
+the structural admonition rules by directive_analyzer (the directive
+nesting tree). The link rules in INDEXED_RULES also need a
+lecture_index.LectureIndex of the lecture's series, and the citation rule
+in BIBLIOGRAPHY_RULES a citation_analyzer.Bibliography of the book — and
+only for lectures whose citations it can classify.
+StyleReviewer and the planner look rules up here when static analysis is on.
+"""
+from typing import Any, Dict, List, Optional
+
+from . import citation_analyzer, code_analyzer, directive_analyzer, lecture_index, math_analyzer
+from .citation_analyzer import Bibliography
+from .document import MystDocument
+from .lecture_index import LectureIndex
+
+ANALYZERS = (code_analyzer, math_analyzer, directive_analyzer)
+
+ANALYZED_RULES = frozenset().union(*(analyzer.ANALYZED_RULES for analyzer in ANALYZERS))
+
+# Rules that can be analyzed only against a LectureIndex
+INDEXED_RULES = lecture_index.ANALYZED_RULES
+
+# Rules that can be analyzed only against a Bibliography
+BIBLIOGRAPHY_RULES = citation_analyzer.ANALYZED_RULES
+
+
+def is_analyzed(rule_id: str, index: Optional[LectureIndex] = None,
+                bibliography: Optional[Bibliography] = None,
+                document: Optional[MystDocument] = None) -> bool:
+    """
+    True if the rule can be checked without the LLM.
+
+    Link rules need an index and the citation rule a bibliography; given the
+    `document`, the citation rule also needs every citation in it to be
+    classifiable (citation_analyzer.decides).
+    """
+    if rule_id in BIBLIOGRAPHY_RULES:
+        return bibliography is not None and (document is None or citation_analyzer.decides(document, bibliography))
+    return rule_id in ANALYZED_RULES or (index is not None and rule_id in INDEXED_RULES)
+
+
+def analyze_rule(document: MystDocument, rule: Dict[str, Any], index: Optional[LectureIndex] = None,
+                 bibliography: Optional[Bibliography] = None) -> List[Dict[str, Any]]:
+    """Check a rule for which is_analyzed() holds with its analyzer (see code_analyzer.analyze_rule)."""
+    if rule['rule_id'] in INDEXED_RULES:
+        return lecture_index.analyze_rule(document, rule, index)
+    if rule['rule_id'] in BIBLIOGRAPHY_RULES:
+        return citation_analyzer.analyze_rule(document, rule, bibliography)
+    analyzer = next(a for a in ANALYZERS if rule['rule_id'] in a.ANALYZED_RULES)
+    return analyzer.analyze_rule(document, rule)
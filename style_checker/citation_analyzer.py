@@ -0,0 +1,355 @@
+"""
+Bibliography index and static checks for the citation rule.
+
+qe-ref-001 asks whether each citation is written the way the sentence uses
+it. Most citations in a lecture answer that from their surroundings: a
+`{cite}` after "the work of" names its authors in-text, a `{cite:t}` just
+before the full stop is parenthetical, "Bellman (1957)" next to
+{cite}`Bellman1957` is a manual citation. `Bibliography` holds the book's
+`.bib` entries (key, author surnames, year), loaded once per run, so cite
+keys can be verified and author-year text matched to its key.
+
+Citations whose position or author-year text the checks can't classify are
+ambiguous. A lecture with any of them is still sent to the model for
+qe-ref-001 (see `decides()`); every other lecture is checked here.
+"""
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .document import MystDocument
+from .findings import edit_findings, text_finding
+
+# Words after which a citation names its authors in the sentence ("the work of {cite:t}`X`")
+IN_TEXT_WORDS = {'by', 'of', 'in', 'following', 'from', 'with'}
+
+# Abbreviations whose full stop doesn't end a sentence
+ABBREVIATIONS = {'e.g.', 'i.e.', 'cf.', 'etc.', 'al.', 'p.', 'pp.', 'vs.', 'eq.', 'ch.'}
+
+# Citation roles this rule decides between
+IN_TEXT_ROLES = {'cite:t'}
+PARENTHETICAL_ROLES = {'cite', 'cite:p'}
+
+_ENTRY_RE = re.compile(r'@(\w+)\s*\{\s*([^,\s{}]+)\s*,')
+_FIELD_RE = re.compile(r'\s*([\w-]+)\s*=\s*')
+_ACCENT_RE = re.compile(r'\\[\'"`^~=.uvHckrb]\s*\{?\\?(\w)\}?')
+_BIBFILES_RE = re.compile(r'^[ \t]*bibtex_bibfiles:[ \t]*(.*)$', re.MULTILINE)
+
+_NAME = r"[A-Z][^\W\d_]*(?:['-][^\W\d_]+)*"
+_AUTHORS = rf"{_NAME}(?:(?:,\s+|\s+and\s+|\s*&\s*){_NAME})*(?:\s+et\s+al\.?)?"
+_IN_TEXT_MENTION_RE = re.compile(rf"\b(?P<authors>{_AUTHORS})\s+\((?P<year>\d{{4}})[a-z]?\)")
+_PARENTHETICAL_MENTION_RE = re.compile(rf"\((?P<authors>{_AUTHORS}),?\s+(?P<year>\d{{4}})[a-z]?\)")
+# Anything else that looks like a manual citation: a capitalized word and a year in parentheses
+_LOOSE_MENTION_RE = re.compile(r"\([^()]*\b[A-Z][^\W\d_]+[^()]*\b\d{4}[a-z]?\b[^()]*\)")
+_SEPARATOR_RE = re.compile(r',\s+|\s+and\s+|\s*&\s*')
+_CODE_SPAN_RE = re.compile(r'`[^`\n]*`')
+_LIST_MARKER_RE = re.compile(r'\s*(?:[-*+]|\d+[.)])?\s*')
+
+
+def _clean(text: str) -> str:
+    """LaTeX accents and braces removed: '{G\\"o}del' -> 'Godel'."""
+    return re.sub(r'\s+', ' ', _ACCENT_RE.sub(r'\1', text).replace('{', '').replace('}', '')).strip()
+
+
+def _split_top_level(text: str, separator: str = r'\s+') -> List[str]:
+    """Split at `separator` (a regex, case-insensitive) outside braces."""
+    parts, depth, start = [], 0, 0
+    pattern = re.compile(separator, re.IGNORECASE)
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        elif depth == 0:
+            match = pattern.match(text, i)
+            if match and match.end() > i and i > 0:
+                parts.append(text[start:i])
+                start = i = match.end()
+                continue
+        i += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _surname(name: str) -> str:
+    """Surname of one BibTeX name: 'Lucas, Jr., Robert E.' / 'Robert E. Lucas' -> 'Lucas'."""
+    name = name.strip()
+    if name.startswith('{') and name.endswith('}') and name.count('{') == 1:
+        return _clean(name)      # Corporate author: {World Bank}
+    parts = _split_top_level(name, r'\s*,\s*')
+    if len(parts) > 1:
+        return _clean(parts[0])
+    words = _split_top_level(name)
+    return _clean(words[-1]).split(',')[0] if words else ''
+
+
+def _field_value(text: str, pos: int) -> Tuple[str, int]:
+    """Value of the BibTeX field starting at `pos` (braced, quoted or bare) and the offset after it."""
+    if pos < len(text) and text[pos] in '{"':
+        # Braced or quoted; a quote inside braces ({\"o}) doesn't end a quoted value
+        depth = 0
+        for i in range(pos, len(text)):
+            if text[i] == '{':
+                depth += 1
+            elif text[i] == '}':
+                depth -= 1
+            if i > pos and ((text[pos] == '{' and depth == 0) or (text[pos] == '"' and depth == 0 and text[i] == '"')):
+                return text[pos + 1:i], i + 1
+        raise ValueError("Unterminated BibTeX field")
+    match = re.compile(r'[^,}\s]*').match(text, pos)
+    return match.group(0), match.end()
+
+
+def parse_bibtex(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Citation key -> {'type', 'authors' (surnames, in order), 'year'} for a .bib file.
+
+    @string, @preamble and @comment entries and malformed entries are skipped.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    for match in _ENTRY_RE.finditer(text):
+        entry_type, key = match.group(1).lower(), match.group(2)
+        if entry_type in ('string', 'preamble', 'comment'):
+            continue
+        fields: Dict[str, str] = {}
+        pos = match.end()
+        try:
+            while True:
+                field = _FIELD_RE.match(text, pos)
+                if not field:
+                    break
+                value, pos = _field_value(text, field.end())
+                fields[field.group(1).lower()] = value
+                separator = re.compile(r'\s*,?').match(text, pos)
+                pos = separator.end()
+                if separator.group(0).strip() != ',':
+                    break
+        except ValueError:
+            continue
+        people = fields.get('author') or fields.get('editor') or ''
+        year = re.search(r'\d{4}', fields.get('year') or fields.get('date') or '')
+        entries[key] = {
+            'type': entry_type,
+            'authors': [_surname(name) for name in _split_top_level(people, r'\s+and\s+')],
+            'year': year.group(0) if year else '',
+        }
+    return entries
+
+
+def bibtex_files(config: str) -> List[str]:
+    """`bibtex_bibfiles` of a Jupyter Book `_config.yml` (inline or block list)."""
+    match = _BIBFILES_RE.search(config)
+    if not match:
+        return []
+    inline = match.group(1).strip()
+    if inline:
+        return [item.strip().strip('"\'') for item in inline.strip('[]').split(',') if item.strip()]
+    files = []
+    for line in config[match.end():].split('\n')[1:]:
+        item = re.match(r'^\s*-\s*["\']?([^"\'#\s]+)', line)
+        if not item:
+            if line.strip():
+                break
+            continue
+        files.append(item.group(1))
+    return files
+
+
+class Bibliography:
+    """
+    Citation keys of a book and the author surnames and year of each entry.
+
+    Attributes:
+        entries: Key -> {'type', 'authors', 'year'} (see parse_bibtex)
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.entries: Dict[str, Dict[str, Any]] = dict(entries or {})
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> 'Bibliography':
+        """Build an index from the text of each .bib file (later files win on duplicate keys)."""
+        bibliography = cls()
+        for text in texts:
+            bibliography.entries.update(parse_bibtex(text))
+        return bibliography
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> 'Bibliography':
+        """
+        Build an index from a book directory on disk.
+
+        Uses the files `_config.yml` names in `bibtex_bibfiles`, or else every
+        .bib file under the directory (outside `_build`).
+        """
+        directory = Path(directory)
+        config = directory / '_config.yml'
+        names = bibtex_files(config.read_text(encoding='utf-8')) if config.exists() else []
+        paths = ([directory / name for name in names] if names else
+                 [path for path in sorted(directory.rglob('*.bib')) if '_build' not in path.parts])
+        return cls.from_texts(path.read_text(encoding='utf-8') for path in paths if path.exists())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def matches(self, surnames: List[str], year: str) -> List[str]:
+        """Keys whose first authors are `surnames` (in order) and whose year is `year`."""
+        wanted = [name.casefold() for name in surnames]
+        return [key for key, entry in self.entries.items()
+                if entry['year'] == year
+                and [name.casefold() for name in entry['authors'][:len(wanted)]] == wanted]
+
+
+# --- Scanning ---------------------------------------------------------------
+
+def _position(content: str, block: Dict[str, Any], start: int, end: int) -> Optional[str]:
+    """'in-text' or 'parenthetical' use of the citation at [start, end), or None if unclear."""
+    before = content[block['start']:start].rstrip()
+    after = content[end:block['end']]
+    word = before.split()[-1].lower() if before.split() else ''
+    sentence_start = (_LIST_MARKER_RE.fullmatch(before.split('\n')[-1]) is not None
+                      or (before[-1] in '.!?' and word not in ABBREVIATIONS))
+    ends = re.match(r'\s*(?:[.;:!?)]|$)', after) is not None
+    if word.strip('(') in IN_TEXT_WORDS:
+        return 'in-text'
+    if sentence_start:
+        return None if ends else 'in-text'
+    return 'parenthetical' if ends else None
+
+
+def _gap(content: str, pos: int) -> int:
+    """Length of the spaces just before `pos`, deleted along with what follows them."""
+    return pos - len(content[:pos].rstrip(' \t'))
+
+
+def _without_key(role: Dict[str, Any], key: str) -> str:
+    """The citation role's text with `key` dropped from its keys."""
+    keys = ','.join(k for k in role['keys'] if k != key)
+    return f"{{{role['role']}}}`{keys}`"
+
+
+def _scan(document: MystDocument, bibliography: Bibliography
+          ) -> Tuple[List[Tuple[int, int, str, str]], List[Dict[str, Any]], List[Tuple[int, int]]]:
+    """
+    Classify every citation of the lecture.
+
+    Returns:
+        (edits, unfixable findings, spans of ambiguous citations)
+    """
+    content = document.content
+    edits: List[Tuple[int, int, str, str]] = []
+    unfixable: List[Dict[str, Any]] = []
+    ambiguous: List[Tuple[int, int]] = []
+    for block in document.blocks_of('paragraph'):
+        roles = [c for c in document.citations if block['start'] <= c['start'] < block['end']]
+        text = content[block['start']:block['end']]
+        skip = [(block['start'] + m.start(), block['start'] + m.end()) for m in _CODE_SPAN_RE.finditer(text)]
+        skip += [(i['start'], i['end']) for i in document.inlines if block['start'] <= i['start'] < block['end']]
+        consumed = set()
+
+        # Manual author-year citations
+        mentions = []
+        for pattern, kind in ((_PARENTHETICAL_MENTION_RE, 'parenthetical'), (_IN_TEXT_MENTION_RE, 'in-text'),
+                              (_LOOSE_MENTION_RE, None)):
+            for match in pattern.finditer(text):
+                start, end = block['start'] + match.start(), block['start'] + match.end()
+                if any(s < end and start < e for s, e in skip + [m[:2] for m in mentions]):
+                    continue
+                mentions.append((start, end, kind, match))
+        for start, end, kind, match in sorted(mentions, key=lambda m: m[0]):
+            surnames = [name for name in _SEPARATOR_RE.split(re.sub(r'\s+et\s+al\.?$', '', match.group('authors')))
+                        ] if kind else []
+            keys = bibliography.matches(surnames, match.group('year')) if kind else []
+            if len(keys) != 1:
+                ambiguous.append((start, end))
+                continue
+            key = keys[0]
+            mention = content[start:end]
+            replacement = f"{{cite:t}}`{key}`" if kind == 'in-text' else f"{{cite}}`{key}`"
+            description = f"Manual citation \"{mention}\" → `{replacement}`"
+            # The same work cited by a role in this paragraph as well
+            role = next((r for r in roles if key in r['keys'] and id(r) not in consumed), None)
+            if role is not None:
+                consumed.add(id(role))
+            if role is not None and kind == 'parenthetical':
+                edits.append((start - _gap(content, start), end, '', description))
+                continue
+            edits.append((start, end, replacement, description))
+            if role is not None and len(role['keys']) > 1:
+                edits.append((role['start'], role['end'], _without_key(role, key), description))
+            elif role is not None:
+                edits.append((role['start'] - _gap(content, role['start']), role['end'], '', description))
+
+        # Citation roles
+        for role in roles:
+            unknown = [key for key in role['keys'] if key not in bibliography]
+            if unknown:
+                unfixable.append(text_finding(
+                    document, role['start'], role['end'], '',
+                    f"`{'`, `'.join(unknown)}` not in the bibliography",
+                    "Every cited key must be defined in the book's .bib file.",
+                ))
+            if id(role) in consumed or role['role'] not in IN_TEXT_ROLES | PARENTHETICAL_ROLES:
+                continue
+            position = _position(content, block, role['start'], role['end'])
+            if position is None:
+                ambiguous.append((role['start'], role['end']))
+                continue
+            wanted = 'cite:t' if position == 'in-text' else 'cite'
+            if (role['role'] in IN_TEXT_ROLES) != (position == 'in-text'):
+                edits.append((role['start'] + 1, role['start'] + 1 + len(role['role']), wanted,
+                              f"{position.capitalize()} citation uses `{{{role['role']}}}` → `{{{wanted}}}`"))
+    return edits, unfixable, ambiguous
+
+
+def ambiguous_citations(document: MystDocument, bibliography: Bibliography) -> List[Tuple[int, int]]:
+    """Spans of citations whose style the checks can't decide (left to the model)."""
+    return _scan(document, bibliography)[2]
+
+
+def decides(document: MystDocument, bibliography: Bibliography) -> bool:
+    """True if every citation of the lecture can be checked without the model."""
+    return not ambiguous_citations(document, bibliography)
+
+
+# --- Checkers ---------------------------------------------------------------
+
+def check_citation_style(document: MystDocument, bibliography: Bibliography) -> List[Dict[str, Any]]:
+    """qe-ref-001: `{cite}` vs `{cite:t}` by position, manual author-year citations, unknown keys."""
+    edits, unfixable, _ = _scan(document, bibliography)
+    return edit_findings(document, edits,
+                         "Use {cite:t} where the authors are part of the sentence, {cite} for "
+                         "parenthetical citations, and a citation role instead of a manual author (year).") + unfixable
+
+
+RULE_CHECKERS: Dict[str, Callable[[MystDocument, Bibliography], List[Dict[str, Any]]]] = {
+    'qe-ref-001': check_citation_style,
+}
+
+ANALYZED_RULES = frozenset(RULE_CHECKERS)
+
+
+def analyze_rule(document: MystDocument, rule: Dict[str, Any], bibliography: Bibliography) -> List[Dict[str, Any]]:
+    """
+    Check the citation rule against a bibliography without the LLM.
+
+    Args:
+        document: Model of the lecture version being checked; decides() must
+            hold for it
+        rule: Rule dict (see reviewer.extract_individual_rules); its id must
+            be in ANALYZED_RULES
+        bibliography: The book's bibliography
+
+    Returns:
+        Violations in the parse_markdown_response() format, each with a
+        `position` hint at the start of its current_text
+    """
+    violations = RULE_CHECKERS[rule['rule_id']](document, bibliography)
+    for violation in violations:
+        violation.update(rule_id=rule['rule_id'], rule_title=rule.get('title', ''))
+    return violations
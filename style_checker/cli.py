@@ -8,6 +8,7 @@ Usage:
     qestyle lecture.md                          # Review, apply fixes, write report
     qestyle lecture.md --categories writing     # Check specific categories only
     qestyle lecture.md --dry-run                # Report only, don't modify the file
+    qestyle plan lectures/                      # Estimate tokens, cost and time offline
 
 Install from GitHub:
     pip install git+https://github.com/QuantEcon/action-style-guide.git
@@ -23,7 +24,19 @@ from datetime import datetime
 
 from style_checker import __version__
 from style_checker.categories import VALID_CATEGORIES
-from style_checker.reviewer import StyleReviewer
+from style_checker.citation_analyzer import Bibliography
+from style_checker.lecture_index import LectureIndex
+from style_checker.memo import ReviewMemo, default_memo_path
+from style_checker.planner import append_usage, default_ledger_path, format_plan, load_calibration, plan_review
+from style_checker.providers import OpenAICompatibleProvider
+from style_checker.reviewer import (
+    EXPLANATION_WORDS,
+    RESPONSE_FORMATS,
+    SCHEDULES,
+    AnthropicProvider,
+    StyleReviewer,
+    format_ratio,
+)
 
 
 def display_width(s: str) -> int:
@@ -79,6 +92,19 @@ def format_report(result: dict, lecture_path: str, dry_run: bool) -> str:
         lines.append(f"- **Mode:** dry-run (no changes applied)")
     else:
         lines.append(f"- **Mode:** fix (rule violations applied to file)")
+    triage = result.get('triage')
+    if triage:
+        checked = len(result.get('triage_log', [])) - triage['skipped']
+        lines.append(
+            f"- **Triage:** {checked} rule(s) checked, {triage['skipped']} skipped "
+            f"(precision {format_ratio(triage['precision'])}, recall {format_ratio(triage['recall'])})"
+        )
+    skipped_rules = result.get('skipped_rules', [])
+    if skipped_rules:
+        lines.append(
+            f"- **Skipped (no trigger match):** {len(skipped_rules)} rule(s) — "
+            + ", ".join(r['rule_id'] for r in skipped_rules)
+        )
     lines.append(f"")
 
     rule_violations = result.get('rule_violations', [])
@@ -202,8 +228,142 @@ def check_git_dirty(lecture_path: Path) -> bool:
         return False
 
 
+def parse_categories(value):
+    """Split a --categories value, exiting with a usage error on unknown names."""
+    if not value:
+        return list(VALID_CATEGORIES)
+    categories = [c.strip() for c in value.split(",")]
+    invalid = [c for c in categories if c not in VALID_CATEGORIES]
+    if invalid:
+        print(f"Error: invalid categories: {', '.join(invalid)}", file=sys.stderr)
+        print(f"Valid categories: {', '.join(VALID_CATEGORIES)}", file=sys.stderr)
+        sys.exit(1)
+    return categories
+
+
+def collect_lectures(paths):
+    """
+    Map lecture name -> content for .md files and directories of them.
+
+    A lecture is named by its path in its book without the suffix
+    ('sub/kalman'), so lectures of the same name in different directories
+    are kept apart; if two books share a name, the later file keeps its path.
+    """
+    lectures = {}
+    files_by_name = {}
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files = sorted(p for p in path.rglob("*.md") if not p.name.startswith("qestyle("))
+        elif path.exists():
+            files = [path]
+        else:
+            print(f"Error: file not found: {path.resolve()}", file=sys.stderr)
+            sys.exit(1)
+        for file in files:
+            resolved = file.resolve()
+            name = resolved.relative_to(book_root(resolved)).with_suffix("").as_posix()
+            if files_by_name.get(name, resolved) != resolved:
+                name = file.as_posix()
+            files_by_name[name] = resolved
+            lectures[name] = file.read_text(encoding="utf-8")
+    return lectures
+
+
+def book_root(path):
+    """Nearest directory at or above `path` with a `_toc.yml`, else the lecture's own directory."""
+    start = path if path.is_dir() else path.parent
+    for directory in (start, *start.parents):
+        if (directory / "_toc.yml").exists():
+            return directory
+    return start
+
+
+def load_lecture_index(path, inventories):
+    """Index of the lecture series `path` belongs to, plus `PREFIX=objects.inv` inventories."""
+    index = LectureIndex.from_directory(book_root(path.resolve()))
+    for spec in inventories or []:
+        prefix, separator, file = spec.partition("=")
+        if not separator:
+            print(f"Error: --inventory expects PREFIX=FILE, got '{spec}'", file=sys.stderr)
+            sys.exit(1)
+        try:
+            index.add_inventory(prefix, Path(file).read_bytes())
+        except (OSError, ValueError) as e:
+            print(f"Error: could not read inventory {file}: {e}", file=sys.stderr)
+            sys.exit(1)
+    return index
+
+
+def load_bibliography(path):
+    """The .bib entries of the book `path` belongs to, or None if it has none."""
+    bibliography = Bibliography.from_directory(book_root(path.resolve()))
+    return bibliography if len(bibliography) else None
+
+
+def plan_main(argv):
+    """`qestyle plan` — estimate a review's tokens, cost and wall time without API calls."""
+    parser = argparse.ArgumentParser(
+        prog="qestyle plan",
+        description="Estimate tokens, cost and wall time for reviewing lectures "
+                    "(no API calls; calibrated from the usage ledger)",
+    )
+    parser.add_argument("paths", nargs="+", help="Lecture .md files or directories")
+    parser.add_argument("-c", "--categories", default=None,
+                        help="Comma-separated categories to check (default: all)")
+    parser.add_argument("--model", default=None,
+                        help="Claude model, for pricing (default: claude-sonnet-4-5-20250929)")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="sequential",
+                        help="Schedule to project wall time for (default: sequential)")
+    parser.add_argument("--max-workers", type=int, default=4,
+                        help="Concurrent rule checks for concurrent schedules (default: 4)")
+    parser.add_argument("--full-context", action="store_true",
+                        help="Plan for sending every rule the whole lecture")
+    parser.add_argument("--static-analysis", action="store_true",
+                        help="Plan for checking the code-cell, math, directive, link and citation rules "
+                             "by static analysis")
+    parser.add_argument("--inventory", action="append", metavar="PREFIX=FILE",
+                        help="With --static-analysis: Sphinx objects.inv of another lecture series "
+                             "(repeatable)")
+    parser.add_argument("--usage-ledger", default=str(default_ledger_path()),
+                        help="Usage ledger to calibrate from (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Also write the plan to this Markdown file")
+    args = parser.parse_args(argv)
+
+    categories = parse_categories(args.categories)
+    lectures = collect_lectures(args.paths)
+    books = sorted({str(book_root(Path(raw).resolve())) for raw in args.paths})
+    if args.static_analysis and len(books) > 1:
+        # The link and citation checks are planned against one book's index and bibliography
+        print(f"Error: --static-analysis plans one book at a time; the paths span {len(books)}: "
+              f"{', '.join(books)}", file=sys.stderr)
+        sys.exit(1)
+    plan = plan_review(
+        lectures,
+        categories=categories,
+        calibration=load_calibration(args.usage_ledger),
+        model=args.model or "claude-sonnet-4-5-20250929",
+        schedule=args.schedule,
+        max_workers=args.max_workers,
+        scoped_context=not args.full_context,
+        static_analysis=args.static_analysis,
+        lecture_index=load_lecture_index(Path(args.paths[0]), args.inventory) if args.static_analysis else None,
+        bibliography=load_bibliography(Path(args.paths[0])) if args.static_analysis else None,
+    )
+    report = format_plan(plan)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+        print(f"📄 Plan: {args.output}")
+
+
 def main():
     """CLI entry point for qestyle."""
+    if sys.argv[1:2] == ["plan"]:
+        plan_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         prog="qestyle",
         description="QuantEcon Style Guide Checker — local CLI",
@@ -214,6 +374,7 @@ Examples:
   qestyle lecture.md --categories writing     # Check writing rules only
   qestyle lecture.md --dry-run                # Report only, don't modify the file
   qestyle lecture.md -o custom-report.md      # Write report to a custom path
+  qestyle plan lectures/ --schedule graph     # Estimate tokens, cost and time offline
 
 Categories:
   writing, math, code, jax, figures, references, links, admonitions
@@ -255,6 +416,130 @@ Categories:
         default=1.0,
         help="LLM temperature (default: 1.0, required for extended thinking)",
     )
+    parser.add_argument(
+        "--triage-model",
+        default=None,
+        help="Cheaper model that screens rules first; only likely violations "
+             "get the full check (e.g. claude-haiku-4-5, default: off)",
+    )
+    parser.add_argument(
+        "--triage-base-url",
+        default=None,
+        help="Serve --triage-model from this OpenAI-compatible endpoint "
+             "(e.g. a local llama.cpp or vLLM server at http://localhost:8080/v1) "
+             "instead of the Anthropic API",
+    )
+    parser.add_argument(
+        "--mechanical-model",
+        default=None,
+        help="Model that checks the mechanical rules (pattern-level rewrites "
+             "such as Unicode parameters or transpose notation) instead of --model",
+    )
+    parser.add_argument(
+        "--mechanical-base-url",
+        default=None,
+        help="Serve --mechanical-model from this OpenAI-compatible endpoint "
+             "instead of the Anthropic API",
+    )
+    parser.add_argument(
+        "--triage-audit-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of rules triaged as 'no' to check anyway, to measure "
+             "triage recall (default: 0.0)",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULES,
+        default="sequential",
+        help="How rule checks are ordered: 'sequential' (one at a time), "
+             "'speculative' (each category's rules concurrently, rebasing fixes), "
+             "or 'graph' (waves of rules with disjoint regions, across "
+             "categories) (default: sequential)",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="Maximum concurrent rule checks for concurrent schedules (default: 4)",
+    )
+    parser.add_argument(
+        "--full-context",
+        action="store_true",
+        help="Send every rule the whole lecture instead of only the fragments "
+             "in the rule's context regions",
+    )
+    parser.add_argument(
+        "--static-analysis",
+        action="store_true",
+        help="Check the code-cell, math, directive, link and citation rules that parsing can decide "
+             "(Greek names, timing, titles, spines, line width, PRNG keys; "
+             "transposes, matrix brackets, bold face, sequences, aligned, tags; "
+             "gated exercises, tick counts, prf: prefix, solution links; "
+             "same- and cross-series links, against an index of the lecture's book; "
+             "citation style, against the book's .bib files) "
+             "without the LLM",
+    )
+    parser.add_argument(
+        "--inventory",
+        action="append",
+        metavar="PREFIX=FILE",
+        help="With --static-analysis: Sphinx objects.inv of another lecture "
+             "series, so bare links to its documents can be recognised "
+             "(repeatable, e.g. intro=intro-objects.inv)",
+    )
+    parser.add_argument(
+        "--prompt-cache",
+        action="store_true",
+        help="Keep the original lecture as a cached prompt prefix and send the "
+             "fixes applied since as a list of edits, so the cache stays warm "
+             "across the whole rule chain",
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.0,
+        help="Fraction of rule checks that may get a duplicate request when they "
+             "run past the p95 latency seen so far; the first response wins "
+             "(default: 0.0 = off)",
+    )
+    parser.add_argument(
+        "--response-format",
+        choices=RESPONSE_FORMATS,
+        default="markdown",
+        help="How the model reports violations: a Markdown report (markdown) "
+             "or the arguments of a report_violations tool call (tool), which "
+             "needs no text parsing and spends fewer output tokens",
+    )
+    parser.add_argument(
+        "--explanation-words",
+        type=int,
+        default=EXPLANATION_WORDS,
+        help=f"With --response-format tool, word limit for each violation's "
+             f"explanation (default: {EXPLANATION_WORDS})",
+    )
+    parser.add_argument(
+        "--requote",
+        action="store_true",
+        help="When a fix's quoted text isn't found verbatim, ask for the exact "
+             "span in a small call over the lines around it instead of "
+             "dropping the fix",
+    )
+    parser.add_argument(
+        "--memo",
+        nargs="?",
+        const=str(default_memo_path()),
+        default=None,
+        metavar="PATH",
+        help="Remember each rule's findings per section and only re-check "
+             f"sections that changed since the last run (default path: {default_memo_path()})",
+    )
+    parser.add_argument(
+        "--usage-ledger",
+        default=str(default_ledger_path()),
+        help="Append API usage to this JSONL ledger, which calibrates "
+             "`qestyle plan` and max_tokens sizing; '' to disable (default: %(default)s)",
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -270,15 +555,7 @@ Categories:
         sys.exit(1)
 
     # Parse categories
-    if args.categories:
-        categories = [c.strip() for c in args.categories.split(",")]
-        invalid = [c for c in categories if c not in VALID_CATEGORIES]
-        if invalid:
-            print(f"Error: invalid categories: {', '.join(invalid)}", file=sys.stderr)
-            print(f"Valid categories: {', '.join(VALID_CATEGORIES)}", file=sys.stderr)
-            sys.exit(1)
-    else:
-        categories = list(VALID_CATEGORIES)
+    categories = parse_categories(args.categories)
 
     # API key
     api_key = args.api_key or os.environ.get("ANTHROPIC_API_KEY")
@@ -287,6 +564,13 @@ Categories:
         print("Set it with: export ANTHROPIC_API_KEY='your-key-here'", file=sys.stderr)
         sys.exit(1)
 
+    if args.triage_base_url and not args.triage_model:
+        print("Error: --triage-base-url needs --triage-model", file=sys.stderr)
+        sys.exit(1)
+    if args.mechanical_base_url and not args.mechanical_model:
+        print("Error: --mechanical-base-url needs --mechanical-model", file=sys.stderr)
+        sys.exit(1)
+
     # --- Check for uncommitted changes (only in fix mode) ---
     if not args.dry_run and check_git_dirty(lecture_path):
         title = f"Uncommitted changes: {lecture_path.name}"
@@ -329,16 +613,57 @@ Categories:
     content = lecture_path.read_text(encoding="utf-8")
     lecture_name = lecture_path.stem
 
+    # Optional backends for triage and the mechanical rules
+    triage_provider = None
+    if args.triage_base_url:
+        triage_provider = OpenAICompatibleProvider(args.triage_base_url, args.triage_model)
+    mechanical_provider = None
+    if args.mechanical_base_url:
+        mechanical_provider = OpenAICompatibleProvider(args.mechanical_base_url, args.mechanical_model)
+    elif args.mechanical_model:
+        mechanical_provider = AnthropicProvider(api_key, args.mechanical_model, temperature=args.temperature)
+
     # Initialize reviewer (same engine as the GitHub Action)
     reviewer = StyleReviewer(
         api_key=api_key,
         model=args.model,
         temperature=args.temperature,
+        triage_model=args.triage_model,
+        triage_audit_rate=args.triage_audit_rate,
+        schedule=args.schedule,
+        max_workers=args.max_workers,
+        scoped_context=not args.full_context,
+        calibration=load_calibration(args.usage_ledger or None),
+        prompt_cache=args.prompt_cache,
+        memo=ReviewMemo(args.memo) if args.memo else None,
+        hedge_budget=args.hedge_budget,
+        response_format=args.response_format,
+        explanation_words=args.explanation_words,
+        requote=args.requote,
+        triage_provider=triage_provider,
+        mechanical_provider=mechanical_provider,
+        static_analysis=args.static_analysis,
+        lecture_index=load_lecture_index(lecture_path, args.inventory) if args.static_analysis else None,
+        bibliography=load_bibliography(lecture_path) if args.static_analysis else None,
     )
 
     # Run the review
     result = reviewer.review_lecture_single_rule(content, categories, lecture_name)
 
+    if reviewer.memo is not None:
+        try:
+            reviewer.memo.save()
+            print(f"   ♻️  Memo: {reviewer.memo.hits} section check(s) replayed, "
+                  f"{reviewer.memo.misses} sent ({args.memo})")
+        except OSError as e:
+            print(f"   ⚠️  Could not save the memo to {args.memo}: {e}")
+
+    if args.usage_ledger:
+        try:
+            append_usage(args.usage_ledger, reviewer.usage_log)
+        except OSError as e:
+            print(f"   ⚠️  Could not record API usage in {args.usage_ledger}: {e}")
+
     issues_found = result.get("issues_found", 0)
     rule_count = len(result.get("rule_violations", []))
     style_count = len(result.get("style_violations", []))
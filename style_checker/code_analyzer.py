@@ -0,0 +1,834 @@
+"""
+Static analysis of the Python in a lecture's code cells.
+
+Several rules are properties of Python code that the `ast` module decides
+exactly — a spelled-out `alpha` bound in a cell, an `ax.set_title()` call, a
+`plot()` without `lw=2`. `analyze_rule()` checks those rules without the LLM:
+every `{code-cell}` is parsed once (IPython magics and shell escapes are
+blanked out first, so `%timeit` lines don't break the parse), a checker per
+rule walks the trees, and findings come back as violation dicts with exact
+`position` hints. Fixes are only offered where they are mechanical — renaming
+a variable the lecture binds itself, deleting a spine-removal statement,
+adding `lw=2` — and everything else is reported for human review.
+
+Cells that don't parse are skipped: the analyzer never guesses.
+"""
+import ast
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .document import MystDocument, parse_document
+from .findings import edit_findings, line_bounds, text_finding
+
+# Code cells with these languages (or none) are analyzed as Python
+PYTHON_LANGUAGES = {'', 'python', 'python3', 'ipython', 'ipython3'}
+
+# Cell magics whose body is still Python
+PYTHON_CELL_MAGICS = {'time', 'timeit', 'capture'}
+
+# Spelled-out Greek letters and their symbols (qe-code-002). `lambda` is a
+# keyword and `pi` is nearly always the constant, so neither is renamed.
+GREEK_LETTERS = {
+    'alpha': 'α', 'beta': 'β', 'gamma': 'γ', 'delta': 'δ', 'epsilon': 'ε',
+    'zeta': 'ζ', 'eta': 'η', 'theta': 'θ', 'iota': 'ι', 'kappa': 'κ',
+    'mu': 'μ', 'nu': 'ν', 'xi': 'ξ', 'rho': 'ρ', 'sigma': 'σ', 'tau': 'τ',
+    'phi': 'φ', 'chi': 'χ', 'psi': 'ψ', 'omega': 'ω',
+    'Gamma': 'Γ', 'Delta': 'Δ', 'Theta': 'Θ', 'Xi': 'Ξ', 'Sigma': 'Σ',
+    'Phi': 'Φ', 'Psi': 'Ψ', 'Omega': 'Ω',
+}
+_GREEK_NAME_RE = re.compile(r'^(%s)(_\w*)?$' % '|'.join(GREEK_LETTERS))
+
+# `time` module functions used for manual timing (qe-code-004)
+TIMING_FUNCTIONS = {'time', 'perf_counter', 'process_time', 'monotonic'}
+LEGACY_TIMERS = {'tic', 'toc', 'tac'}
+
+# Directives inside which embedded titles are allowed (qe-fig-003)
+EXERCISE_DIRECTIVES = {'exercise', 'solution'}
+
+_LINE_MAGIC_RE = re.compile(r'^(\s*)([%!])(%?)(\w*)(.*)$')
+_ASSIGNED_MAGIC_RE = re.compile(r'^(\s*[\w.,\s\[\]]+=\s*)[%!].*$')
+_OPTION_LINE_RE = re.compile(r'^\s*:[\w-]+:')
+
+
+class CodeCell:
+    """
+    One Python code cell of a lecture.
+
+    Attributes:
+        block: The MystDocument code block
+        lines: Source lines of the cell body, without newlines
+        line_offsets: Lecture offset of each line in `lines`
+        magics: 1-based cell line -> (magic name, argument) for `%` line magics
+        cell_magic: (name, argument) of a leading `%%` cell magic, or None
+        tree: Parsed module, or None if the cell isn't valid Python
+    """
+
+    def __init__(self, content: str, block: Dict[str, Any]):
+        self.block = block
+        self.content = content
+        raw = content[block['start']:block['end']].split('\n')
+        offsets = []
+        pos = block['start']
+        for line in raw:
+            offsets.append(pos)
+            pos += len(line) + 1
+
+        # Body: after the fence line and any option header, before the closing fence
+        first, last = 1, len(raw)
+        while last > first and not raw[last - 1].strip():
+            last -= 1
+        if last > first and re.match(r'^\s*(`{3,}|~{3,})\s*$', raw[last - 1]):
+            last -= 1
+        if first < last and raw[first].strip() == '---':
+            end = next((i for i in range(first + 1, last) if raw[i].strip() == '---'), None)
+            if end is not None:
+                first = end + 1
+        while first < last and _OPTION_LINE_RE.match(raw[first]):
+            first += 1
+        self.lines = raw[first:last]
+        self.line_offsets = offsets[first:last]
+
+        self.magics: Dict[int, Tuple[str, str]] = {}
+        self.cell_magic: Optional[Tuple[str, str]] = None
+        self.tree = self._parse()
+
+    def _parse(self) -> Optional[ast.Module]:
+        """Parse the cell as Python, blanking magics so line numbers are kept."""
+        python = []
+        for lineno, line in enumerate(self.lines, 1):
+            magic = _LINE_MAGIC_RE.match(line)
+            if magic and magic.group(3) and not any(l.strip() for l in self.lines[:lineno - 1]):
+                name, argument = magic.group(4), magic.group(5).strip()
+                if name not in PYTHON_CELL_MAGICS:
+                    return None
+                self.cell_magic = (name, argument)
+                python.append('')
+            elif magic:
+                if magic.group(2) == '%':
+                    self.magics[lineno] = (magic.group(4), magic.group(5).strip())
+                python.append(f"{magic.group(1)}pass")
+            elif _ASSIGNED_MAGIC_RE.match(line):
+                python.append(_ASSIGNED_MAGIC_RE.sub(r'\1None', line))
+            else:
+                python.append(line)
+        try:
+            return ast.parse('\n'.join(python))
+        except (SyntaxError, ValueError):
+            return None
+
+    def offset(self, lineno: int, col: int) -> int:
+        """Lecture offset of an AST position (1-based line, UTF-8 byte column)."""
+        line = self.lines[lineno - 1]
+        return self.line_offsets[lineno - 1] + len(line.encode('utf-8')[:col].decode('utf-8', 'ignore'))
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        """Lecture (start, end) offsets of a node."""
+        return self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset)
+
+    def text(self, node: ast.AST) -> str:
+        start, end = self.span(node)
+        return self.content[start:end]
+
+
+@lru_cache(maxsize=32)
+def _lecture_cells(content: str) -> Tuple[CodeCell, ...]:
+    document = parse_document(content)
+    return tuple(
+        CodeCell(content, block) for block in document.blocks_of('code')
+        if block.get('name') == 'code-cell' and block.get('info', '').strip().lower() in PYTHON_LANGUAGES
+    )
+
+
+def code_cells(document: MystDocument) -> List[CodeCell]:
+    """The lecture's Python code cells, parsed (cached by content)."""
+    return list(_lecture_cells(document.content))
+
+
+# --- Findings ---------------------------------------------------------------
+
+def _deletion_finding(document: MystDocument, cell: CodeCell, node: ast.stmt,
+                      description: str, explanation: str) -> Dict[str, Any]:
+    """
+    A violation whose fix deletes a whole statement.
+
+    Fixes must be non-empty, so the deleted lines are anchored to the line
+    before them (or after them, for the first statement of a cell). A cell
+    holding nothing else is reported without a fix.
+    """
+    content = document.content
+    start, end = cell.span(node)
+    start, end = line_bounds(content, start, end)
+    index = node.lineno - 1
+    before = next((i for i in range(index - 1, -1, -1) if cell.lines[i].strip()), None)
+    after = next((i for i in range(node.end_lineno, len(cell.lines)) if cell.lines[i].strip()), None)
+    if before is not None:
+        anchor = cell.line_offsets[before] + len(cell.lines[before])
+        finding = text_finding(document, cell.line_offsets[before], end, content[cell.line_offsets[before]:anchor],
+                               description, explanation)
+    elif after is not None:
+        anchor = cell.line_offsets[after]
+        next_line = content[anchor:anchor + len(cell.lines[after])]
+        finding = text_finding(document, start, anchor + len(cell.lines[after]), next_line, description, explanation)
+        # Keep the following line's own indentation
+        finding['suggested_fix'] = next_line.strip()
+    else:
+        finding = text_finding(document, start, end, '', description, explanation)
+    return finding
+
+
+def _statements(tree: ast.AST) -> Iterable[ast.stmt]:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.stmt):
+            yield node
+
+
+def _call_name(func: ast.expr) -> Optional[str]:
+    """The called name: `f` for f(...), `set_title` for ax.set_title(...)."""
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+def _import_aliases(cells: List[CodeCell], module: str) -> Set[str]:
+    """Names the lecture binds to `module` (e.g. {'np'} for numpy)."""
+    aliases = set()
+    for cell in cells:
+        if cell.tree is None:
+            continue
+        for node in ast.walk(cell.tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name == module:
+                        aliases.add(alias.asname or module.split('.')[0])
+    return aliases
+
+
+def _from_imports(cells: List[CodeCell], module: str) -> Dict[str, str]:
+    """Local name -> imported name for `from module import ...` in the lecture."""
+    names = {}
+    for cell in cells:
+        if cell.tree is None:
+            continue
+        for node in ast.walk(cell.tree):
+            if isinstance(node, ast.ImportFrom) and node.module == module:
+                for alias in node.names:
+                    names[alias.asname or alias.name] = alias.name
+    return names
+
+
+def _ordered_arguments(call: ast.Call) -> List[ast.AST]:
+    return sorted(list(call.args) + list(call.keywords), key=lambda n: (n.lineno, n.col_offset))
+
+
+def _remove_argument(cell: CodeCell, call: ast.Call, argument: ast.AST) -> Tuple[int, int]:
+    """Span to delete to drop one argument from a call, with its comma."""
+    arguments = _ordered_arguments(call)
+    index = arguments.index(argument)
+    start, end = cell.span(argument)
+    if index > 0:
+        return cell.span(arguments[index - 1])[1], end
+    if index + 1 < len(arguments):
+        return start, cell.span(arguments[index + 1])[0]
+    return start, end
+
+
+def _in_exercise(document: MystDocument, block: Dict[str, Any]) -> bool:
+    """True if a block sits in an exercise or solution (directive or -start/-end pair)."""
+    gated = 0
+    for other in document.blocks:
+        if other['start'] >= block['start']:
+            break
+        name = other.get('name') or ''
+        if other['kind'] != 'directive':
+            continue
+        if name in EXERCISE_DIRECTIVES and other['end'] >= block['end']:
+            return True
+        base, _, edge = name.rpartition('-')
+        if base in EXERCISE_DIRECTIVES:
+            gated += {'start': 1, 'end': -1}.get(edge, 0)
+    return gated > 0
+
+
+# --- qe-code-002: Greek letters ---------------------------------------------
+
+def _greek_symbol(name: str) -> Optional[str]:
+    match = _GREEK_NAME_RE.match(name)
+    if not match:
+        return None
+    return GREEK_LETTERS[match.group(1)] + (match.group(2) or '')
+
+
+def check_greek_names(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """
+    qe-code-002: rename spelled-out Greek variables (`alpha` -> `α`).
+
+    A name is renamed everywhere in the lecture, and only if the lecture
+    binds it itself (assignment, parameter, loop target...) and the rename
+    can't change behaviour: names that are imported, define a function or
+    class, are class attributes, already have a symbol twin, may be passed
+    by keyword to code we can't see, or appear in a cell that isn't valid
+    Python (a `raises-exception` demo, IPython syntax) and so couldn't be
+    renamed there are left alone.
+    """
+    parsed = [cell for cell in cells if cell.tree is not None]
+    functions: Dict[str, Set[str]] = {}  # Lecture function/class -> parameter names
+    methods: Set[str] = set()
+    parameters: Set[str] = set()
+    unsafe: Set[str] = set()
+    bound: Set[str] = set()
+    all_names: Set[str] = set()
+    strings: Set[str] = set()
+    occurrences: Dict[str, List[Tuple[CodeCell, int, int]]] = {}
+
+    def params_of(node) -> List[str]:
+        args = node.args
+        return [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+
+    for cell in cells:
+        if cell.tree is None:
+            unsafe.update(re.findall(r'\w+', '\n'.join(cell.lines)))
+
+    for cell in parsed:
+        for node in ast.walk(cell.tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                functions[node.name] = set(params_of(node))
+                parameters.update(params_of(node))
+                unsafe.add(node.name)
+            elif isinstance(node, ast.ClassDef):
+                unsafe.add(node.name)
+                init = next((n for n in node.body if isinstance(n, ast.FunctionDef) and n.name == '__init__'), None)
+                functions[node.name] = set(params_of(init)) if init else set()
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        methods.add(item.name)
+                    # Class-body bindings are attributes, not variables
+                    for target in ast.walk(item):
+                        if isinstance(target, ast.Name) and isinstance(target.ctx, ast.Store) \
+                                and not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                            unsafe.add(target.id)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                unsafe.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                unsafe.add(node.name)
+            elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+                unsafe.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                unsafe.update(node.names)
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+                strings.add(node.value)
+            elif isinstance(node, ast.Name):
+                all_names.add(node.id)
+                if isinstance(node.ctx, ast.Store):
+                    bound.add(node.id)
+                if _greek_symbol(node.id):
+                    occurrences.setdefault(node.id, []).append((cell, *cell.span(node)))
+            elif isinstance(node, ast.arg):
+                all_names.add(node.arg)
+                bound.add(node.arg)
+                if _greek_symbol(node.arg):
+                    start = cell.offset(node.lineno, node.col_offset)
+                    occurrences.setdefault(node.arg, []).append((cell, start, start + len(node.arg)))
+
+    # Keyword arguments: renamed for lecture functions, unsafe where the callee is unknown
+    for cell in parsed:
+        for node in ast.walk(cell.tree):
+            if not isinstance(node, ast.Call):
+                continue
+            callee = node.func
+            if _call_name(callee) == 'partial' and node.args:
+                callee = node.args[0]
+            name = _call_name(callee)
+            for keyword in node.keywords:
+                if keyword.arg is None or not _greek_symbol(keyword.arg):
+                    continue
+                if isinstance(callee, ast.Name) and name in functions:
+                    if keyword.arg in functions[name]:
+                        start = cell.offset(keyword.lineno, keyword.col_offset)
+                        occurrences.setdefault(keyword.arg, []).append((cell, start, start + len(keyword.arg)))
+                elif name in methods and keyword.arg in parameters:
+                    unsafe.add(keyword.arg)
+
+    edits = []
+    content = document.content
+    for name, spans in occurrences.items():
+        symbol = _greek_symbol(name)
+        if name in unsafe or name not in bound or symbol in all_names:
+            continue
+        if name in parameters and name in strings:
+            continue  # Probably passed as **kwargs or a namedtuple field
+        if any(content[start:end] != name for _, start, end in spans):
+            continue  # Position we can't trust (e.g. inside an f-string)
+        for _, start, end in spans:
+            edits.append((start, end, symbol, f"`{name}` → `{symbol}`"))
+    return edit_findings(
+        document, edits,
+        "Greek letters in code should use their Unicode symbols, matching the mathematical notation",
+    )
+
+
+# --- qe-code-004 / qe-code-005: timing --------------------------------------
+
+def _indent_block(lines: List[str], indent: str) -> str:
+    return '\n'.join(indent + line if line.strip() else '' for line in lines)
+
+
+def _dedent(lines: List[str]) -> List[str]:
+    width = min((len(l) - len(l.lstrip()) for l in lines if l.strip()), default=0)
+    return [l[width:] for l in lines]
+
+
+def _cell_body_span(cell: CodeCell) -> Tuple[int, int]:
+    last = len(cell.lines) - 1
+    return cell.line_offsets[0], cell.line_offsets[last] + len(cell.lines[last])
+
+
+def check_manual_timing(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """
+    qe-code-004: manual timing (`time.time()`, `tic()`/`toc()`, `%time`).
+
+    The statements from the first timing call to the last in a block are
+    suggested as a `with qe.Timer():` block around the code between them.
+    """
+    time_aliases = _import_aliases(cells, 'time')
+    time_functions = {local for local, name in _from_imports(cells, 'time').items() if name in TIMING_FUNCTIONS}
+    explanation = "`qe.Timer()` times a block and reports the elapsed time without bookkeeping code"
+
+    def is_timing(node: ast.AST) -> bool:
+        for call in ast.walk(node):
+            if not isinstance(call, ast.Call):
+                continue
+            func = call.func
+            if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+                if func.value.id in time_aliases and func.attr in TIMING_FUNCTIONS:
+                    return True
+                if func.attr in LEGACY_TIMERS and func.value.id in ('qe', 'quantecon'):
+                    return True
+            if isinstance(func, ast.Name) and (func.id in time_functions or func.id in LEGACY_TIMERS):
+                return True
+        return False
+
+    findings = []
+    for cell in cells:
+        if cell.tree is None:
+            continue
+        reported: List[Tuple[int, int]] = []
+        if cell.cell_magic and cell.cell_magic[0] == 'time':
+            start, end = _cell_body_span(cell)
+            body = _dedent(cell.lines[1:])
+            findings.append(text_finding(document, start, end, "with qe.Timer():\n" + _indent_block(body, '    '),
+                                         "`%%time` cell magic", explanation))
+        for lineno, (name, argument) in sorted(cell.magics.items()):
+            if name == 'time' and argument:
+                line = cell.lines[lineno - 1]
+                indent = line[:len(line) - len(line.lstrip())]
+                start = cell.line_offsets[lineno - 1]
+                findings.append(text_finding(document, start, start + len(line),
+                                             f"with qe.Timer():\n{indent}    {argument}",
+                                             "`%time` line magic", explanation))
+
+        for node in ast.walk(cell.tree):
+            for field in ('body', 'orelse', 'finalbody'):
+                block = getattr(node, field, None)
+                if not isinstance(block, list) or not block or not isinstance(block[0], ast.stmt):
+                    continue
+                timed = [i for i, stmt in enumerate(block) if is_timing(stmt)]
+                if not timed:
+                    continue
+                first, last = block[timed[0]], block[timed[-1]]
+                start, end = line_bounds(document.content, cell.span(first)[0], cell.span(last)[1])
+                if any(s <= start < e for s, e in reported):
+                    continue  # Inside a block already reported (ast.walk is outermost first)
+                reported.append((start, end))
+                indent = ' ' * first.col_offset
+                inner = [stmt for stmt in block[timed[0] + 1:timed[-1]] if not is_timing(stmt)]
+                if inner:
+                    lines = cell.lines[inner[0].lineno - 1:inner[-1].end_lineno]
+                    body = _indent_block(_dedent(lines), indent + '    ')
+                else:
+                    body = f"{indent}    ..."
+                findings.append(text_finding(document, start, end, f"with qe.Timer():\n{body}",
+                                             "Manual timing code", explanation))
+    return findings
+
+
+def _timeit_call(statement: str, number: Optional[str] = None, repeat: Optional[str] = None) -> str:
+    """qe.timeit(...) call timing `statement` (Python source)."""
+    options = ''.join(f", {key}={value}" for key, value in (('number', number), ('repeat', repeat)) if value)
+    try:
+        ast.parse(statement, mode='eval')
+    except SyntaxError:
+        body = _indent_block(_dedent(statement.split('\n')), '    ')
+        return f"def run():\n{body}\n\nqe.timeit(run{options})"
+    return f"qe.timeit(lambda: {statement.strip()}{options})"
+
+
+def _timeit_options(argument: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Split `%timeit -n 10 -r 3 f(x)` into (statement, number, repeat)."""
+    number = repeat = None
+    parts = argument.split()
+    while parts and parts[0].startswith('-'):
+        flag = parts.pop(0)
+        if flag in ('-n', '-r') and parts:
+            value = parts.pop(0)
+            number, repeat = (value, repeat) if flag == '-n' else (number, value)
+    return ' '.join(parts), number, repeat
+
+
+def check_timeit(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """qe-code-005: `%timeit`, `%%timeit` and the `timeit` module -> `qe.timeit()`."""
+    explanation = "`qe.timeit()` runs the function repeatedly and summarizes the timings"
+    timeit_aliases = _import_aliases(cells, 'timeit')
+    timeit_functions = {local for local, name in _from_imports(cells, 'timeit').items()
+                        if name in ('timeit', 'repeat')}
+    findings = []
+    edits = []
+    for cell in cells:
+        if cell.tree is None:
+            continue
+        if cell.cell_magic and cell.cell_magic[0] == 'timeit':
+            _, number, repeat = _timeit_options(cell.cell_magic[1])
+            start, end = _cell_body_span(cell)
+            statement = '\n'.join(_dedent(cell.lines[1:])).strip()
+            findings.append(text_finding(document, start, end, _timeit_call(statement, number, repeat),
+                                         "`%%timeit` cell magic", explanation))
+        for lineno, (name, argument) in sorted(cell.magics.items()):
+            if name != 'timeit' or not argument:
+                continue
+            statement, number, repeat = _timeit_options(argument)
+            line = cell.lines[lineno - 1]
+            start = cell.line_offsets[lineno - 1]
+            findings.append(text_finding(document, start, start + len(line),
+                                         _timeit_call(statement, number, repeat),
+                                         "`%timeit` line magic", explanation))
+
+        for node in ast.walk(cell.tree):
+            if not isinstance(node, ast.Call):
+                continue
+            func = node.func
+            module_call = (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                           and func.value.id in timeit_aliases and func.attr in ('timeit', 'repeat'))
+            if not (module_call or (isinstance(func, ast.Name) and func.id in timeit_functions)):
+                continue
+            keywords = {k.arg: cell.text(k.value) for k in node.keywords if k.arg}
+            target = cell.text(node.args[0]) if node.args else keywords.get('stmt')
+            if target is None:
+                continue
+            if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                target = f"lambda: {node.args[0].value.strip()}"
+            options = ''.join(f", {key}={keywords[key]}" for key in ('number', 'repeat') if key in keywords)
+            start, end = cell.span(node)
+            edits.append((start, end, f"qe.timeit({target}{options})", "`timeit` module"))
+    return findings + edit_findings(document, edits, explanation)
+
+
+# --- qe-fig-003: embedded titles --------------------------------------------
+
+def check_embedded_titles(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """
+    qe-fig-003: `set_title()`, `suptitle()`, `plt.title()` and `title=` arguments.
+
+    Title statements are deleted and `title=` arguments removed; cells in
+    exercises and solutions are exempt.
+    """
+    pyplot = _import_aliases(cells, 'matplotlib.pyplot') | {'plt'}
+    explanation = "Figure titles belong in the figure directive or mystnb caption, not in the image"
+    findings = []
+    edits = []
+    for cell in cells:
+        if cell.tree is None or _in_exercise(document, cell.block):
+            continue
+        for stmt in _statements(cell.tree):
+            if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+                func = stmt.value.func
+                if isinstance(func, ast.Attribute) and (
+                        func.attr in ('set_title', 'suptitle')
+                        or (func.attr == 'title' and isinstance(func.value, ast.Name) and func.value.id in pyplot)):
+                    findings.append(_deletion_finding(document, cell, stmt, f"`{func.attr}()` call", explanation))
+        for node in ast.walk(cell.tree):
+            if not (isinstance(node, ast.Call) and _call_name(node.func) in ('plot', 'hist', 'set')):
+                continue
+            for keyword in node.keywords:
+                if keyword.arg == 'title':
+                    start, end = _remove_argument(cell, node, keyword)
+                    edits.append((start, end, '', "`title=` argument"))
+    return findings + edit_findings(document, edits, explanation)
+
+
+# --- qe-fig-007: spines -----------------------------------------------------
+
+def _removes_spine(stmt: ast.stmt) -> bool:
+    if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)):
+        return False
+    call = stmt.value
+    if _call_name(call.func) == 'despine':
+        return True
+    func = call.func
+    if not (isinstance(func, ast.Attribute) and func.attr in ('set_visible', 'set_color')):
+        return False
+    spines = func.value
+    while isinstance(spines, ast.Subscript):
+        spines = spines.value
+    if not (isinstance(spines, ast.Attribute) and spines.attr == 'spines'):
+        return False
+    value = call.args[0] if call.args else None
+    return isinstance(value, ast.Constant) and value.value in (False, 'none', 'None')
+
+
+def check_spines(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """qe-fig-007: delete statements (or loops of them) that remove figure spines."""
+    explanation = "Lectures keep matplotlib's default box around figures"
+    findings = []
+    for cell in cells:
+        if cell.tree is None:
+            continue
+        loops = [node for node in ast.walk(cell.tree)
+                 if isinstance(node, ast.For) and not node.orelse and all(_removes_spine(s) for s in node.body)]
+        inside = {id(s) for loop in loops for s in loop.body}
+        for stmt in loops:
+            findings.append(_deletion_finding(document, cell, stmt, "Loop removing spines", explanation))
+        for stmt in _statements(cell.tree):
+            if _removes_spine(stmt) and id(stmt) not in inside:
+                findings.append(_deletion_finding(document, cell, stmt, "Spine removal", explanation))
+    return sorted(findings, key=lambda f: f['position'])
+
+
+# --- qe-fig-008: line width -------------------------------------------------
+
+_LINE_STYLE_RE = re.compile(r'-|:')
+_MARKER_RE = re.compile(r'[.,ov^<>1-4sp*hH+xXDd|_]')
+
+
+def _marker_only(call: ast.Call) -> bool:
+    """True for plot() calls that draw markers without a line."""
+    for arg in call.args:
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            fmt = re.sub(r'^[bgrcmykw]|[bgrcmykw]$', '', arg.value)
+            if _MARKER_RE.search(fmt) and not _LINE_STYLE_RE.search(fmt):
+                return True
+    for keyword in call.keywords:
+        if keyword.arg in ('ls', 'linestyle') and isinstance(keyword.value, ast.Constant) \
+                and keyword.value.value in ('', ' ', 'none', 'None', None):
+            return True
+    return False
+
+
+def check_line_width(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """qe-fig-008: give `plot()` lines `lw=2` (added if missing, constants other than 2 replaced)."""
+    edits = []
+    for cell in cells:
+        if cell.tree is None:
+            continue
+        for node in ast.walk(cell.tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'plot'):
+                continue
+            keywords = {k.arg: k for k in node.keywords}
+            kind = keywords.get('kind')
+            if None in keywords or not (node.args or node.keywords) or _marker_only(node):
+                continue
+            if kind is not None and not (isinstance(kind.value, ast.Constant) and kind.value.value == 'line'):
+                continue
+            width = keywords.get('lw') or keywords.get('linewidth')
+            if width is None:
+                end = cell.span(_ordered_arguments(node)[-1])[1]
+                edits.append((end, end, ', lw=2', "Line plot without `lw=2`"))
+            elif isinstance(width.value, ast.Constant) and isinstance(width.value.value, (int, float)) \
+                    and not isinstance(width.value.value, bool) and width.value.value != 2:
+                start, end = cell.span(width)
+                edits.append((start, end, 'lw=2', f"Line width `{cell.text(width)}`"))
+    return edit_findings(document, edits, "Line charts use `lw=2` for visibility and consistency across lectures")
+
+
+# --- qe-jax-006: PRNG keys --------------------------------------------------
+
+# NumPy random calls that set up state rather than draw
+_NUMPY_SEEDERS = ('seed', 'default_rng', 'RandomState')
+
+# Scopes where `key, subkey = jax.random.split(key)` would not split the lecture's key
+_KEY_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+               ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+# Statements whose parts don't all run once, right after the statement before them
+_COMPOUND_STATEMENTS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try,
+                        ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Match)
+
+
+def check_numpy_random(document: MystDocument, cells: List[CodeCell]) -> List[Dict[str, Any]]:
+    """
+    qe-jax-006: NumPy's global random state in lectures that use JAX.
+
+    `np.random.seed(s)` becomes `key = jax.random.PRNGKey(s)`. A draw is
+    rewritten to use a fresh `subkey` split off just before its statement,
+    but only where that is sound: the lecture has a `key`, the statement is
+    a simple one at cell level (not in a function, lambda or comprehension)
+    and holds no other draw. Other draws, and generators from `default_rng()`
+    or `RandomState()` whose method calls would also need rewriting, are
+    reported without a fix.
+    """
+    parsed = [cell for cell in cells if cell.tree is not None]
+    modules = set()
+    for cell in parsed:
+        for node in ast.walk(cell.tree):
+            if isinstance(node, ast.Import):
+                modules.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                modules.add(node.module.split('.')[0])
+    if 'jax' not in modules:
+        return []
+    numpy = _import_aliases(cells, 'numpy') | {'np'}
+    random_modules = {local for local, name in _from_imports(cells, 'numpy').items() if name == 'random'}
+    for cell in parsed:
+        for node in ast.walk(cell.tree):
+            if isinstance(node, ast.Import):
+                random_modules.update(a.asname for a in node.names if a.name == 'numpy.random' and a.asname)
+
+    def numpy_random(node: ast.AST) -> bool:
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+            return False
+        module = node.func.value
+        return ((isinstance(module, ast.Attribute) and module.attr == 'random'
+                 and isinstance(module.value, ast.Name) and module.value.id in numpy)
+                or (isinstance(module, ast.Name) and module.id in random_modules))
+
+    content = document.content
+    calls = []  # (cell, call, enclosing statement, parent map)
+    for cell in parsed:
+        parents = {id(child): parent for parent in ast.walk(cell.tree) for child in ast.iter_child_nodes(parent)}
+        for node in ast.walk(cell.tree):
+            if numpy_random(node):
+                statement = parents[id(node)]
+                while not isinstance(statement, ast.stmt):
+                    statement = parents[id(statement)]
+                calls.append((cell, node, statement, parents))
+    seeds = {id(node) for _, node, statement, _ in calls
+             if node.func.attr == 'seed' and isinstance(statement, ast.Expr) and statement.value is node}
+    has_key = bool(seeds) or any(isinstance(node, ast.Name) and node.id == 'key' and isinstance(node.ctx, ast.Store)
+                                 for cell in parsed for node in ast.walk(cell.tree))
+    draws: Dict[int, int] = {}
+    for _, node, statement, _ in calls:
+        if node.func.attr not in _NUMPY_SEEDERS:
+            draws[id(statement)] = draws.get(id(statement), 0) + 1
+
+    def splittable(cell: CodeCell, statement: ast.stmt, parents: Dict[int, ast.AST]) -> bool:
+        if isinstance(statement, _COMPOUND_STATEMENTS) or draws[id(statement)] > 1:
+            return False
+        scope = parents.get(id(statement))
+        while scope is not None:
+            if isinstance(scope, _KEY_SCOPES):
+                return False
+            scope = parents.get(id(scope))
+        start = cell.offset(statement.lineno, statement.col_offset)
+        return not content[content.rfind('\n', 0, start) + 1:start].strip()
+
+    edits = []
+    unfixable: Dict[int, Tuple[int, List[str]]] = {}
+    for cell, node, statement, parents in calls:
+        name = node.func.attr
+        description = f"`{cell.text(node.func)}()`"
+        start, end = cell.span(node)
+        if id(node) in seeds:
+            seed = cell.text(node.args[0]) if node.args else '0'
+            edits.append((start, end, f"key = jax.random.PRNGKey({seed})", description))
+        elif name not in _NUMPY_SEEDERS and has_key and splittable(cell, statement, parents):
+            statement_start = cell.offset(statement.lineno, statement.col_offset)
+            indent = content[content.rfind('\n', 0, statement_start) + 1:statement_start]
+            edits.append((statement_start, statement_start, f"key, subkey = jax.random.split(key)\n{indent}",
+                          description))
+            args = [cell.text(arg) for arg in node.args]
+            kwargs = {k.arg: cell.text(k.value) for k in node.keywords if k.arg}
+            edits.append((start, end, _jax_random_call(name, args, kwargs, key='subkey'), description))
+        else:
+            first, last = line_bounds(content, start, end)
+            _, descriptions = unfixable.setdefault(first, (last, []))
+            if description not in descriptions:
+                descriptions.append(description)
+
+    explanation = ("JAX code should pass explicit PRNG keys (split with `jax.random.split`) "
+                   "instead of relying on NumPy's global random state")
+    return edit_findings(document, edits, explanation) + [
+        text_finding(document, first, last, '', '; '.join(descriptions), explanation)
+        for first, (last, descriptions) in sorted(unfixable.items())
+    ]
+
+
+# NumPy random functions -> (JAX function, NumPy parameter names in order)
+_NUMPY_RANDOM = {
+    'normal': ('normal', ('loc', 'scale', 'size')),
+    'standard_normal': ('normal', ('size',)),
+    'uniform': ('uniform', ('low', 'high', 'size')),
+    'randint': ('randint', ('low', 'high', 'size')),
+    'exponential': ('exponential', ('scale', 'size')),
+    'choice': ('choice', ('a', 'size', 'replace', 'p')),
+    'permutation': ('permutation', ('x',)),
+}
+
+
+def _jax_random_call(name: str, args: List[str], kwargs: Dict[str, str], key: str = 'key') -> str:
+    """Rewrite a np.random.<name>(...) call as its jax.random equivalent drawing with `key`."""
+    if name in ('rand', 'randn'):
+        shape = f"({', '.join(args)},)" if len(args) == 1 else f"({', '.join(args)})"
+        return f"jax.random.{'uniform' if name == 'rand' else 'normal'}({key}, {shape if args else '()'})"
+    if name not in _NUMPY_RANDOM:
+        return f"jax.random.{name}({', '.join([key] + args + [f'{k}={v}' for k, v in kwargs.items()])})"
+
+    jax_name, parameters = _NUMPY_RANDOM[name]
+    values = dict(zip(parameters, args))
+    values.update(kwargs)
+    size = values.get('size')
+    shape = '()' if size is None else f"({size},)" if re.fullmatch(r'\w+', size) else size
+    if name in ('normal', 'standard_normal'):
+        call = f"jax.random.normal({key}, {shape})"
+        scale, loc = values.get('scale', '1'), values.get('loc', '0')
+        if scale not in ('1', '1.0'):
+            call = f"{scale} * {call}"
+        return call if loc in ('0', '0.0') else f"{loc} + {call}"
+    if name == 'uniform':
+        bounds = ''.join(f", {jax}={values[np_]}" for np_, jax in (('low', 'minval'), ('high', 'maxval'))
+                         if np_ in values)
+        return f"jax.random.uniform({key}, {shape}{bounds})"
+    if name == 'randint':
+        low, high = values.get('low', '0'), values.get('high')
+        low, high = (low, high) if high else ('0', low)
+        return f"jax.random.randint({key}, {shape}, {low}, {high})"
+    if name == 'exponential':
+        call = f"jax.random.exponential({key}, {shape})"
+        return call if values.get('scale', '1') in ('1', '1.0') else f"{values['scale']} * {call}"
+    if name == 'choice':
+        options = ''.join(f", {k}={values[k]}" for k in ('replace', 'p') if k in values)
+        return f"jax.random.choice({key}, {values.get('a', '')}, {shape}{options})"
+    return f"jax.random.permutation({key}, {values.get('x', '')})"
+
+
+# Rules the analyzer checks, and how
+RULE_CHECKERS: Dict[str, Callable[[MystDocument, List[CodeCell]], List[Dict[str, Any]]]] = {
+    'qe-code-002': check_greek_names,
+    'qe-code-004': check_manual_timing,
+    'qe-code-005': check_timeit,
+    'qe-fig-003': check_embedded_titles,
+    'qe-fig-007': check_spines,
+    'qe-fig-008': check_line_width,
+    'qe-jax-006': check_numpy_random,
+}
+
+ANALYZED_RULES = frozenset(RULE_CHECKERS)
+
+
+def analyze_rule(document: MystDocument, rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Check one rule against a lecture's code cells without the LLM.
+
+    Args:
+        document: Model of the lecture version being checked
+        rule: Rule dict (see reviewer.extract_individual_rules); its id must
+            be in ANALYZED_RULES
+
+    Returns:
+        Violations in the parse_markdown_response() format, each with a
+        `position` hint at the start of its current_text
+    """
+    violations = RULE_CHECKERS[rule['rule_id']](document, code_cells(document))
+    for violation in violations:
+        violation.update(rule_id=rule['rule_id'], rule_title=rule.get('title', ''))
+    return violations
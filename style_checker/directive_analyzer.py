@@ -0,0 +1,304 @@
+"""
+Directive nesting tree and static checks for the admonition rules.
+
+Gated exercises, tick counts, the `prf:` prefix and solution-to-exercise
+links are properties of how a lecture's fenced directives nest and refer to
+each other. `directive_tree()` turns the MystDocument's fenced blocks into a
+tree — each node knows its fence, options, label, parent and children — and
+a checker per rule walks it. Findings are the same violation dicts
+code_analyzer produces, with exact `position` hints.
+
+The tree follows the author's intent: every opening fence with a
+`{directive}` nests, and a bare fence closes the innermost open block. That
+is how the lecture reads, even where too few ticks make MyST parse it
+differently, which is exactly what qe-admon-003 reports.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .document import MystDocument, parse_document
+from .findings import edit_findings, text_finding
+
+# Directives that need gated syntax once they hold code or other directives (qe-admon-001)
+GATED_DIRECTIVES = {'exercise', 'solution'}
+
+# sphinx-proof directives, which must carry the prf: prefix (qe-admon-004)
+PROOF_DIRECTIVES = {
+    'proof', 'theorem', 'axiom', 'lemma', 'definition', 'criteria', 'remark', 'conjecture',
+    'corollary', 'algorithm', 'example', 'property', 'observation', 'proposition', 'assumption',
+}
+
+# Directives that define an exercise label a solution may point to (qe-admon-005)
+EXERCISE_DIRECTIVES = {'exercise', 'exercise-start'}
+SOLUTION_DIRECTIVES = {'solution', 'solution-start'}
+
+_FENCE_RE = re.compile(r'^(\s*)(`{3,}|~{3,}|:{3,})\s*(?:\{([\w:-]+)\})?\s*(.*?)\s*$')
+_OPTION_LINE_RE = re.compile(r'^\s*:[\w-]+:')
+
+
+class Directive:
+    """
+    One fenced block of a lecture and the fenced blocks nested in it.
+
+    Attributes:
+        block: The MystDocument block
+        name: Directive name ('exercise', 'prf:theorem', 'code-cell', ...),
+            or None for a plain code fence
+        argument: Text after the name on the opening line
+        label: The :label: (or :name:) option, if any
+        fence: Opening fence marker, e.g. '````'
+        fence_start: Lecture offset of the opening fence marker
+        closing: (start, end) of the closing fence marker, or None if unclosed
+        header_end: Lecture offset where the body starts (after the options)
+        body_end: Lecture offset where the body ends (the closing fence line)
+        parent: Enclosing Directive, or None at top level
+        children: Directly nested Directives in document order
+    """
+
+    def __init__(self, content: str, block: Dict[str, Any]):
+        self.block = block
+        self.name = block.get('name')
+        self.label = block.get('label')
+        self.parent: Optional['Directive'] = None
+        self.children: List['Directive'] = []
+
+        lines = content[block['start']:block['end']].split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        offsets = []
+        pos = block['start']
+        for line in lines:
+            offsets.append(pos)
+            pos += len(line) + 1
+
+        opening = _FENCE_RE.match(lines[0])
+        self.fence = opening.group(2)
+        self.fence_start = block['start'] + len(opening.group(1))
+        self.argument = opening.group(4)
+
+        self.closing: Optional[Tuple[int, int]] = None
+        last = lines[-1].strip() if len(lines) > 1 else ''
+        if last and last == last[0] * len(last) and last[0] == self.fence[0] and len(last) >= len(self.fence):
+            start = offsets[-1] + len(lines[-1]) - len(lines[-1].lstrip())
+            self.closing = (start, start + len(last))
+        body_end = len(lines) - 1 if self.closing else len(lines)
+
+        first = 1
+        if self.name is not None and first < body_end and lines[first].strip() == '---':
+            end = next((i for i in range(first + 1, body_end) if lines[i].strip() == '---'), None)
+            if end is not None:
+                first = end + 1
+        while self.name is not None and first < body_end and _OPTION_LINE_RE.match(lines[first]):
+            first += 1
+        self.header_end = offsets[first] if first < len(offsets) else block['end']
+        self.body_end = offsets[body_end] if body_end < len(offsets) else block['end']
+
+    @property
+    def start(self) -> int:
+        return self.block['start']
+
+    @property
+    def end(self) -> int:
+        """Offset just past the closing fence (or the block, if unclosed)."""
+        return self.closing[1] if self.closing else self.block['end']
+
+    def walk(self) -> List['Directive']:
+        """This directive and all its descendants, in document order."""
+        nodes = [self]
+        for child in self.children:
+            nodes += child.walk()
+        return nodes
+
+
+@lru_cache(maxsize=32)
+def _lecture_tree(content: str) -> Tuple[Directive, ...]:
+    document = parse_document(content)
+    roots: List[Directive] = []
+    stack: List[Directive] = []
+    for block in document.blocks:
+        line_end = content.find('\n', block['start'])
+        first_line = content[block['start']:len(content) if line_end == -1 else line_end]
+        if block['kind'] not in ('code', 'math', 'directive') or not _FENCE_RE.match(first_line):
+            continue
+        node = Directive(content, block)
+        while stack and stack[-1].block['end'] <= block['start']:
+            stack.pop()
+        if stack:
+            node.parent = stack[-1]
+            stack[-1].children.append(node)
+        else:
+            roots.append(node)
+        stack.append(node)
+    return tuple(roots)
+
+
+def directive_tree(document: MystDocument) -> List[Directive]:
+    """Top-level fenced blocks of the lecture, each with its nested blocks (cached by content)."""
+    return list(_lecture_tree(document.content))
+
+
+def directives(document: MystDocument) -> List[Directive]:
+    """Every fenced block of the lecture, in document order."""
+    return [node for root in directive_tree(document) for node in root.walk()]
+
+
+# --- Checkers ---------------------------------------------------------------
+
+def check_gated_exercises(document: MystDocument, nodes: List[Directive]) -> List[Dict[str, Any]]:
+    """qe-admon-001: exercises holding code cells or directives -> exercise-start/exercise-end."""
+    content = document.content
+    findings = []
+    for node in nodes:
+        if node.name not in GATED_DIRECTIVES or node.closing is None:
+            continue
+        nested = [child.name for child in node.children if child.name is not None]
+        if not nested:
+            continue
+        indent = content[node.start:node.fence_start]
+        header = content[content.find('\n', node.start) + 1:node.header_end].rstrip('\n')
+        body = content[node.header_end:node.body_end].strip('\n')
+        opening = f"{indent}```{{{node.name}-start}}" + (f" {node.argument}" if node.argument else '')
+        gated = '\n'.join(part for part in (opening, header, f"{indent}```") if part)
+        gated += f"\n\n{body}\n\n{indent}```{{{node.name}-end}}\n{indent}```"
+        findings.append(text_finding(
+            document, node.start, node.end, gated,
+            f"`{{{node.name}}}` contains `{{{nested[0]}}}`",
+            f"Use gated syntax (`{node.name}-start`/`{node.name}-end`) when a {node.name} "
+            "contains code cells or nested directives.",
+        ))
+    return findings
+
+
+def _fence_lengths(node: Directive) -> Dict[int, int]:
+    """Fence length each node in the subtree needs: more than any nested fence of the same kind."""
+    lengths: Dict[int, int] = {}
+
+    def visit(current: Directive) -> int:
+        needed = len(current.fence)
+        for child in current.children:
+            child_length = visit(child)
+            if child.fence[0] == current.fence[0]:
+                needed = max(needed, child_length + 1)
+        lengths[id(current)] = needed
+        return needed
+
+    visit(node)
+    return lengths
+
+
+def check_tick_counts(document: MystDocument, nodes: List[Directive]) -> List[Dict[str, Any]]:
+    """qe-admon-003: an outer fence needs more ticks than the fences nested in it."""
+    content = document.content
+    findings = []
+    for root in directive_tree(document):
+        lengths = _fence_lengths(root)
+        pending = [root]
+        while pending:
+            node = pending.pop(0)
+            if lengths[id(node)] == len(node.fence):
+                pending = node.children + pending
+                continue
+            # Rewrite this directive with every fence inside it that has to grow
+            edits = []
+            for inner in node.walk():
+                length = lengths[id(inner)]
+                if length == len(inner.fence):
+                    continue
+                marker = inner.fence[0] * length
+                edits.append((inner.fence_start, inner.fence_start + len(inner.fence), marker))
+                if inner.closing:
+                    edits.append((inner.closing[0], inner.closing[1], marker))
+            text = content[node.start:node.end]
+            for start, end, marker in sorted(edits, reverse=True):
+                text = text[:start - node.start] + marker + text[end - node.start:]
+            name = f"`{{{node.name}}}`" if node.name else "Code fence"
+            findings.append(text_finding(
+                document, node.start, node.end, text,
+                f"{name} fence has {len(node.fence)} `{node.fence[0]}` but needs {lengths[id(node)]}",
+                "The outer directive must use more ticks than the directives nested in it "
+                "(nested 3, outer 4).",
+            ))
+    return findings
+
+
+def check_proof_prefix(document: MystDocument, nodes: List[Directive]) -> List[Dict[str, Any]]:
+    """qe-admon-004: `{theorem}` -> `{prf:theorem}`, and `{ref}` to proof labels -> `{prf:ref}`."""
+    content = document.content
+    edits = []
+    proof_labels = set()
+    for node in nodes:
+        if node.name in PROOF_DIRECTIVES:
+            name_start = content.index('{', node.fence_start) + 1
+            edits.append((name_start, name_start, 'prf:', f"`{{{node.name}}}` → `{{prf:{node.name}}}`"))
+        if node.name and node.name.split('prf:')[-1] in PROOF_DIRECTIVES and node.label:
+            proof_labels.add(node.label)
+    for ref in document.inlines_of('ref'):
+        if ref.get('role') in ('ref', 'numref') and ref.get('target') in proof_labels:
+            role_start = ref['start'] + 1
+            edits.append((role_start, role_start + len(ref['role']), 'prf:ref',
+                          f"`{{{ref['role']}}}` → `{{prf:ref}}` for `{ref['target']}`"))
+    return edit_findings(document, edits,
+                         "sphinx-proof directives and references to them need the `prf:` prefix.")
+
+
+def check_solution_links(document: MystDocument, nodes: List[Directive]) -> List[Dict[str, Any]]:
+    """qe-admon-005: every solution names the label of an exercise in the lecture."""
+    content = document.content
+    exercise_labels = {node.label for node in nodes if node.name in EXERCISE_DIRECTIVES and node.label}
+    edits = []
+    unfixable = []
+    previous_exercise: Optional[Directive] = None
+    for node in nodes:
+        if node.name in EXERCISE_DIRECTIVES:
+            previous_exercise = node
+            continue
+        if node.name not in SOLUTION_DIRECTIVES:
+            continue
+        exercise, previous_exercise = previous_exercise, None
+        target = node.argument.split()[0] if node.argument else ''
+        if target and (target in exercise_labels or target not in document.labels):
+            # Linked, or pointing outside this lecture
+            continue
+        description = (f"`{{{node.name}}}` links `{target}`, which is not an exercise" if target
+                       else f"`{{{node.name}}}` has no exercise label")
+        if exercise is not None and exercise.label:
+            name_end = content.index('}', node.fence_start) + 1
+            line_end = content.find('\n', name_end)
+            line_end = len(content) if line_end == -1 else line_end
+            edits.append((name_end, line_end, f" {exercise.label}", description))
+        else:
+            line_end = content.find('\n', node.fence_start)
+            unfixable.append(text_finding(document, node.fence_start, len(content) if line_end == -1 else line_end, '',
+                                          description, "Label the exercise and name it after the solution directive."))
+    return edit_findings(document, edits,
+                         "A solution names the label of its exercise, e.g. `{solution} my-exercise`.") + unfixable
+
+
+RULE_CHECKERS: Dict[str, Callable[[MystDocument, List[Directive]], List[Dict[str, Any]]]] = {
+    'qe-admon-001': check_gated_exercises,
+    'qe-admon-003': check_tick_counts,
+    'qe-admon-004': check_proof_prefix,
+    'qe-admon-005': check_solution_links,
+}
+
+ANALYZED_RULES = frozenset(RULE_CHECKERS)
+
+
+def analyze_rule(document: MystDocument, rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Check one rule against a lecture's directive tree without the LLM.
+
+    Args:
+        document: Model of the lecture version being checked
+        rule: Rule dict (see reviewer.extract_individual_rules); its id must
+            be in ANALYZED_RULES
+
+    Returns:
+        Violations in the parse_markdown_response() format, each with a
+        `position` hint at the start of its current_text
+    """
+    violations = RULE_CHECKERS[rule['rule_id']](document, directives(document))
+    for violation in violations:
+        violation.update(rule_id=rule['rule_id'], rule_title=rule.get('title', ''))
+    return violations
@@ -0,0 +1,614 @@
+"""
+Lightweight MyST document model shared by the review pipeline.
+
+A lecture is parsed once per content version into blocks (front matter,
+headings, paragraphs, code, math, directives, label targets) and inline
+elements (math, links, references, citations), all with character spans into
+the content. After a batch of fixes, `MystDocument.update()` re-parses only
+the blocks around the edited text and shifts everything else, so rules,
+context extraction and deterministic checkers can share one model instead of
+rescanning the lecture.
+"""
+import bisect
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Block kinds produced by the parser
+BLOCK_KINDS = ('frontmatter', 'heading', 'paragraph', 'code', 'math', 'directive', 'target')
+
+# Directives whose body is literal text rather than nested MyST
+LITERAL_DIRECTIVES = {
+    'code-cell': 'code',
+    'code-block': 'code',
+    'code': 'code',
+    'sourcecode': 'code',
+    'raw': 'code',
+    'math': 'math',
+}
+
+_FENCE_RE = re.compile(r'^(\s*)(`{3,}|~{3,}|:{3,})\s*(.*?)\s*$')
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_TARGET_RE = re.compile(r'^\((\S+)\)=\s*$')
+_OPTION_RE = re.compile(r'^\s*:([\w-]+):\s*(.*?)\s*$')
+_DISPLAY_MATH_LABEL_RE = re.compile(r'\$\$\s*\((\S+)\)\s*$')
+
+_CODE_SPAN_RE = re.compile(r'(?<![}`])(`+)(?!`)(.+?)(?<!`)\1(?!`)')
+_ROLE_RE = re.compile(r'\{([\w:-]+)\}`([^`]*)`')
+_LINK_RE = re.compile(r'(?<!!)\[([^\]\n]*)\]\(([^)\s]+)(?:\s+"[^"]*")?\)')
+_INLINE_MATH_RE = re.compile(r'(?<![\\$])\$(?!\$)([^$\n]+?)(?<![\\\s])\$(?!\$)')
+
+# Cached documents by content hash (see parse_document)
+_CACHE_SIZE = 32
+_cache: 'OrderedDict[str, MystDocument]' = OrderedDict()
+_cache_lock = threading.Lock()  # Rule checks may run in worker threads
+
+
+def _content_key(content: str) -> str:
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def parse_document(content: str) -> 'MystDocument':
+    """
+    Return the MystDocument for `content`, parsing it at most once.
+
+    Documents are cached by content hash, so every stage that asks for the
+    same lecture version shares one model.
+    """
+    key = _content_key(content)
+    with _cache_lock:
+        document = _cache.get(key)
+        if document is not None:
+            _cache.move_to_end(key)
+            return document
+    document = MystDocument(content)
+    _remember(key, document)
+    return document
+
+
+def _remember(key: str, document: 'MystDocument') -> None:
+    with _cache_lock:
+        _cache[key] = document
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _line_starts(content: str) -> List[int]:
+    starts = [0]
+    pos = content.find('\n')
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = content.find('\n', pos + 1)
+    return starts
+
+
+class MystDocument:
+    """
+    Parsed view of one lecture version.
+
+    Attributes:
+        content: The lecture text this model describes
+        blocks: Block dicts in document order, each with 'kind' (BLOCK_KINDS),
+            'start'/'end' character offsets ('end' is past the block's last
+            newline) and 'depth' (0 at top level, +1 per enclosing directive).
+            Headings add 'level' and 'title'; code, math and directive blocks
+            add 'name' (directive name, None for plain fences and $$ math),
+            'info' (text after the name) and 'options'; labelled blocks add
+            'label'.
+        inlines: Inline element dicts in document order, each with 'kind'
+            ('math', 'link', 'ref' or 'citation'), 'start'/'end' and 'text';
+            links and refs add 'target', citations add 'keys'.
+        labels: Label name -> offset of the labelled block
+    """
+
+    def __init__(self, content: str, _parsed: Optional[Tuple[list, list]] = None):
+        self.content = content
+        if _parsed is None:
+            _parsed = _Parser(content).parse(0, len(content))[:2]
+        self.blocks, self.inlines = _parsed
+        self._line_starts = _line_starts(content)
+        self.labels: Dict[str, int] = {
+            block['label']: block['start'] for block in self.blocks if block.get('label')
+        }
+
+    # --- Queries -------------------------------------------------------------
+
+    def line_of(self, pos: int) -> int:
+        """1-based line number of character offset `pos`."""
+        return bisect.bisect_right(self._line_starts, pos)
+
+    def line_span(self, start: int, end: int) -> Tuple[int, int]:
+        """1-based (first, last) line numbers covered by [start, end)."""
+        return self.line_of(start), self.line_of(max(start, end - 1))
+
+    def blocks_of(self, *kinds: str) -> List[Dict[str, Any]]:
+        """Blocks of the given kinds, in document order."""
+        return [block for block in self.blocks if block['kind'] in kinds]
+
+    def inlines_of(self, *kinds: str) -> List[Dict[str, Any]]:
+        """Inline elements of the given kinds, in document order."""
+        return [inline for inline in self.inlines if inline['kind'] in kinds]
+
+    def block_at(self, pos: int) -> Optional[Dict[str, Any]]:
+        """Innermost block containing offset `pos`, or None (e.g. a blank line)."""
+        found = None
+        for block in self.blocks:
+            if block['start'] > pos:
+                break
+            if pos < block['end'] and (found is None or block['depth'] >= found['depth']):
+                found = block
+        return found
+
+    def region_spans(self, regions: List[str]) -> List[Tuple[int, int]]:
+        """
+        Character spans covering the given rule regions (see reviewer.RULE_REGIONS).
+
+        'math' includes display math, paragraphs with inline math and the
+        paragraphs directly around display math; 'links' and 'citations'
+        cover only the lines containing them. An unknown region maps to the
+        whole document.
+        """
+        spans: List[Tuple[int, int]] = []
+        for region in regions:
+            if region == 'prose':
+                spans += [(b['start'], b['end']) for b in self.blocks_of('paragraph')]
+            elif region == 'headings':
+                spans += [(b['start'], b['end']) for b in self.blocks_of('heading')]
+            elif region == 'code':
+                spans += [(b['start'], b['end']) for b in self.blocks_of('code')]
+            elif region == 'directives':
+                spans += [(b['start'], b['end']) for b in self.blocks_of('directive')]
+            elif region == 'math':
+                spans += self._math_spans()
+            elif region == 'links':
+                spans += [self._line_bounds(i) for i in self.inlines_of('link', 'ref')]
+            elif region == 'citations':
+                spans += [self._line_bounds(i) for i in self.citations]
+            else:
+                return [(0, len(self.content))]
+        return sorted(spans)
+
+    def _math_spans(self) -> List[Tuple[int, int]]:
+        spans = []
+        math_starts = {i['start'] for i in self.inlines_of('math')}
+        for index, block in enumerate(self.blocks):
+            if block['kind'] == 'math':
+                spans.append((block['start'], block['end']))
+                # The prose that introduces or follows an equation
+                for neighbour in (index - 1, index + 1):
+                    if 0 <= neighbour < len(self.blocks) and self.blocks[neighbour]['kind'] == 'paragraph':
+                        spans.append((self.blocks[neighbour]['start'], self.blocks[neighbour]['end']))
+            elif block['kind'] in ('paragraph', 'heading') and any(
+                    block['start'] <= pos < block['end'] for pos in math_starts):
+                spans.append((block['start'], block['end']))
+        return spans
+
+    def _line_bounds(self, item: Dict[str, Any]) -> Tuple[int, int]:
+        first, last = self.line_span(item['start'], item['end'])
+        end = self._line_starts[last] if last < len(self._line_starts) else len(self.content)
+        return self._line_starts[first - 1], end
+
+    def fragments(self, regions: List[str], gap: int = 1) -> List[Dict[str, Any]]:
+        """
+        Merge the spans for `regions` into whole-line fragments.
+
+        Spans separated by at most `gap` lines are joined, so an excerpt keeps
+        the blank lines between neighbouring blocks instead of splitting.
+
+        Returns:
+            Fragment dicts with 'start'/'end' offsets and 1-based
+            'first_line'/'last_line', in document order
+        """
+        fragments: List[Dict[str, Any]] = []
+        for start, end in self.region_spans(regions):
+            if end <= start:
+                continue
+            first, last = self.line_span(start, end)
+            if fragments and first <= fragments[-1]['last_line'] + gap + 1:
+                previous = fragments[-1]
+                previous['last_line'] = max(previous['last_line'], last)
+                previous['end'] = max(previous['end'], end)
+                continue
+            fragments.append({'start': start, 'end': end, 'first_line': first, 'last_line': last})
+        for fragment in fragments:
+            # Snap to whole lines
+            fragment['start'] = self._line_starts[fragment['first_line'] - 1]
+            last = fragment['last_line']
+            fragment['end'] = self._line_starts[last] if last < len(self._line_starts) else len(self.content)
+        return fragments
+
+    def sections(self) -> List[Tuple[int, int]]:
+        """
+        Split the lecture at its top-level headings.
+
+        Returns:
+            (start, end) spans covering the whole content in order; the first
+            holds everything before the first heading (front matter, intro).
+            A label target directly above a heading stays with its heading.
+        """
+        starts = {0}
+        for index, block in enumerate(self.blocks):
+            if block['kind'] == 'heading' and block['depth'] == 0:
+                previous = self.blocks[index - 1] if index else None
+                if previous and previous['kind'] == 'target' and previous['depth'] == 0:
+                    block = previous
+                starts.add(block['start'])
+        starts = sorted(starts)
+        ends = starts[1:] + [len(self.content)]
+        return [(start, end) for start, end in zip(starts, ends) if end > start]
+
+    @property
+    def citations(self) -> List[Dict[str, Any]]:
+        """Citation roles ({cite}, {cite:p}, ...) in document order."""
+        return self.inlines_of('citation')
+
+    def text(self, item: Dict[str, Any]) -> str:
+        """Source text of a block or inline element."""
+        return self.content[item['start']:item['end']]
+
+    # --- Incremental update --------------------------------------------------
+
+    def update(self, new_content: str) -> 'MystDocument':
+        """
+        Return the model for `new_content`, an edited version of this content.
+
+        Only the top-level blocks around the changed range (plus one
+        neighbouring block on each side, so merged or split paragraphs are
+        picked up) are re-parsed; blocks and inlines outside that window are
+        reused with their offsets shifted. Falls back to a full parse when the
+        window does not end in a clean top-level state, e.g. an edit that
+        removes a closing fence.
+        """
+        if new_content == self.content:
+            return self
+        key = _content_key(new_content)
+        with _cache_lock:
+            cached = _cache.get(key)
+        if cached is not None:
+            return cached
+
+        document = self._incremental(new_content)
+        if document is None:
+            document = MystDocument(new_content)
+        _remember(key, document)
+        return document
+
+    def _incremental(self, new_content: str) -> Optional['MystDocument']:
+        old = self.content
+        prefix = _common_prefix(old, new_content)
+        suffix = _common_suffix(old, new_content, limit=min(len(old), len(new_content)) - prefix)
+        old_change_end = len(old) - suffix
+        delta = len(new_content) - len(old)
+
+        # Front matter is only recognized from the first line and may end
+        # anywhere, so edits that could change it need a full parse.
+        if _opens_frontmatter(old) or _opens_frontmatter(new_content):
+            first = self.blocks[0] if self.blocks else None
+            if first is None or first['kind'] != 'frontmatter' or prefix < first['end']:
+                return None
+
+        top = [block for block in self.blocks if block['depth'] == 0]
+        # Window in old coordinates: one top-level block either side of the change
+        before = [i for i, block in enumerate(top) if block['end'] <= prefix]
+        after = [i for i, block in enumerate(top) if block['start'] >= old_change_end]
+        if len(before) >= 2:
+            window_start = top[before[-2]]['end']
+        else:
+            window_start = 0
+        if len(after) >= 2:
+            window_end = top[after[1]]['start']
+        else:
+            window_end = len(old)
+
+        new_window_end = window_end + delta
+        if window_end <= old_change_end and window_end != len(old):
+            return None
+        if new_window_end != len(new_content) and new_content[new_window_end - 1] != '\n':
+            return None
+
+        blocks, inlines, clean = _Parser(new_content).parse(window_start, new_window_end)
+        if not clean:
+            return None
+
+        head_blocks = [b for b in self.blocks if b['end'] <= window_start]
+        tail_blocks = [_shifted(b, delta) for b in self.blocks if b['start'] >= window_end]
+        head_inlines = [i for i in self.inlines if i['end'] <= window_start]
+        tail_inlines = [_shifted(i, delta) for i in self.inlines if i['start'] >= window_end]
+        return MystDocument(
+            new_content,
+            _parsed=(head_blocks + blocks + tail_blocks, head_inlines + inlines + tail_inlines),
+        )
+
+
+def _opens_frontmatter(content: str) -> bool:
+    nl = content.find('\n')
+    return (content if nl == -1 else content[:nl]).strip() == '---'
+
+
+def _shifted(item: Dict[str, Any], delta: int) -> Dict[str, Any]:
+    moved = dict(item)
+    moved['start'] += delta
+    moved['end'] += delta
+    return moved
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    lo, hi = 0, n
+    # Binary search on slice equality keeps the comparison in C
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, max(limit, 0)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class _Parser:
+    """Line-oriented MyST block parser with inline scanning of prose blocks."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+    def parse(self, start: int, end: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], bool]:
+        """
+        Parse the lines in [start, end), which must begin at top level.
+
+        Returns:
+            Tuple of (blocks, inlines, clean) where `clean` is False if the
+            range ends inside a fence or inside a paragraph that the following
+            line would continue.
+        """
+        content = self.content
+        lines = []
+        pos = start
+        while pos < end:
+            nl = content.find('\n', pos, end)
+            line_end = end if nl == -1 else nl + 1
+            lines.append((pos, line_end, content[pos:line_end].rstrip('\n')))
+            pos = line_end
+
+        blocks: List[Dict[str, Any]] = []
+        inlines: List[Dict[str, Any]] = []
+        stack: List[Dict[str, Any]] = []  # Open fenced blocks
+        paragraph: Optional[Dict[str, Any]] = None
+        in_options = False
+        i = 0
+
+        def close_paragraph(at: int) -> None:
+            nonlocal paragraph
+            if paragraph is not None:
+                paragraph['end'] = at
+                self._scan_inlines(paragraph, inlines)
+                paragraph = None
+
+        if start == 0 and lines and lines[0][2].strip() == '---':
+            for j in range(1, len(lines)):
+                if lines[j][2].strip() == '---':
+                    blocks.append({'kind': 'frontmatter', 'start': 0, 'end': lines[j][1], 'depth': 0})
+                    i = j + 1
+                    break
+
+        while i < len(lines):
+            line_start, line_end, line = lines[i]
+            top = stack[-1] if stack else None
+            i += 1
+
+            # Inside a literal block: only its closing fence matters
+            if top is not None and top['literal']:
+                if top['fence'] == '$$':
+                    if line.rstrip().endswith('$$') or _DISPLAY_MATH_LABEL_RE.search(line):
+                        self._close(stack, blocks, line_end, line)
+                    continue
+                if self._closes(top, line):
+                    self._close(stack, blocks, line_end, line)
+                    continue
+                if in_options:
+                    in_options = self._read_option(top, line)
+                continue
+
+            if top is not None and in_options:
+                in_options = self._read_option(top, line)
+                if in_options:
+                    continue
+
+            if top is not None and self._closes(top, line):
+                close_paragraph(line_start)
+                self._close(stack, blocks, line_end, line)
+                continue
+
+            depth = len(stack)
+            stripped = line.strip()
+
+            fence = _FENCE_RE.match(line)
+            if fence:
+                close_paragraph(line_start)
+                block = self._open_fence(fence, line_start, depth)
+                stack.append(block)
+                in_options = block['kind'] != 'code' or block['name'] is not None
+                continue
+
+            if stripped.startswith('$$'):
+                close_paragraph(line_start)
+                stack.append({
+                    'kind': 'math', 'start': line_start, 'end': line_end, 'depth': depth,
+                    'name': None, 'info': '', 'options': {},
+                    'fence': '$$', 'literal': True,
+                })
+                if '$$' in stripped[2:]:
+                    # One-line display math: $$ x = y $$ (label)
+                    self._close(stack, blocks, line_end, line)
+                continue
+
+            heading = _HEADING_RE.match(line)
+            if heading:
+                close_paragraph(line_start)
+                block = {
+                    'kind': 'heading', 'start': line_start, 'end': line_end, 'depth': depth,
+                    'level': len(heading.group(1)), 'title': heading.group(2),
+                }
+                blocks.append(block)
+                self._scan_inlines(block, inlines)
+                continue
+
+            target = _TARGET_RE.match(stripped)
+            if target:
+                close_paragraph(line_start)
+                blocks.append({
+                    'kind': 'target', 'start': line_start, 'end': line_end, 'depth': depth,
+                    'label': target.group(1),
+                })
+                continue
+
+            if not stripped:
+                close_paragraph(line_start)
+                continue
+
+            if paragraph is None:
+                paragraph = {'kind': 'paragraph', 'start': line_start, 'end': line_end, 'depth': depth}
+                blocks.append(paragraph)
+            paragraph['end'] = line_end
+
+        clean = not stack
+        if end == len(content):
+            # Like CommonMark, an unclosed fence runs to the end of the document
+            close_paragraph(end)
+            while stack:
+                self._close(stack, blocks, end, '')
+        if paragraph is not None:
+            close_paragraph(end)
+            clean = clean and not self._continues_paragraph(end)
+
+        blocks.sort(key=lambda block: (block['start'], block['depth']))
+        inlines.sort(key=lambda inline: inline['start'])
+        for block in blocks:
+            for key in ('fence', 'literal'):
+                block.pop(key, None)
+        return blocks, inlines, clean
+
+    def _continues_paragraph(self, end: int) -> bool:
+        """True if the line starting at `end` would extend a paragraph ending there."""
+        if end >= len(self.content):
+            return False
+        nl = self.content.find('\n', end)
+        line = self.content[end:] if nl == -1 else self.content[end:nl]
+        stripped = line.strip()
+        return bool(stripped) and not (
+            _FENCE_RE.match(line) or stripped.startswith('$$')
+            or _HEADING_RE.match(line) or _TARGET_RE.match(stripped)
+        )
+
+    @staticmethod
+    def _open_fence(match: 're.Match', line_start: int, depth: int) -> Dict[str, Any]:
+        marker, info = match.group(2), match.group(3)
+        name = None
+        directive = re.match(r'^\{([\w:-]+)\}\s*(.*)$', info)
+        if directive:
+            name, info = directive.group(1), directive.group(2)
+            kind = LITERAL_DIRECTIVES.get(name, 'directive')
+        else:
+            kind = 'code'
+        return {
+            'kind': kind, 'start': line_start, 'end': line_start, 'depth': depth,
+            'name': name, 'info': info, 'options': {},
+            'fence': marker, 'literal': kind != 'directive',
+        }
+
+    @staticmethod
+    def _closes(block: Dict[str, Any], line: str) -> bool:
+        fence = block['fence']
+        stripped = line.strip()
+        return (
+            fence != '$$' and len(stripped) >= len(fence)
+            and stripped == stripped[0] * len(stripped) and stripped[0] == fence[0]
+        )
+
+    @staticmethod
+    def _read_option(block: Dict[str, Any], line: str) -> bool:
+        """Record a directive option line; False once the option header ends."""
+        if line.strip() == '---':
+            # YAML-style option block: toggled on open, off on close
+            block['_yaml'] = not block.get('_yaml', False)
+            return True
+        match = _OPTION_RE.match(line) if not block.get('_yaml') else re.match(r'^\s*([\w-]+):\s*(.*?)\s*$', line)
+        if match:
+            key, value = match.group(1), match.group(2)
+            block['options'][key] = value
+            if key in ('label', 'name') and value:
+                block['label'] = value
+            return True
+        return bool(block.get('_yaml'))
+
+    def _close(self, stack: List[Dict[str, Any]], blocks: List[Dict[str, Any]], line_end: int, line: str) -> None:
+        block = stack.pop()
+        block['end'] = line_end
+        block.pop('_yaml', None)
+        if block['fence'] == '$$':
+            label = _DISPLAY_MATH_LABEL_RE.search(line)
+            if label:
+                block['label'] = label.group(1)
+        blocks.append(block)
+
+    def _scan_inlines(self, block: Dict[str, Any], inlines: List[Dict[str, Any]]) -> None:
+        """Collect inline math, links, references and citations inside a prose block."""
+        start = block['start']
+        text = self.content[start:block['end']]
+        code_spans = [m.span() for m in _CODE_SPAN_RE.finditer(text)]
+
+        def in_code(span: Tuple[int, int]) -> bool:
+            return any(c_start <= span[0] and span[1] <= c_end for c_start, c_end in code_spans)
+
+        role_spans = []
+        for match in _ROLE_RE.finditer(text):
+            role, body = match.group(1), match.group(2)
+            role_spans.append(match.span())
+            inline = {'start': start + match.start(), 'end': start + match.end(), 'text': match.group(0)}
+            if role.startswith('cite'):
+                inline.update(kind='citation', role=role,
+                              keys=[key.strip() for key in body.split(',') if key.strip()])
+            elif role == 'math':
+                inline.update(kind='math')
+            elif role == 'doc':
+                target = re.search(r'<([^>]+)>\s*$', body)
+                inline.update(kind='link', role=role, target=target.group(1) if target else body.strip())
+            elif role in ('ref', 'numref', 'eq', 'prf:ref'):
+                target = re.search(r'<([^>]+)>\s*$', body)
+                inline.update(kind='ref', role=role, target=target.group(1) if target else body.strip())
+            else:
+                continue
+            inlines.append(inline)
+
+        # Role bodies are backtick spans too; don't treat them as code spans
+        code_spans = [span for span in code_spans
+                      if not any(r_start <= span[0] and span[1] <= r_end for r_start, r_end in role_spans)]
+
+        for match in _LINK_RE.finditer(text):
+            if in_code(match.span()):
+                continue
+            inlines.append({
+                'kind': 'link', 'start': start + match.start(), 'end': start + match.end(),
+                'text': match.group(0), 'target': match.group(2),
+            })
+
+        for match in _INLINE_MATH_RE.finditer(text):
+            if in_code(match.span()) or any(r_start <= match.start() < r_end for r_start, r_end in role_spans):
+                continue
+            inlines.append({
+                'kind': 'math', 'start': start + match.start(), 'end': start + match.end(),
+                'text': match.group(0),
+            })
@@ -0,0 +1,76 @@
+"""
+Violation dicts for static findings, shared by the analyzers.
+
+Every analyzer reports what it finds the way the LLM path does — the dicts
+parse_markdown_response() produces — plus an exact `position` hint, so
+fix_applier can anchor each fix without searching. `text_finding()` reports
+a span of the lecture with its replacement; `edit_findings()` merges small
+in-line edits into one violation per group of touched lines.
+"""
+from typing import Any, Dict, List, Tuple
+
+from .document import MystDocument
+
+
+def line_bounds(content: str, start: int, end: int) -> Tuple[int, int]:
+    """Widen [start, end) to whole lines: first non-blank character to end of line."""
+    line_start = content.rfind('\n', 0, start) + 1
+    first = line_start + len(content[line_start:start]) - len(content[line_start:start].lstrip())
+    first = min(first, start)
+    line_end = content.find('\n', max(end - 1, start))
+    return first, len(content) if line_end == -1 else line_end
+
+
+def line_location(document: MystDocument, start: int, end: int) -> str:
+    """'Line 7' or 'Lines 7-9' for the lecture text [start, end)."""
+    first, last = document.line_span(start, end)
+    return f"Line {first}" if first == last else f"Lines {first}-{last}"
+
+
+def text_finding(document: MystDocument, start: int, end: int, suggested_fix: str,
+                 description: str, explanation: str) -> Dict[str, Any]:
+    """A violation for the lecture text [start, end) (whitespace-trimmed)."""
+    text = document.content[start:end]
+    lead = len(text) - len(text.lstrip())
+    start += lead
+    current_text = text.strip()
+    return {
+        'location': line_location(document, start, start + len(current_text)),
+        'description': description,
+        'current_text': current_text,
+        'suggested_fix': suggested_fix.strip(),
+        'explanation': explanation,
+        'position': start,
+    }
+
+
+def edit_findings(document: MystDocument, edits: List[Tuple[int, int, str, str]],
+                  explanation: str) -> List[Dict[str, Any]]:
+    """
+    Turn in-line edits into one violation per group of touched lines.
+
+    Args:
+        edits: (start, end, replacement, description) in lecture offsets
+    """
+    content = document.content
+    groups: List[Dict[str, Any]] = []
+    for start, end, replacement, description in sorted(edits):
+        first, last = line_bounds(content, start, end)
+        if groups and first <= groups[-1]['end']:
+            group = groups[-1]
+            group['end'] = max(group['end'], last)
+        else:
+            group = {'start': first, 'end': last, 'edits': [], 'descriptions': []}
+            groups.append(group)
+        group['edits'].append((start, end, replacement))
+        if description not in group['descriptions']:
+            group['descriptions'].append(description)
+
+    findings = []
+    for group in groups:
+        text = content[group['start']:group['end']]
+        for start, end, replacement in sorted(group['edits'], reverse=True):
+            text = text[:start - group['start']] + replacement + text[end - group['start']:]
+        findings.append(text_finding(document, group['start'], group['end'], text,
+                                     '; '.join(group['descriptions']), explanation))
+    return findings
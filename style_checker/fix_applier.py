@@ -1,7 +1,7 @@
 """
 Apply style guide fixes programmatically to lecture content
 """
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
 
 def apply_fixes(content: str, violations: List[Dict[str, Any]]) -> Tuple[str, List[str], List[Dict[str, Any]]]:
@@ -56,7 +56,13 @@ def apply_fixes(content: str, violations: List[Dict[str, Any]]) -> Tuple[str, Li
             skipped_count += 1
             continue
 
-        pos = corrected.find(current_text)
+        # A caller that already knows where the span is (e.g. a fix rebased from a
+        # snapshot) passes `position`; fall back to the first occurrence otherwise.
+        hint = v.get('position')
+        if hint is not None and corrected[hint:hint + len(current_text)] == current_text:
+            pos = hint
+        else:
+            pos = corrected.find(current_text)
         if pos == -1:
             # Most common cause is the LLM paraphrasing whitespace (collapsing newlines,
             # trimming indentation) so the exact substring isn't present. Surface a clear
@@ -157,3 +163,116 @@ def validate_fix_quality(violations: List[Dict[str, Any]]) -> List[str]:
             )
     
     return warnings
+
+
+def _normalize_span(text: str) -> str:
+    """Collapse all whitespace runs so trivially re-wrapped quotes compare equal."""
+    return ' '.join(text.split())
+
+
+def dedupe_violations(
+    violations: List[Dict[str, Any]],
+    prior_fixes: Optional[List[Dict[str, Any]]] = None,
+    content: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Collapse violations that describe the same edit as one already kept.
+
+    Different rules in a category often flag the same span (e.g. qe-math-001
+    and qe-math-009 both rewrite parameter notation). Once the first rule's fix
+    is applied, the second one can no longer anchor and only produces a
+    "not found verbatim" warning. This stage drops such duplicates up front and
+    records the extra rule on the record that was kept, so reports can still
+    attribute the change to every rule that asked for it.
+
+    After whitespace normalization, a violation is a duplicate when:
+    - an earlier violation in the same list quotes the same span and proposes
+      the same replacement, or
+    - a record in `prior_fixes` does, or contains both the span and the
+      replacement while no longer containing the span (the earlier rule made
+      this edit as part of a larger one).
+
+    When `content` is given, prior fixes only absorb violations whose span no
+    longer occurs in it — a span that still anchors is another occurrence of
+    the pattern, not a repeat of an edit that was already made.
+
+    Args:
+        violations: Newly parsed violations (typically one rule's response)
+        prior_fixes: Records already kept for this category — `fix_log` entries
+            or earlier violations — each with `current_text` / `suggested_fix`
+        content: Current lecture content, when `prior_fixes` were applied to it
+
+    Returns:
+        Tuple of (unique violations, duplicate violations). Every duplicate
+        carries a `duplicate_of` key naming the rule whose record it merged
+        into; that record gains a `rule_ids` list with both rules.
+    """
+    prior = [
+        (record, _normalize_span(record.get('current_text', '')),
+         _normalize_span(record.get('suggested_fix', '')))
+        for record in (prior_fixes or [])
+    ]
+    seen: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    unique: List[Dict[str, Any]] = []
+    duplicates: List[Dict[str, Any]] = []
+
+    for v in violations:
+        current = _normalize_span(v.get('current_text', ''))
+        fix = _normalize_span(v.get('suggested_fix', ''))
+        # Incomplete violations can't be compared — let apply_fixes() report them.
+        if not current or not fix:
+            unique.append(v)
+            continue
+
+        match = seen.get((current, fix))
+        anchors = content is not None and v.get('current_text', '').strip() in content
+        if match is None and not anchors:
+            for record, record_current, record_fix in prior:
+                if (current, fix) == (record_current, record_fix) or (
+                        current in record_current and fix in record_fix
+                        and current not in record_fix):
+                    match = record
+                    break
+
+        if match is None:
+            seen[(current, fix)] = v
+            unique.append(v)
+            continue
+
+        rule_id = v.get('rule_id', 'unknown')
+        rule_ids = match.setdefault('rule_ids', [match.get('rule_id', 'unknown')])
+        if rule_id not in rule_ids:
+            rule_ids.append(rule_id)
+        v['duplicate_of'] = match.get('rule_id', 'unknown')
+        duplicates.append(v)
+
+    return unique, duplicates
+
+
+class EditMap:
+    """
+    Record of edits made to a snapshot, kept in snapshot coordinates.
+
+    Used when several rules check the same snapshot concurrently: each rule's
+    spans are located in the snapshot, checked against the edits already
+    accepted from earlier rules, and — if disjoint — rebased into the current
+    content by shifting past every earlier edit.
+    """
+
+    def __init__(self):
+        # Sorted, non-overlapping (start, end, delta) in snapshot coordinates,
+        # where delta = len(replacement) - (end - start).
+        self.edits: List[Tuple[int, int, int]] = []
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """True if snapshot span [start, end) touches an edited span."""
+        return any(start < e_end and e_start < end for e_start, e_end, _ in self.edits)
+
+    def to_current(self, pos: int) -> int:
+        """Map an unedited snapshot position into the current content."""
+        return pos + sum(delta for _, e_end, delta in self.edits if e_end <= pos)
+
+    def record(self, start: int, end: int, new_length: int) -> None:
+        """Record that snapshot span [start, end) now has `new_length` characters."""
+        self.edits.append((start, end, new_length - (end - start)))
+        self.edits.sort()
@@ -3,17 +3,31 @@ GitHub Integration Handler
 Manages PRs, issues, and comments
 """
 
+import base64
 import os
 import re
 import secrets
-from typing import List, Dict, Any, Optional, Tuple
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
-from github import Github, GithubException
+from github import Github, GithubException, InputGitTreeElement
 from datetime import datetime
 
 from . import __version__
 from .categories import VALID_CATEGORIES
 
+LECTURE_SUFFIXES = ('.md', '.myst')
+
+# Lectures downloaded ahead of the one being reviewed in bulk mode
+PREFETCH_READ_AHEAD = 8
+PREFETCH_WORKERS = 4
+
+# Committer identity for LocalRepoHandler when the checkout has none configured
+GIT_BOT_NAME = 'github-actions[bot]'
+GIT_BOT_EMAIL = '41898282+github-actions[bot]@users.noreply.github.com'
+
 
 class GitHubHandler:
     """Handles GitHub API interactions for PR and issue management"""
@@ -35,6 +49,30 @@ class GitHubHandler:
             self.default_branch = self.repo.default_branch or 'main'
         except GithubException:
             self.default_branch = 'main'
+        # Path -> blob sha of the default branch, fetched on first use (see tree_index)
+        self._tree: Optional[Dict[str, str]] = None
+        self._tree_loaded = False
+
+    def tree_index(self) -> Optional[Dict[str, str]]:
+        """
+        Path -> blob sha of every file on the default branch.
+
+        Fetched once per run with a single recursive git tree request, so
+        lecture discovery and lookups need no further API calls. Returns None
+        (callers fall back to per-path requests) if the request fails or the
+        tree is too large for GitHub to return whole.
+        """
+        if not self._tree_loaded:
+            self._tree_loaded = True
+            try:
+                tree = self.repo.get_git_tree(self.default_branch, recursive=True)
+                if tree.truncated:
+                    print("Warning: Repository tree truncated by GitHub; listing directories instead")
+                else:
+                    self._tree = {item.path: item.sha for item in tree.tree if item.type == 'blob'}
+            except GithubException as e:
+                print(f"Warning: Could not fetch repository tree: {e}")
+        return self._tree
     
     def extract_lecture_from_comment(self, comment_body: str) -> Optional[Tuple[str, List[str]]]:
         """
@@ -107,7 +145,17 @@ class GitHubHandler:
             f"{lecture_name}.md",
             f"{lecture_name}.myst"
         ]
-        
+
+        tree = self.tree_index()
+        if tree is not None:
+            found = next((path for path in possible_paths if path in tree), None)
+            if found is None:
+                # A lecture in a subdirectory, if its name is unique there
+                nested = [path for path in self.get_all_lectures(lectures_path)
+                          if path.rsplit('/', 1)[-1] in (f"{lecture_name}{suffix}" for suffix in LECTURE_SUFFIXES)]
+                found = nested[0] if len(nested) == 1 else None
+            return found
+
         for path in possible_paths:
             try:
                 self.repo.get_contents(path)
@@ -128,10 +176,51 @@ class GitHubHandler:
             File content as string
         """
         try:
+            sha = (self.tree_index() or {}).get(file_path)
+            if sha is not None:
+                # Blob by sha from the tree index: no path resolution, no 1 MB limit
+                return base64.b64decode(self.repo.get_git_blob(sha).content).decode('utf-8')
             content = self.repo.get_contents(file_path)
             return content.decoded_content.decode('utf-8')
         except GithubException as e:
             raise Exception(f"Failed to get lecture content: {e}")
+
+    def prefetch_lectures(
+        self,
+        paths: List[str],
+        read_ahead: int = PREFETCH_READ_AHEAD,
+        max_workers: int = PREFETCH_WORKERS,
+    ) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+        """
+        Download lectures concurrently, a bounded number ahead of the consumer.
+
+        Worker threads fetch and decode up to `read_ahead` lectures beyond the
+        one being consumed (see get_lecture_content), so a bulk review waits on
+        GitHub only if it outpaces the downloads.
+
+        Yields:
+            (path, content, None), or (path, None, error) if the fetch failed,
+            in the order of `paths`
+        """
+        self.tree_index()  # Fetched once here rather than raced by the workers
+        pending: deque = deque()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for path in paths:
+                pending.append((path, executor.submit(self.get_lecture_content, path)))
+                if len(pending) > read_ahead:
+                    yield self._prefetched(*pending.popleft())
+            while pending:
+                yield self._prefetched(*pending.popleft())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _prefetched(path: str, future) -> Tuple[str, Optional[str], Optional[Exception]]:
+        try:
+            return path, future.result(), None
+        except Exception as e:
+            return path, None, e
     
     def create_branch(self, branch_name: str, base_branch: Optional[str] = None) -> str:
         """
@@ -200,6 +289,45 @@ class GitHubHandler:
         except GithubException as e:
             raise Exception(f"Failed to commit changes: {e}")
     
+    def commit_files(
+        self,
+        changes: List[Tuple[str, str, str]],
+        branch: str,
+        message: Optional[str] = None,
+    ) -> str:
+        """
+        Commit many files at once through the Git Data API.
+
+        The new contents go into git trees built on the branch head (GitHub
+        creates their blobs), and the branch ref is moved once at the end, so
+        the branch never holds a partial set of changes.
+
+        Args:
+            changes: (path, new content, commit message) per file
+            branch: Branch to commit to
+            message: Message of a single commit holding every file; if None,
+                one commit per file is chained with the files' own messages
+
+        Returns:
+            SHA of the new branch head
+        """
+        try:
+            ref = self.repo.get_git_ref(f'heads/{branch}')
+            head = self.repo.get_git_commit(ref.object.sha)
+            elements = [InputGitTreeElement(path, '100644', 'blob', content=content)
+                        for path, content, _ in changes]
+            if message is not None:
+                steps = [(elements, message)]
+            else:
+                steps = [([element], file_message) for element, (_, _, file_message) in zip(elements, changes)]
+            for step_elements, step_message in steps:
+                tree = self.repo.create_git_tree(step_elements, head.tree)
+                head = self.repo.create_git_commit(step_message, tree, [head])
+            ref.edit(head.sha)
+            return head.sha
+        except GithubException as e:
+            raise Exception(f"Failed to commit changes: {e}")
+
     def commit_file(
         self,
         file_path: str,
@@ -604,6 +732,22 @@ class GitHubHandler:
             msg += f"- ... and {len(violations) - 10} more\n"
         
         return msg
+
+    def format_bulk_commit_message(self, lectures: List[Tuple[str, int]]) -> str:
+        """
+        Format the message of a bulk review's single commit
+
+        Args:
+            lectures: (lecture name, issues found) per changed lecture
+
+        Returns:
+            Formatted commit message
+        """
+        total = sum(issues for _, issues in lectures)
+        msg = f"style: fix {total} issues in {len(lectures)} lectures\n\n"
+        for name, issues in lectures:
+            msg += f"- {name}: {issues} issues\n"
+        return msg
     
     def get_all_lectures(self, lectures_path: str = 'lectures/') -> List[str]:
         """
@@ -613,14 +757,20 @@ class GitHubHandler:
             lectures_path: Path to lectures directory
             
         Returns:
-            List of lecture file paths
+            List of lecture file paths, including those in subdirectories
+            when the repository tree is available (see tree_index)
         """
+        tree = self.tree_index()
+        if tree is not None:
+            prefix = lectures_path.strip('/') + '/' if lectures_path.strip('/') else ''
+            return sorted(path for path in tree if path.startswith(prefix) and path.endswith(LECTURE_SUFFIXES))
+
         lectures = []
         
         try:
             contents = self.repo.get_contents(lectures_path)
             for content in contents:
-                if content.type == 'file' and (content.name.endswith('.md') or content.name.endswith('.myst')):
+                if content.type == 'file' and content.name.endswith(LECTURE_SUFFIXES):
                     lectures.append(content.path)
         except GithubException as e:
             print(f"Warning: Could not list lectures: {e}")
@@ -628,6 +778,198 @@ class GitHubHandler:
         return lectures
 
 
+class LocalRepoHandler(GitHubHandler):
+    """
+    GitHubHandler that reads and commits through a local checkout.
+
+    Lectures are listed with `git ls-files` and read from disk, and fixes are
+    written to the working tree, committed and pushed with plain git, so a
+    review makes no contents, blob or Git Data API requests. Pull requests,
+    comments and the report formatting still go through the API (inherited).
+    """
+
+    def __init__(self, token: str, repository: str, root: str = '.'):
+        """
+        Initialize the handler
+
+        Args:
+            token: GitHub token or GitHub App token
+            repository: Repository in format 'owner/repo'
+            root: Path of the checkout (its top-level directory or any
+                directory inside it)
+
+        Raises:
+            Exception: If `root` is not inside a git checkout
+        """
+        super().__init__(token, repository)
+        self.root = Path(root)
+        # Paths are relative to the top level, wherever in the checkout `root` is
+        self.root = Path(self._git('rev-parse', '--show-toplevel').strip())
+        identity = subprocess.run(['git', 'config', 'user.email'], cwd=self.root,
+                                  capture_output=True, text=True)
+        self._identity = [] if identity.stdout.strip() else [
+            '-c', f'user.name={GIT_BOT_NAME}', '-c', f'user.email={GIT_BOT_EMAIL}',
+        ]
+
+    def _git(self, *args: str) -> str:
+        """Run git in the checkout and return its output."""
+        try:
+            result = subprocess.run(['git', *args], cwd=self.root, capture_output=True, text=True)
+        except OSError as e:
+            raise Exception(f"Failed to run git: {e}")
+        if result.returncode != 0:
+            # Name the subcommand, not a leading `-c name=value` option
+            command = next((arg for i, arg in enumerate(args)
+                            if not arg.startswith('-') and (i == 0 or args[i - 1] != '-c')), 'command')
+            raise Exception(f"git {command} failed: {result.stderr.strip() or result.stdout.strip()}")
+        return result.stdout
+
+    def tree_index(self) -> Optional[Dict[str, str]]:
+        """Path -> blob sha of every file tracked in the checkout (from `git ls-files`)."""
+        if not self._tree_loaded:
+            self._tree_loaded = True
+            tree = {}
+            for entry in self._git('ls-files', '-s', '-z').split('\0'):
+                if entry:
+                    info, path = entry.split('\t', 1)
+                    tree[path] = info.split()[1]
+            self._tree = tree
+        return self._tree
+
+    def get_lecture_content(self, file_path: str) -> str:
+        """
+        Get content of a lecture file from the working tree
+
+        Args:
+            file_path: Path to lecture file, relative to the checkout
+
+        Returns:
+            File content as string
+        """
+        try:
+            return (self.root / file_path).read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            raise Exception(f"Failed to get lecture content: {e}")
+
+    def _branch_exists(self, branch: str) -> bool:
+        local = subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f'refs/heads/{branch}'],
+                               cwd=self.root, capture_output=True, text=True)
+        return local.returncode == 0 or bool(self._git('ls-remote', '--heads', 'origin', branch).strip())
+
+    def create_branch(self, branch_name: str, base_branch: Optional[str] = None) -> str:
+        """
+        Create a new branch in the checkout and switch to it.
+
+        The branch starts at the checked-out commit — the one the lectures
+        were read from — unless `base_branch` is given. As with the API
+        handler, a name already taken locally or on origin gets a short
+        random suffix.
+
+        Args:
+            branch_name: Name for new branch
+            base_branch: Branch or commit to branch from (defaults to HEAD)
+
+        Returns:
+            The actual branch name created (may include a collision-avoidance suffix).
+        """
+        candidate = branch_name
+        for _ in range(5):
+            if not self._branch_exists(candidate):
+                self._git('checkout', '-b', candidate, base_branch or 'HEAD')
+                return candidate
+            candidate = f"{branch_name}-{secrets.token_hex(3)}"
+        raise Exception(
+            f"Failed to create branch after 5 attempts (last try: '{candidate}')"
+        )
+
+    def _commit(self, paths: List[str], contents: List[str], message: str) -> None:
+        """Write and commit the files whose content changed; no commit if none did."""
+        changed = []
+        for path, content in zip(paths, contents):
+            target = self.root / path
+            if target.is_file() and target.read_text(encoding='utf-8') == content:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content, encoding='utf-8')
+            changed.append(path)
+        if not changed:
+            return
+        self._git('add', '--', *changed)
+        staged = subprocess.run(['git', 'diff', '--cached', '--quiet'], cwd=self.root)
+        if staged.returncode == 0:
+            return
+        self._git(*self._identity, 'commit', '--quiet', '-m', message)
+
+    def _checkout(self, branch: str) -> None:
+        if self._git('rev-parse', '--abbrev-ref', 'HEAD').strip() != branch:
+            self._git('checkout', branch)
+
+    def commit_changes(
+        self,
+        file_path: str,
+        new_content: str,
+        commit_message: str,
+        branch: str
+    ) -> None:
+        """
+        Commit changes to a file and push the branch
+
+        Args:
+            file_path: Path to file to update
+            new_content: New content for the file
+            commit_message: Commit message
+            branch: Branch to commit to
+        """
+        self._checkout(branch)
+        self._commit([file_path], [new_content], commit_message)
+        self._git('push', '--quiet', 'origin', f'HEAD:refs/heads/{branch}')
+
+    def commit_files(
+        self,
+        changes: List[Tuple[str, str, str]],
+        branch: str,
+        message: Optional[str] = None,
+    ) -> str:
+        """
+        Commit many files locally and push the branch once.
+
+        Args:
+            changes: (path, new content, commit message) per file
+            branch: Branch to commit to
+            message: Message of a single commit holding every file; if None,
+                one commit per file is made with the files' own messages
+
+        Returns:
+            SHA of the new branch head
+        """
+        self._checkout(branch)
+        if message is not None:
+            self._commit([path for path, _, _ in changes], [content for _, content, _ in changes], message)
+        else:
+            for path, content, file_message in changes:
+                self._commit([path], [content], file_message)
+        self._git('push', '--quiet', 'origin', f'HEAD:refs/heads/{branch}')
+        return self._git('rev-parse', 'HEAD').strip()
+
+    def commit_file(
+        self,
+        file_path: str,
+        content: str,
+        commit_message: str,
+        branch: str
+    ) -> None:
+        """
+        Create a new file in the checkout, commit it and push the branch
+
+        Args:
+            file_path: Path for the new file
+            content: Content of the file
+            commit_message: Commit message
+            branch: Branch to commit to
+        """
+        self.commit_changes(file_path, content, commit_message, branch)
+
+
 def _build_changed_regions(original: str, final: str, fix_log: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Build a list of changed regions by comparing original vs final content line-by-line,
@@ -687,7 +1029,9 @@ def _build_changed_regions(original: str, final: str, fix_log: List[Dict[str, An
             if _text_overlaps_region(fix_current, orig_text) or \
                _text_overlaps_region(fix_suggested, final_text):
                 rule_id = fix['rule_id']
-                rules.add(rule_id)
+                # Rules whose duplicate findings were merged into this fix
+                # (see fix_applier.dedupe_violations) share the attribution.
+                rules.update(fix.get('rule_ids') or [rule_id])
                 if fix.get('description'):
                     descriptions[rule_id] = fix['description']
                 if fix.get('explanation'):
@@ -0,0 +1,297 @@
+"""
+Index of the lectures in a series, and static checks of the link rules.
+
+qe-link-001 and qe-link-002 turn on one question: does a link point into
+this lecture series or another one? A single lecture can't answer that, but
+the repository can. `LectureIndex` is built once per run from the lecture
+directory listing, `_toc.yml` (the book's documents) and `_config.yml` (the
+book's own URL and its intersphinx prefixes), and optionally from Sphinx
+`objects.inv` inventories of the other series. The link checkers then
+classify every link against it instead of asking the model.
+
+Links the index can't place — a URL of an unknown site, a document found in
+no inventory — are left alone.
+"""
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .document import MystDocument
+from .findings import edit_findings
+
+# Intersphinx prefixes of the QuantEcon lecture series (see links-rules.md)
+SERIES_URLS = {
+    'programming': 'https://python-programming.quantecon.org/',
+    'intro': 'https://intro.quantecon.org/',
+    'intermediate': 'https://python.quantecon.org/',
+    'advanced': 'https://python-advanced.quantecon.org/',
+    'jax': 'https://jax.quantecon.org/',
+}
+
+LECTURE_SUFFIXES = ('.md', '.myst', '.ipynb')
+
+_TOC_ENTRY_RE = re.compile(r'^\s*-?\s*(?:file|root):\s*["\']?([^"\'\s#]+)', re.MULTILINE)
+_BASEURL_RE = re.compile(r'^\s*html_baseurl:\s*["\']?([^"\'\s]+)', re.MULTILINE)
+_URL_RE = re.compile(r'https?://[^"\'\s,\]]+')
+_INVENTORY_LINE_RE = re.compile(r'^(.+?)\s+(\S+:\S+)\s+(-?\d+)\s+(\S*)\s+(.*)$')
+_LINK_TEXT_RE = re.compile(r'^\[([^\]]*)\]')
+_DOC_ROLE_RE = re.compile(r'^\{doc\}`(?:(.*?)\s*<([^>]+)>|([^`]*))`$')
+
+
+def _docname(path: str) -> str:
+    """'lectures/sub/kalman.md' relative to 'lectures/' -> 'sub/kalman'."""
+    for suffix in LECTURE_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def _site(url: str) -> str:
+    """URL without scheme, for prefix comparison."""
+    return url.split('://', 1)[-1].rstrip('/') + '/'
+
+
+def parse_intersphinx(config: str) -> Dict[str, str]:
+    """Intersphinx prefix -> base URL from a Jupyter Book `_config.yml` (no YAML parser needed)."""
+    mapping: Dict[str, str] = {}
+    lines = config.split('\n')
+    for index, line in enumerate(lines):
+        if not re.match(r'^\s*intersphinx_mapping:\s*$', line):
+            continue
+        indent = len(line) - len(line.lstrip())
+        key = None
+        for entry in lines[index + 1:]:
+            if not entry.strip() or entry.lstrip().startswith('#'):
+                continue
+            entry_indent = len(entry) - len(entry.lstrip())
+            if entry_indent <= indent:
+                break
+            match = re.match(r'^\s*([\w-]+):\s*(.*)$', entry)
+            if match and not match.group(1).startswith('http'):
+                key = match.group(1)
+            url = _URL_RE.search(entry)
+            if key and url and key not in mapping:
+                mapping[key] = url.group(0)
+        break
+    return mapping
+
+
+class LectureIndex:
+    """
+    The documents of this lecture series and the URLs of the others.
+
+    Attributes:
+        lectures: Document names of this series ('kalman', 'sub/kalman')
+        series: This series' intersphinx prefix, if its URL is known
+        series_urls: Intersphinx prefix -> base URL, for every known series
+        inventories: Prefix -> document names, from loaded objects.inv files
+    """
+
+    def __init__(self, lectures: Iterable[str] = (), home_url: Optional[str] = None,
+                 series_urls: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            lectures: Document names of this series
+            home_url: This series' base URL (html_baseurl)
+            series_urls: Extra or overriding prefix -> base URL entries
+        """
+        self.lectures: Set[str] = set(lectures)
+        self.series_urls = dict(SERIES_URLS)
+        self.series_urls.update(series_urls or {})
+        self.inventories: Dict[str, Set[str]] = {}
+        self.series: Optional[str] = None
+        if home_url:
+            self.series = next((prefix for prefix, url in self.series_urls.items()
+                                if _site(url) == _site(home_url)), 'self')
+            self.series_urls.setdefault(self.series, home_url)
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str], toc: Optional[str] = None,
+                   config: Optional[str] = None) -> 'LectureIndex':
+        """
+        Build an index from a lecture listing and the book's configuration.
+
+        Args:
+            paths: Lecture file paths relative to the book root
+            toc: Text of `_toc.yml`, whose entries are added to the listing
+            config: Text of `_config.yml`, for html_baseurl and intersphinx_mapping
+        """
+        lectures = {_docname(path) for path in paths if path.endswith(LECTURE_SUFFIXES)}
+        if toc:
+            lectures.update(_docname(entry) for entry in _TOC_ENTRY_RE.findall(toc))
+        home_url = None
+        series_urls = {}
+        if config:
+            baseurl = _BASEURL_RE.search(config)
+            home_url = baseurl.group(1) if baseurl else None
+            series_urls = parse_intersphinx(config)
+        return cls(lectures, home_url=home_url, series_urls=series_urls)
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> 'LectureIndex':
+        """Build an index from a book directory on disk (see from_files)."""
+        directory = Path(directory)
+        paths = [path.relative_to(directory).as_posix() for path in directory.rglob('*')
+                 if path.suffix in LECTURE_SUFFIXES and not path.name.startswith('qestyle(')
+                 and '_build' not in path.parts]
+        toc = directory / '_toc.yml'
+        config = directory / '_config.yml'
+        return cls.from_files(
+            paths,
+            toc=toc.read_text(encoding='utf-8') if toc.exists() else None,
+            config=config.read_text(encoding='utf-8') if config.exists() else None,
+        )
+
+    def add_inventory(self, prefix: str, data: bytes) -> None:
+        """
+        Add the documents of another series from its Sphinx `objects.inv`.
+
+        Raises:
+            ValueError: If `data` is not a version 2 Sphinx inventory
+        """
+        header = data.split(b'\n', 4)
+        if len(header) < 5 or not header[0].startswith(b'# Sphinx inventory version 2'):
+            raise ValueError(f"Not a Sphinx inventory (version 2) for '{prefix}'")
+        try:
+            body = zlib.decompress(header[4]).decode('utf-8')
+        except zlib.error as e:
+            raise ValueError(f"Corrupt Sphinx inventory for '{prefix}': {e}") from e
+        documents = self.inventories.setdefault(prefix, set())
+        for line in body.split('\n'):
+            match = _INVENTORY_LINE_RE.match(line)
+            if match and match.group(2) == 'std:doc':
+                documents.add(match.group(1))
+
+    def resolve_url(self, url: str) -> Optional[Tuple[str, str, str]]:
+        """
+        (prefix, document, anchor) of a URL into a known series, or None.
+
+        'https://intro.quantecon.org/linear_equations.html#solving' ->
+        ('intro', 'linear_equations', 'solving').
+        """
+        site = _site(url.split('#', 1)[0])
+        for prefix, base in self.series_urls.items():
+            base_site = _site(base)
+            if site.startswith(base_site) and site != base_site:
+                path = site[len(base_site):].rstrip('/')
+                document = path[:-len('.html')] if path.endswith('.html') else path
+                anchor = url.split('#', 1)[1] if '#' in url else ''
+                return prefix, document, anchor
+        return None
+
+    def is_local(self, document: str) -> bool:
+        """True if `document` is in this series (unknown if the listing is empty)."""
+        return document in self.lectures
+
+    def other_series(self, document: str) -> Optional[str]:
+        """The one other series whose inventory has `document`, if it isn't local."""
+        if not self.lectures or self.is_local(document):
+            return None
+        found = [prefix for prefix, documents in self.inventories.items()
+                 if document in documents and prefix != self.series]
+        return found[0] if len(found) == 1 else None
+
+
+def _doc_target(document: str, anchor: str) -> str:
+    return f"{document}.html#{anchor}" if anchor else document
+
+
+def _markdown_links(document: MystDocument) -> Iterable[Tuple[Dict[str, Any], str]]:
+    """Markdown links and their link text."""
+    for link in document.inlines_of('link'):
+        if link.get('role'):
+            continue
+        text = _LINK_TEXT_RE.match(link['text'])
+        yield link, text.group(1) if text else ''
+
+
+def check_same_series_links(document: MystDocument, index: LectureIndex) -> List[Dict[str, Any]]:
+    """qe-link-001: URLs into this series -> `[](document)`."""
+    edits = []
+    if index.series is None:
+        return []
+    for link, text in _markdown_links(document):
+        resolved = index.resolve_url(link['target'])
+        if resolved is None or resolved[0] != index.series:
+            continue
+        _, name, anchor = resolved
+        if index.lectures and not index.is_local(name):
+            continue
+        replacement = f"[{text}]({_doc_target(name, anchor)})"
+        edits.append((link['start'], link['end'], replacement, f"URL → `{replacement}`"))
+    return edit_findings(document, edits,
+                         "Link lectures of the same series with Markdown links to the document, "
+                         "not full URLs.")
+
+
+def check_cross_series_links(document: MystDocument, index: LectureIndex) -> List[Dict[str, Any]]:
+    """qe-link-002: URLs, bare links and unprefixed {doc} links into other series -> {doc}`prefix:document`."""
+    edits = []
+    for link, text in _markdown_links(document):
+        target = link['target']
+        resolved = index.resolve_url(target) if index.series is not None else None
+        if resolved is not None and resolved[0] != index.series:
+            prefix, name, anchor = resolved
+        elif '://' not in target and not target.startswith('#'):
+            name, _, anchor = target.partition('#')
+            name = _docname(name[:-len('.html')] if name.endswith('.html') else name)
+            prefix = index.other_series(name)
+            if prefix is None:
+                continue
+        else:
+            continue
+        reference = f"{prefix}:{_doc_target(name, anchor)}"
+        replacement = f"{{doc}}`{text}<{reference}>`" if text else f"{{doc}}`{reference}`"
+        edits.append((link['start'], link['end'], replacement, f"Link → `{replacement}`"))
+
+    for link in document.inlines_of('link'):
+        if link.get('role') != 'doc':
+            continue
+        role = _DOC_ROLE_RE.match(link['text'])
+        if not role:
+            continue
+        title, target = (role.group(1), role.group(2)) if role.group(2) else ('', role.group(3).strip())
+        if ':' in target:
+            continue
+        prefix, separator, rest = target.partition('/')
+        if separator and prefix in index.series_urls and prefix != index.series:
+            fixed = f"{prefix}:{rest}"
+        else:
+            prefix = index.other_series(target)
+            if prefix is None:
+                continue
+            fixed = f"{prefix}:{target}"
+        replacement = f"{{doc}}`{title}<{fixed}>`" if title else f"{{doc}}`{fixed}`"
+        edits.append((link['start'], link['end'], replacement, f"`{target}` → `{fixed}`"))
+    return edit_findings(document, edits,
+                         "Documents in another lecture series are linked with {doc} and the series' "
+                         "intersphinx prefix.")
+
+
+RULE_CHECKERS: Dict[str, Callable[[MystDocument, LectureIndex], List[Dict[str, Any]]]] = {
+    'qe-link-001': check_same_series_links,
+    'qe-link-002': check_cross_series_links,
+}
+
+ANALYZED_RULES = frozenset(RULE_CHECKERS)
+
+
+def analyze_rule(document: MystDocument, rule: Dict[str, Any], index: LectureIndex) -> List[Dict[str, Any]]:
+    """
+    Check one link rule against a lecture index without the LLM.
+
+    Args:
+        document: Model of the lecture version being checked
+        rule: Rule dict (see reviewer.extract_individual_rules); its id must
+            be in ANALYZED_RULES
+        index: Index of the lecture's series
+
+    Returns:
+        Violations in the parse_markdown_response() format, each with a
+        `position` hint at the start of its current_text
+    """
+    violations = RULE_CHECKERS[rule['rule_id']](document, index)
+    for violation in violations:
+        violation.update(rule_id=rule['rule_id'], rule_title=rule.get('title', ''))
+    return violations
@@ -0,0 +1,474 @@
+"""
+Tokenizer and static checks for the math in a lecture.
+
+The mechanical math rules — `\\top` for transposes, `bmatrix`, no bold face,
+curly-bracket sequences, `aligned` instead of `align`, no `\\tag` — are
+statements about the token structure of a formula. `math_spans()` collects
+every `$...$`, `$$...$$` and `{math}` body, `tokenize_math()` splits each
+into LaTeX tokens with matched braces and the stack of enclosing
+environments, and a checker per rule walks the tokens. Findings are the same
+violation dicts code_analyzer produces, with exact `position` hints, so the
+fixes apply without an API call.
+
+A formula whose braces or environments don't balance is skipped, and a
+pattern that could mean two things (`\\beta^T` is a power) is left alone.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .document import MystDocument, parse_document
+from .findings import edit_findings
+
+# Bold-face commands (qe-math-004)
+BOLD_COMMANDS = {'\\mathbf', '\\boldsymbol', '\\bm', '\\pmb'}
+
+# Matrix environments with the wrong brackets (qe-math-003). `vmatrix` is
+# left alone: it is the determinant, not a bracket choice.
+MATRIX_ENVIRONMENTS = {'pmatrix', 'Bmatrix'}
+
+# Environments that nest a numbered display inside math (qe-math-006)
+ALIGN_ENVIRONMENTS = {'align', 'align*'}
+
+# Relations that make a subscript an index range: [x_t]_{t=0} (qe-math-005)
+_INDEX_RELATIONS = {'=', '\\geq', '\\ge', '\\in'}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<env>\\(?P<verb>begin|end)\s*\{(?P<name>[^{}]*)\})
+  | (?P<command>\\(?:[A-Za-z]+|.))
+  | (?P<comment>%[^\n]*)
+  | (?P<space>\s+)
+  | (?P<char>.)
+""", re.VERBOSE | re.DOTALL)
+
+_CHAR_KINDS = {'{': 'open', '}': 'close', '_': 'sub', '^': 'sup'}
+_OPTION_LINE_RE = re.compile(r'^\s*:[\w-]+:')
+
+
+def tokenize_math(text: str, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Split a LaTeX formula into tokens.
+
+    Args:
+        text: Formula body, without its `$`/`$$` delimiters
+        offset: Lecture offset of text[0]
+
+    Returns:
+        Token dicts with 'kind' ('begin', 'end', 'command', 'open', 'close',
+        'sub', 'sup', 'space', 'comment' or 'char'), 'text', lecture
+        'start'/'end' and 'envs' (names of the enclosing environments,
+        outermost first). Braces and begin/end pairs carry the index of
+        their partner in 'match'; 'begin'/'end' also carry 'env'.
+
+    Raises:
+        ValueError: If braces or environments don't balance
+    """
+    tokens: List[Dict[str, Any]] = []
+    braces: List[int] = []
+    environments: List[int] = []
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        token = {'kind': kind, 'text': match.group(0),
+                 'start': offset + match.start(), 'end': offset + match.end(),
+                 'envs': tuple(tokens[i]['env'] for i in environments)}
+        if kind == 'env':
+            token.update(kind=match.group('verb'), env=match.group('name').strip())
+        elif kind == 'char':
+            token['kind'] = _CHAR_KINDS.get(token['text'], 'char')
+        index = len(tokens)
+        tokens.append(token)
+
+        if token['kind'] == 'open':
+            braces.append(index)
+        elif token['kind'] == 'close':
+            if not braces:
+                raise ValueError(f"Unbalanced '}}' at offset {token['start']}")
+            opener = braces.pop()
+            tokens[opener]['match'], token['match'] = index, opener
+        elif token['kind'] == 'begin':
+            environments.append(index)
+        elif token['kind'] == 'end':
+            if not environments or tokens[environments[-1]]['env'] != token['env']:
+                raise ValueError(f"Unmatched \\end{{{token['env']}}} at offset {token['start']}")
+            opener = environments.pop()
+            tokens[opener]['match'], token['match'] = index, opener
+            token['envs'] = token['envs'][:-1]
+    if braces:
+        raise ValueError(f"Unbalanced '{{' at offset {tokens[braces[-1]]['start']}")
+    if environments:
+        raise ValueError(f"Unclosed \\begin{{{tokens[environments[-1]]['env']}}}")
+    return tokens
+
+
+class MathSpan:
+    """
+    One formula of a lecture: display math, a {math} directive or inline math.
+
+    Attributes:
+        display: True for `$$` blocks and {math} directives
+        start: Lecture offset of the formula body (delimiters excluded)
+        end: Lecture offset just past the body
+        tokens: tokenize_math() tokens, or None if the formula doesn't balance
+    """
+
+    def __init__(self, content: str, start: int, end: int, display: bool):
+        self.display = display
+        self.start = start
+        self.end = end
+        self.text = content[start:end]
+        try:
+            self.tokens: Optional[List[Dict[str, Any]]] = tokenize_math(self.text, start)
+        except ValueError:
+            self.tokens = None
+
+
+def _display_body(content: str, block: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Body span of a `$$` block or {math} directive, or None."""
+    text = content[block['start']:block['end']]
+    if block.get('name') is None:
+        opening = text.find('$$')
+        closing = text.rfind('$$')
+        if opening == -1 or closing <= opening:
+            return None
+        return block['start'] + opening + 2, block['start'] + closing
+
+    # {math} directive: after the fence line and options, before the closing fence
+    lines = text.split('\n')
+    offsets = []
+    pos = block['start']
+    for line in lines:
+        offsets.append(pos)
+        pos += len(line) + 1
+    first, last = 1, len(lines)
+    while last > first and not lines[last - 1].strip():
+        last -= 1
+    if last > first and re.match(r'^\s*(`{3,}|~{3,}|:{3,})\s*$', lines[last - 1]):
+        last -= 1
+    if first < last and lines[first].strip() == '---':
+        end = next((i for i in range(first + 1, last) if lines[i].strip() == '---'), None)
+        if end is not None:
+            first = end + 1
+    while first < last and _OPTION_LINE_RE.match(lines[first]):
+        first += 1
+    if first >= last:
+        return None
+    return offsets[first], offsets[last - 1] + len(lines[last - 1])
+
+
+@lru_cache(maxsize=32)
+def _lecture_math(content: str) -> Tuple[MathSpan, ...]:
+    document = parse_document(content)
+    spans = []
+    for block in document.blocks_of('math'):
+        body = _display_body(content, block)
+        if body:
+            spans.append(MathSpan(content, body[0], body[1], display=True))
+    for inline in document.inlines_of('math'):
+        if inline['text'].startswith('$'):
+            spans.append(MathSpan(content, inline['start'] + 1, inline['end'] - 1, display=False))
+        else:
+            # {math}`...` role
+            opening = inline['text'].find('`')
+            spans.append(MathSpan(content, inline['start'] + opening + 1, inline['end'] - 1, display=False))
+    return tuple(sorted(spans, key=lambda span: span.start))
+
+
+def math_spans(document: MystDocument) -> List[MathSpan]:
+    """The lecture's formulas in document order, tokenized (cached by content)."""
+    return list(_lecture_math(document.content))
+
+
+# --- Token helpers ----------------------------------------------------------
+
+def _skip_space(tokens: List[Dict[str, Any]], index: int, step: int = 1) -> Optional[int]:
+    """Index of the first non-space, non-comment token from `index` in direction `step`."""
+    while 0 <= index < len(tokens):
+        if tokens[index]['kind'] not in ('space', 'comment'):
+            return index
+        index += step
+    return None
+
+
+def _argument(tokens: List[Dict[str, Any]], index: int) -> Optional[Tuple[int, int]]:
+    """(first, last) token indices of the argument starting at or after `index`."""
+    index = _skip_space(tokens, index)
+    if index is None:
+        return None
+    kind = tokens[index]['kind']
+    if kind == 'open':
+        return index, tokens[index]['match']
+    if kind in ('char', 'command'):
+        return index, index
+    return None
+
+
+def _inner(tokens: List[Dict[str, Any]], argument: Tuple[int, int]) -> List[Dict[str, Any]]:
+    """Significant tokens of an argument, without its braces."""
+    first, last = argument
+    if tokens[first]['kind'] == 'open':
+        first, last = first + 1, last - 1
+    return [t for t in tokens[first:last + 1] if t['kind'] not in ('space', 'comment')]
+
+
+def _deletion_start(tokens: List[Dict[str, Any]], index: int) -> int:
+    """Start of the token at `index`, widened over the spaces before it on the same line."""
+    if index > 0 and tokens[index - 1]['kind'] == 'space' and '\n' not in tokens[index - 1]['text']:
+        return tokens[index - 1]['start']
+    return tokens[index]['start']
+
+
+def _base(tokens: List[Dict[str, Any]], index: int) -> Optional[int]:
+    """Index of the base of the superscript at `index`, skipping a subscript (x_t^T -> x)."""
+    before = _skip_space(tokens, index - 1, -1)
+    if before is None:
+        return None
+    start = tokens[before]['match'] if tokens[before]['kind'] == 'close' else before
+    sub = _skip_space(tokens, start - 1, -1)
+    if sub is not None and tokens[sub]['kind'] == 'sub':
+        before = _skip_space(tokens, sub - 1, -1)
+    return before
+
+
+def _opening_bracket(tokens: List[Dict[str, Any]], index: int) -> Optional[int]:
+    """Index of the bracket matching the closing bracket at `index`, in the same group."""
+    closing = tokens[index]['text']
+    opening = {')': '(', ']': '['}[closing]
+    depth = 0
+    position = index - 1
+    while position >= 0:
+        token = tokens[position]
+        if token['kind'] in ('close', 'end'):
+            position = token['match']
+        elif token['kind'] in ('open', 'begin'):
+            return None
+        elif token['kind'] == 'char' and token['text'] == closing:
+            depth += 1
+        elif token['kind'] == 'char' and token['text'] == opening:
+            if depth == 0:
+                return position
+            depth -= 1
+        position -= 1
+    return None
+
+
+# --- Checkers ---------------------------------------------------------------
+
+def _t_is_a_symbol(spans: List[MathSpan]) -> bool:
+    """True if `T` appears anywhere other than as a superscript of a letter (a horizon, `\\beta^T`)."""
+    for span in spans:
+        tokens = span.tokens or []
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'char' or token['text'] != 'T':
+                continue
+            sup = _skip_space(tokens, index - 1, -1)
+            if sup is not None and tokens[sup]['kind'] == 'open':
+                # Only ^{T} on its own counts: ^{T-1} is a power
+                if tokens[sup]['match'] != _skip_space(tokens, index + 1):
+                    return True
+                sup = _skip_space(tokens, sup - 1, -1)
+            if sup is None or tokens[sup]['kind'] != 'sup':
+                return True
+            base = _base(tokens, sup)
+            if base is None or not _is_letter(tokens[base]):
+                return True
+    return False
+
+
+def _is_letter(token: Dict[str, Any]) -> bool:
+    return token['kind'] == 'char' and token['text'].isascii() and token['text'].isalpha() \
+        and token['text'] != 'e'
+
+
+def check_transpose(document: MystDocument, spans: List[MathSpan]) -> List[Dict[str, Any]]:
+    """qe-math-002: `A^T` -> `A^\\top`, unless the lecture also uses T as a symbol."""
+    spans = [span for span in spans if span.tokens]
+    if _t_is_a_symbol(spans):
+        return []
+    edits = []
+    for span in spans:
+        tokens = span.tokens
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'sup':
+                continue
+            argument = _argument(tokens, index + 1)
+            if argument is None or [t['text'] for t in _inner(tokens, argument)] != ['T']:
+                continue
+            base = _base(tokens, index)
+            if base is None or not _is_letter(tokens[base]):
+                continue
+            inner = _inner(tokens, argument)[0]
+            edits.append((inner['start'], inner['end'], '\\top',
+                          f"`{document.content[token['start']:tokens[argument[1]]['end']]}` → `^\\top`"))
+    return edit_findings(document, edits, "Use `\\top` for the transpose.")
+
+
+def check_matrix_brackets(document: MystDocument, spans: List[MathSpan]) -> List[Dict[str, Any]]:
+    """qe-math-003: pmatrix/Bmatrix and \\left( matrix \\right) -> bmatrix."""
+    edits = []
+    for span in spans:
+        tokens = span.tokens or []
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'begin':
+                continue
+            end = tokens[token['match']]
+            if token['env'] in MATRIX_ENVIRONMENTS:
+                description = f"`{token['env']}` → `bmatrix`"
+                edits.append((token['start'], token['end'], '\\begin{bmatrix}', description))
+                edits.append((end['start'], end['end'], '\\end{bmatrix}', description))
+            elif token['env'] == 'matrix':
+                # \left( \begin{matrix} ... \end{matrix} \right)
+                delimiter = _skip_space(tokens, index - 1, -1)
+                left = _skip_space(tokens, delimiter - 1, -1) if delimiter is not None else None
+                right = _skip_space(tokens, token['match'] + 1)
+                closing = _skip_space(tokens, right + 1) if right is not None else None
+                if left is None or closing is None:
+                    continue
+                if (tokens[left]['text'], tokens[delimiter]['text']) not in (('\\left', '('), ('\\left', '\\{')) \
+                        or tokens[right]['text'] != '\\right' or tokens[closing]['text'] not in (')', '\\}'):
+                    continue
+                description = "`\\left( matrix \\right)` → `bmatrix`"
+                edits.append((tokens[left]['start'], token['end'], '\\begin{bmatrix}', description))
+                edits.append((end['start'], tokens[closing]['end'], '\\end{bmatrix}', description))
+    return edit_findings(document, edits, "Matrices use square brackets: `\\begin{bmatrix} ... \\end{bmatrix}`.")
+
+
+def check_bold(document: MystDocument, spans: List[MathSpan]) -> List[Dict[str, Any]]:
+    """qe-math-004: `\\mathbf{A}` -> `A`; `\\mathbf{1}` -> `\\mathbb{1}`."""
+    edits = []
+    for span in spans:
+        tokens = span.tokens or []
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'command' or token['text'] not in BOLD_COMMANDS:
+                continue
+            argument = _argument(tokens, index + 1)
+            if argument is None:
+                continue
+            first, last = argument
+            inner = _inner(tokens, argument)
+            if not inner:
+                continue
+            body = document.content[inner[0]['start']:inner[-1]['end']]
+            if body == '1':
+                replacement = '\\mathbb{1}'
+            else:
+                replacement = body
+                after = _skip_space(tokens, last + 1)
+                before = _skip_space(tokens, index - 1, -1)
+                scripted = (after is not None and tokens[after]['kind'] in ('sub', 'sup')) or \
+                           (before is not None and tokens[before]['kind'] in ('sub', 'sup'))
+                if len(inner) > 1 and scripted:
+                    # Keep the group: \mathbf{AB}^T is (AB)^T, not A B^T
+                    replacement = '{' + body + '}'
+                elif re.search(r'\\[A-Za-z]+$', replacement) and last + 1 < len(tokens) \
+                        and tokens[last + 1]['kind'] == 'char' and tokens[last + 1]['text'].isalpha():
+                    # \boldsymbol{\beta}x must not become \betax
+                    replacement += ' '
+            original = document.content[token['start']:tokens[last]['end']]
+            edits.append((token['start'], tokens[last]['end'], replacement,
+                          f"`{original}` → `{replacement.strip()}`"))
+    return edit_findings(document, edits, "Matrices and vectors are set in plain letters, not bold face.")
+
+
+def check_sequences(document: MystDocument, spans: List[MathSpan]) -> List[Dict[str, Any]]:
+    """qe-math-005: `[x_t]_{t=0}^\\infty` -> `\\{x_t\\}_{t=0}^\\infty`."""
+    edits = []
+    for span in spans:
+        tokens = span.tokens or []
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'char' or token['text'] not in (')', ']'):
+                continue
+            sub = _skip_space(tokens, index + 1)
+            if sub is None or tokens[sub]['kind'] != 'sub':
+                continue
+            argument = _argument(tokens, sub + 1)
+            if argument is None:
+                continue
+            subscript = _inner(tokens, argument)
+            if not subscript or not any(t['text'] in _INDEX_RELATIONS for t in subscript):
+                continue
+            opening = _opening_bracket(tokens, index)
+            if opening is None:
+                continue
+            # The index variable must appear between the brackets
+            index_name = subscript[0]['text']
+            if not any(t['text'] == index_name for t in tokens[opening + 1:index]):
+                continue
+            description = f"`{tokens[opening]['text']} ... {token['text']}` → `\\{{ ... \\}}`"
+            edits.append((tokens[opening]['start'], tokens[opening]['end'], '\\{', description))
+            edits.append((token['start'], token['end'], '\\}', description))
+    return edit_findings(document, edits, "Sequences use curly brackets: `\\{ x_t \\}_{t=0}^{\\infty}`.")
+
+
+def check_align(document: MystDocument, spans: List[MathSpan]) -> List[Dict[str, Any]]:
+    """qe-math-006: `align` inside math -> `aligned`."""
+    edits = []
+    for span in spans:
+        tokens = span.tokens or []
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'begin' or token['env'] not in ALIGN_ENVIRONMENTS:
+                continue
+            body = tokens[index + 1:token['match']]
+            # aligned has no equation numbers to label or tag
+            if any(t['text'] in ('\\label', '\\tag') for t in body):
+                continue
+            description = f"`{token['env']}` → `aligned`"
+            edits.append((token['start'], token['end'], '\\begin{aligned}', description))
+            end = tokens[token['match']]
+            edits.append((end['start'], end['end'], '\\end{aligned}', description))
+            for offset, t in enumerate(body, index + 1):
+                if t['kind'] == 'command' and t['text'] in ('\\nonumber', '\\notag'):
+                    edits.append((_deletion_start(tokens, offset), t['end'], '', description))
+    return edit_findings(document, edits,
+                         "`align` inside math nests two math environments and fails in PDF builds; use `aligned`.")
+
+
+def check_tags(document: MystDocument, spans: List[MathSpan]) -> List[Dict[str, Any]]:
+    """qe-math-007: remove `\\tag{...}`."""
+    edits = []
+    for span in spans:
+        tokens = span.tokens or []
+        for index, token in enumerate(tokens):
+            if token['kind'] != 'command' or token['text'] != '\\tag':
+                continue
+            following = index + 1
+            if following < len(tokens) and tokens[following]['text'] == '*':
+                following += 1
+            argument = _argument(tokens, following)
+            if argument is None:
+                continue
+            tag = document.content[token['start']:tokens[argument[1]]['end']]
+            edits.append((_deletion_start(tokens, index), tokens[argument[1]]['end'], '', f"`{tag}` removed"))
+    return edit_findings(document, edits,
+                         "Use automatic numbering: label the equation (`$$ ... $$ (label)`) and "
+                         "reference it with {eq}`label`.")
+
+
+RULE_CHECKERS: Dict[str, Callable[[MystDocument, List[MathSpan]], List[Dict[str, Any]]]] = {
+    'qe-math-002': check_transpose,
+    'qe-math-003': check_matrix_brackets,
+    'qe-math-004': check_bold,
+    'qe-math-005': check_sequences,
+    'qe-math-006': check_align,
+    'qe-math-007': check_tags,
+}
+
+ANALYZED_RULES = frozenset(RULE_CHECKERS)
+
+
+def analyze_rule(document: MystDocument, rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Check one rule against a lecture's math without the LLM.
+
+    Args:
+        document: Model of the lecture version being checked
+        rule: Rule dict (see reviewer.extract_individual_rules); its id must
+            be in ANALYZED_RULES
+
+    Returns:
+        Violations in the parse_markdown_response() format, each with a
+        `position` hint at the start of its current_text
+    """
+    violations = RULE_CHECKERS[rule['rule_id']](document, math_spans(document))
+    for violation in violations:
+        violation.update(rule_id=rule['rule_id'], rule_title=rule.get('title', ''))
+    return violations
@@ -0,0 +1,241 @@
+"""
+Persistent memo of rule findings per lecture section.
+
+Most of a lecture is unchanged between weekly runs, but a whole-prompt cache
+misses as soon as any line changes. The memo instead remembers, for each
+(rule, section) pair, what the rule found in that exact section text: nothing,
+or a list of violations with their offsets inside the section. On the next
+run only sections whose text changed (or whose rule, base prompt or model
+changed) are sent to the LLM, and the findings for the rest are replayed at
+their current offsets — so the cost of a re-review follows the churn, not the
+lecture size.
+
+Because entries are keyed by content alone, the same memo also deduplicates
+across lectures: in bulk mode a boilerplate install cell or a copied
+admonition is checked once per rule and its findings are fanned out to every
+lecture containing it. `CorpusIndex` reports how much of a corpus is shared.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .document import MystDocument, parse_document
+
+# Bumped when the entry format changes; memos with another version are ignored
+MEMO_VERSION = 1
+
+# Oldest entries beyond this are dropped on save, so the memo of a repo whose
+# lectures keep changing doesn't grow without bound.
+MAX_MEMO_ENTRIES = 50000
+
+# Rules that only read these regions are memoized per block instead of per
+# section, so one shared code cell or admonition matches across lectures.
+BLOCK_UNIT_KINDS = {'code': 'code', 'directives': 'directive'}
+
+_LOCATION_LINES_RE = re.compile(r'(\bLines?\s+)(\d+)(?:(\s*[-–]\s*)(\d+))?')
+
+
+def default_memo_path() -> Path:
+    """Memo location: $XDG_CACHE_HOME/qestyle/memo.json (~/.cache by default)."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(cache_home) / 'qestyle' / 'memo.json'
+
+
+def _sha1(*parts: str) -> str:
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def rule_key(rule: Dict[str, Any], model: str, base_prompt: str) -> str:
+    """Hash of everything besides the lecture that shapes a rule's findings."""
+    return _sha1(model, base_prompt, rule.get('rule_type', 'rule'), rule['content'])
+
+
+def memo_units(document: MystDocument, regions: Iterable[str], whole: bool = False) -> List[Tuple[int, int]]:
+    """
+    Split a lecture into the units a rule's findings are memoized by.
+
+    Args:
+        document: Model of the lecture version being checked
+        regions: The rule's context regions
+        whole: True for rules that must see the whole lecture
+
+    Returns:
+        (start, end) spans: the whole lecture if `whole`; the code cells /
+        directives (outermost only) for rules that read nothing else;
+        otherwise the sections from MystDocument.sections()
+    """
+    if whole:
+        return [(0, len(document.content))]
+    regions = set(regions)
+    if regions and regions <= set(BLOCK_UNIT_KINDS):
+        kinds = {BLOCK_UNIT_KINDS[region] for region in regions}
+        units: List[Tuple[int, int]] = []
+        for block in document.blocks:
+            if block['kind'] in kinds and not (units and block['start'] < units[-1][1]):
+                units.append((block['start'], block['end']))
+        return units
+    return document.sections()
+
+
+def _shift_location(location: str, delta: int) -> str:
+    """Move 'Line N' / 'Lines N-M' references in a location by `delta` lines."""
+    if not delta:
+        return location
+
+    def shift(match: 're.Match') -> str:
+        text = f"{match.group(1)}{int(match.group(2)) + delta}"
+        if match.group(4):
+            text += f"{match.group(3)}{int(match.group(4)) + delta}"
+        return text
+
+    return _LOCATION_LINES_RE.sub(shift, location)
+
+
+class ReviewMemo:
+    """
+    (rule hash, section hash) -> findings, persisted as JSON.
+
+    Safe to share between the worker threads of a concurrent schedule.
+
+    Attributes:
+        path: JSON file the memo is loaded from and saved to (None = in-memory only)
+        hits: Sections replayed from the memo so far
+        misses: Sections that had to be checked so far
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                data = {}
+            if isinstance(data, dict) and data.get('version') == MEMO_VERSION:
+                self._entries.update(data.get('entries', {}))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, rule_hash: str, section: str, start: int, line: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Replay a rule's findings for an unchanged section.
+
+        Args:
+            rule_hash: rule_key() of the rule
+            section: Current text of the section
+            start: Offset of the section in the current content
+            line: 1-based line the section starts on in the current content
+
+        Returns:
+            Violations with 'position' set to their current offset (an empty
+            list for a known-clean section), or None if the pair isn't memoized
+        """
+        key = f"{rule_hash}:{_sha1(section)}"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        violations = []
+        for finding in entry['findings']:
+            violation = {k: v for k, v in finding.items() if k != 'offset'}
+            violation['position'] = start + finding['offset']
+            if 'location' in violation:
+                violation['location'] = _shift_location(violation['location'], line - entry['line'])
+            violations.append(violation)
+        return violations
+
+    def store(self, rule_hash: str, section: str, start: int, line: int,
+              violations: List[Dict[str, Any]]) -> None:
+        """
+        Remember a rule's findings for a section it was just checked against.
+
+        Args:
+            violations: Violations inside the section, each with its 'position'
+                in the content the section was taken from
+        """
+        findings = []
+        for v in violations:
+            finding = {k: val for k, val in v.items() if k != 'position'}
+            finding['offset'] = v['position'] - start
+            findings.append(finding)
+        key = f"{rule_hash}:{_sha1(section)}"
+        with self._lock:
+            self._entries[key] = {'line': line, 'findings': findings}
+            self._entries.move_to_end(key)
+
+    def save(self) -> int:
+        """
+        Write the memo to `path`, keeping the MAX_MEMO_ENTRIES most recently used entries.
+
+        Returns:
+            Number of entries written (0 for an in-memory memo)
+        """
+        if self.path is None:
+            return 0
+        with self._lock:
+            while len(self._entries) > MAX_MEMO_ENTRIES:
+                self._entries.popitem(last=False)
+            data = {'version': MEMO_VERSION, 'entries': dict(self._entries)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        tmp_path.replace(self.path)
+        return len(data['entries'])
+
+
+class CorpusIndex:
+    """
+    Content-hash index of the sections and cells of a set of lectures.
+
+    Built before a bulk review to show how much of the corpus repeats; the
+    shared ReviewMemo is what actually checks each repeated unit once per rule.
+    """
+
+    def __init__(self):
+        self._units: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, content: str) -> None:
+        """Index one lecture's sections, code cells and directives."""
+        document = parse_document(content)
+        spans = set(document.sections())
+        for regions in (['code'], ['directives']):
+            spans.update(memo_units(document, regions))
+        for start, end in sorted(spans):
+            text = content[start:end]
+            if not text.strip():
+                continue
+            entry = self._units.setdefault(_sha1(text), {'chars': len(text), 'lectures': []})
+            entry['lectures'].append(name)
+
+    def shared(self) -> List[Dict[str, Any]]:
+        """Units found more than once, most duplicated text first."""
+        shared = [
+            dict(entry, key=key) for key, entry in self._units.items() if len(entry['lectures']) > 1
+        ]
+        return sorted(shared, key=lambda e: -e['chars'] * (len(e['lectures']) - 1))
+
+    def summary(self) -> Dict[str, int]:
+        """Unit counts and the characters that would otherwise be checked again."""
+        shared = self.shared()
+        return {
+            'units': len(self._units),
+            'shared_units': len(shared),
+            'duplicate_chars': sum(e['chars'] * (len(e['lectures']) - 1) for e in shared),
+        }
@@ -0,0 +1,458 @@
+"""
+Offline token, cost and latency planning for style reviews.
+
+Estimates what a review would cost before any API traffic: the exact prompts
+are built locally (same rules, context extraction and base prompt as a real
+run) and converted to tokens with a chars-per-token ratio; output, thinking
+and latency come from a calibration fitted to the usage ledger that real runs
+append to. The same estimates choose per-call `max_tokens` and decide when an
+oversized prompt has to be split into shards.
+"""
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .categories import VALID_CATEGORIES
+from .analyzers import is_analyzed
+from .document import MystDocument, parse_document
+from .citation_analyzer import Bibliography
+from .lecture_index import LectureIndex
+
+
+# Used until the ledger has enough samples to fit its own numbers
+DEFAULT_CALIBRATION = {
+    'chars_per_token': 3.5,        # MyST prose/code/LaTeX mix
+    'output_tokens': 600.0,        # Visible response tokens per rule check
+    'thinking_tokens': 2500.0,     # Extended-thinking tokens per rule check
+    'seconds_overhead': 4.0,       # Per-call latency before the first token
+    'seconds_per_output_token': 0.015,
+    'samples': 0,
+}
+
+# Fewer ledger samples than this keep the defaults (a single outlier call
+# shouldn't set the plan for a weekly sweep).
+MIN_CALIBRATION_SAMPLES = 5
+
+# Context per packed prompt when short lectures share one call per rule
+# (see pack_lectures); lectures above half of it are reviewed on their own.
+PACK_TOKENS = 30000
+
+# Model output cap, and the largest prompt sent in one call; bigger prompts are
+# sharded (200k context minus room for thinking and the response).
+MAX_OUTPUT_TOKENS = 64000
+MAX_INPUT_TOKENS = 150000
+
+# USD per million (input, output) tokens. Thinking is billed as output.
+# Matched by prefix; unknown models fall back to DEFAULT_PRICING.
+PRICING = {
+    'claude-sonnet-4-5': (3.0, 15.0),
+    'claude-haiku-4-5': (1.0, 5.0),
+    'claude-opus-4-1': (15.0, 75.0),
+}
+DEFAULT_PRICING = PRICING['claude-sonnet-4-5']
+
+
+def default_ledger_path() -> Path:
+    """Usage ledger location: $XDG_CACHE_HOME/qestyle/usage.jsonl (~/.cache by default)."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(cache_home) / 'qestyle' / 'usage.jsonl'
+
+
+def append_usage(path: Path, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Append provider usage records to the JSONL ledger at `path`.
+
+    Returns:
+        Number of records written
+    """
+    records = list(records)
+    if not records:
+        return 0
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return len(records)
+
+
+def load_calibration(path: Optional[Path] = None) -> Dict[str, float]:
+    """
+    Fit token and latency parameters to the rule-check records in a usage ledger.
+
+    Args:
+        path: JSONL ledger written by append_usage(); missing or unreadable
+            ledgers give DEFAULT_CALIBRATION
+
+    Returns:
+        Calibration dict with the keys of DEFAULT_CALIBRATION
+    """
+    calibration = dict(DEFAULT_CALIBRATION)
+    if path is None or not Path(path).exists():
+        return calibration
+
+    records = []
+    with Path(path).open(encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Only extended-thinking checks: local models would skew the thinking split
+            if (record.get('kind') == 'check' and record.get('provider', 'anthropic') == 'anthropic'
+                    and record.get('input_tokens') and record.get('output_tokens')):
+                records.append(record)
+    if len(records) < MIN_CALIBRATION_SAMPLES:
+        return calibration
+
+    calibration['samples'] = len(records)
+    # With prompt caching, input_tokens only counts the uncached part of the prompt
+    prompt_tokens = sum(
+        r['input_tokens'] + (r.get('cache_read_input_tokens') or 0) + (r.get('cache_creation_input_tokens') or 0)
+        for r in records
+    )
+    calibration['chars_per_token'] = sum(r['prompt_chars'] for r in records) / prompt_tokens
+
+    # Usage reports thinking and visible output as one number; split it by
+    # the share of characters each part produced.
+    thinking, visible = [], []
+    for r in records:
+        thinking_chars = r.get('thinking_chars', 0)
+        total_chars = thinking_chars + r.get('response_chars', 0)
+        share = thinking_chars / total_chars if total_chars else 0.0
+        thinking.append(r['output_tokens'] * share)
+        visible.append(r['output_tokens'] * (1 - share))
+    calibration['thinking_tokens'] = sum(thinking) / len(thinking)
+    calibration['output_tokens'] = sum(visible) / len(visible)
+
+    # Least-squares fit of seconds = overhead + rate * output_tokens
+    timed = [(r['output_tokens'], r['seconds']) for r in records if r.get('seconds')]
+    if len(timed) >= 2:
+        mean_x = sum(x for x, _ in timed) / len(timed)
+        mean_y = sum(y for _, y in timed) / len(timed)
+        var_x = sum((x - mean_x) ** 2 for x, _ in timed)
+        if var_x > 0:
+            rate = sum((x - mean_x) * (y - mean_y) for x, y in timed) / var_x
+            if rate > 0:
+                calibration['seconds_per_output_token'] = rate
+                calibration['seconds_overhead'] = max(0.0, mean_y - rate * mean_x)
+    return calibration
+
+
+def estimate_tokens(text: str, calibration: Optional[Dict[str, float]] = None) -> int:
+    """Estimate the token count of `text` from the calibrated chars-per-token ratio."""
+    chars_per_token = (calibration or DEFAULT_CALIBRATION)['chars_per_token']
+    return math.ceil(len(text) / chars_per_token)
+
+
+def estimate_seconds(output_tokens: float, calibration: Optional[Dict[str, float]] = None) -> float:
+    """Estimate one call's wall time from the number of tokens it generates."""
+    calibration = calibration or DEFAULT_CALIBRATION
+    return calibration['seconds_overhead'] + output_tokens * calibration['seconds_per_output_token']
+
+
+def choose_max_tokens(thinking_budget: int, calibration: Optional[Dict[str, float]] = None) -> int:
+    """
+    Pick `max_tokens` for a rule check.
+
+    The full thinking budget plus generous room for the visible response
+    (4x the calibrated mean, at least 4096 tokens). Staying well below
+    MAX_OUTPUT_TOKENS lets most calls skip the streaming fallback; a response
+    that does hit the cap is retried with MAX_OUTPUT_TOKENS by the provider.
+    """
+    calibration = calibration or DEFAULT_CALIBRATION
+    visible = max(4096, math.ceil(4 * calibration['output_tokens']))
+    return min(MAX_OUTPUT_TOKENS, thinking_budget + visible)
+
+
+def shard_fragments(
+    document: MystDocument,
+    fragments: Optional[List[Dict[str, Any]]],
+    max_chars: int,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Split a rule's context into shards that each fit in one prompt.
+
+    Fragments (or, for whole-lecture rules, the lecture itself) are cut at
+    top-level block boundaries and packed greedily, in order, so no shard's
+    excerpt exceeds `max_chars`. A single block larger than that becomes a
+    shard on its own.
+
+    Args:
+        document: Model of the lecture being checked
+        fragments: Output of extract_rule_context(), or None for the whole lecture
+        max_chars: Excerpt size limit per shard
+
+    Returns:
+        List of shards, each a list of fragment dicts
+    """
+    if fragments is None:
+        fragments = [{
+            'start': 0, 'end': len(document.content),
+            'first_line': 1, 'last_line': document.line_of(max(0, len(document.content) - 1)),
+        }]
+
+    boundaries = sorted({b['start'] for b in document.blocks if b['depth'] == 0})
+    pieces = []
+    for fragment in fragments:
+        cuts = [pos for pos in boundaries if fragment['start'] < pos < fragment['end']]
+        edges = [fragment['start']] + cuts + [fragment['end']]
+        for start, end in zip(edges, edges[1:]):
+            pieces.append((start, end))
+
+    shards: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    size = 0
+    for start, end in pieces:
+        if current and size + (end - start) > max_chars:
+            shards.append(current)
+            current, size = [], 0
+        # Pieces cut from one fragment stay contiguous within a shard
+        if current and current[-1]['end'] == start:
+            current[-1]['end'] = end
+        else:
+            current.append({'start': start, 'end': end})
+        size += end - start
+    if current:
+        shards.append(current)
+
+    for shard in shards:
+        for fragment in shard:
+            fragment['first_line'], fragment['last_line'] = document.line_span(
+                fragment['start'], fragment['end']
+            )
+    return shards
+
+
+def pack_lectures(sizes: List[int], max_chars: int) -> List[List[int]]:
+    """
+    Group short lectures into packs that share one prompt per rule.
+
+    Lectures are packed greedily, in order, while a pack's context stays
+    within `max_chars`; a lecture larger than that gets a pack of its own.
+
+    Args:
+        sizes: Context size in characters of each lecture
+        max_chars: Context size limit per pack
+
+    Returns:
+        Packs as lists of indices into `sizes`
+    """
+    packs: List[List[int]] = []
+    size = 0
+    for index, chars in enumerate(sizes):
+        if packs and size + chars <= max_chars:
+            packs[-1].append(index)
+            size += chars
+        else:
+            packs.append([index])
+            size = chars
+    return packs
+
+
+def plan_lecture(
+    content: str,
+    categories: Optional[List[str]] = None,
+    calibration: Optional[Dict[str, float]] = None,
+    scoped_context: bool = True,
+    thinking_budget: int = 10000,
+    static_analysis: bool = False,
+    lecture_index: Optional[LectureIndex] = None,
+    bibliography: Optional[Bibliography] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Estimate the rule-check calls a review of one lecture would make.
+
+    Prompts are built exactly as a review would build them for the original
+    content (later rules see fixed content, which is close enough for sizing).
+    With `static_analysis`, the analyzers.ANALYZED_RULES make no calls, and
+    neither do the link rules if a `lecture_index` is given, nor the citation
+    rule if a `bibliography` classifies every citation of the lecture.
+
+    Returns:
+        One dict per call with 'category', 'rule_id', 'rule_type', 'touches',
+        'input_tokens', 'output_tokens', 'thinking_tokens', 'seconds' and
+        'shard' (index within the rule's shards)
+    """
+    # Imported here: reviewer uses this module's sizing helpers at import time
+    from .reviewer import (
+        create_single_rule_prompt, extract_individual_rules, extract_rule_context, format_fragments,
+        rule_triggered,
+    )
+
+    calibration = calibration or DEFAULT_CALIBRATION
+    document = parse_document(content)
+    max_chars = int(MAX_INPUT_TOKENS * calibration['chars_per_token'])
+    thinking = min(calibration['thinking_tokens'], thinking_budget)
+    output = calibration['output_tokens']
+
+    calls = []
+    for category in categories or VALID_CATEGORIES:
+        for rule in extract_individual_rules(category):
+            if static_analysis and is_analyzed(rule['rule_id'], lecture_index, bibliography, document):
+                continue  # Checked without the LLM
+            if not rule_triggered(document, rule):
+                continue  # No trigger match: the review skips the call
+            fragments = extract_rule_context(document, rule) if scoped_context else None
+            if fragments == []:
+                continue  # Nothing in scope: the review skips the call
+            prompts = []
+            if fragments is None and len(content) <= max_chars:
+                prompts.append(create_single_rule_prompt(category, rule, content))
+            else:
+                for shard in shard_fragments(document, fragments, max_chars):
+                    prompts.append(create_single_rule_prompt(
+                        category, rule, format_fragments(content, shard), excerpt=True
+                    ))
+            for index, prompt in enumerate(prompts):
+                calls.append({
+                    'category': category,
+                    'rule_id': rule['rule_id'],
+                    'rule_type': rule['rule_type'],
+                    'touches': rule['touches'],
+                    'input_tokens': estimate_tokens(prompt, calibration),
+                    'output_tokens': output,
+                    'thinking_tokens': thinking,
+                    'seconds': estimate_seconds(output + thinking, calibration),
+                    'shard': index,
+                })
+    return calls
+
+
+def _batched_seconds(durations: List[float], max_workers: int) -> float:
+    """Wall time for running `durations` with at most `max_workers` in flight."""
+    total = 0.0
+    for i in range(0, len(durations), max_workers):
+        total += max(durations[i:i + max_workers])
+    return total
+
+
+def _lecture_seconds(calls: List[Dict[str, Any]], schedule: str, max_workers: int) -> float:
+    if schedule == 'sequential' or max_workers <= 1:
+        return sum(call['seconds'] for call in calls)
+    if schedule == 'speculative':
+        total = 0.0
+        for category in dict.fromkeys(call['category'] for call in calls):
+            total += _batched_seconds([c['seconds'] for c in calls if c['category'] == category], max_workers)
+        return total
+    # 'graph': one wave per dependency level, across categories
+    from .reviewer import schedule_rule_waves
+    waves = schedule_rule_waves(calls)
+    return sum(_batched_seconds([calls[i]['seconds'] for i in wave], max_workers) for wave in waves)
+
+
+def model_pricing(model: Optional[str]) -> tuple:
+    """(input, output) USD per million tokens for `model`."""
+    for prefix, pricing in PRICING.items():
+        if model and model.startswith(prefix):
+            return pricing
+    return DEFAULT_PRICING
+
+
+def plan_review(
+    lectures: Dict[str, str],
+    categories: Optional[List[str]] = None,
+    calibration: Optional[Dict[str, float]] = None,
+    model: Optional[str] = None,
+    schedule: str = 'sequential',
+    max_workers: int = 4,
+    scoped_context: bool = True,
+    thinking_budget: int = 10000,
+    static_analysis: bool = False,
+    lecture_index: Optional[LectureIndex] = None,
+    bibliography: Optional[Bibliography] = None,
+) -> Dict[str, Any]:
+    """
+    Plan a review of a set of lectures without calling the API.
+
+    Lectures are reviewed one after another (as bulk mode does); concurrency
+    only applies to rule checks within a lecture.
+
+    Args:
+        lectures: Lecture name -> content
+        categories: Categories to check (default: all)
+        calibration: From load_calibration() (default: DEFAULT_CALIBRATION)
+        model: Model used for rule checks, for pricing
+        schedule, max_workers, scoped_context, thinking_budget, static_analysis,
+        lecture_index, bibliography: As for StyleReviewer
+
+    Returns:
+        Dict with per-lecture rows ('lectures') and totals: 'calls',
+        'input_tokens', 'output_tokens', 'thinking_tokens', 'cost_usd',
+        'seconds', plus 'max_tokens' and the 'calibration' used
+    """
+    calibration = calibration or DEFAULT_CALIBRATION
+    input_price, output_price = model_pricing(model)
+    rows = []
+    for name, content in lectures.items():
+        calls = plan_lecture(content, categories, calibration, scoped_context, thinking_budget, static_analysis,
+                             lecture_index, bibliography)
+        input_tokens = sum(c['input_tokens'] for c in calls)
+        output_tokens = sum(c['output_tokens'] for c in calls)
+        thinking_tokens = sum(c['thinking_tokens'] for c in calls)
+        rows.append({
+            'lecture': name,
+            'calls': len(calls),
+            'sharded_rules': len({c['rule_id'] for c in calls if c['shard'] > 0}),
+            'input_tokens': input_tokens,
+            'output_tokens': round(output_tokens),
+            'thinking_tokens': round(thinking_tokens),
+            'cost_usd': (input_tokens * input_price + (output_tokens + thinking_tokens) * output_price) / 1e6,
+            'seconds': _lecture_seconds(calls, schedule, max_workers),
+        })
+
+    totals = {
+        key: sum(row[key] for row in rows)
+        for key in ('calls', 'input_tokens', 'output_tokens', 'thinking_tokens', 'cost_usd', 'seconds')
+    }
+    return {
+        'lectures': rows,
+        **totals,
+        'model': model,
+        'schedule': schedule,
+        'max_workers': max_workers,
+        'max_tokens': choose_max_tokens(thinking_budget, calibration),
+        'calibration': calibration,
+    }
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m {secs:02d}s"
+
+
+def format_plan(plan: Dict[str, Any]) -> str:
+    """Render a plan_review() result as a Markdown report."""
+    calibration = plan['calibration']
+    source = (f"{calibration['samples']} recorded calls" if calibration['samples']
+              else "built-in defaults (no usage ledger yet)")
+    lines = [
+        "# Review Plan",
+        "",
+        f"- **Model:** {plan['model'] or 'default'} · **Schedule:** {plan['schedule']}"
+        f" · **Workers:** {plan['max_workers']}",
+        f"- **Calibration:** {source}",
+        f"- **max_tokens per call:** {plan['max_tokens']}",
+        "",
+        "| Lecture | Calls | Input tokens | Output tokens | Thinking tokens | Cost (USD) | Wall time |",
+        "|---------|------:|-------------:|--------------:|----------------:|-----------:|----------:|",
+    ]
+    for row in plan['lectures']:
+        lecture = row['lecture'] + (f" ({row['sharded_rules']} rules sharded)" if row['sharded_rules'] else "")
+        lines.append(
+            f"| {lecture} | {row['calls']} | {row['input_tokens']:,} | {row['output_tokens']:,} "
+            f"| {row['thinking_tokens']:,} | ${row['cost_usd']:.2f} | {_format_duration(row['seconds'])} |"
+        )
+    lines.append(
+        f"| **Total** | **{plan['calls']}** | **{plan['input_tokens']:,}** | **{round(plan['output_tokens']):,}** "
+        f"| **{round(plan['thinking_tokens']):,}** | **${plan['cost_usd']:.2f}** "
+        f"| **{_format_duration(plan['seconds'])}** |"
+    )
+    lines.append("")
+    lines.append("Estimates assume every in-scope rule is checked once; triage and re-runs are not modelled.")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,251 @@
+"""
+LLM provider interface and an OpenAI-compatible HTTP backend.
+
+StyleReviewer reaches its models only through the small `LLMProvider`
+protocol below. `reviewer.AnthropicProvider` is the default implementation;
+`OpenAICompatibleProvider` talks to any server exposing the OpenAI
+`/v1/chat/completions` API — llama.cpp's `llama-server`, vLLM, Ollama, or a
+hosted gateway — so high-volume work such as triage and the mechanical rules
+can run on our own hardware instead of against an external rate limit.
+
+Only the standard library is used for HTTP, so the backend adds no dependency.
+"""
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional, Protocol, Union
+
+import anthropic
+
+
+class ProviderError(Exception):
+    """A recoverable provider failure (HTTP error, timeout, unreadable reply).
+
+    Handled like `anthropic.APIError`: the rule check is logged as a warning
+    and the review carries on with the other rules.
+    """
+
+
+# Exceptions the reviewer treats as recoverable per-call failures
+PROVIDER_ERRORS = (anthropic.APIError, ProviderError)
+
+
+class LLMProvider(Protocol):
+    """
+    What StyleReviewer needs from a model backend.
+
+    Attributes:
+        model: Model name, part of the memo's rule keys
+        max_tokens: Output cap for rule checks (set by StyleReviewer)
+        usage_log: One record per API call, in the usage ledger format
+            (see planner.append_usage); 'kind' is 'check', 'triage' or 'requote'
+        response_format: One of reviewer.RESPONSE_FORMATS
+        explanation_words: Explanation word limit in 'tool' mode
+        hedge_budget: Fraction of checks that may be hedged (ignored without
+            the 'hedging' capability)
+        capabilities: Feature flags — 'thinking' (extended thinking),
+            'prompt_cache' (honours cache_control blocks), 'tools' (tool-use
+            responses), 'streaming' (long calls streamed), 'hedging'
+
+    Streaming is a transport detail, not a protocol method: whether a call
+    streams depends on the backend's own limits (the Anthropic API requires
+    it for long extended-thinking responses, and hedging cancels an attempt
+    by closing its stream), and the reviewer only ever needs the final
+    answer. So each provider decides inside check_single_rule(), and the
+    'streaming' flag just describes what it does.
+    """
+
+    model: str
+    max_tokens: int
+    usage_log: List[Dict[str, Any]]
+    response_format: str
+    explanation_words: int
+    hedge_budget: float
+    capabilities: Dict[str, bool]
+
+    def check_single_rule(self, prompt: Union[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Check one rule, streaming if the backend needs to; returns a parse_markdown_response()-style result."""
+        ...
+
+    def triage_rules(self, prompt: str, rule_ids: List[str]) -> Dict[str, str]:
+        """Answer yes/maybe/no per rule (see reviewer.create_triage_prompt)."""
+        ...
+
+    def requote(self, prompt: str, max_tokens: int) -> str:
+        """Answer a re-quote prompt (see reviewer.create_requote_prompt)."""
+        ...
+
+
+class OpenAICompatibleProvider:
+    """
+    Provider for an OpenAI-compatible chat completions endpoint.
+
+    Local models have no extended thinking, so rule checks run at
+    `temperature` (0 by default) with the same prompts; they are best kept
+    to triage and mechanical rules, where the answer is a pattern match
+    rather than a judgement call. Cached prompt blocks are sent as plain
+    text, and calls are never streamed or hedged.
+    """
+
+    # Local servers can be slow on long prompts but shouldn't hang forever
+    REQUEST_TIMEOUT_SECONDS = 300.0
+    # Retries for connection errors, 429 and 5xx, with exponential backoff
+    MAX_RETRIES = 3
+
+    capabilities = {
+        'thinking': False,
+        'prompt_cache': False,
+        'tools': True,
+        'streaming': False,
+        'hedging': False,
+    }
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None,
+                 temperature: float = 0.0):
+        """
+        Args:
+            base_url: Server root including the API version, e.g.
+                http://localhost:8080/v1
+            model: Model name as the server knows it
+            api_key: Sent as a Bearer token if set (default: $OPENAI_API_KEY;
+                most local servers need none)
+            temperature: Sampling temperature for rule checks
+        """
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
+        self.temperature = temperature
+        self.max_tokens = 4096
+        self.usage_log: List[Dict[str, Any]] = []
+        self.response_format = 'markdown'
+        self.explanation_words = 25
+        self.hedge_budget = 0.0
+
+    def check_single_rule(self, prompt: Union[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        # Imported here: reviewer imports this module at import time
+        from .reviewer import VIOLATION_TOOL_NAME, parse_markdown_response, parse_tool_response, violation_tool
+
+        started = time.monotonic()
+        text = _prompt_text(prompt)
+        payload: Dict[str, Any] = {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': text}],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+        }
+        if self.response_format == 'tool':
+            tool = violation_tool(self.explanation_words)
+            payload['tools'] = [{'type': 'function', 'function': {
+                'name': tool['name'], 'description': tool['description'], 'parameters': tool['input_schema'],
+            }}]
+            # Without extended thinking the tool can be forced
+            payload['tool_choice'] = {'type': 'function', 'function': {'name': VIOLATION_TOOL_NAME}}
+
+        response = self._post(payload)
+        choice = response['choices'][0]
+        message = choice.get('message') or {}
+        content = message.get('content') or ''
+        if self.response_format == 'tool':
+            tool_input = None
+            for call in message.get('tool_calls') or []:
+                function = call.get('function') or {}
+                if function.get('name') == VIOLATION_TOOL_NAME:
+                    try:
+                        tool_input = json.loads(function.get('arguments') or 'null')
+                    except ValueError:
+                        tool_input = None
+            result = parse_tool_response(tool_input)
+            response_chars = len(json.dumps(tool_input)) if tool_input is not None else len(content)
+        else:
+            result = parse_markdown_response(content)
+            response_chars = len(content)
+
+        if choice.get('finish_reason') == 'length':
+            # No larger cap to retry with on a local model: keep what was parsed
+            print(f"      ⚠️  Response hit max_tokens={self.max_tokens} - findings may be incomplete")
+        self._record_usage('check', text, response, started, response_chars=response_chars,
+                           max_tokens=self.max_tokens, response_format=self.response_format,
+                           parse_error='error' in result)
+        return result
+
+    def triage_rules(self, prompt: str, rule_ids: List[str]) -> Dict[str, str]:
+        from .reviewer import parse_triage_response
+
+        started = time.monotonic()
+        response = self._post({
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': 64 + 16 * len(rule_ids),
+            'temperature': 0.0,
+        })
+        text = (response['choices'][0].get('message') or {}).get('content') or ''
+        self._record_usage('triage', prompt, response, started, response_chars=len(text))
+        return parse_triage_response(text, rule_ids)
+
+    def requote(self, prompt: str, max_tokens: int) -> str:
+        started = time.monotonic()
+        response = self._post({
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': max_tokens,
+            'temperature': 0.0,
+        })
+        text = (response['choices'][0].get('message') or {}).get('content') or ''
+        self._record_usage('requote', prompt, response, started, response_chars=len(text),
+                           max_tokens=max_tokens)
+        return text
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST to /chat/completions, retrying transient failures."""
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        body = json.dumps(payload).encode('utf-8')
+
+        attempt = 0
+        while True:
+            request = urllib.request.Request(f'{self.base_url}/chat/completions', data=body,
+                                             headers=headers, method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=self.REQUEST_TIMEOUT_SECONDS) as reply:
+                    data = json.loads(reply.read().decode('utf-8'))
+            except urllib.error.HTTPError as e:
+                retryable = e.code == 429 or e.code >= 500
+                error = ProviderError(f'{self.base_url} returned HTTP {e.code}: {e.reason}')
+            except (urllib.error.URLError, TimeoutError, OSError) as e:
+                retryable = True
+                error = ProviderError(f'Could not reach {self.base_url}: {e}')
+            except ValueError as e:
+                raise ProviderError(f'Unreadable response from {self.base_url}: {e}') from e
+            else:
+                if not isinstance(data, dict) or not data.get('choices'):
+                    raise ProviderError(f'No choices in response from {self.base_url}')
+                return data
+            if not retryable or attempt >= self.MAX_RETRIES:
+                raise error
+            time.sleep(min(30.0, 2 ** attempt + random.random()))
+            attempt += 1
+
+    def _record_usage(self, kind: str, prompt: str, response: Dict[str, Any],
+                      started: float, **extra: Any) -> None:
+        usage = response.get('usage') or {}
+        self.usage_log.append({
+            'kind': kind,
+            'provider': 'openai-compatible',
+            'model': self.model,
+            'prompt_chars': len(prompt),
+            'input_tokens': usage.get('prompt_tokens'),
+            'output_tokens': usage.get('completion_tokens'),
+            'seconds': round(time.monotonic() - started, 3),
+            **extra,
+        })
+
+
+def _prompt_text(prompt: Union[str, List[Dict[str, Any]]]) -> str:
+    """Flatten content blocks (e.g. a cached prompt) to one string."""
+    if isinstance(prompt, str):
+        return prompt
+    return ''.join(block.get('text', '') for block in prompt)
@@ -6,15 +6,37 @@ Uses markdown-based prompt templates for simplicity and maintainability
 Extended thinking lets Claude reason internally before responding, eliminating false positives
 """
 
+import json
 import os
+import random
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 import anthropic
 
 from .categories import VALID_CATEGORIES
-from .fix_applier import apply_fixes, validate_fix_quality
+from .analyzers import analyze_rule, is_analyzed
+from .citation_analyzer import Bibliography
+from .document import MystDocument, parse_document
+from .fix_applier import EditMap, apply_fixes, dedupe_violations, validate_fix_quality
+from .lecture_index import LectureIndex
+from .memo import ReviewMemo, memo_units, rule_key as memo_rule_key
+from .planner import (
+    MAX_INPUT_TOKENS,
+    MAX_OUTPUT_TOKENS,
+    PACK_TOKENS,
+    choose_max_tokens,
+    estimate_tokens,
+    load_calibration,
+    pack_lectures,
+    shard_fragments,
+)
+from .providers import PROVIDER_ERRORS, LLMProvider
 
 
 # Rule evaluation order - defines the sequence for checking rules
@@ -87,6 +109,49 @@ RULE_EVALUATION_ORDER = {
     ],
 }
 
+# The rules marked (mechanical) above: pattern-level rewrites that a small or
+# local model can check (see StyleReviewer's mechanical_provider).
+MECHANICAL_RULES = frozenset({
+    'qe-writing-008', 'qe-writing-004', 'qe-writing-006', 'qe-writing-005',
+    'qe-math-001', 'qe-math-002', 'qe-math-003', 'qe-math-004', 'qe-math-005', 'qe-math-007',
+    'qe-code-002',
+    'qe-fig-003', 'qe-fig-004', 'qe-fig-005', 'qe-fig-006', 'qe-fig-007', 'qe-fig-008',
+    'qe-ref-001',
+    'qe-link-002',
+    'qe-admon-003', 'qe-admon-004',
+})
+
+
+# Document regions a rule may declare in its `**Touches:**` field — the parts of
+# a lecture the rule reads and, for 'rule' types, rewrites. The rule scheduler
+# treats two rules as dependent only if their regions intersect.
+RULE_REGIONS = (
+    'prose',       # Narrative paragraphs
+    'headings',    # Lecture and section titles
+    'math',        # Inline/display math and {math} directives
+    'code',        # code-cell directives and their metadata
+    'directives',  # Admonitions, exercises, figures and other MyST directives
+    'links',       # Markdown links and {doc} roles
+    'citations',   # {cite} roles and bibliography references
+)
+
+# A rule's `**Context:**` field narrows or widens what the model is shown. It
+# defaults to the rule's Touches regions; `full` sends the whole lecture, for
+# rules that reason about position in the document (e.g. "near the top").
+CONTEXT_FULL = 'full'
+
+# Send the whole lecture anyway once an excerpt would cover more than this
+# fraction of it — the saving is small and whole-document context is lost.
+CONTEXT_FULL_THRESHOLD = 0.6
+
+# A rule's optional `**Triggers:**` field lists backtick-quoted regexes, one of
+# which must match its Touches regions for the rule to be worth a call, e.g.
+# **Triggers:** `set_title`, `suptitle`. Rules without the field always run.
+_TRIGGER_RE = re.compile(r'`([^`]+)`')
+
+# Modes for ordering rule checks within a review (see StyleReviewer).
+SCHEDULES = ('sequential', 'speculative', 'graph')
+
 
 def extract_individual_rules(category: str) -> List[Dict[str, str]]:
     """
@@ -99,8 +164,16 @@ def extract_individual_rules(category: str) -> List[Dict[str, str]]:
         category: Category name (e.g., 'writing', 'math')
         
     Returns:
-        List of dicts with 'rule_id', 'title', and 'content' for each rule, 
-        sorted by evaluation priority
+        List of dicts with 'rule_id', 'rule_type', 'title', 'touches',
+        'context', 'triggers' and 'content' for each rule, sorted by
+        evaluation priority. 'touches' lists the RULE_REGIONS named in the
+        rule's `**Touches:**` field (all regions if the field is missing);
+        'context' lists the regions the model is shown — the `**Context:**`
+        field, else 'touches'; 'triggers' holds the compiled `**Triggers:**`
+        patterns (empty if the field is missing).
+
+    Raises:
+        ValueError: If a trigger pattern is not a valid regex
     """
     rules_dir = Path(__file__).parent / "rules"
     rules_file = rules_dir / f"{category}-rules.md"
@@ -125,11 +198,33 @@ def extract_individual_rules(category: str) -> List[Dict[str, str]]:
         
         # Reconstruct the full rule markdown
         full_rule = f"### Rule: {rule_id}\n**Type:** {rule_type}\n**Title:** {title}\n\n{rule_content}"
+
+        # Scheduling metadata: which document regions the rule reads/mutates
+        touches_match = re.search(r'\*\*Touches:\*\*\s*([^\n]+)', rule_content)
+        if touches_match:
+            touches = [t.strip().lower() for t in touches_match.group(1).split(',') if t.strip()]
+        else:
+            touches = list(RULE_REGIONS)
+        context_match = re.search(r'\*\*Context:\*\*\s*([^\n]+)', rule_content)
+        if context_match:
+            context = [c.strip().lower() for c in context_match.group(1).split(',') if c.strip()]
+        else:
+            context = touches
+        triggers_match = re.search(r'\*\*Triggers:\*\*\s*([^\n]+)', rule_content)
+        triggers = []
+        for pattern in _TRIGGER_RE.findall(triggers_match.group(1)) if triggers_match else []:
+            try:
+                triggers.append(re.compile(pattern, re.MULTILINE))
+            except re.error as e:
+                raise ValueError(f"{rule_id}: invalid trigger pattern {pattern!r}: {e}") from e
         
         rules_dict[rule_id] = {
             'rule_id': rule_id,
             'rule_type': rule_type,  # 'rule' = auto-fix, 'style' = suggestion
             'title': title,
+            'touches': touches,
+            'context': context,
+            'triggers': triggers,
             'content': full_rule
         }
     
@@ -151,7 +246,244 @@ def extract_individual_rules(category: str) -> List[Dict[str, str]]:
         return list(rules_dict.values())
 
 
-def create_single_rule_prompt(category: str, rule: Dict[str, str], lecture_content: str) -> str:
+def schedule_rule_waves(rules: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Group rules into waves that can be checked concurrently.
+
+    `rules` is in evaluation order (categories in VALID_CATEGORIES order, each
+    in RULE_EVALUATION_ORDER). A rule depends on an earlier rule when their
+    `touches` regions intersect and at least one of the two rewrites content
+    ('rule' type) — two read-only suggestion rules never conflict. Each rule
+    lands in the wave after the latest wave it depends on, so every wave holds
+    rules that are independent of each other and only need earlier waves.
+
+    Args:
+        rules: Rule dicts with 'rule_type' and 'touches'
+
+    Returns:
+        Waves as lists of indices into `rules`, each wave in evaluation order
+    """
+    levels: List[int] = []
+    for i, rule in enumerate(rules):
+        regions = set(rule.get('touches') or RULE_REGIONS)
+        mutates = rule.get('rule_type', 'rule') == 'rule'
+        level = 0
+        for j in range(i):
+            earlier = rules[j]
+            if not regions & set(earlier.get('touches') or RULE_REGIONS):
+                continue
+            if mutates or earlier.get('rule_type', 'rule') == 'rule':
+                level = max(level, levels[j] + 1)
+        levels.append(level)
+
+    waves: List[List[int]] = [[] for _ in range(max(levels, default=-1) + 1)]
+    for i, level in enumerate(levels):
+        waves[level].append(i)
+    return waves
+
+
+def extract_rule_context(document: MystDocument, rule: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Select the fragments of a lecture a rule needs to see.
+
+    Args:
+        document: Model of the lecture version being checked
+        rule: Rule dict with 'context' regions (see extract_individual_rules)
+
+    Returns:
+        Fragment dicts from MystDocument.fragments() — an empty list if the
+        lecture has nothing in the rule's scope — or None if the rule should
+        see the whole lecture
+    """
+    context = rule.get('context') or [CONTEXT_FULL]
+    if CONTEXT_FULL in context:
+        return None
+    fragments = document.fragments(context)
+    covered = sum(f['end'] - f['start'] for f in fragments)
+    if covered > CONTEXT_FULL_THRESHOLD * len(document.content):
+        return None
+    return fragments
+
+
+def rule_triggered(document: MystDocument, rule: Dict[str, Any]) -> bool:
+    """
+    Whether a lecture gives a rule anything to find, judged by its triggers.
+
+    Triggers are cheap necessary conditions (a timing rule needs `time.time(`
+    or `%timeit` somewhere), searched for in the rule's Touches regions only,
+    so a prose apostrophe doesn't wake a math rule about primes.
+
+    Args:
+        document: Model of the lecture version being checked
+        rule: Rule dict with 'triggers' and 'touches' (see extract_individual_rules)
+
+    Returns:
+        True if the rule has no triggers or one of them matches
+    """
+    triggers = rule.get('triggers')
+    if not triggers:
+        return True
+    content = document.content
+    spans = document.region_spans(rule.get('touches') or list(RULE_REGIONS))
+    text = '\n'.join(content[start:end] for start, end in spans)
+    return any(pattern.search(text) for pattern in triggers)
+
+
+def _restrict_fragments(
+    document: MystDocument,
+    fragments: Optional[List[Dict[str, Any]]],
+    spans: List[Tuple[int, int]],
+) -> List[Dict[str, Any]]:
+    """Clip fragments (None = the whole lecture) to line-aligned `spans`."""
+    if fragments is None:
+        fragments = [{'start': 0, 'end': len(document.content)}]
+    restricted = []
+    for fragment in fragments:
+        for span_start, span_end in spans:
+            start, end = max(fragment['start'], span_start), min(fragment['end'], span_end)
+            if start >= end:
+                continue
+            if restricted and restricted[-1]['end'] == start:
+                restricted[-1]['end'] = end
+                restricted[-1]['last_line'] = document.line_span(start, end)[1]
+                continue
+            first, last = document.line_span(start, end)
+            restricted.append({'start': start, 'end': end, 'first_line': first, 'last_line': last})
+    return restricted
+
+
+def format_fragments(content: str, fragments: List[Dict[str, Any]]) -> str:
+    """Render fragments as an excerpt, each headed by its line range in the full file."""
+    parts = []
+    for fragment in fragments:
+        text = content[fragment['start']:fragment['end']].rstrip('\n')
+        parts.append(f"<!-- Lines {fragment['first_line']}-{fragment['last_line']} -->\n{text}")
+    return '\n\n'.join(parts) + '\n'
+
+
+def locate_in_fragments(content: str, current_text: str, fragments: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    Map text quoted from an excerpt back to its offset in the full content.
+
+    Returns:
+        Offset of the first occurrence inside a fragment, or None if the quote
+        doesn't lie within a single fragment
+    """
+    if not current_text:
+        return None
+    for fragment in fragments:
+        pos = content.find(current_text, fragment['start'], fragment['end'])
+        if pos != -1:
+            return pos
+    return None
+
+
+# Cap on how many earlier fixes are listed in a prompt's "Already Fixed" hint,
+# and on how many characters of each side are quoted. The hint only needs to be
+# recognizable — the full text of every edit would cost more than it saves.
+ALREADY_FIXED_HINT_LIMIT = 20
+ALREADY_FIXED_HINT_CHARS = 80
+
+
+def _format_already_fixed_hint(fixes: List[Dict[str, Any]]) -> str:
+    """Render earlier fixes as a compact bullet list for the prompt."""
+    def clip(text: str) -> str:
+        text = ' '.join(text.split())
+        if len(text) > ALREADY_FIXED_HINT_CHARS:
+            text = text[:ALREADY_FIXED_HINT_CHARS - 1] + '…'
+        return text
+
+    lines = []
+    for fix in fixes[-ALREADY_FIXED_HINT_LIMIT:]:
+        lines.append(
+            f"- {fix.get('rule_id', 'unknown')}: `{clip(fix.get('current_text', ''))}` "
+            f"→ `{clip(fix.get('suggested_fix', ''))}`"
+        )
+    return "\n".join(lines)
+
+
+def _already_fixed_section(fixes: Optional[List[Dict[str, Any]]]) -> str:
+    """The prompt's "Already Fixed" section, or '' when there are no earlier fixes."""
+    if not fixes:
+        return ""
+    return (
+        "\n## Already Fixed\n\n"
+        "Earlier rules already made these edits. Do not report them again:\n\n"
+        f"{_format_already_fixed_hint(fixes)}\n"
+    )
+
+
+# How rule checks report their findings: 'markdown' parses the free-form
+# report described in prompts/prompt.md; 'tool' has the model call the
+# VIOLATION_TOOL_NAME tool (see violation_tool) and reads its arguments.
+RESPONSE_FORMATS = ('markdown', 'tool')
+VIOLATION_TOOL_NAME = 'report_violations'
+
+# Default cap on the length of each violation's explanation in 'tool' mode
+EXPLANATION_WORDS = 25
+
+
+def read_base_prompt(response_format: str = 'markdown') -> str:
+    """Read the rule-agnostic base prompt for a response format (one of RESPONSE_FORMATS)."""
+    name = "prompt-tool.md" if response_format == 'tool' else "prompt.md"
+    prompt_file = Path(__file__).parent / "prompts" / name
+
+    if not prompt_file.exists():
+        raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+
+    return prompt_file.read_text()
+
+
+def violation_tool(explanation_words: int = EXPLANATION_WORDS) -> Dict[str, Any]:
+    """
+    Tool definition the model calls in 'tool' mode to report its findings.
+
+    Args:
+        explanation_words: Word limit stated for each explanation; the schema
+            carries no Markdown scaffolding, so this is most of what decides
+            the output tokens spent per violation
+
+    Returns:
+        Tool dict for the Messages API `tools` parameter
+    """
+    violation = {
+        'type': 'object',
+        'properties': {
+            'rule_id': {'type': 'string', 'description': 'Rule code, e.g. qe-writing-001'},
+            'document': {
+                'type': 'string',
+                'description': 'Document id (only when several lectures are reviewed at once)',
+            },
+            'first_line': {'type': 'integer', 'description': 'Line the current text starts on'},
+            'last_line': {'type': 'integer', 'description': 'Line the current text ends on'},
+            'current_text': {'type': 'string', 'description': 'Exact quote of the offending text'},
+            'suggested_fix': {
+                'type': 'string',
+                'description': 'Replacement for current_text; must be different from it',
+            },
+            'severity': {'type': 'string', 'enum': ['error', 'warning', 'info']},
+            'explanation': {
+                'type': 'string',
+                'description': f'Why this violates the rule, in at most {explanation_words} words',
+            },
+        },
+        'required': ['rule_id', 'first_line', 'current_text', 'suggested_fix', 'explanation'],
+    }
+    return {
+        'name': VIOLATION_TOOL_NAME,
+        'description': 'Report every confirmed violation of the rule being checked '
+                       '(an empty list if there are none).',
+        'input_schema': {
+            'type': 'object',
+            'properties': {'violations': {'type': 'array', 'items': violation}},
+            'required': ['violations'],
+        },
+    }
+
+
+def create_single_rule_prompt(category: str, rule: Dict[str, str], lecture_content: str,
+                              already_fixed: Optional[List[Dict[str, Any]]] = None,
+                              excerpt: bool = False, response_format: str = 'markdown') -> str:
     """
     Create a focused prompt for checking a single rule.
 
@@ -164,17 +496,28 @@ def create_single_rule_prompt(category: str, rule: Dict[str, str], lecture_conte
         category: Category name (e.g., 'writing') — currently unused
         rule: Dict with 'rule_id', 'title', and 'content'
         lecture_content: The lecture to check
+        already_fixed: Optional fix_log entries from earlier rules in the same
+            category. Listed as a skip hint so the model doesn't spend output
+            tokens re-reporting edits that are already in the content.
+        excerpt: True if `lecture_content` is a format_fragments() excerpt
+            rather than the whole lecture
+        response_format: 'markdown' or 'tool' (see read_base_prompt)
 
     Returns:
         Complete prompt focused on one specific rule
     """
-    prompts_dir = Path(__file__).parent / "prompts"
-    prompt_file = prompts_dir / "prompt.md"
+    base_prompt = read_base_prompt(response_format)
 
-    if not prompt_file.exists():
-        raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+    already_fixed_section = _already_fixed_section(already_fixed)
 
-    base_prompt = prompt_file.read_text()
+    excerpt_note = ""
+    if excerpt:
+        excerpt_note = (
+            "Only the parts of the lecture this rule applies to are shown. Each excerpt "
+            "starts with a `<!-- Lines A-B -->` marker giving its line numbers in the full "
+            "file: use them for **Location**, and quote **Current text** from within a "
+            "single excerpt, never across markers.\n\n"
+        )
 
     # Create focused prompt with single rule
     focused_prompt = f"""{base_prompt}
@@ -184,13 +527,326 @@ def create_single_rule_prompt(category: str, rule: Dict[str, str], lecture_conte
 **IMPORTANT**: Check ONLY for violations of this specific rule. Do not check other rules.
 
 {rule['content']}
+{already_fixed_section}
+## Lecture to Review
+
+{excerpt_note}{lecture_content}
+"""
+
+    return focused_prompt
+
+
+# With prompt caching, the lecture is re-sent (and re-cached) only once this
+# many edits have piled up on top of the cached version.
+CACHE_REFRESH_EDITS = 20
+
+
+def _format_edits(edits: List[Dict[str, Any]]) -> str:
+    """Render applied edits as line-anchored before/after pairs."""
+    parts = []
+    for n, edit in enumerate(edits, 1):
+        anchor = f"line {edit['line']}" if edit.get('line') else "in text changed by an earlier edit"
+        parts.append(
+            f"**Edit {n}** ({anchor}):\n"
+            f"~~~before\n{edit['current_text']}\n~~~\n"
+            f"~~~after\n{edit['suggested_fix']}\n~~~"
+        )
+    return "\n\n".join(parts)
+
+
+def create_cached_rule_prompt(category: str, rule: Dict[str, str], base_content: str,
+                              edits: Optional[List[Dict[str, Any]]] = None,
+                              already_fixed: Optional[List[Dict[str, Any]]] = None,
+                              response_format: str = 'markdown') -> List[Dict[str, Any]]:
+    """
+    Create a single-rule prompt whose lecture prefix can be served from the prompt cache.
+
+    The base prompt and a fixed version of the lecture come first, marked with
+    `cache_control`, so every rule in a review reuses the same cached prefix.
+    Fixes applied since that version are not re-sent as a new lecture; they
+    follow the prefix as a compact list of line-anchored edits, together with
+    the rule. Callers re-base (see CACHE_REFRESH_EDITS) once the list grows.
+
+    Args:
+        category: Category name (e.g., 'writing') — currently unused
+        rule: Dict with 'rule_id', 'title', and 'content'
+        base_content: The lecture version held in the cached prefix
+        edits: Fixes applied since `base_content`, oldest first, each with
+            'current_text', 'suggested_fix' and 'line' (1-based, in
+            `base_content`; None if the edit is inside text changed earlier)
+        already_fixed: Optional fix_log entries from earlier rules in the same
+            category that are already part of `base_content` (the skip hint
+            of create_single_rule_prompt)
+        response_format: 'markdown' or 'tool' (see read_base_prompt)
+
+    Returns:
+        Message content blocks (cached prefix, then the per-rule suffix)
+    """
+    prefix = f"""{read_base_prompt(response_format)}
+
+## Lecture to Review
+
+{base_content}
+"""
+
+    edits_section = ""
+    if edits:
+        edits_section = (
+            "## Edits Since This Version\n\n"
+            "These fixes have already been applied to the lecture above. Review the lecture "
+            "as it reads after them: do not report them again, and quote **Current text** "
+            "as it reads after the edits.\n\n"
+            f"{_format_edits(edits)}\n\n"
+        )
+
+    already_fixed_section = _already_fixed_section(already_fixed)
+
+    suffix = f"""{edits_section}## Style Rule to Check
+
+**IMPORTANT**: Check ONLY for violations of this specific rule. Do not check other rules.
+
+{rule['content']}
+{already_fixed_section}"""
+
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": suffix},
+    ]
+
+
+def create_packed_rule_prompt(category: str, rule: Dict[str, str],
+                              documents: List[Dict[str, Any]], response_format: str = 'markdown') -> str:
+    """
+    Create one prompt that checks a rule against several short lectures.
+
+    Each lecture sits between `<!-- BEGIN DOCUMENT id -->` / `<!-- END
+    DOCUMENT id -->` markers, and every violation names its lecture in a
+    `**Document:**` field (parsed into the violation's 'document' key).
+
+    Args:
+        category: Category name (e.g., 'writing') — currently unused
+        rule: Dict with 'rule_id', 'title', and 'content'
+        documents: Dicts with 'id', 'name', 'text' (the lecture or a
+            format_fragments() excerpt) and 'excerpt'
+        response_format: 'markdown' or 'tool' (see read_base_prompt)
+
+    Returns:
+        Complete prompt focused on one specific rule
+    """
+    excerpt_note = ""
+    if any(document['excerpt'] for document in documents):
+        excerpt_note = (
+            "Some lectures are shown as excerpts of the parts this rule applies to. Each "
+            "excerpt starts with a `<!-- Lines A-B -->` marker giving its line numbers in "
+            "that lecture: use them for **Location**, and quote **Current text** from within "
+            "a single excerpt, never across markers.\n\n"
+        )
+
+    parts = []
+    for document in documents:
+        parts.append(
+            f"<!-- BEGIN DOCUMENT {document['id']}: {document['name']} -->\n"
+            f"{document['text'].rstrip()}\n"
+            f"<!-- END DOCUMENT {document['id']} -->"
+        )
+
+    return f"""{read_base_prompt(response_format)}
+
+## Style Rule to Check
+
+**IMPORTANT**: Check ONLY for violations of this specific rule. Do not check other rules.
+
+{rule['content']}
+
+## Lectures to Review
+
+{len(documents)} separate lectures follow, each between `<!-- BEGIN DOCUMENT id -->` and `<!-- END DOCUMENT id -->` markers. Check each lecture on its own. Report violations from all of them in one list, and give each violation {'its `document` id' if response_format == 'tool' else 'a `**Document:** <id>` line directly under its heading'}. Quote **Current text** from that lecture only; **Location** line numbers refer to that lecture.
+
+{excerpt_note}{chr(10).join(parts)}
+"""
+
+
+# Triage answers that escalate a rule to the full extended-thinking check.
+# 'maybe' escalates too: the cascade must never be the reason a violation is missed.
+TRIAGE_DECISIONS = ('yes', 'maybe', 'no')
+TRIAGE_ESCALATE = ('yes', 'maybe')
+
+
+def create_triage_prompt(category: str, rules: List[Dict[str, str]], lecture_content: str) -> str:
+    """
+    Create a batched applicability prompt covering every rule in a category.
+
+    Args:
+        category: Category name (e.g., 'writing')
+        rules: Rules to triage, as returned by extract_individual_rules()
+        lecture_content: The lecture to check
+
+    Returns:
+        Prompt asking for one yes/maybe/no answer per rule
+    """
+    prompt_file = Path(__file__).parent / "prompts" / "triage-prompt.md"
+
+    if not prompt_file.exists():
+        raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+
+    rules_text = "\n\n".join(rule['content'] for rule in rules)
+
+    return f"""{prompt_file.read_text()}
+
+## Rules to Triage ({category})
+
+{rules_text}
 
 ## Lecture to Review
 
 {lecture_content}
 """
 
-    return focused_prompt
+
+def parse_triage_response(response: str, rule_ids: List[str]) -> Dict[str, str]:
+    """
+    Parse `rule-id: decision` lines from a triage response.
+
+    Rules the model skipped, or answered with anything other than
+    yes/maybe/no, default to 'maybe' so they still get the full check.
+
+    Args:
+        response: Raw triage model output
+        rule_ids: Rule IDs that were asked about
+
+    Returns:
+        Dict mapping every requested rule_id to 'yes', 'maybe', or 'no'
+    """
+    decisions = {rule_id: 'maybe' for rule_id in rule_ids}
+    for match in re.finditer(r'(qe-[a-z]+-\d+)\W+(yes|maybe|no)\b', response, re.IGNORECASE):
+        rule_id = match.group(1)
+        if rule_id in decisions:
+            decisions[rule_id] = match.group(2).lower()
+    return decisions
+
+
+# Re-quote repair: lines of context shown on each side of an unanchored fix's
+# reported location. The window only has to contain the span the model meant.
+REQUOTE_WINDOW_LINES = 6
+
+_LOCATION_LINES_RE = re.compile(r'\bLines?\s+(\d+)(?:\s*[-–]\s*(\d+))?')
+
+
+def location_lines(location: str) -> Optional[Tuple[int, int]]:
+    """(first, last) line of a 'Line N' / 'Lines N-M' location, or None if it names no line."""
+    match = _LOCATION_LINES_RE.search(location or '')
+    if not match:
+        return None
+    first = int(match.group(1))
+    last = int(match.group(2)) if match.group(2) else first
+    return first, max(first, last)
+
+
+def create_requote_prompt(violation: Dict[str, Any], window: str, first_line: int) -> str:
+    """
+    Create a prompt asking for the exact span an unanchored fix refers to.
+
+    Args:
+        violation: The violation whose current_text was not found verbatim
+        window: Lines of the lecture around the violation's reported location
+        first_line: Line number of the window's first line in the lecture
+
+    Returns:
+        Prompt asking for the verbatim span and a fix restated against it
+    """
+    prompt_file = Path(__file__).parent / "prompts" / "requote-prompt.md"
+
+    if not prompt_file.exists():
+        raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+
+    last_line = first_line + window.count('\n') - (1 if window.endswith('\n') else 0)
+    return f"""{prompt_file.read_text()}
+
+## Violation
+
+**Rule:** {violation.get('rule_id', 'unknown')}
+**Location:** {violation.get('location', 'unknown')}
+**Current text:**
+~~~markdown
+{violation.get('current_text', '').strip()}
+~~~
+**Suggested fix:**
+~~~markdown
+{violation.get('suggested_fix', '').strip()}
+~~~
+
+## Lecture Excerpt
+
+<!-- Lines {first_line}-{last_line} -->
+{window}
+"""
+
+
+def parse_requote_response(response: str) -> Optional[Dict[str, str]]:
+    """
+    Parse the ~~~current / ~~~fix blocks of a re-quote response.
+
+    Returns:
+        Dict with 'current_text' and 'suggested_fix' (None if the fix block is
+        missing), or None if the model answered NOT FOUND or gave no quote
+    """
+    current_match = re.search(r'~~~current[^\n]*\n(.*?)\n~~~', response, re.DOTALL)
+    if not current_match or not current_match.group(1).strip():
+        return None
+    fix_match = re.search(r'~~~fix[^\n]*\n(.*?)\n~~~', response, re.DOTALL)
+    return {
+        'current_text': current_match.group(1).strip(),
+        'suggested_fix': fix_match.group(1).strip() if fix_match else None,
+    }
+
+
+def summarize_triage(triage_log: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize triage accuracy from per-rule records.
+
+    Precision is measured on escalated rules (did the full check find
+    anything?). Recall can only be measured on 'no' answers that were
+    audited — checked anyway — so it is None until some audits have run.
+
+    Args:
+        triage_log: Records with 'decision', 'checked', and 'violations' keys
+
+    Returns:
+        Dict with decision counts, skipped count, precision, and recall
+    """
+    counts = {decision: 0 for decision in TRIAGE_DECISIONS}
+    true_pos = false_pos = false_neg = skipped = audited = 0
+    for record in triage_log:
+        counts[record['decision']] += 1
+        if not record['checked']:
+            skipped += 1
+            continue
+        found = record['violations'] > 0
+        if record['decision'] in TRIAGE_ESCALATE:
+            if found:
+                true_pos += 1
+            else:
+                false_pos += 1
+        else:
+            audited += 1
+            if found:
+                false_neg += 1
+
+    escalated = true_pos + false_pos
+    relevant = true_pos + false_neg
+    return {
+        'counts': counts,
+        'skipped': skipped,
+        'audited': audited,
+        'precision': true_pos / escalated if escalated else None,
+        'recall': true_pos / relevant if audited and relevant else None,
+    }
+
+
+def format_ratio(value: Optional[float]) -> str:
+    """Format a 0–1 ratio as a percentage, or 'n/a' when it can't be measured."""
+    return 'n/a' if value is None else f"{value:.0%}"
+
 
 def parse_markdown_response(response: str) -> Dict[str, Any]:
     """
@@ -282,6 +938,11 @@ def parse_markdown_response(response: str) -> Dict[str, Any]:
                 if severity_match:
                     violation['severity'] = severity_match.group(1).strip()
                 
+                # Packed prompts (create_packed_rule_prompt) name the lecture
+                document_match = re.search(r'\*\*Document:\*\*\s*`?([\w-]+)`?', body)
+                if document_match:
+                    violation['document'] = document_match.group(1)
+
                 location_match = re.search(r'\*\*Location:\*\*\s*(.+)', body)
                 if location_match:
                     violation['location'] = location_match.group(1).strip()
@@ -317,6 +978,101 @@ def parse_markdown_response(response: str) -> Dict[str, Any]:
     return result
 
 
+def parse_tool_response(tool_input: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert the arguments of a VIOLATION_TOOL_NAME call into the result format
+    of parse_markdown_response().
+
+    Args:
+        tool_input: The tool call's `input`, or None if the model didn't call it
+
+    Returns:
+        Dictionary with parsed review results; 'error' is set when there was
+        no usable tool call
+    """
+    result = {
+        'issues_found': 0,
+        'violations': [],
+        'corrected_content': '',
+        'summary': ''
+    }
+    if not isinstance(tool_input, dict) or not isinstance(tool_input.get('violations'), list):
+        result['error'] = f'No {VIOLATION_TOOL_NAME} tool call in response'
+        return result
+
+    for item in tool_input['violations']:
+        if not isinstance(item, dict):
+            continue
+        violation = {
+            'rule_id': str(item.get('rule_id', '')).strip(),
+            'rule_title': '',
+            'current_text': str(item.get('current_text', '')).strip(),
+            'suggested_fix': str(item.get('suggested_fix', '')).strip(),
+            'explanation': str(item.get('explanation', '')).strip(),
+        }
+        if item.get('severity'):
+            violation['severity'] = str(item['severity'])
+        if item.get('document'):
+            violation['document'] = str(item['document'])
+        first, last = item.get('first_line'), item.get('last_line')
+        if isinstance(first, int):
+            if isinstance(last, int) and last > first:
+                violation['location'] = f"Lines {first}-{last}"
+            else:
+                violation['location'] = f"Line {first}"
+        result['violations'].append(violation)
+
+    result['issues_found'] = len(result['violations'])
+    return result
+
+
+# Prompt-size tiers for latency tracking: (name, upper bound in prompt characters).
+# A rule checked against a short excerpt and one checked against a whole
+# lecture have very different normal latencies, so they are hedged separately.
+LATENCY_TIERS = (('excerpt', 8000), ('lecture', 40000), ('large', None))
+
+# Latency samples kept per tier, and the fewest needed before a tier's p95 is
+# trusted as a hedging threshold.
+LATENCY_WINDOW = 200
+MIN_HEDGE_SAMPLES = 10
+
+
+def _prompt_chars(prompt: Union[str, List[Dict[str, Any]]]) -> int:
+    """Length of a prompt given as a string or as message content blocks."""
+    if isinstance(prompt, str):
+        return len(prompt)
+    return sum(len(block.get('text', '')) for block in prompt)
+
+
+def latency_tier(prompt_chars: int) -> str:
+    """Name of the LATENCY_TIERS bucket a prompt of `prompt_chars` falls into."""
+    for name, limit in LATENCY_TIERS:
+        if limit is None or prompt_chars < limit:
+            return name
+    return LATENCY_TIERS[-1][0]
+
+
+class LatencyTracker:
+    """In-process record of recent call latencies per tier (thread-safe)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(tier, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, tier: str, q: float) -> Optional[float]:
+        """The `q` quantile (0-1) of a tier's latencies, or None below MIN_HEDGE_SAMPLES."""
+        with self._lock:
+            samples = sorted(self._samples.get(tier, ()))
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
 class AnthropicProvider:
     """Anthropic Claude provider with extended thinking
     
@@ -338,6 +1094,19 @@ class AnthropicProvider:
     # Number of times to retry transient API failures (rate limits, 5xx). The SDK
     # uses exponential backoff between attempts.
     MAX_RETRIES = 3
+    # Hedging: a rule check still running after its tier's p95 latency (but
+    # never before this many seconds) gets a duplicate request.
+    HEDGE_QUANTILE = 0.95
+    HEDGE_MIN_SECONDS = 10.0
+
+    # See providers.LLMProvider
+    capabilities = {
+        'thinking': True,
+        'prompt_cache': True,
+        'tools': True,
+        'streaming': True,
+        'hedging': True,
+    }
 
     def __init__(self, api_key: str, model: str = "claude-sonnet-4-5-20250929",
                  temperature: float = 1.0, thinking_budget: int = 10000):
@@ -345,6 +1114,21 @@ class AnthropicProvider:
         self.model = model
         self.temperature = temperature  # Must be 1.0 for extended thinking
         self.thinking_budget = thinking_budget
+        # Rule-check output cap; StyleReviewer lowers it from the planner's
+        # calibration so most calls don't need streaming.
+        self.max_tokens = MAX_OUTPUT_TOKENS
+        # One record per API call, appended to the usage ledger by the CLI
+        # (see planner.append_usage / load_calibration).
+        self.usage_log: List[Dict[str, Any]] = []
+        # Fraction of rule checks that may be hedged (0 disables hedging); see _hedged_message
+        self.hedge_budget = 0.0
+        # How rule checks report findings (one of RESPONSE_FORMATS); see violation_tool
+        self.response_format = 'markdown'
+        self.explanation_words = EXPLANATION_WORDS
+        self.latency = LatencyTracker()
+        self.checks_started = 0
+        self.hedges_launched = 0
+        self._hedge_lock = threading.Lock()
         # `anthropic` is a required dep declared in pyproject.toml and imported at
         # module top; if it's missing the module fails to import long before we get
         # here, so no need to wrap construction in try/except ImportError.
@@ -354,11 +1138,27 @@ class AnthropicProvider:
             max_retries=self.MAX_RETRIES,
         )
     
-    def check_single_rule(self, prompt: str) -> Dict[str, Any]:
-        """Check a single rule using provided prompt with extended thinking"""
+    def check_single_rule(self, prompt: Union[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Check a single rule using provided prompt with extended thinking.
+
+        `prompt` is a string, or message content blocks from
+        create_cached_rule_prompt() whose first block is a cached prefix.
+        The response is read according to `response_format`.
+        """
+        result, stop_reason = self._check(prompt, self.max_tokens)
+        if stop_reason == 'max_tokens' and self.max_tokens < MAX_OUTPUT_TOKENS:
+            # A truncated response would silently drop violations — retry uncapped
+            print(f"      ↻ Response hit max_tokens={self.max_tokens} - retrying with {MAX_OUTPUT_TOKENS}")
+            result, _ = self._check(prompt, MAX_OUTPUT_TOKENS)
+        return result
+
+    def _check(self, prompt: Union[str, List[Dict[str, Any]]], max_tokens: int) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Run one extended-thinking call; returns (parsed result, stop reason)."""
+        started = time.monotonic()
         api_kwargs = dict(
             model=self.model,
-            max_tokens=64000,
+            max_tokens=max_tokens,
             temperature=self.temperature,
             messages=[{"role": "user", "content": prompt}],
             thinking={
@@ -366,38 +1166,231 @@ class AnthropicProvider:
                 "budget_tokens": self.thinking_budget,
             },
         )
-        
-        # Try non-streaming first, fall back to streaming if required
+        if self.response_format == 'tool':
+            # Extended thinking only allows tool_choice 'auto', so the prompt
+            # is what asks for exactly one call.
+            api_kwargs['tools'] = [violation_tool(self.explanation_words)]
+            api_kwargs['tool_choice'] = {"type": "auto"}
+
+        tier = latency_tier(_prompt_chars(prompt))
+        with self._hedge_lock:
+            self.checks_started += 1
+
+        extra = {}
+        if self.hedge_budget > 0:
+            response, extra['hedged'] = self._hedged_message(api_kwargs, tier)
+        else:
+            # Try non-streaming first, fall back to streaming if required
+            try:
+                response = self.client.messages.create(**api_kwargs)
+            except Exception as e:
+                # If we get the streaming error, use streaming
+                if "Streaming is required" in str(e) or "10 minutes" in str(e):
+                    with self.client.messages.stream(**api_kwargs) as stream:
+                        for _ in stream:
+                            pass
+                        response = stream.get_final_message()
+                else:
+                    # Re-raise if it's a different error
+                    raise
+            self.latency.record(tier, time.monotonic() - started)
+
+        # Thinking blocks are internal reasoning and not part of the answer
+        full_response = ""
+        tool_input = None
+        thinking_chars = 0
+        for block in response.content:
+            if block.type == "text":
+                full_response = block.text
+            elif block.type == "tool_use" and getattr(block, 'name', None) == VIOLATION_TOOL_NAME:
+                tool_input = block.input
+            elif block.type == "thinking":
+                thinking_chars += len(getattr(block, 'thinking', '') or '')
+
+        if self.response_format == 'tool':
+            result = parse_tool_response(tool_input)
+            response_chars = len(json.dumps(tool_input)) if tool_input is not None else len(full_response)
+        else:
+            result = parse_markdown_response(full_response)
+            response_chars = len(full_response)
+        self._record_usage('check', prompt, response, started,
+                           thinking_chars=thinking_chars, response_chars=response_chars,
+                           max_tokens=max_tokens, response_format=self.response_format,
+                           parse_error='error' in result, **extra)
+        return result, getattr(response, 'stop_reason', None)
+
+    def _hedged_message(self, api_kwargs: Dict[str, Any], tier: str) -> Tuple[Any, bool]:
+        """
+        Run one call, launching a duplicate if it runs past its tier's p95 latency.
+
+        Whichever attempt finishes first wins and the other is cancelled by
+        closing its stream, so only the tokens it produced so far are billed.
+        Duplicates are capped at `hedge_budget` times the number of checks, and
+        a tier is only hedged once MIN_HEDGE_SAMPLES latencies are known.
+
+        Returns:
+            (final message, whether a duplicate was launched)
+        """
+        threshold = self.latency.percentile(tier, self.HEDGE_QUANTILE)
+        if threshold is not None:
+            threshold = max(threshold, self.HEDGE_MIN_SECONDS)
+        cancels = [threading.Event(), threading.Event()]
+        executor = ThreadPoolExecutor(max_workers=2)
         try:
-            response = self.client.messages.create(**api_kwargs)
-            full_response = ""
-            for block in response.content:
-                if block.type == "text":
-                    full_response = block.text
-        except Exception as e:
-            # If we get the streaming error, use streaming
-            if "Streaming is required" in str(e) or "10 minutes" in str(e):
-                full_response = ""
-                with self.client.messages.stream(**api_kwargs) as stream:
-                    for event in stream:
-                        # Only extract text blocks — thinking blocks are internal
-                        # reasoning and not needed in the final response
-                        if hasattr(event, 'type') and event.type == 'content_block_delta':
-                            if hasattr(event.delta, 'text'):
-                                full_response += event.delta.text
-            else:
-                # Re-raise if it's a different error
-                raise
-        
-        # Parse the Markdown response
-        return parse_markdown_response(full_response)
+            attempts = {executor.submit(self._stream_message, api_kwargs, cancels[0]): 0}
+            hedged = False
+            if threshold is not None:
+                done, _ = wait(attempts, timeout=threshold)
+                if not done and self._take_hedge():
+                    print(f"      ⏱️  No response after {threshold:.0f}s (p95 for {tier} prompts) - hedging")
+                    attempts[executor.submit(self._stream_message, api_kwargs, cancels[1])] = 1
+                    hedged = True
+
+            errors = []
+            pending = set(attempts)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+                        continue
+                    message, seconds = future.result()
+                    for cancel in cancels:
+                        cancel.set()  # Stop the other attempt
+                    self.latency.record(tier, seconds)
+                    return message, hedged
+            raise errors[0]
+        finally:
+            executor.shutdown(wait=False)
+
+    def _stream_message(self, api_kwargs: Dict[str, Any], cancel: threading.Event) -> Tuple[Any, float]:
+        """Stream one call to completion, or stop early once `cancel` is set."""
+        started = time.monotonic()
+        with self.client.messages.stream(**api_kwargs) as stream:
+            for _ in stream:
+                if cancel.is_set():
+                    return None, time.monotonic() - started
+            message = stream.get_final_message()
+        return message, time.monotonic() - started
+
+    def _take_hedge(self) -> bool:
+        """Reserve one duplicate request if the hedge budget allows it."""
+        with self._hedge_lock:
+            if self.hedges_launched + 1 > self.hedge_budget * self.checks_started:
+                return False
+            self.hedges_launched += 1
+            return True
+
+    def _record_usage(self, kind: str, prompt: Union[str, List[Dict[str, Any]]], response: Any,
+                      started: float, **extra: Any) -> None:
+        usage = getattr(response, 'usage', None)
+        self.usage_log.append({
+            'kind': kind,
+            'provider': 'anthropic',
+            'model': self.model,
+            'prompt_chars': _prompt_chars(prompt),
+            # input_tokens excludes prompt tokens read from or written to the cache
+            'input_tokens': getattr(usage, 'input_tokens', None),
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', None),
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', None),
+            'output_tokens': getattr(usage, 'output_tokens', None),
+            'seconds': round(time.monotonic() - started, 3),
+            **extra,
+        })
+
+    def triage_rules(self, prompt: str, rule_ids: List[str]) -> Dict[str, str]:
+        """Ask for a yes/maybe/no applicability answer per rule.
+
+        Triage is a quick screening pass, so it runs without extended thinking
+        and with a small output budget (a few tokens per rule).
+        """
+        started = time.monotonic()
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=64 + 16 * len(rule_ids),
+            temperature=0.0,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        text = "".join(block.text for block in response.content if block.type == "text")
+        self._record_usage('triage', prompt, response, started, response_chars=len(text))
+        return parse_triage_response(text, rule_ids)
+
+    def requote(self, prompt: str, max_tokens: int) -> str:
+        """Ask for the exact span of an unanchored fix (see create_requote_prompt).
+
+        Like triage, this is a small lookup rather than a judgement call, so it
+        runs without extended thinking and with an output cap sized to the quote.
+        """
+        started = time.monotonic()
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=0.0,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        text = "".join(block.text for block in response.content if block.type == "text")
+        self._record_usage('requote', prompt, response, started, response_chars=len(text),
+                           max_tokens=max_tokens)
+        return text
+
+
+def _skipped_rule(rule: Dict[str, Any]) -> Dict[str, str]:
+    """Report entry for a rule not sent because none of its triggers matched."""
+    return {'rule_id': rule['rule_id'], 'title': rule['title'], 'reason': 'no trigger match'}
+
+
+class _ReviewState:
+    """Mutable bookkeeping for one StyleReviewer.review_lecture_single_rule() run."""
+
+    def __init__(self, content: str):
+        self.content = content  # Track the evolving content as fixes are applied
+        self.original_content = content  # Snapshot before any rules run
+        self.violations = []  # Every reported violation, for comprehensive reporting
+        self.rule_violations = []  # 'rule' type violations actually applied
+        self.style_violations = []  # 'style'/'migrate' suggestions for human review
+        self.warnings = []
+        self.fix_log = []  # Track each applied fix with rule attribution
+        self.triage_log = []  # Per-rule triage decisions and outcomes (cascade mode only)
+        self.skipped_rules = []  # Rules not sent because none of their triggers matched
+        # Records kept so far per category, used to collapse the same edit
+        # flagged by several rules (see dedupe_violations).
+        self.category_fixes: Dict[str, List[Dict[str, Any]]] = {}
+        self.category_suggestions: Dict[str, List[Dict[str, Any]]] = {}
+        self._document = parse_document(content)
+        # Prompt caching: the lecture version held in the cached prompt prefix,
+        # and the index into fix_log of the first fix applied after it.
+        self.cache_base = content
+        self.cache_start = 0
+
+    @property
+    def document(self) -> MystDocument:
+        """
+        MyST model of the current content.
+
+        Parsed once for the original lecture; after each batch of fixes it is
+        brought up to date incrementally the next time it is needed.
+        """
+        if self._document.content != self.content:
+            self._document = self._document.update(self.content)
+        return self._document
 
 
 class StyleReviewer:
     """Main style reviewer using Claude Sonnet 4.5 with extended thinking"""
     
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None,
-                 temperature: float = 1.0, thinking_budget: int = 10000):
+                 temperature: float = 1.0, thinking_budget: int = 10000,
+                 triage_model: Optional[str] = None, triage_audit_rate: float = 0.0,
+                 schedule: str = 'sequential', max_workers: int = 4,
+                 scoped_context: bool = True, calibration: Optional[Dict[str, float]] = None,
+                 prompt_cache: bool = False, cache_refresh_edits: int = CACHE_REFRESH_EDITS,
+                 memo: Optional[ReviewMemo] = None, hedge_budget: float = 0.0,
+                 response_format: str = 'markdown', explanation_words: int = EXPLANATION_WORDS,
+                 requote: bool = False, provider: Optional[LLMProvider] = None,
+                 triage_provider: Optional[LLMProvider] = None,
+                 mechanical_provider: Optional[LLMProvider] = None,
+                 static_analysis: bool = False, lecture_index: Optional[LectureIndex] = None,
+                 bibliography: Optional[Bibliography] = None):
         """
         Initialize reviewer with Claude Sonnet 4.5
         
@@ -406,21 +1399,129 @@ class StyleReviewer:
             model: Specific Claude model to use (default: claude-sonnet-4-5-20250929)
             temperature: LLM temperature (must be 1.0 for extended thinking)
             thinking_budget: Max tokens for internal reasoning (default: 10000)
+            triage_model: Optional smaller model (e.g. claude-haiku-4-5) that screens
+                each category's rules first; only 'yes'/'maybe' rules get the full check
+            triage_audit_rate: Fraction of triage 'no' answers to check anyway, so
+                triage recall can be measured (0.0 = never, 1.0 = always)
+            schedule: How rule checks are ordered (one of SCHEDULES):
+                'sequential' checks one rule at a time; 'speculative' checks all
+                rules in a category concurrently and rebases their fixes;
+                'graph' runs waves of independent rules from schedule_rule_waves()
+                concurrently, across categories
+            max_workers: Maximum concurrent rule checks ('speculative'/'graph')
+            scoped_context: Show each rule only the lecture fragments in its
+                context regions (see extract_rule_context) instead of the whole
+                lecture
+            calibration: Token/latency calibration from planner.load_calibration(),
+                used to size max_tokens and decide when a prompt must be sharded
+                (default: the planner's built-in numbers)
+            prompt_cache: Send every rule the same cached lecture prefix, with the
+                fixes applied since as a list of edits (see
+                create_cached_rule_prompt), instead of the updated lecture.
+                Takes the place of scoped excerpts, though rules with nothing
+                in scope are still skipped
+            cache_refresh_edits: With prompt_cache, re-base the cached prefix on
+                the current content once more than this many edits pile up
+            memo: Section-level memo of earlier findings (see memo.ReviewMemo);
+                sections a rule has already checked in the same form are
+                replayed instead of sent again. The caller saves it.
+            hedge_budget: Fraction of rule checks that may get a duplicate
+                request when they run past the p95 latency of their prompt-size
+                tier (see AnthropicProvider._hedged_message); 0 disables hedging
+            response_format: How rule checks report findings (one of
+                RESPONSE_FORMATS): 'markdown' parses a free-form report,
+                'tool' reads the arguments of a report_violations tool call
+            explanation_words: Word limit for each explanation in 'tool' mode
+            requote: When a fix's current_text isn't found verbatim, send just
+                the violation and the lines around its location in a small
+                call without extended thinking (see create_requote_prompt)
+                and retry with the exact span, instead of dropping the fix
+            provider: Backend for rule checks (see providers.LLMProvider),
+                e.g. a providers.OpenAICompatibleProvider; by default an
+                AnthropicProvider for `model`
+            triage_provider: Backend for triage, instead of an
+                AnthropicProvider for `triage_model`
+            mechanical_provider: Backend for the MECHANICAL_RULES checks;
+                all other rules still go to `provider`
+            static_analysis: Check the analyzers.ANALYZED_RULES by parsing
+                the lecture's code cells, math and directives instead of
+                calling the LLM
+            lecture_index: Index of the lecture's series; with
+                static_analysis, the link rules are checked against it
+            bibliography: The book's .bib entries; with static_analysis,
+                the citation rule is checked against it in lectures whose
+                citations it can classify, and sent to the LLM otherwise
         """
-        self.provider_name = 'claude'
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule '{schedule}' (expected one of: {', '.join(SCHEDULES)})")
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(
+                f"Unknown response format '{response_format}' (expected one of: {', '.join(RESPONSE_FORMATS)})"
+            )
+
+        self.provider_name = 'claude' if provider is None else provider.model
         
         # Get API key from parameter or environment
         if not api_key:
             api_key = os.environ.get('ANTHROPIC_API_KEY')
         
-        if not api_key:
+        if not api_key and (provider is None or (triage_model and triage_provider is None)):
             raise ValueError("No API key provided. Set ANTHROPIC_API_KEY environment variable or pass api_key parameter")
         
+        if provider is not None:
+            self.provider = provider
         # Initialize Claude provider with extended thinking
-        if model:
+        elif model:
             self.provider = AnthropicProvider(api_key, model, temperature=temperature, thinking_budget=thinking_budget)
         else:
             self.provider = AnthropicProvider(api_key, temperature=temperature, thinking_budget=thinking_budget)
+
+        # Optional two-stage cascade: a cheap model screens rules before the full check
+        if triage_provider is None and triage_model:
+            triage_provider = AnthropicProvider(api_key, triage_model)
+        self.triage_provider = triage_provider
+        self.mechanical_provider = mechanical_provider
+        self.triage_audit_rate = triage_audit_rate
+
+        self.schedule = schedule
+        self.max_workers = max_workers
+        self.scoped_context = scoped_context
+        self.prompt_cache = prompt_cache
+        self.cache_refresh_edits = cache_refresh_edits
+        self.memo = memo
+        self.requote = requote
+        self.static_analysis = static_analysis
+        self.lecture_index = lecture_index
+        self.bibliography = bibliography
+        self._base_prompt_text: Optional[str] = None
+
+        self.calibration = calibration or load_calibration()
+        self.response_format = response_format
+        for checker in (self.provider, mechanical_provider):
+            if checker is None:
+                continue
+            thinking = thinking_budget if checker.capabilities.get('thinking') else 0
+            checker.max_tokens = choose_max_tokens(thinking, self.calibration)
+            checker.hedge_budget = hedge_budget
+            checker.response_format = response_format
+            checker.explanation_words = explanation_words
+        # Context larger than this is split across several calls
+        self.max_prompt_chars = int(MAX_INPUT_TOKENS * self.calibration['chars_per_token'])
+
+    @property
+    def usage_log(self) -> List[Dict[str, Any]]:
+        """Usage records for every API call made so far (rule checks and triage)."""
+        records = list(self.provider.usage_log)
+        for extra in (self.mechanical_provider, self.triage_provider):
+            if extra is not None:
+                records += extra.usage_log
+        return records
+
+    def _provider_for(self, rule: Dict[str, str]) -> LLMProvider:
+        """The backend that checks `rule`: mechanical_provider for MECHANICAL_RULES, if set."""
+        if self.mechanical_provider is not None and rule['rule_id'] in MECHANICAL_RULES:
+            return self.mechanical_provider
+        return self.provider
     
     def review_lecture_single_rule(
         self,
@@ -443,13 +1544,8 @@ class StyleReviewer:
         Returns:
             Dictionary with combined review results from all rules
         """
-        all_violations = []
-        rule_violations = []  # NEW: Track rule category violations (auto-apply)
-        style_violations = []  # NEW: Track style category violations (suggestions only)
-        all_warnings = []
-        current_content = content  # Track the evolving content as fixes are applied
-        original_content = content  # Snapshot before any rules run
-        fix_log = []  # Track each applied fix with rule attribution
+        state = _ReviewState(content)
+        graph_pending = []
         
         for category in categories:
             print(f"  📋 Checking {category} rules individually...")
@@ -460,96 +1556,799 @@ class StyleReviewer:
                 continue
             
             print(f"    ℹ️  Found {len(rules)} rules to check")
-            
-            for i, rule in enumerate(rules, 1):
-                rule_id = rule['rule_id']
-                rule_type = rule.get('rule_type', 'rule')  # 'rule' = auto-fix, 'style' = suggestion
-                print(f"    ⏳ Checking {rule_id}: {rule['title']} ({i}/{len(rules)}) [type: {rule_type}]")
-                
-                try:
-                    # Create focused prompt for this specific rule using CURRENT content
-                    prompt = create_single_rule_prompt(category, rule, current_content)
-                    
-                    # Check this single rule
-                    result = self.provider.check_single_rule(prompt)
-                    
-                    # Process violations from this rule
-                    if result.get('violations'):
-                        violations_count = len(result['violations'])
-                        print(f"      ✓ Found {violations_count} violation(s)")
-                        
-                        # Validate fix quality
-                        validation_warnings = validate_fix_quality(result['violations'])
-                        if validation_warnings:
-                            print(f"      ⚠️  Fix quality warnings: {len(validation_warnings)}")
-                            all_warnings.extend(validation_warnings)
-                        
-                        # Separate by type - only auto-apply fixes for 'rule' type
-                        if rule_type == 'rule':
-                            # Apply fixes immediately to current content
-                            corrected_content, apply_warnings, applied = apply_fixes(current_content, result['violations'])
-                            
-                            if apply_warnings:
-                                all_warnings.extend(apply_warnings)
-                            
-                            # Update current content for next rule
-                            if corrected_content != current_content:
-                                current_content = corrected_content
-                                print(f"      ✓ Applied {len(applied)} fix(es) automatically - content updated for next rule")
-                                
-                                # Log each actually-applied fix for region-based reporting
-                                for v in applied:
-                                    fix_log.append({
-                                        'rule_id': v.get('rule_id', 'unknown'),
-                                        'rule_title': v.get('rule_title', ''),
-                                        'category': category,
-                                        'current_text': v.get('current_text', '').strip(),
-                                        'suggested_fix': v.get('suggested_fix', '').strip(),
-                                        'description': v.get('description', ''),
-                                        'explanation': v.get('explanation', ''),
-                                        'location': v.get('location', ''),
-                                    })
-                            else:
-                                print(f"      ⚠️  Could not apply fixes - content unchanged")
-                            
-                            # Store only actually-applied violations for reporting
-                            rule_violations.extend(applied)
-                        else:
-                            # Style category - collect suggestions but don't auto-apply
-                            print(f"      ℹ️  Style suggestions collected (not auto-applied) - requires human review")
-                            style_violations.extend(result['violations'])
-                        
-                        # Store all violations for comprehensive reporting
-                        all_violations.extend(result['violations'])
-                    else:
-                        print(f"      ✓ No violations")
-                        
-                except anthropic.APIError as e:
-                    # Recoverable: rate limits, transient 5xx, single-call timeouts.
-                    # Log per-rule but keep checking other rules.
-                    warning = f"API error checking {rule_id}: {e}"
-                    print(f"      ⚠️  {warning}")
-                    all_warnings.append(warning)
-                # Any other exception (AttributeError, KeyError, TypeError, ...) is
-                # a programmer bug — let it bubble up so the action fails loudly
-                # instead of silently reporting "0 issues found" for a broken run.
+
+            pending = self._select_rules(state, category, rules)
+            if self.schedule == 'graph':
+                # Scheduled across categories once every category is collected
+                graph_pending.extend(pending)
+            elif self.schedule == 'speculative' and len(pending) > 1:
+                self._review_concurrently(state, pending)
+            else:
+                for category_, progress, rule, triage_record in pending:
+                    self._review_rule(state, category_, rule, progress, triage_record)
+
+        if graph_pending:
+            waves = schedule_rule_waves([rule for _, _, rule, _ in graph_pending])
+            print(f"  🗺️  Rule graph: {len(graph_pending)} rules in {len(waves)} waves")
+            for n, wave in enumerate(waves, 1):
+                print(f"  🌊 Wave {n}/{len(waves)} ({len(wave)} rules)")
+                wave_pending = [graph_pending[i] for i in wave]
+                if len(wave_pending) > 1:
+                    self._review_concurrently(state, wave_pending)
+                else:
+                    category, progress, rule, triage_record = wave_pending[0]
+                    self._review_rule(state, category, rule, progress, triage_record)
+
+        return self._combine_results(state, lecture_name)
+
+    def _combine_results(self, state: _ReviewState, lecture_name: str) -> Dict[str, Any]:
+        """Build the result dict of review_lecture_single_rule() from a finished run."""
+        triage_summary = summarize_triage(state.triage_log) if state.triage_log else None
+        if triage_summary:
+            print(
+                f"  🔎 Triage: {triage_summary['skipped']}/{len(state.triage_log)} rule checks skipped, "
+                f"precision {format_ratio(triage_summary['precision'])}, "
+                f"recall {format_ratio(triage_summary['recall'])}"
+            )
 
         # Combine all results
         combined_result = {
-            'issues_found': len(all_violations),
-            'violations': all_violations,
-            'rule_violations': rule_violations,  # Automatic fixes actually applied
-            'style_violations': style_violations,  # Suggestions for human review
+            'issues_found': len(state.violations),
+            'violations': state.violations,
+            'rule_violations': state.rule_violations,  # Automatic fixes actually applied
+            'style_violations': state.style_violations,  # Suggestions for human review
             'provider': self.provider_name,
             'lecture_name': lecture_name,
-            'warnings': all_warnings,
-            'corrected_content': current_content,  # Final content after all rule fixes
-            'original_content': original_content,  # Snapshot before any fixes
-            'fix_log': fix_log,  # Per-fix log with rule attribution
+            'warnings': state.warnings,
+            'corrected_content': state.content,  # Final content after all rule fixes
+            'original_content': state.original_content,  # Snapshot before any fixes
+            'fix_log': state.fix_log,  # Per-fix log with rule attribution
+            'triage_log': state.triage_log,  # Per-rule triage decisions (empty without triage)
+            'triage': triage_summary,  # Precision/recall summary, or None
+            'skipped_rules': state.skipped_rules,  # Rules whose triggers didn't match
         }
         
         return combined_result
-    
+
+    def review_lectures_packed(
+        self,
+        lectures: List[Tuple[str, str]],
+        categories: List[str],
+        pack_tokens: int = PACK_TOKENS,
+    ) -> List[Dict[str, Any]]:
+        """
+        Review several short lectures in lockstep, one packed prompt per rule.
+
+        Short lectures pay the base prompt, the rule and per-request latency
+        once per pack instead of once each. For every rule, each lecture's
+        context (after scoping and the memo) is computed as usual, the
+        lectures are grouped by planner.pack_lectures() up to `pack_tokens`,
+        and each pack is sent as one create_packed_rule_prompt() call. Fixes
+        are then applied to each lecture separately, so later rules see the
+        updated lectures just as in review_lecture_single_rule().
+
+        Rules are checked sequentially and without triage, the Already Fixed
+        hint or prompt caching; a lecture alone in its pack gets the normal
+        single-lecture prompt.
+
+        Args:
+            lectures: (lecture name, content) pairs
+            categories: List of category names to check
+            pack_tokens: Context size limit per packed prompt, in tokens
+
+        Returns:
+            One review_lecture_single_rule() result per lecture, in order
+        """
+        states = [_ReviewState(content) for _, content in lectures]
+        names = [name for name, _ in lectures]
+        max_chars = min(self.max_prompt_chars, int(pack_tokens * self.calibration['chars_per_token']))
+        print(f"  📦 Reviewing {len(lectures)} lectures together, packed per rule")
+
+        for category in categories:
+            print(f"  📋 Checking {category} rules individually...")
+            rules = extract_individual_rules(category)
+            if not rules:
+                print(f"    ⚠️  No rules found for category: {category}")
+                continue
+            for i, rule in enumerate(rules, 1):
+                rule_type = rule.get('rule_type', 'rule')
+                print(f"    ⏳ Checking {rule['rule_id']}: {rule['title']} ({i}/{len(rules)}) [type: {rule_type}]")
+                self._review_rule_packed(states, names, category, rule, max_chars)
+
+        return [self._combine_results(state, name) for state, name in zip(states, names)]
+
+    def _review_rule_packed(
+        self,
+        states: List[_ReviewState],
+        names: List[str],
+        category: str,
+        rule: Dict[str, str],
+        max_chars: int,
+    ) -> None:
+        """Check one rule against every lecture of a packed review and record the findings."""
+        analyzed = [self.static_analysis and is_analyzed(rule['rule_id'], self.lecture_index, self.bibliography,
+                                                         state.document) for state in states]
+        if any(analyzed):
+            print(f"      🔬 Checked by static analysis"
+                  + ("" if all(analyzed) else f" ({sum(analyzed)}/{len(states)} lectures)"))
+        for state, name, done in zip(states, names, analyzed):
+            if not done:
+                continue
+            violations = analyze_rule(state.document, rule, self.lecture_index, self.bibliography)
+            violations = self._dedupe(state, category, rule.get('rule_type', 'rule'), violations)
+            if violations:
+                print(f"      📄 {name}:")
+                self._record_violations(state, category, rule, violations)
+        if all(analyzed):
+            return
+        states = [state for state, done in zip(states, analyzed) if not done]
+        names = [name for name, done in zip(names, analyzed) if not done]
+        contexts = [self._rule_context(rule, state.document) for state in states]
+        for state, context in zip(states, contexts):
+            if context['untriggered']:
+                state.skipped_rules.append(_skipped_rule(rule))
+        results: Dict[int, Optional[List[Dict[str, Any]]]] = {}
+        to_send = []
+        for index, context in enumerate(contexts):
+            if context['send']:
+                to_send.append(index)
+            else:
+                results[index] = []
+
+        sizes = []
+        for index in to_send:
+            fragments = contexts[index]['fragments']
+            content = states[index].content
+            sizes.append(len(content) if fragments is None else sum(f['end'] - f['start'] for f in fragments))
+        packs = [[to_send[i] for i in pack] for pack in pack_lectures(sizes, max_chars)]
+        if any(len(pack) > 1 for pack in packs):
+            print(f"      📦 {len(to_send)} lectures in {len(packs)} request(s)")
+
+        for pack in packs:
+            if len(pack) == 1:
+                index = pack[0]
+                state, context = states[index], contexts[index]
+                results[index] = self._query_rule(state, category, rule, state.content, context['document'],
+                                                  context['fragments'], whole=False)
+            else:
+                results.update(self._query_packed(states, names, category, rule, pack, contexts))
+
+        for index, state in enumerate(states):
+            violations = results[index]
+            if violations is None:
+                continue
+            violations = self._finish_check(contexts[index], state.content, violations)
+            violations = self._dedupe(state, category, rule.get('rule_type', 'rule'), violations)
+            if violations:
+                print(f"      📄 {names[index]}:")
+                self._record_violations(state, category, rule, violations)
+
+    def _query_packed(
+        self,
+        states: List[_ReviewState],
+        names: List[str],
+        category: str,
+        rule: Dict[str, str],
+        pack: List[int],
+        contexts: List[Dict[str, Any]],
+    ) -> Dict[int, Optional[List[Dict[str, Any]]]]:
+        """
+        Send one packed prompt for the lectures in `pack` and split the findings by lecture.
+
+        Returns:
+            Lecture index -> violations (with `position` hints for excerpts),
+            or None for every lecture if the API call failed
+        """
+        documents = []
+        by_id = {}
+        for n, index in enumerate(pack, 1):
+            content, fragments = states[index].content, contexts[index]['fragments']
+            doc_id = f"doc-{n}"
+            by_id[doc_id] = index
+            documents.append({
+                'id': doc_id,
+                'name': names[index],
+                'text': content if fragments is None else format_fragments(content, fragments),
+                'excerpt': fragments is not None,
+            })
+
+        prompt = create_packed_rule_prompt(category, rule, documents, response_format=self.response_format)
+        try:
+            result = self._provider_for(rule).check_single_rule(prompt)
+        except PROVIDER_ERRORS as e:
+            warning = f"API error checking {rule['rule_id']}: {e}"
+            print(f"      ⚠️  {warning}")
+            for index in pack:
+                states[index].warnings.append(warning)
+            return {index: None for index in pack}
+
+        found: Dict[int, List[Dict[str, Any]]] = {index: [] for index in pack}
+        for v in result.get('violations', []):
+            current_text = v.get('current_text', '').strip()
+            index = by_id.get(v.pop('document', None))
+            if index is None:
+                # No usable document ID: attribute the quote to the one lecture containing it
+                holders = [i for i, d in zip(pack, documents) if current_text and current_text in d['text']]
+                if len(holders) != 1:
+                    warning = (f"Could not tell which lecture a {rule['rule_id']} violation belongs to "
+                               f"- skipped: {current_text[:60]!r}")
+                    print(f"      ⚠️  {warning}")
+                    for i in pack:
+                        states[i].warnings.append(warning)
+                    continue
+                index = holders[0]
+            fragments = contexts[index]['fragments']
+            if fragments is not None:
+                pos = locate_in_fragments(states[index].content, current_text, fragments)
+                if pos is not None:
+                    v['position'] = pos
+            found[index].append(v)
+        return found
+
+    def _select_rules(
+        self,
+        state: _ReviewState,
+        category: str,
+        rules: List[Dict[str, str]],
+    ) -> List[Tuple[str, str, Dict[str, str], Optional[Dict[str, Any]]]]:
+        """
+        Decide which of a category's rules to check, applying triage if enabled.
+
+        Returns:
+            List of (category, progress label, rule, triage record or None) to
+            check, in evaluation order
+        """
+        decisions = {}
+        if self.triage_provider:
+            decisions = self._triage_category(category, rules, state.content, state.warnings)
+
+        pending = []
+        for i, rule in enumerate(rules, 1):
+            rule_id = rule['rule_id']
+            progress = f"{i}/{len(rules)}"
+
+            triage_record = None
+            if rule_id in decisions:
+                decision = decisions[rule_id]
+                checked = decision in TRIAGE_ESCALATE or random.random() < self.triage_audit_rate
+                triage_record = {
+                    'rule_id': rule_id,
+                    'category': category,
+                    'decision': decision,
+                    'checked': checked,
+                    'violations': 0,
+                }
+                state.triage_log.append(triage_record)
+                if not checked:
+                    print(f"    ⏭️  Skipping {rule_id}: {rule['title']} ({progress}) [triage: no]")
+                    continue
+
+            pending.append((category, progress, rule, triage_record))
+        return pending
+
+    def _review_rule(
+        self,
+        state: _ReviewState,
+        category: str,
+        rule: Dict[str, str],
+        progress: str,
+        triage_record: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Check one rule against the current content and record its findings."""
+        rule_type = rule.get('rule_type', 'rule')  # 'rule' = auto-fix, 'style' = suggestion
+        print(f"    ⏳ Checking {rule['rule_id']}: {rule['title']} ({progress}) [type: {rule_type}]")
+
+        violations = self._check_rule(state, category, rule, state.content, triage_record)
+        if violations is None:
+            return
+        violations = self._dedupe(state, category, rule_type, violations)
+        if violations:
+            self._record_violations(state, category, rule, violations)
+        else:
+            print(f"      ✓ No violations")
+
+    def _check_rule(
+        self,
+        state: _ReviewState,
+        category: str,
+        rule: Dict[str, str],
+        content: str,
+        triage_record: Optional[Dict[str, Any]] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Run the LLM check for one rule against `content`.
+
+        With scoped context the model only sees the rule's fragments; each
+        violation then carries a `position` hint with its offset in `content`.
+        With a memo, sections this rule has already seen in the same form
+        replay their memoized findings (also with `position` hints) and only
+        the remaining sections are sent.
+
+        Safe to call from worker threads: it only reads `state` apart from
+        appending to the warnings and skipped rules lists. (Concurrent callers
+        bring `state.document` up to date before starting the workers.)
+
+        Returns:
+            Parsed violations, or None if the API call failed (logged as a warning)
+        """
+        # The current content's model is kept up to date incrementally as fixes land
+        document = state.document if content == state.content else parse_document(content)
+        if self._analyzed(rule, document):
+            violations = analyze_rule(document, rule, self.lecture_index, self.bibliography)
+            if triage_record is not None:
+                triage_record['violations'] = len(violations)
+            return violations
+        context = self._rule_context(rule, document)
+        if context['untriggered']:
+            state.skipped_rules.append(_skipped_rule(rule))
+        violations = []
+        if context['send']:
+            violations = self._query_rule(state, category, rule, content, context['document'],
+                                          context['fragments'], whole=context['whole'])
+            if violations is None:
+                return None
+        return self._finish_check(context, content, violations, triage_record)
+
+    def _analyzed(self, rule: Dict[str, str], document: MystDocument) -> bool:
+        """True if the rule is checked by static analysis rather than the LLM for `document`."""
+        if self.static_analysis and is_analyzed(rule['rule_id'], self.lecture_index, self.bibliography, document):
+            print(f"      🔬 Checked by static analysis")
+            return True
+        return False
+
+    def _rule_context(self, rule: Dict[str, str], document: MystDocument) -> Dict[str, Any]:
+        """
+        Decide what of a lecture a rule has to be sent (see _check_rule).
+
+        Triggers, scoped fragments and memo sections all come from `document`,
+        the caller's model of the lecture version being checked.
+
+        Returns:
+            Dict with 'document'; 'fragments' to send (None = the whole
+            lecture); 'send' (False if there is nothing to send);
+            'untriggered' (True if the rule's triggers ruled it out); 'whole'
+            (False if the memo narrowed the context); 'replayed' memoized
+            violations; and 'changed' memo units with their 'rule_hash'
+            (None without a memo)
+        """
+        content = document.content
+        context = {'document': document, 'fragments': None, 'send': True, 'untriggered': False,
+                   'whole': True, 'replayed': [], 'changed': None, 'rule_hash': None}
+        if not rule_triggered(document, rule):
+            print(f"      ✓ No trigger match - skipped")
+            context.update(send=False, untriggered=True)
+            return context
+        if self.scoped_context:
+            context['fragments'] = extract_rule_context(document, rule)
+            if context['fragments'] == []:
+                print(f"      ✓ Nothing in scope ({', '.join(rule['context'])}) - skipped")
+                context['send'] = False
+                return context
+
+        if self.memo is not None:
+            rule_hash = memo_rule_key(rule, self._provider_for(rule).model, self._base_prompt())
+            sections = memo_units(document, rule['context'], whole=CONTEXT_FULL in rule['context'])
+            changed = []
+            for start, end in sections:
+                cached = self.memo.lookup(rule_hash, content[start:end], start, document.line_of(start))
+                if cached is None:
+                    changed.append((start, end))
+                else:
+                    context['replayed'].extend(cached)
+            context.update(rule_hash=rule_hash, changed=changed)
+            if len(changed) < len(sections):
+                print(f"      ♻️  {len(sections) - len(changed)}/{len(sections)} sections/cells already "
+                      f"checked - replayed {len(context['replayed'])} memoized finding(s)")
+                context['fragments'] = _restrict_fragments(document, context['fragments'], changed)
+                context['whole'] = False
+                # Only changed sections may hold anything this rule reads
+                context['send'] = context['fragments'] != []
+        return context
+
+    def _finish_check(
+        self,
+        context: Dict[str, Any],
+        content: str,
+        violations: List[Dict[str, Any]],
+        triage_record: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Memoize fresh findings and add the replayed ones (see _rule_context)."""
+        if context['changed']:
+            self._memoize(context['rule_hash'], content, context['document'], context['changed'], violations)
+        violations = context['replayed'] + violations
+        if triage_record is not None:
+            triage_record['violations'] = len(violations)
+        return violations
+
+    def _query_rule(
+        self,
+        state: _ReviewState,
+        category: str,
+        rule: Dict[str, str],
+        content: str,
+        document: MystDocument,
+        fragments: Optional[List[Dict[str, Any]]],
+        whole: bool = True,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Send `content` (or its `fragments`) to the LLM for one rule.
+
+        `whole` is False when the memo narrowed the context down to changed
+        sections, which rules out the cached whole-lecture prompt.
+        """
+        if (self.prompt_cache and whole and content == state.content
+                and len(state.cache_base) <= self.max_prompt_chars):
+            return self._check_rule_cached(state, category, rule)
+
+        context_chars = len(content) if fragments is None else sum(f['end'] - f['start'] for f in fragments)
+        shards = [fragments]
+        if context_chars > self.max_prompt_chars:
+            shards = shard_fragments(document, fragments, self.max_prompt_chars)
+            print(f"      ✂️  Context too large for one call - split into {len(shards)} shards")
+
+        violations = []
+        try:
+            for shard in shards:
+                # Create focused prompt for this specific rule
+                if shard is None:
+                    prompt = create_single_rule_prompt(
+                        category, rule, content, already_fixed=state.category_fixes.get(category),
+                        response_format=self.response_format,
+                    )
+                else:
+                    prompt = create_single_rule_prompt(
+                        category, rule, format_fragments(content, shard),
+                        already_fixed=state.category_fixes.get(category), excerpt=True,
+                        response_format=self.response_format,
+                    )
+                result = self._provider_for(rule).check_single_rule(prompt)
+                shard_violations = result.get('violations', [])
+                if shard is not None:
+                    # Anchor each quote at its occurrence inside the excerpt, which
+                    # may not be the first occurrence in the full file.
+                    for v in shard_violations:
+                        pos = locate_in_fragments(content, v.get('current_text', '').strip(), shard)
+                        if pos is not None:
+                            v['position'] = pos
+                violations.extend(shard_violations)
+        except PROVIDER_ERRORS as e:
+            # Recoverable: rate limits, transient 5xx, single-call timeouts.
+            # Log per-rule but keep checking other rules.
+            warning = f"API error checking {rule['rule_id']}: {e}"
+            print(f"      ⚠️  {warning}")
+            state.warnings.append(warning)
+            return None
+        # Any other exception (AttributeError, KeyError, TypeError, ...) is
+        # a programmer bug — let it bubble up so the action fails loudly
+        # instead of silently reporting "0 issues found" for a broken run.
+        return violations
+
+    def _memoize(
+        self,
+        rule_hash: str,
+        content: str,
+        document: MystDocument,
+        sections: List[Tuple[int, int]],
+        violations: List[Dict[str, Any]],
+    ) -> None:
+        """Store a rule's fresh findings under each section that was just checked."""
+        by_section: Dict[Tuple[int, int], List[Dict[str, Any]]] = {span: [] for span in sections}
+        for v in violations:
+            current_text = v.get('current_text', '').strip()
+            pos = v.get('position')
+            if pos is None or content[pos:pos + len(current_text)] != current_text:
+                pos = content.find(current_text) if current_text else -1
+            span = next((s for s in sections if s[0] <= pos < s[1]), None)
+            if span is None:
+                # Can't tell which section it came from, so don't vouch for any
+                # of them: they are checked again next time.
+                return
+            by_section[span].append(dict(v, position=pos))
+        for (start, end), found in by_section.items():
+            self.memo.store(rule_hash, content[start:end], start, document.line_of(start), found)
+
+    def _base_prompt(self) -> str:
+        if self._base_prompt_text is None:
+            self._base_prompt_text = read_base_prompt(self.response_format)
+        return self._base_prompt_text
+
+    def _check_rule_cached(
+        self,
+        state: _ReviewState,
+        category: str,
+        rule: Dict[str, str],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Run the LLM check for one rule against the cached lecture prefix plus
+        the edits applied since (see create_cached_rule_prompt).
+
+        Returns:
+            Parsed violations, or None if the API call failed (logged as a warning)
+        """
+        base = state.cache_base
+        since_base = state.fix_log[state.cache_start:]
+        edits = []
+        for entry in since_base:
+            pos = base.find(entry['current_text']) if entry['current_text'] else -1
+            edits.append({
+                'current_text': entry['current_text'],
+                'suggested_fix': entry['suggested_fix'],
+                'line': base.count('\n', 0, pos) + 1 if pos != -1 else None,
+            })
+
+        # Fixes since the base are listed as edits; older ones keep the skip hint
+        already_fixed = [
+            fix for fix in state.category_fixes.get(category, [])
+            if not any(fix is entry for entry in since_base)
+        ]
+        prompt = create_cached_rule_prompt(category, rule, base, edits, already_fixed=already_fixed,
+                                           response_format=self.response_format)
+        try:
+            result = self._provider_for(rule).check_single_rule(prompt)
+        except PROVIDER_ERRORS as e:
+            warning = f"API error checking {rule['rule_id']}: {e}"
+            print(f"      ⚠️  {warning}")
+            state.warnings.append(warning)
+            return None
+        return result.get('violations', [])
+
+    def _dedupe(
+        self,
+        state: _ReviewState,
+        category: str,
+        rule_type: str,
+        violations: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Drop edits an earlier rule in this category already made or suggested;
+        the kept record picks up this rule's attribution.
+        """
+        if not violations:
+            return violations
+        if rule_type == 'rule':
+            violations, duplicates = dedupe_violations(
+                violations, state.category_fixes.get(category), state.content
+            )
+        else:
+            violations, duplicates = dedupe_violations(
+                violations, state.category_suggestions.get(category)
+            )
+        if duplicates:
+            print(f"      ℹ️  Merged {len(duplicates)} duplicate(s) of earlier {category} findings")
+        return violations
+
+    def _record_violations(
+        self,
+        state: _ReviewState,
+        category: str,
+        rule: Dict[str, str],
+        violations: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply ('rule' type) or collect (other types) one rule's violations.
+
+        Returns:
+            The violations whose fixes were actually applied
+        """
+        rule_type = rule.get('rule_type', 'rule')
+        print(f"      ✓ Found {len(violations)} violation(s)")
+
+        # Tool-mode findings carry no title; the rule knows it
+        for v in violations:
+            if not v.get('rule_title'):
+                v['rule_title'] = rule.get('title', '')
+
+        # Validate fix quality
+        validation_warnings = validate_fix_quality(violations)
+        if validation_warnings:
+            print(f"      ⚠️  Fix quality warnings: {len(validation_warnings)}")
+            state.warnings.extend(validation_warnings)
+
+        applied = []
+        # Separate by type - only auto-apply fixes for 'rule' type
+        if rule_type == 'rule':
+            if self.requote:
+                self._requote_unanchored(state, rule, violations)
+
+            # Apply fixes immediately to current content
+            corrected_content, apply_warnings, applied = apply_fixes(state.content, violations)
+
+            if apply_warnings:
+                state.warnings.extend(apply_warnings)
+
+            # Update current content for next rule
+            if corrected_content != state.content:
+                state.content = corrected_content
+                print(f"      ✓ Applied {len(applied)} fix(es) automatically - content updated for next rule")
+
+                # Log each actually-applied fix for region-based reporting
+                for v in applied:
+                    entry = {
+                        'rule_id': v.get('rule_id', 'unknown'),
+                        'rule_ids': v.get('rule_ids', [v.get('rule_id', 'unknown')]),
+                        'rule_title': v.get('rule_title', ''),
+                        'category': category,
+                        'current_text': v.get('current_text', '').strip(),
+                        'suggested_fix': v.get('suggested_fix', '').strip(),
+                        'description': v.get('description', ''),
+                        'explanation': v.get('explanation', ''),
+                        'location': v.get('location', ''),
+                    }
+                    state.fix_log.append(entry)
+                    state.category_fixes.setdefault(category, []).append(entry)
+            else:
+                print(f"      ⚠️  Could not apply fixes - content unchanged")
+
+            if self.prompt_cache and len(state.fix_log) - state.cache_start > self.cache_refresh_edits:
+                # The edit list now costs more than it saves - cache the current version instead
+                print(f"      ♻️  {len(state.fix_log) - state.cache_start} edits since the cached lecture - refreshing it")
+                state.cache_base = state.content
+                state.cache_start = len(state.fix_log)
+
+            # Store only actually-applied violations for reporting
+            state.rule_violations.extend(applied)
+        else:
+            # Style category - collect suggestions but don't auto-apply
+            print(f"      ℹ️  Style suggestions collected (not auto-applied) - requires human review")
+            state.style_violations.extend(violations)
+            state.category_suggestions.setdefault(category, []).extend(violations)
+
+        # Offsets are only meaningful for the content they were computed against
+        for v in violations:
+            v.pop('position', None)
+
+        # Store all violations for comprehensive reporting
+        state.violations.extend(violations)
+        return applied
+
+    def _requote_unanchored(
+        self,
+        state: _ReviewState,
+        rule: Dict[str, str],
+        violations: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Repair, in place, violations whose current_text is not in the content.
+
+        Each one is sent with a window of REQUOTE_WINDOW_LINES lines around its
+        reported location; if the reply quotes a span that is really there,
+        the violation is re-anchored at it (with the fix restated against it).
+        Violations without a line number, or that can't be repaired, are left
+        for apply_fixes() to skip as before.
+        """
+        content = state.content
+        lines = content.splitlines(keepends=True)
+        for v in violations:
+            current_text = v.get('current_text', '').strip()
+            suggested_fix = v.get('suggested_fix', '').strip()
+            if not current_text or not suggested_fix or current_text == suggested_fix:
+                continue
+            pos = v.get('position')
+            if (pos is not None and content[pos:pos + len(current_text)] == current_text) or current_text in content:
+                continue
+            reported = location_lines(v.get('location', ''))
+            if reported is None or reported[0] > len(lines):
+                continue
+
+            first = max(1, reported[0] - REQUOTE_WINDOW_LINES)
+            last = min(len(lines), reported[1] + REQUOTE_WINDOW_LINES)
+            start = sum(len(line) for line in lines[:first - 1])
+            end = start + sum(len(line) for line in lines[first - 1:last])
+            prompt = create_requote_prompt(v, content[start:end], first)
+            max_tokens = 64 + 2 * estimate_tokens(current_text + suggested_fix, self.calibration)
+            try:
+                repaired = parse_requote_response(self._provider_for(rule).requote(prompt, max_tokens))
+            except PROVIDER_ERRORS as e:
+                warning = f"API error re-quoting {v.get('rule_id', rule['rule_id'])}: {e}"
+                print(f"      ⚠️  {warning}")
+                state.warnings.append(warning)
+                continue
+            if repaired is None:
+                continue
+            found = content.find(repaired['current_text'], start, end)
+            if found == -1:
+                continue
+            print(f"      🩹 Re-quoted {v.get('rule_id', rule['rule_id'])} at {v.get('location', 'unknown')}")
+            v['current_text'] = repaired['current_text']
+            if repaired['suggested_fix'] is not None:
+                v['suggested_fix'] = repaired['suggested_fix']
+            v['position'] = found
+            v['requoted'] = True
+
+    def _review_concurrently(
+        self,
+        state: _ReviewState,
+        pending: List[Tuple[str, str, Dict[str, str], Optional[Dict[str, Any]]]],
+    ) -> None:
+        """
+        Check a batch of rules concurrently, then apply their fixes in order.
+
+        Used for a whole category in 'speculative' mode and for each wave in
+        'graph' mode. Every rule sees the same snapshot, so latency is roughly
+        that of the slowest call instead of the sum of all of them. Results are
+        then walked in evaluation order: a rule whose spans are disjoint from
+        the edits accepted so far has its fixes rebased through the EditMap and
+        applied; a rule whose spans overlap an earlier edit would have seen
+        different text in sequential mode, so it is re-run on the updated
+        content once the non-conflicting fixes are in.
+        """
+        snapshot = state.content
+        state.document  # Updated here once rather than raced by the workers
+        print(f"    ⚡ Checking {len(pending)} rules concurrently on one snapshot...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._check_rule, state, category, rule, snapshot, triage_record)
+                for category, _, rule, triage_record in pending
+            ]
+            results = [future.result() for future in futures]
+
+        edit_map = EditMap()
+        deferred = []
+        for (category, progress, rule, triage_record), violations in zip(pending, results):
+            rule_type = rule.get('rule_type', 'rule')
+            print(f"    ⏳ {rule['rule_id']}: {rule['title']} ({progress}) [type: {rule_type}]")
+            if violations is None:
+                continue
+            violations = self._dedupe(state, category, rule_type, violations)
+            if not violations:
+                print(f"      ✓ No violations")
+                continue
+
+            spans = {}
+            if rule_type == 'rule':
+                for v in violations:
+                    current_text = v.get('current_text', '').strip()
+                    start = v.get('position')
+                    if start is None or snapshot[start:start + len(current_text)] != current_text:
+                        start = snapshot.find(current_text) if current_text else -1
+                    if start != -1:
+                        spans[id(v)] = (start, start + len(current_text))
+                if any(edit_map.overlaps(start, end) for start, end in spans.values()):
+                    print(f"      ↻ Overlaps an earlier rule's edits - will re-run on updated content")
+                    deferred.append((category, progress, rule, triage_record))
+                    continue
+                for v in violations:
+                    if id(v) in spans:
+                        v['position'] = edit_map.to_current(spans[id(v)][0])
+
+            applied = self._record_violations(state, category, rule, violations)
+            for v in applied:
+                if id(v) in spans:
+                    start, end = spans[id(v)]
+                    edit_map.record(start, end, len(v.get('suggested_fix', '').strip()))
+
+        for category, progress, rule, triage_record in deferred:
+            self._review_rule(state, category, rule, f"{progress}, re-run", triage_record)
+
+    def _triage_category(
+        self,
+        category: str,
+        rules: List[Dict[str, str]],
+        content: str,
+        warnings: List[str],
+    ) -> Dict[str, str]:
+        """
+        Screen a category's rules with the triage model in one batched call.
+
+        Fails open: if the triage call errors, every rule gets the full check.
+
+        Returns:
+            Dict mapping rule_id to 'yes', 'maybe', or 'no' ({} on failure)
+        """
+        rule_ids = [rule['rule_id'] for rule in rules]
+        try:
+            prompt = create_triage_prompt(category, rules, content)
+            decisions = self.triage_provider.triage_rules(prompt, rule_ids)
+        except PROVIDER_ERRORS as e:
+            warning = f"Triage failed for {category}, checking all rules: {e}"
+            print(f"    ⚠️  {warning}")
+            warnings.append(warning)
+            return {}
+
+        escalated = sum(1 for d in decisions.values() if d in TRIAGE_ESCALATE)
+        print(f"    🔎 Triage: {escalated}/{len(rule_ids)} rules escalated to full check")
+        return decisions
+
     def review_lecture_smart(
         self,
         content: str,
@@ -0,0 +1,144 @@
+"""
+Tests for citation_analyzer.py — bibliography index and static checks of the citation rule
+"""
+
+from style_checker.analyzers import analyze_rule, is_analyzed
+from style_checker.citation_analyzer import Bibliography, bibtex_files, decides, parse_bibtex
+from style_checker.document import MystDocument
+from style_checker.fix_applier import apply_fixes
+from style_checker.reviewer import extract_individual_rules
+
+
+BIB = r"""
+@string{jpe = "Journal of Political Economy"}
+
+@book{StokeyLucas1989,
+  author = {Stokey, Nancy L. and Robert E. {Lucas, Jr.} and Edward C. Prescott},
+  title = {Recursive Methods in {Economic} Dynamics},
+  year = 1989,
+}
+
+@book{Bellman1957,
+  author = "Richard Bellman",
+  title = "Dynamic Programming",
+  year = {1957}
+}
+
+@article{Godel1931,
+  author = {Kurt G{\"o}del},
+  date = {1931-01},
+}
+
+@techreport{WorldBank2020, author = {{World Bank}}, year = {2020}}
+"""
+
+BIBLIOGRAPHY = Bibliography.from_texts([BIB])
+
+
+def _check(content):
+    return analyze_rule(MystDocument(content), {'rule_id': 'qe-ref-001', 'title': 'Title'},
+                        bibliography=BIBLIOGRAPHY)
+
+
+def _fixed(content):
+    corrected, _, _ = apply_fixes(content, _check(content))
+    return corrected
+
+
+class TestBibliography:
+    """Test parse_bibtex() and Bibliography lookups"""
+
+    def test_entries(self):
+        entries = parse_bibtex(BIB)
+        assert set(entries) == {'StokeyLucas1989', 'Bellman1957', 'Godel1931', 'WorldBank2020'}
+        assert entries['StokeyLucas1989']['authors'] == ['Stokey', 'Lucas', 'Prescott']
+        assert entries['Godel1931'] == {'type': 'article', 'authors': ['Godel'], 'year': '1931'}
+        assert entries['WorldBank2020']['authors'] == ['World Bank']
+
+    def test_matches(self):
+        assert BIBLIOGRAPHY.matches(['Stokey', 'Lucas'], '1989') == ['StokeyLucas1989']
+        assert BIBLIOGRAPHY.matches(['stokey'], '1989') == ['StokeyLucas1989']
+        assert BIBLIOGRAPHY.matches(['Lucas'], '1989') == []
+        assert BIBLIOGRAPHY.matches(['Bellman'], '1958') == []
+
+    def test_bibtex_files(self):
+        assert bibtex_files("sphinx:\n  bibtex_bibfiles:\n    - _static/quant-econ.bib\n    - b.bib\n"
+                            "  other: 1\n") == ['_static/quant-econ.bib', 'b.bib']
+        assert bibtex_files('bibtex_bibfiles: ["a.bib", b.bib]\n') == ['a.bib', 'b.bib']
+        assert bibtex_files("title: Book\n") == []
+
+    def test_from_directory(self, tmp_path):
+        (tmp_path / '_static').mkdir()
+        (tmp_path / '_static' / 'refs.bib').write_text(BIB, encoding='utf-8')
+        (tmp_path / 'unused.bib').write_text("@book{Other, year = 2000}", encoding='utf-8')
+        (tmp_path / '_config.yml').write_text("bibtex_bibfiles:\n  - _static/refs.bib\n", encoding='utf-8')
+        assert 'Other' not in Bibliography.from_directory(tmp_path)
+        assert 'Bellman1957' in Bibliography.from_directory(tmp_path)
+        (tmp_path / '_config.yml').unlink()
+        assert len(Bibliography.from_directory(tmp_path)) == 5
+
+
+class TestCitationRoles:
+    """qe-ref-001: {cite} vs {cite:t} by position"""
+
+    def test_in_text_position(self):
+        content = "The work of {cite}`Bellman1957` shows this.\n\n{cite:p}`Bellman1957` introduced it.\n"
+        fixed = _fixed(content)
+        assert "The work of {cite:t}`Bellman1957` shows this." in fixed
+        assert "{cite:t}`Bellman1957` introduced it." in fixed
+
+    def test_parenthetical_position(self):
+        assert "has been proven {cite}`StokeyLucas1989`." in _fixed(
+            "This result has been proven {cite:t}`StokeyLucas1989`.\n")
+
+    def test_correct_roles_left_alone(self):
+        content = ("This was proven by {cite:t}`StokeyLucas1989`.\n\n"
+                   "Dynamic programming is useful {cite}`Bellman1957,StokeyLucas1989`.\n\n"
+                   "- {cite:t}`Bellman1957` introduced it, e.g. {cite:t}`Godel1931` too.\n")
+        assert _check(content) == []
+
+    def test_unknown_keys_reported(self):
+        violation, = _check("This is well known {cite}`Bellman1957,Missing2001`.\n")
+        assert violation['description'] == "`Missing2001` not in the bibliography"
+        assert violation['suggested_fix'] == ''
+
+
+class TestManualCitations:
+    """qe-ref-001: author (year) text"""
+
+    def test_in_text_mention_with_role(self):
+        content = "Bellman (1957) introduced dynamic programming {cite}`Bellman1957`.\n"
+        assert _fixed(content) == "{cite:t}`Bellman1957` introduced dynamic programming.\n"
+
+    def test_mention_of_one_of_several_keys(self):
+        content = "As Stokey and Lucas (1989) show, it holds {cite}`StokeyLucas1989,Bellman1957`.\n"
+        assert _fixed(content) == "As {cite:t}`StokeyLucas1989` show, it holds {cite}`Bellman1957`.\n"
+
+    def test_mentions_without_role(self):
+        content = "This is standard (Bellman, 1957) and known (Stokey et al., 1989).\n"
+        assert _fixed(content) == "This is standard {cite}`Bellman1957` and known {cite}`StokeyLucas1989`.\n"
+
+    def test_parenthetical_mention_with_role(self):
+        content = "This is standard (Bellman, 1957) {cite}`Bellman1957`.\n"
+        assert _fixed(content) == "This is standard {cite}`Bellman1957`.\n"
+
+
+class TestAmbiguity:
+    """Lectures the checks can't decide go to the model"""
+
+    def test_unmatched_mention(self):
+        document = MystDocument("Keynes (1936) argued otherwise.\n")
+        assert not decides(document, BIBLIOGRAPHY)
+        assert not is_analyzed('qe-ref-001', bibliography=BIBLIOGRAPHY, document=document)
+
+    def test_unclear_role_position(self):
+        assert not decides(MystDocument("The results {cite}`Bellman1957` are general.\n"), BIBLIOGRAPHY)
+
+    def test_math_and_code_ignored(self):
+        document = MystDocument("Compute $f (2020)$ with `Model (2020)` as usual {cite}`Bellman1957`.\n")
+        assert decides(document, BIBLIOGRAPHY)
+
+    def test_rule_needs_a_bibliography(self):
+        assert {r['rule_id'] for r in extract_individual_rules('references')} >= {'qe-ref-001'}
+        assert not is_analyzed('qe-ref-001')
+        assert is_analyzed('qe-ref-001', bibliography=Bibliography())
@@ -15,7 +15,9 @@ import os
 import tempfile
 from pathlib import Path
 
-from style_checker.cli import format_report, default_report_path, check_git_dirty
+import pytest
+
+from style_checker.cli import format_report, default_report_path, check_git_dirty, collect_lectures, plan_main
 from style_checker.categories import VALID_CATEGORIES
 from style_checker import __version__
 
@@ -121,6 +123,13 @@ class TestFormatReport:
         assert 'Warnings (1)' in report
         assert 'Fix quality warning' in report
 
+    def test_skipped_rules_listed(self):
+        result = self._make_result()
+        result['skipped_rules'] = [{'rule_id': 'qe-code-004', 'title': 'Timer', 'reason': 'no trigger match'}]
+        report = format_report(result, 'lecture.md', dry_run=False)
+
+        assert 'Skipped (no trigger match):** 1 rule(s) — qe-code-004' in report
+
     def test_mixed_results(self):
         rule_v = [{'rule_id': 'qe-math-001', 'rule_title': 'Unicode'}]
         style_v = [{'rule_id': 'qe-writing-002', 'rule_title': 'Clarity'}]
@@ -257,6 +266,35 @@ class TestCategories:
 # CLI invocation tests (subprocess)
 # ---------------------------------------------------------------------------
 
+class TestPlanPaths:
+    """Test how `qestyle plan` names lectures and finds their book"""
+
+    def test_same_name_in_two_directories(self, tmp_path):
+        (tmp_path / '_toc.yml').write_text('format: jb-book\n')
+        for directory in ('a', 'b'):
+            (tmp_path / directory).mkdir()
+            (tmp_path / directory / 'intro.md').write_text(f'# {directory}\n')
+        lectures = collect_lectures([str(tmp_path / 'a'), str(tmp_path / 'b' / 'intro.md')])
+        assert lectures == {'a/intro': '# a\n', 'b/intro': '# b\n'}
+
+    def test_same_name_in_two_books(self, tmp_path):
+        for book in ('one', 'two'):
+            (tmp_path / book).mkdir()
+            (tmp_path / book / 'intro.md').write_text(f'# {book}\n')
+        lectures = collect_lectures([str(tmp_path / 'one'), str(tmp_path / 'two')])
+        assert lectures == {'intro': '# one\n', (tmp_path / 'two' / 'intro.md').as_posix(): '# two\n'}
+
+    def test_static_analysis_rejects_several_books(self, tmp_path, capsys):
+        for book in ('one', 'two'):
+            (tmp_path / book).mkdir()
+            (tmp_path / book / '_toc.yml').write_text('format: jb-book\n')
+            (tmp_path / book / 'intro.md').write_text('# Intro\n')
+        with pytest.raises(SystemExit):
+            plan_main([str(tmp_path / 'one'), str(tmp_path / 'two'), '--static-analysis',
+                       '--usage-ledger', ''])
+        assert 'one book at a time' in capsys.readouterr().err
+
+
 class TestCLIInvocation:
     """Tests for the qestyle command-line interface."""
 
@@ -317,3 +355,18 @@ class TestCLIInvocation:
             assert 'ANTHROPIC_API_KEY' in result.stderr
         finally:
             tmp.unlink(missing_ok=True)
+
+    def test_plan_subcommand(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lecture = Path(tmpdir) / 'lecture.md'
+            lecture.write_text('# Test\n\nHello world.\n')
+            result = subprocess.run(
+                ['qestyle', 'plan', tmpdir, '--categories', 'writing',
+                 '--usage-ledger', str(Path(tmpdir) / 'usage.jsonl')],
+                capture_output=True, text=True,
+                # No API key: planning never calls the API
+                env={k: v for k, v in __import__('os').environ.items() if k != 'ANTHROPIC_API_KEY'},
+            )
+            assert result.returncode == 0, result.stderr
+            assert '# Review Plan' in result.stdout
+            assert '| lecture |' in result.stdout
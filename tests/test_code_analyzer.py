@@ -0,0 +1,227 @@
+"""
+Tests for code_analyzer.py — static checks of code-cell rules
+"""
+
+import pytest
+
+from style_checker.code_analyzer import ANALYZED_RULES, analyze_rule, code_cells
+from style_checker.document import MystDocument
+from style_checker.fix_applier import apply_fixes
+from style_checker.reviewer import extract_individual_rules
+
+
+def _cell(source, info='ipython3'):
+    return f"# Lecture\n\nSome prose.\n\n```{{code-cell}} {info}\n{source}```\n"
+
+
+def _check(rule_id, content):
+    return analyze_rule(MystDocument(content), {'rule_id': rule_id, 'title': 'Title'})
+
+
+def _fixed(rule_id, content):
+    corrected, _, _ = apply_fixes(content, _check(rule_id, content))
+    return corrected
+
+
+class TestCodeCells:
+    """Test code-cell extraction and parsing"""
+
+    def test_options_and_fences_excluded(self):
+        content = _cell(":tags: [hide-output]\nx = 1\n")
+        cell, = code_cells(MystDocument(content))
+        assert cell.lines == ['x = 1']
+        assert content[cell.line_offsets[0]:].startswith('x = 1')
+
+    def test_yaml_options_excluded(self):
+        cell, = code_cells(MystDocument(_cell("---\ntags: [hide-input]\n---\nx = 1\n")))
+        assert cell.lines == ['x = 1']
+
+    def test_magics_tolerated(self):
+        cell, = code_cells(MystDocument(_cell("!pip install quantecon\n%timeit f(1)\nfiles = !ls\nx = 1\n")))
+        assert cell.tree is not None
+        assert cell.magics == {2: ('timeit', 'f(1)')}
+
+    def test_python_cell_magic(self):
+        cell, = code_cells(MystDocument(_cell("%%time\nx = f(1)\n")))
+        assert cell.cell_magic == ('time', '')
+        assert cell.tree is not None
+
+    def test_other_cells_skipped(self):
+        content = _cell("%%bash\nls\n") + _cell("x = (", info='python') + _cell("x = 1\n", info='julia')
+        cells = code_cells(MystDocument(content))
+        assert [cell.tree for cell in cells] == [None, None]
+
+    def test_positions_after_unicode(self):
+        content = _cell("α = 1; ax.plot(x, y)\n")
+        violation, = _check('qe-fig-008', content)
+        assert content[violation['position']:].startswith(violation['current_text'])
+        assert violation['suggested_fix'] == "α = 1; ax.plot(x, y, lw=2)"
+
+
+class TestGreekNames:
+    """qe-code-002"""
+
+    def test_bound_names_renamed_everywhere(self):
+        content = _cell("alpha, beta_hat = 0.5, 0.9\n") + _cell(
+            "def u(c, alpha=alpha):\n    return c ** (1 - alpha) * beta_hat\n\nu(1.0, alpha=0.3)\n"
+        )
+        fixed = _fixed('qe-code-002', content)
+        assert "α, β_hat = 0.5, 0.9" in fixed
+        assert "def u(c, α=α):\n    return c ** (1 - α) * β_hat" in fixed
+        assert "u(1.0, α=0.3)" in fixed
+
+    def test_external_keywords_and_attributes_kept(self):
+        fixed = _fixed('qe-code-002', _cell("alpha = 0.5\nax.plot(x, y, alpha=alpha)\nm.alpha = alpha\n"))
+        assert "ax.plot(x, y, alpha=α)" in fixed
+        assert "m.alpha = α" in fixed
+
+    @pytest.mark.parametrize('source', [
+        "from scipy.stats import beta\nbeta.pdf(0.5, 2, 3)\n",      # Imported
+        "def gamma(x):\n    return x\n",                            # Function name
+        "class Model:\n    alpha = 0.5\n",                          # Class attribute
+        "alpha = 0.5\nα = 1\n",                                     # Symbol already used
+        "def f(alpha):\n    return alpha\nf(**{'alpha': 1})\n",      # Passed by keyword dict
+        "print(alpha)\n",                                           # Never bound here
+    ])
+    def test_unsafe_names_left_alone(self, source):
+        assert _check('qe-code-002', _cell(source)) == []
+
+    def test_names_in_unparsed_cells_left_alone(self):
+        content = _cell("alpha, beta = 0.5, 0.9\n") + _cell(
+            ":tags: [raises-exception]\nprint(alpha +)\n"
+        )
+        fixed = _fixed('qe-code-002', content)
+        assert "alpha, β = 0.5, 0.9" in fixed
+        assert "print(alpha +)" in fixed
+
+    def test_one_violation_per_line(self):
+        violations = _check('qe-code-002', _cell("alpha = 1\nbeta = alpha + alpha\n"))
+        assert [v['location'] for v in violations] == ['Line 6', 'Line 7']
+        assert violations[1]['description'] == "`beta` → `β`; `alpha` → `α`"
+
+
+class TestTiming:
+    """qe-code-004 and qe-code-005"""
+
+    def test_manual_timing_wrapped_in_timer(self):
+        content = _cell("import time\nstart = time.time()\nx = f(1)\nprint(time.time() - start)\n")
+        violation, = _check('qe-code-004', content)
+        assert violation['current_text'] == "start = time.time()\nx = f(1)\nprint(time.time() - start)"
+        assert violation['suggested_fix'] == "with qe.Timer():\n    x = f(1)"
+
+    def test_nested_timing_reported_once(self):
+        content = _cell("from time import perf_counter\nfor i in range(3):\n"
+                        "    t0 = perf_counter()\n    f(i)\n    print(perf_counter() - t0)\n")
+        assert len(_check('qe-code-004', content)) == 1
+
+    def test_tic_toc_and_time_magics(self):
+        assert len(_check('qe-code-004', _cell("tic()\nf(1)\ntoc()\n"))) == 1
+        violation, = _check('qe-code-004', _cell("%time f(1)\n"))
+        assert violation['suggested_fix'] == "with qe.Timer():\n    f(1)"
+        violation, = _check('qe-code-004', _cell("%%time\nx = f(1)\n"))
+        assert violation['current_text'] == "%%time\nx = f(1)"
+
+    def test_timeit_magics(self):
+        violation, = _check('qe-code-005', _cell("%timeit -n 10 f(1)\n"))
+        assert violation['suggested_fix'] == "qe.timeit(lambda: f(1), number=10)"
+        violation, = _check('qe-code-005', _cell("%%timeit\nx = f(1)\ny = g(x)\n"))
+        assert violation['suggested_fix'] == "def run():\n    x = f(1)\n    y = g(x)\n\nqe.timeit(run)"
+
+    def test_timeit_module(self):
+        violation, = _check('qe-code-005', _cell("import timeit\ntimeit.timeit(lambda: f(1), number=100)\n"))
+        assert violation['suggested_fix'] == "qe.timeit(lambda: f(1), number=100)"
+
+    def test_timing_rules_are_suggestions(self):
+        rules = {r['rule_id']: r for r in extract_individual_rules('code')}
+        assert rules['qe-code-004']['rule_type'] == rules['qe-code-005']['rule_type'] == 'migrate'
+
+
+class TestFigureRules:
+    """qe-fig-003, qe-fig-007 and qe-fig-008"""
+
+    def test_titles_removed(self):
+        content = _cell("fig, ax = plt.subplots()\nax.plot(x, y)\nax.set_title('GDP')\n"
+                        "fig.suptitle('All')\ndf.plot(y='gdp', title='GDP')\n")
+        fixed = _fixed('qe-fig-003', content)
+        assert "fig, ax = plt.subplots()\nax.plot(x, y)\ndf.plot(y='gdp')\n```" in fixed
+
+    def test_title_in_first_line_anchored_to_next(self):
+        fixed = _fixed('qe-fig-003', _cell("plt.title('GDP')\nplt.show()\n"))
+        assert "```{code-cell} ipython3\nplt.show()\n```" in fixed
+
+    def test_titles_allowed_in_exercises(self):
+        content = "```{exercise-start}\n:label: ex1\n```\n\n" + _cell("ax.set_title('GDP')\n") + \
+                  "\n```{exercise-end}\n```\n"
+        assert _check('qe-fig-003', content) == []
+
+    def test_spine_removal_deleted(self):
+        content = _cell("fig, ax = plt.subplots()\nax.spines['top'].set_visible(False)\n"
+                        "for side in ['right', 'left']:\n    ax.spines[side].set_visible(False)\n"
+                        "ax.spines[['top', 'right']].set_visible(True)\nplt.show()\n")
+        fixed = _fixed('qe-fig-007', content)
+        assert ("fig, ax = plt.subplots()\nax.spines[['top', 'right']].set_visible(True)\nplt.show()"
+                in fixed)
+
+    def test_line_width(self):
+        content = _cell("ax.plot(x, y, label='a')\nax.plot(x, y, linewidth=1.5)\nax.plot(x, y, lw=2)\n"
+                        "ax.plot(x, y, 'o')\nax.plot(x, y, 'ro', alpha=0.5)\nax.plot(x, y, lw=width)\n"
+                        "df.plot(kind='bar')\nax.plot(x, y, **style)\n")
+        fixed = _fixed('qe-fig-008', content)
+        assert "ax.plot(x, y, label='a', lw=2)\nax.plot(x, y, lw=2)\nax.plot(x, y, lw=2)\n" in fixed
+        assert "ax.plot(x, y, 'o')\nax.plot(x, y, 'ro', alpha=0.5)\nax.plot(x, y, lw=width)\n" in fixed
+        assert "df.plot(kind='bar')\nax.plot(x, y, **style)\n" in fixed
+
+    def test_multiline_call(self):
+        fixed = _fixed('qe-fig-008', _cell("ax.plot(x,\n        y,\n        label='a')\n"))
+        assert "ax.plot(x,\n        y,\n        label='a', lw=2)" in fixed
+
+
+class TestPRNGKeys:
+    """qe-jax-006"""
+
+    def test_numpy_random_in_jax_lecture(self):
+        content = _cell("import jax\nimport numpy as np\nnp.random.seed(42)\n"
+                        "shocks = np.random.normal(0, 1, 100)\nu = np.random.uniform(size=(2, 3))\n")
+        fixes = [v['suggested_fix'] for v in _check('qe-jax-006', content)]
+        assert fixes == [
+            "key = jax.random.PRNGKey(42)",
+            "key, subkey = jax.random.split(key)\nshocks = jax.random.normal(subkey, (100,))",
+            "key, subkey = jax.random.split(key)\nu = jax.random.uniform(subkey, (2, 3))",
+        ]
+
+    def test_split_inside_loop_keeps_indentation(self):
+        content = _cell("import jax\nimport numpy as np\nkey = jax.random.PRNGKey(0)\n"
+                        "for t in range(3):\n    x = np.random.randn(2)\n")
+        assert _fixed('qe-jax-006', content) == _cell(
+            "import jax\nimport numpy as np\nkey = jax.random.PRNGKey(0)\n"
+            "for t in range(3):\n    key, subkey = jax.random.split(key)\n"
+            "    x = jax.random.normal(subkey, (2,))\n")
+
+    def test_generators_not_rewritten(self):
+        content = _cell("import jax\nimport numpy as np\nrng = np.random.default_rng(0)\nx = rng.normal()\n")
+        violations = _check('qe-jax-006', content)
+        assert [(v['current_text'], v['suggested_fix']) for v in violations] == [
+            ("rng = np.random.default_rng(0)", ""),
+        ]
+
+    def test_draws_without_a_splittable_key_not_rewritten(self):
+        content = _cell("import jax\nimport numpy as np\nnp.random.seed(0)\n"
+                        "def draw():\n    return np.random.rand()\n"
+                        "z = np.random.rand() + np.random.randn()\n")
+        fixes = [v['suggested_fix'] for v in _check('qe-jax-006', content)]
+        assert fixes == ["key = jax.random.PRNGKey(0)", "", ""]
+
+    def test_draws_without_a_key_not_rewritten(self):
+        content = _cell("import jax\nimport numpy as np\nx = np.random.rand()\n")
+        assert [v['suggested_fix'] for v in _check('qe-jax-006', content)] == [""]
+
+    def test_numpy_lectures_not_flagged(self):
+        assert _check('qe-jax-006', _cell("import numpy as np\nnp.random.seed(42)\n")) == []
+
+
+class TestAnalyzedRules:
+    """ANALYZED_RULES against the rule files"""
+
+    def test_analyzed_rules_exist(self):
+        rule_ids = {r['rule_id'] for c in ('code', 'figures', 'jax') for r in extract_individual_rules(c)}
+        assert ANALYZED_RULES <= rule_ids
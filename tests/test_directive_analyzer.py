@@ -0,0 +1,121 @@
+"""
+Tests for directive_analyzer.py — directive nesting tree and admonition checks
+"""
+
+from style_checker.analyzers import ANALYZED_RULES, analyze_rule
+from style_checker.directive_analyzer import directive_tree, directives
+from style_checker.document import MystDocument
+from style_checker.fix_applier import apply_fixes
+from style_checker.reviewer import extract_individual_rules
+
+
+EXERCISE = """# Lecture
+
+```{exercise}
+:label: ex1
+
+Compute this.
+
+```{code-cell} ipython3
+x = 1
+```
+```
+"""
+
+
+def _check(rule_id, content):
+    return analyze_rule(MystDocument(content), {'rule_id': rule_id, 'title': 'Title'})
+
+
+def _fixed(rule_id, content):
+    corrected, _, _ = apply_fixes(content, _check(rule_id, content))
+    return corrected
+
+
+class TestDirectiveTree:
+    """Test directive_tree() and Directive nodes"""
+
+    def test_nesting_labels_and_fences(self):
+        root, = directive_tree(MystDocument(EXERCISE))
+        assert (root.name, root.label, root.fence) == ('exercise', 'ex1', '```')
+        child, = root.children
+        assert child.name == 'code-cell' and child.parent is root
+        assert EXERCISE[root.header_end:].startswith('\nCompute this.')
+
+    def test_plain_fences_and_colon_fences(self):
+        content = ":::{note}\n```python\nx = 1\n```\n:::\n"
+        nodes = directives(MystDocument(content))
+        assert [(n.name, n.fence) for n in nodes] == [('note', ':::'), (None, '```')]
+        assert content[nodes[0].closing[0]:nodes[0].closing[1]] == ':::'
+
+    def test_unclosed_fence(self):
+        root, = directive_tree(MystDocument("```{note}\nText\n"))
+        assert root.closing is None
+
+
+class TestGatedExercises:
+    """qe-admon-001"""
+
+    def test_exercise_with_code_gated(self):
+        fixed = _fixed('qe-admon-001', EXERCISE)
+        assert fixed == ("# Lecture\n\n```{exercise-start}\n:label: ex1\n```\n\nCompute this.\n\n"
+                         "```{code-cell} ipython3\nx = 1\n```\n\n```{exercise-end}\n```\n")
+
+    def test_plain_exercise_left_alone(self):
+        assert _check('qe-admon-001', "```{exercise}\n:label: ex1\n\nCompute this.\n```\n") == []
+
+
+class TestTickCounts:
+    """qe-admon-003"""
+
+    def test_outer_fences_grow(self):
+        content = "````{note}\n```{note}\n```{code-cell}\nx\n```\n```\n````\n"
+        violation, = _check('qe-admon-003', content)
+        assert violation['suggested_fix'] == "`````{note}\n````{note}\n```{code-cell}\nx\n```\n````\n`````"
+
+    def test_correct_nesting_and_other_fence_kinds(self):
+        assert _check('qe-admon-003', "````{note}\n```{code-cell}\nx\n```\n````\n") == []
+        assert _check('qe-admon-003', ":::{note}\n```{code-cell}\nx\n```\n:::\n") == []
+
+
+class TestProofPrefix:
+    """qe-admon-004"""
+
+    def test_directives_and_references_prefixed(self):
+        content = "```{theorem} Big\n:label: thm1\n\nText.\n```\n\nSee {ref}`thm1` and {ref}`sec`.\n"
+        fixed = _fixed('qe-admon-004', content)
+        assert "```{prf:theorem} Big" in fixed
+        assert "See {prf:ref}`thm1` and {ref}`sec`." in fixed
+
+    def test_prefixed_directives_left_alone(self):
+        assert _check('qe-admon-004', "```{prf:lemma}\n:label: l1\nText.\n```\n\n{prf:ref}`l1`\n") == []
+
+
+class TestSolutionLinks:
+    """qe-admon-005"""
+
+    def test_missing_label_taken_from_exercise(self):
+        content = "```{exercise}\n:label: ex1\nQ.\n```\n\n```{solution}\n:class: dropdown\nA.\n```\n"
+        assert "```{solution} ex1\n:class: dropdown" in _fixed('qe-admon-005', content)
+
+    def test_label_of_something_else(self):
+        content = "(sec)=\n## Section\n\n```{exercise}\nQ.\n```\n\n```{solution} sec\nA.\n```\n"
+        violation, = _check('qe-admon-005', content)
+        assert violation['suggested_fix'] == ''
+        assert 'not an exercise' in violation['description']
+
+    def test_linked_and_external_solutions_left_alone(self):
+        content = ("```{exercise-start}\n:label: ex1\n```\nQ.\n```{exercise-end}\n```\n\n"
+                   "```{solution-start} ex1\n```\nA.\n```{solution-end}\n```\n\n"
+                   "```{solution} other_lecture_ex\nA.\n```\n")
+        assert _check('qe-admon-005', content) == []
+
+
+class TestAnalyzedRules:
+    """Admonition rules in analyzers.ANALYZED_RULES"""
+
+    def test_structural_admonition_rules_analyzed(self):
+        rule_ids = {r['rule_id'] for r in extract_individual_rules('admonitions')}
+        analyzed = {rule_id for rule_id in ANALYZED_RULES if rule_id.startswith('qe-admon-')}
+        assert analyzed <= rule_ids
+        assert analyzed == {'qe-admon-001', 'qe-admon-003', 'qe-admon-004', 'qe-admon-005'}
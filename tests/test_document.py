@@ -0,0 +1,168 @@
+"""
+Tests for document.py — MystDocument parsing and incremental updates
+"""
+
+from style_checker.document import MystDocument, parse_document
+
+
+LECTURE = """---
+jupytext:
+  text_representation:
+    extension: .md
+---
+
+(intro)=
+# Lecture Title
+
+We use $\\alpha$, a [link](https://example.com) and {cite}`Sargent2020, Ljungqvist2018`.
+Code like `$x$` is not math. See {doc}`the intro <intro_lecture>`.
+
+```{code-cell} ipython3
+---
+tags: [hide-output]
+---
+!pip install quantecon
+```
+
+$$
+x = y
+$$ (eq:first)
+
+````{exercise}
+:label: ex1
+
+Solve it with {ref}`intro`.
+
+```{code-cell} ipython3
+print(1)
+```
+````
+
+## Section
+
+Closing paragraph.
+"""
+
+
+def _kinds(document):
+    return [(block['kind'], block['depth']) for block in document.blocks]
+
+
+class TestParse:
+    """Test block and inline parsing"""
+
+    def test_blocks(self):
+        document = MystDocument(LECTURE)
+        assert _kinds(document) == [
+            ('frontmatter', 0), ('target', 0), ('heading', 0), ('paragraph', 0),
+            ('code', 0), ('math', 0), ('directive', 0), ('paragraph', 1),
+            ('code', 1), ('heading', 0), ('paragraph', 0),
+        ]
+
+    def test_directive_metadata(self):
+        document = MystDocument(LECTURE)
+        code_cell = document.blocks_of('code')[0]
+        assert code_cell['name'] == 'code-cell'
+        assert code_cell['options'] == {'tags': '[hide-output]'}
+        exercise = document.blocks_of('directive')[0]
+        assert exercise['name'] == 'exercise'
+        assert exercise['label'] == 'ex1'
+
+    def test_headings(self):
+        headings = MystDocument(LECTURE).blocks_of('heading')
+        assert [(h['level'], h['title']) for h in headings] == [(1, 'Lecture Title'), (2, 'Section')]
+
+    def test_labels(self):
+        document = MystDocument(LECTURE)
+        assert set(document.labels) == {'intro', 'eq:first', 'ex1'}
+
+    def test_inlines(self):
+        document = MystDocument(LECTURE)
+        assert [i['text'] for i in document.inlines_of('math')] == ['$\\alpha$']
+        assert [i['target'] for i in document.inlines_of('link')] == ['https://example.com', 'intro_lecture']
+        assert document.citations[0]['keys'] == ['Sargent2020', 'Ljungqvist2018']
+        assert document.inlines_of('ref')[0]['target'] == 'intro'
+
+    def test_spans_and_lines(self):
+        document = MystDocument(LECTURE)
+        math = document.blocks_of('math')[0]
+        assert document.text(math).startswith('$$\nx = y\n$$')
+        assert document.line_span(math['start'], math['end']) == (20, 22)
+        assert document.block_at(LECTURE.index('print(1)'))['name'] == 'code-cell'
+
+    def test_unclosed_fence_runs_to_end(self):
+        document = MystDocument("Text.\n\n```python\nx = 1\n")
+        assert _kinds(document) == [('paragraph', 0), ('code', 0)]
+        assert document.blocks[-1]['end'] == len(document.content)
+
+
+class TestFragments:
+    """Test region spans and line-aligned fragments"""
+
+    def _lines(self, regions):
+        return [(f['first_line'], f['last_line']) for f in MystDocument(LECTURE).fragments(regions)]
+
+    def test_code_fragments(self):
+        assert self._lines(['code']) == [(13, 18), (29, 31)]
+
+    def test_link_and_citation_lines(self):
+        assert self._lines(['citations']) == [(10, 10)]
+        assert self._lines(['links']) == [(10, 11), (27, 27)]
+
+    def test_math_includes_adjacent_prose(self):
+        assert self._lines(['math']) == [(10, 11), (20, 22)]
+
+    def test_nearby_spans_merge(self):
+        assert self._lines(['headings', 'prose'])[0] == (8, 11)
+
+    def test_sections_split_at_top_level_headings(self):
+        document = MystDocument(LECTURE)
+        sections = document.sections()
+        # Front matter, then '(intro)=' stays with its heading
+        assert [document.line_of(start) for start, _ in sections] == [1, 7, 34]
+        assert ''.join(LECTURE[start:end] for start, end in sections) == LECTURE
+
+    def test_unknown_region_is_whole_document(self):
+        document = MystDocument(LECTURE)
+        assert document.region_spans(['everything']) == [(0, len(LECTURE))]
+
+
+class TestCache:
+    """Test per-version caching"""
+
+    def test_same_content_parsed_once(self):
+        assert parse_document(LECTURE) is parse_document(LECTURE)
+
+    def test_update_to_same_content_is_noop(self):
+        document = parse_document(LECTURE)
+        assert document.update(LECTURE) is document
+
+
+class TestIncrementalUpdate:
+    """Incremental updates must match a full re-parse"""
+
+    def _check(self, new_content):
+        updated = MystDocument(LECTURE).update(new_content)
+        fresh = MystDocument(new_content)
+        assert updated.blocks == fresh.blocks
+        assert updated.inlines == fresh.inlines
+        assert updated.labels == fresh.labels
+        return updated
+
+    def test_edit_inside_paragraph(self):
+        updated = self._check(LECTURE.replace('$\\alpha$', 'α'))
+        assert updated.inlines_of('math') == []
+
+    def test_edit_shifts_later_blocks(self):
+        self._check(LECTURE.replace('Closing paragraph.', 'A much longer closing paragraph.'))
+        self._check(LECTURE.replace('# Lecture Title', '# A Longer Lecture Title'))
+
+    def test_blank_line_removed_merges_paragraphs(self):
+        updated = self._check(LECTURE.replace('## Section\n\nClosing', '## Section\nClosing'))
+        assert updated.blocks[-1]['kind'] == 'paragraph'
+
+    def test_removed_closing_fence(self):
+        self._check(LECTURE.replace('print(1)\n```\n', 'print(1)\n'))
+
+    def test_frontmatter_edit(self):
+        self._check(LECTURE.replace('extension: .md', 'extension: .markdown'))
@@ -2,7 +2,7 @@
 Tests for fix_applier.py — apply_fixes() and validate_fix_quality()
 """
 
-from style_checker.fix_applier import apply_fixes, validate_fix_quality
+from style_checker.fix_applier import EditMap, apply_fixes, dedupe_violations, validate_fix_quality
 
 
 class TestApplyFixes:
@@ -203,6 +203,51 @@ class TestApplyFixes:
         assert 'r-outer' in warnings[0]
         assert 'no longer matches' in warnings[0]
 
+    def test_position_hint_selects_occurrence(self):
+        """A valid `position` hint anchors the fix instead of the first occurrence"""
+        content = "word word word"
+        violations = [{
+            'rule_id': 'qe-test-001',
+            'current_text': 'word',
+            'suggested_fix': 'WORD',
+            'position': 5,
+        }]
+        result, _warnings, applied = apply_fixes(content, violations)
+        assert result == "word WORD word"
+        assert len(applied) == 1
+
+    def test_stale_position_hint_falls_back(self):
+        """A hint that no longer matches the content falls back to find()"""
+        content = "one word here"
+        violations = [{
+            'rule_id': 'qe-test-001',
+            'current_text': 'word',
+            'suggested_fix': 'WORD',
+            'position': 0,
+        }]
+        result, _warnings, _applied = apply_fixes(content, violations)
+        assert result == "one WORD here"
+
+
+class TestEditMap:
+    """Test EditMap rebasing of snapshot positions"""
+
+    def test_positions_shift_past_earlier_edits(self):
+        edit_map = EditMap()
+        edit_map.record(0, 5, 8)  # 5 chars became 8
+        edit_map.record(20, 22, 0)  # 2 chars deleted
+        assert edit_map.to_current(3) == 3  # Before any completed edit
+        assert edit_map.to_current(10) == 13
+        assert edit_map.to_current(30) == 31
+
+    def test_overlap_detection(self):
+        edit_map = EditMap()
+        edit_map.record(10, 20, 4)
+        assert edit_map.overlaps(15, 25)
+        assert edit_map.overlaps(5, 11)
+        assert not edit_map.overlaps(0, 10)
+        assert not edit_map.overlaps(20, 30)
+
 
 class TestValidateFixQuality:
     """Test validate_fix_quality() function"""
@@ -266,3 +311,65 @@ class TestValidateFixQuality:
         }]
         warnings = validate_fix_quality(violations)
         assert any('commentary' in w for w in warnings)
+
+
+class TestDedupeViolations:
+    """Test dedupe_violations() function"""
+
+    def test_identical_edits_collapsed(self):
+        """Two violations with the same span and fix collapse into one"""
+        violations = [
+            {'rule_id': 'qe-writing-004', 'current_text': 'the Bellman Equation',
+             'suggested_fix': 'the Bellman equation'},
+            {'rule_id': 'qe-writing-006', 'current_text': 'the Bellman  Equation',
+             'suggested_fix': 'the Bellman equation'},
+        ]
+        unique, duplicates = dedupe_violations(violations)
+        assert len(unique) == 1
+        assert len(duplicates) == 1
+        assert unique[0]['rule_ids'] == ['qe-writing-004', 'qe-writing-006']
+        assert duplicates[0]['duplicate_of'] == 'qe-writing-004'
+
+    def test_different_fix_kept(self):
+        """Same span with a different replacement is a different intent"""
+        violations = [
+            {'rule_id': 'r1', 'current_text': 'some text', 'suggested_fix': 'Some text'},
+            {'rule_id': 'r2', 'current_text': 'some text', 'suggested_fix': 'some texts'},
+        ]
+        unique, duplicates = dedupe_violations(violations)
+        assert len(unique) == 2
+        assert duplicates == []
+
+    def test_prior_fix_contains_edit(self):
+        """An edit already made as part of a larger earlier fix is a duplicate"""
+        content = "The rate α is fixed."
+        prior = [{'rule_id': 'qe-math-001', 'current_text': 'The rate $\\alpha$ is fixed.',
+                  'suggested_fix': 'The rate α is fixed.'}]
+        violations = [{'rule_id': 'qe-math-009', 'current_text': '$\\alpha$',
+                       'suggested_fix': 'α'}]
+        unique, duplicates = dedupe_violations(violations, prior, content)
+        assert unique == []
+        assert len(duplicates) == 1
+        assert prior[0]['rule_ids'] == ['qe-math-001', 'qe-math-009']
+
+    def test_prior_fix_ignored_when_span_still_anchors(self):
+        """A span still present in the content is another occurrence, not a repeat"""
+        content = "The rate α is fixed. Later $\\alpha$ appears again."
+        prior = [{'rule_id': 'qe-math-001', 'current_text': 'The rate $\\alpha$ is fixed.',
+                  'suggested_fix': 'The rate α is fixed.'}]
+        violations = [{'rule_id': 'qe-math-009', 'current_text': '$\\alpha$',
+                       'suggested_fix': 'α'}]
+        unique, duplicates = dedupe_violations(violations, prior, content)
+        assert len(unique) == 1
+        assert duplicates == []
+        assert 'rule_ids' not in prior[0]
+
+    def test_incomplete_violations_passed_through(self):
+        """Violations missing text are left for apply_fixes() to report"""
+        violations = [
+            {'rule_id': 'r1', 'current_text': '', 'suggested_fix': 'x'},
+            {'rule_id': 'r2', 'current_text': '', 'suggested_fix': 'x'},
+        ]
+        unique, duplicates = dedupe_violations(violations)
+        assert len(unique) == 2
+        assert duplicates == []
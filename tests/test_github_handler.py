@@ -3,13 +3,20 @@
 Test GitHub handler PR comment formatting
 """
 
+import base64
+import subprocess
 import sys
+import tempfile
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from style_checker.github_handler import GitHubHandler
+from types import SimpleNamespace
+
+from github import GithubException
+
+from style_checker.github_handler import GIT_BOT_EMAIL, GIT_BOT_NAME, GitHubHandler, LocalRepoHandler
 
 
 class MockGitHub:
@@ -18,15 +25,88 @@ class MockGitHub:
         return None
 
 
-def create_mock_handler():
+class MockTreeRepo:
+    """Mock repository answering recursive tree requests and counting per-path lookups"""
+    def __init__(self, paths, truncated=False, fail=False):
+        self.paths = paths
+        self.truncated = truncated
+        self.fail = fail
+        self.tree_calls = 0
+        self.content_calls = 0
+        self.blob_calls = 0
+
+    def get_git_tree(self, sha, recursive=False):
+        self.tree_calls += 1
+        if self.fail:
+            raise GithubException(404, {'message': 'Not Found'}, None)
+        items = [SimpleNamespace(path=p, sha=f"sha-{p}", type='blob') for p in self.paths]
+        items.append(SimpleNamespace(path='lectures', sha='sha-dir', type='tree'))
+        return SimpleNamespace(tree=items, truncated=self.truncated)
+
+    def get_git_blob(self, sha):
+        self.blob_calls += 1
+        path = sha[len('sha-'):]
+        if path.endswith('broken.md'):
+            raise GithubException(500, {'message': 'Server Error'}, None)
+        return SimpleNamespace(content=base64.b64encode(f"# {path}\n".encode()).decode())
+
+    def get_contents(self, path):
+        self.content_calls += 1
+        if path in self.paths:
+            return SimpleNamespace(path=path)
+        if path.rstrip('/') == 'lectures':
+            return [SimpleNamespace(type='file', name=p.rsplit('/', 1)[-1], path=p)
+                    for p in self.paths if p.count('/') == 1 and p.startswith('lectures/')]
+        raise GithubException(404, {'message': 'Not Found'}, None)
+
+
+def create_mock_handler(repo=None):
     """Create a GitHubHandler instance without real GitHub API"""
     handler = GitHubHandler.__new__(GitHubHandler)
     handler.github = MockGitHub()
-    handler.repo = None
+    handler.repo = repo
     handler.repository = "test/repo"
+    handler.default_branch = 'main'
+    handler._tree = None
+    handler._tree_loaded = False
     return handler
 
 
+LECTURE_TREE = ['lectures/aiyagari.md', 'lectures/_toc.yml', 'lectures/dynamics/kalman.md',
+                'lectures/dynamics/mccall.myst', 'README.md', 'notes.md']
+
+
+def test_tree_index_fetched_once():
+    """Discovery and lookups are answered from one recursive tree request"""
+    repo = MockTreeRepo(LECTURE_TREE)
+    handler = create_mock_handler(repo)
+    assert handler.get_all_lectures('lectures/') == [
+        'lectures/aiyagari.md', 'lectures/dynamics/kalman.md', 'lectures/dynamics/mccall.myst']
+    assert handler.find_lecture_file('aiyagari') == 'lectures/aiyagari.md'
+    assert handler.find_lecture_file('dynamics/kalman') == 'lectures/dynamics/kalman.md'
+    assert handler.find_lecture_file('mccall') == 'lectures/dynamics/mccall.myst'
+    assert handler.find_lecture_file('notes') == 'notes.md'
+    assert handler.find_lecture_file('missing') is None
+    assert handler.tree_index()['lectures/aiyagari.md'] == 'sha-lectures/aiyagari.md'
+    assert (repo.tree_calls, repo.content_calls) == (1, 0)
+
+
+def test_nested_lookup_must_be_unique():
+    """A bare name found in two subdirectories is not guessed"""
+    handler = create_mock_handler(MockTreeRepo(['lectures/a/kalman.md', 'lectures/b/kalman.md']))
+    assert handler.find_lecture_file('kalman') is None
+    assert handler.find_lecture_file('b/kalman') == 'lectures/b/kalman.md'
+
+
+def test_tree_fallback_to_contents():
+    """Without a usable tree, lectures are listed and probed per path as before"""
+    for repo in (MockTreeRepo(LECTURE_TREE, truncated=True), MockTreeRepo(LECTURE_TREE, fail=True)):
+        handler = create_mock_handler(repo)
+        assert handler.get_all_lectures('lectures/') == ['lectures/aiyagari.md']
+        assert handler.find_lecture_file('aiyagari') == 'lectures/aiyagari.md'
+        assert repo.tree_calls == 1 and repo.content_calls == 2
+
+
 def test_format_detailed_report_uses_tilde_fences():
     """Test that format_detailed_report uses ~~~ fences for markdown blocks"""
     handler = create_mock_handler()
@@ -251,6 +331,208 @@ def test_no_report_when_no_actual_changes():
     assert report is None
 
 
+
+def test_region_report_attributes_merged_duplicate_rules():
+    """Rules merged into a fix via dedupe (rule_ids) are attributed to its region"""
+    handler = create_mock_handler()
+
+    review_result = {
+        'original_content': 'The Bellman Equation holds.\n',
+        'corrected_content': 'The Bellman equation holds.\n',
+        'fix_log': [{
+            'rule_id': 'qe-writing-004',
+            'rule_ids': ['qe-writing-004', 'qe-writing-006'],
+            'rule_title': 'Capitalization',
+            'category': 'writing',
+            'current_text': 'The Bellman Equation holds.',
+            'suggested_fix': 'The Bellman equation holds.',
+        }],
+    }
+
+    report = handler.format_applied_fixes_report(review_result, 'test_lecture')
+
+    assert report is not None
+    assert '**Rules applied:** qe-writing-004, qe-writing-006' in report
+
+def test_prefetch_in_order_with_errors():
+    """Prefetched lectures come back in listing order, decoded, with fetch errors in place"""
+    paths = [f'lectures/l{i}.md' for i in range(6)] + ['lectures/broken.md', 'lectures/last.md']
+    repo = MockTreeRepo(paths)
+    handler = create_mock_handler(repo)
+    results = list(handler.prefetch_lectures(paths, read_ahead=2, max_workers=3))
+    assert [path for path, _, _ in results] == paths
+    assert results[0][1] == "# lectures/l0.md\n" and results[0][2] is None
+    assert results[6][1] is None and 'Failed to get lecture content' in str(results[6][2])
+    assert repo.blob_calls == len(paths) and repo.content_calls == 0
+
+
+def test_prefetch_read_ahead_bounded():
+    """No more than read_ahead lectures are fetched beyond the one consumed"""
+    paths = [f'lectures/l{i}.md' for i in range(10)]
+    repo = MockTreeRepo(paths)
+    fetched = create_mock_handler(repo).prefetch_lectures(paths, read_ahead=2, max_workers=2)
+    assert next(fetched)[0] == 'lectures/l0.md'
+    assert repo.blob_calls <= 3
+    fetched.close()
+
+
+class MockGitDataRepo:
+    """Mock repository recording Git Data API calls"""
+    def __init__(self):
+        self.calls = []
+        self.ref = SimpleNamespace(object=SimpleNamespace(sha='c0'), edit=self._edit_ref)
+
+    def _edit_ref(self, sha):
+        self.calls.append(('edit_ref', sha))
+
+    def get_git_ref(self, ref):
+        self.calls.append(('get_ref', ref))
+        return self.ref
+
+    def get_git_commit(self, sha):
+        return SimpleNamespace(sha=sha, tree=SimpleNamespace(sha='t0'))
+
+    def create_git_tree(self, elements, base_tree):
+        sha = f"t{len([c for c in self.calls if c[0] == 'tree']) + 1}"
+        self.calls.append(('tree', [e._identity['path'] for e in elements], base_tree.sha))
+        return SimpleNamespace(sha=sha)
+
+    def create_git_commit(self, message, tree, parents):
+        sha = f"c{len([c for c in self.calls if c[0] == 'commit']) + 1}"
+        self.calls.append(('commit', message, tree.sha, [p.sha for p in parents]))
+        return SimpleNamespace(sha=sha, tree=tree)
+
+
+CHANGES = [('lectures/a.md', '# A\n', 'style: fix a'), ('lectures/b.md', '# B\n', 'style: fix b')]
+
+
+def test_commit_files_single_commit():
+    """All files go into one tree and one commit; the ref moves once"""
+    repo = MockGitDataRepo()
+    assert create_mock_handler(repo).commit_files(CHANGES, 'bulk', 'style: bulk') == 'c1'
+    assert repo.calls == [
+        ('get_ref', 'heads/bulk'),
+        ('tree', ['lectures/a.md', 'lectures/b.md'], 't0'),
+        ('commit', 'style: bulk', 't1', ['c0']),
+        ('edit_ref', 'c1'),
+    ]
+
+
+def test_commit_files_chain_per_file():
+    """Without a message, one commit per file is chained before the ref moves"""
+    repo = MockGitDataRepo()
+    assert create_mock_handler(repo).commit_files(CHANGES, 'bulk') == 'c2'
+    assert [c for c in repo.calls if c[0] in ('commit', 'edit_ref')] == [
+        ('commit', 'style: fix a', 't1', ['c0']),
+        ('commit', 'style: fix b', 't2', ['c1']),
+        ('edit_ref', 'c2'),
+    ]
+    assert ('tree', ['lectures/b.md'], 't1') in repo.calls
+
+
+def test_format_bulk_commit_message():
+    message = create_mock_handler().format_bulk_commit_message([('a', 3), ('b', 1)])
+    assert message.startswith("style: fix 4 issues in 2 lectures\n\n")
+    assert "- a: 3 issues\n- b: 1 issues\n" in message
+
+
+def _git(cwd, *args):
+    return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def create_local_handler(workdir):
+    """
+    A LocalRepoHandler on a fresh checkout (cloned from a bare origin) of
+    LECTURE_TREE, with no GitHub API behind it.
+    """
+    origin = Path(workdir) / 'origin.git'
+    seed = Path(workdir) / 'seed'
+    _git(workdir, 'init', '--quiet', '--bare', str(origin))
+    _git(workdir, 'init', '--quiet', str(seed))
+    for path in LECTURE_TREE:
+        (seed / path).parent.mkdir(parents=True, exist_ok=True)
+        (seed / path).write_text(f"# {path}\n", encoding='utf-8')
+    identity = ['-c', f'user.name={GIT_BOT_NAME}', '-c', f'user.email={GIT_BOT_EMAIL}']
+    _git(seed, 'add', '.')
+    _git(seed, *identity, 'commit', '--quiet', '-m', 'init')
+    _git(seed, 'push', '--quiet', str(origin), 'HEAD:refs/heads/main')
+    _git(workdir, 'clone', '--quiet', '--branch', 'main', str(origin), 'checkout')
+
+    handler = LocalRepoHandler.__new__(LocalRepoHandler)
+    handler.github = MockGitHub()
+    handler.repo = None
+    handler.repository = "test/repo"
+    handler.default_branch = 'main'
+    handler._tree = None
+    handler._tree_loaded = False
+    handler.root = Path(workdir) / 'checkout'
+    handler._identity = identity
+    return handler, origin
+
+
+def test_local_handler_reads_checkout():
+    """Discovery, lookups and reads come from the working tree, not the API"""
+    with tempfile.TemporaryDirectory() as workdir:
+        handler, _ = create_local_handler(workdir)
+        assert handler.get_all_lectures('lectures/') == [
+            'lectures/aiyagari.md', 'lectures/dynamics/kalman.md', 'lectures/dynamics/mccall.myst',
+        ]
+        assert handler.find_lecture_file('kalman', 'lectures/') == 'lectures/dynamics/kalman.md'
+        assert handler.find_lecture_file('missing', 'lectures/') is None
+        assert handler.get_lecture_content('lectures/aiyagari.md') == "# lectures/aiyagari.md\n"
+        fetched = list(handler.prefetch_lectures(['lectures/aiyagari.md', 'lectures/gone.md']))
+        assert fetched[0] == ('lectures/aiyagari.md', "# lectures/aiyagari.md\n", None)
+        assert fetched[1][0] == 'lectures/gone.md' and fetched[1][2] is not None
+
+
+def test_local_handler_commits_and_pushes():
+    """Fixes are committed with git and the branch is pushed to origin"""
+    with tempfile.TemporaryDirectory() as workdir:
+        handler, origin = create_local_handler(workdir)
+        _git(origin, 'branch', 'style/bulk', 'main')
+        branch = handler.create_branch('style/bulk')
+        assert branch.startswith('style/bulk-')
+
+        head = handler.commit_files(CHANGES, branch)
+        assert _git(origin, 'rev-parse', f'refs/heads/{branch}').strip() == head
+        assert _git(origin, 'log', '--format=%s', f'main..{branch}').split('\n')[:2] == [
+            'style: fix b', 'style: fix a',
+        ]
+        assert _git(origin, 'show', f'{branch}:lectures/a.md') == '# A\n'
+
+        handler.commit_changes('lectures/aiyagari.md', '# Fixed\n', 'style: fix aiyagari', branch)
+        assert _git(origin, 'show', f'{branch}:lectures/aiyagari.md') == '# Fixed\n'
+        assert _git(origin, 'rev-parse', 'refs/heads/main').strip() != head
+
+
+def test_local_handler_skips_unchanged_files():
+    """An unchanged file is neither written nor committed, alone or among changed ones"""
+    with tempfile.TemporaryDirectory() as workdir:
+        handler, origin = create_local_handler(workdir)
+        branch = handler.create_branch('style/bulk')
+        unchanged = ('lectures/aiyagari.md', "# lectures/aiyagari.md\n", 'style: fix aiyagari')
+
+        handler.commit_files([unchanged, *CHANGES], branch)
+        assert _git(origin, 'log', '--format=%s', f'main..{branch}').splitlines() == [
+            'style: fix b', 'style: fix a',
+        ]
+        head = handler.commit_files([unchanged], branch, 'style: nothing')
+        assert _git(origin, 'rev-parse', f'refs/heads/{branch}').strip() == head
+        assert 'nothing' not in _git(origin, 'log', '--format=%s', f'main..{branch}')
+
+
+def test_local_handler_git_errors_name_subcommand():
+    """Errors name the git subcommand even after the identity options"""
+    with tempfile.TemporaryDirectory() as workdir:
+        handler, _ = create_local_handler(workdir)
+        try:
+            handler._git(*handler._identity, 'commit', '--quiet', '-m', 'empty')
+        except Exception as e:
+            assert str(e).startswith('git commit failed')
+        else:
+            raise AssertionError('expected a failed commit')
+
+
 if __name__ == '__main__':
     print("Testing GitHub handler PR comment formatting...\n")
     
@@ -271,5 +553,44 @@ if __name__ == '__main__':
     
     test_no_report_when_no_actual_changes()
     print("✅ test_no_report_when_no_actual_changes")
+
+    test_region_report_attributes_merged_duplicate_rules()
+    print("✅ test_region_report_attributes_merged_duplicate_rules")
+
+    test_tree_index_fetched_once()
+    print("✅ test_tree_index_fetched_once")
+
+    test_nested_lookup_must_be_unique()
+    print("✅ test_nested_lookup_must_be_unique")
+
+    test_tree_fallback_to_contents()
+    print("✅ test_tree_fallback_to_contents")
+
+    test_prefetch_in_order_with_errors()
+    print("✅ test_prefetch_in_order_with_errors")
+
+    test_prefetch_read_ahead_bounded()
+    print("✅ test_prefetch_read_ahead_bounded")
+
+    test_commit_files_single_commit()
+    print("✅ test_commit_files_single_commit")
+
+    test_commit_files_chain_per_file()
+    print("✅ test_commit_files_chain_per_file")
+
+    test_format_bulk_commit_message()
+    print("✅ test_format_bulk_commit_message")
+
+    test_local_handler_reads_checkout()
+    print("✅ test_local_handler_reads_checkout")
+
+    test_local_handler_commits_and_pushes()
+    print("✅ test_local_handler_commits_and_pushes")
+
+    test_local_handler_skips_unchanged_files()
+    print("✅ test_local_handler_skips_unchanged_files")
+
+    test_local_handler_git_errors_name_subcommand()
+    print("✅ test_local_handler_git_errors_name_subcommand")
     
     print("\n🎉 All tests passed!")
@@ -0,0 +1,158 @@
+"""
+Tests for lecture_index.py — lecture series index and static checks of link rules
+"""
+
+import zlib
+
+import pytest
+
+from style_checker.analyzers import analyze_rule, is_analyzed
+from style_checker.document import MystDocument
+from style_checker.fix_applier import apply_fixes
+from style_checker.lecture_index import LectureIndex, parse_intersphinx
+from style_checker.reviewer import extract_individual_rules
+
+
+CONFIG = """title: Intermediate Quantitative Economics
+sphinx:
+  config:
+    html_baseurl: https://python.quantecon.org/
+    intersphinx_mapping:
+      intro:
+        - "https://intro.quantecon.org/"
+        - null
+      dle: ["https://dle.quantecon.org/", null]
+"""
+
+TOC = """format: jb-book
+root: intro
+parts:
+- caption: Tools
+  chapters:
+  - file: kalman
+  - file: sub/linear_models
+"""
+
+
+def _inventory(documents):
+    body = ''.join(f"{name} std:doc -1 {name}.html {name.title()}\n" for name in documents)
+    return (b"# Sphinx inventory version 2\n# Project: Intro\n# Version: \n"
+            b"# The remainder of this file is compressed using zlib.\n" + zlib.compress(body.encode()))
+
+
+def _index():
+    index = LectureIndex.from_files(['kalman.md', 'mccall.md', 'README.txt'], toc=TOC, config=CONFIG)
+    index.add_inventory('intro', _inventory(['linear_equations', 'mccall']))
+    return index
+
+
+def _check(rule_id, content, index=None):
+    return analyze_rule(MystDocument(content), {'rule_id': rule_id, 'title': 'Title'}, index or _index())
+
+
+def _fixed(rule_id, content):
+    corrected, _, _ = apply_fixes(content, _check(rule_id, content))
+    return corrected
+
+
+class TestLectureIndex:
+    """Test LectureIndex construction and lookups"""
+
+    def test_from_files(self):
+        index = _index()
+        assert index.lectures == {'intro', 'kalman', 'mccall', 'sub/linear_models'}
+        assert index.series == 'intermediate'
+        assert index.series_urls['dle'] == 'https://dle.quantecon.org/'
+
+    def test_from_directory(self, tmp_path):
+        (tmp_path / 'sub').mkdir()
+        (tmp_path / '_build' / 'html').mkdir(parents=True)
+        for name in ('kalman.md', 'sub/linear_models.md', 'qestyle(kalman).md', '_build/html/old.md'):
+            (tmp_path / name).write_text('# Lecture\n')
+        (tmp_path / '_config.yml').write_text(CONFIG)
+        index = LectureIndex.from_directory(tmp_path)
+        assert index.lectures == {'kalman', 'sub/linear_models'}
+        assert index.series == 'intermediate'
+
+    def test_parse_intersphinx(self):
+        assert parse_intersphinx(CONFIG) == {'intro': 'https://intro.quantecon.org/',
+                                             'dle': 'https://dle.quantecon.org/'}
+        assert parse_intersphinx("title: Book\n") == {}
+
+    def test_unknown_home_url(self):
+        index = LectureIndex(['a'], home_url='https://example.org/book/')
+        assert index.series == 'self'
+        assert LectureIndex(['a']).series is None
+
+    def test_inventory(self):
+        index = _index()
+        assert index.inventories['intro'] == {'linear_equations', 'mccall'}
+        assert index.other_series('linear_equations') == 'intro'
+        assert index.other_series('mccall') is None      # Also a lecture of this series
+
+    @pytest.mark.parametrize('data', [b"not an inventory", _inventory([])[:-4] + b"xxxx"])
+    def test_bad_inventory_rejected(self, data):
+        with pytest.raises(ValueError):
+            LectureIndex().add_inventory('intro', data)
+
+    def test_resolve_url(self):
+        index = _index()
+        assert index.resolve_url('https://intro.quantecon.org/linear_equations.html#solving') == \
+            ('intro', 'linear_equations', 'solving')
+        assert index.resolve_url('https://python.quantecon.org/sub/linear_models.html') == \
+            ('intermediate', 'sub/linear_models', '')
+        assert index.resolve_url('https://intro.quantecon.org/') is None
+        assert index.resolve_url('https://numpy.org/doc/') is None
+
+
+class TestSameSeriesLinks:
+    """qe-link-001"""
+
+    def test_urls_into_this_series(self):
+        content = ("See [the filter](https://python.quantecon.org/kalman.html) and "
+                   "[models](https://python.quantecon.org/sub/linear_models.html#state) for details.\n")
+        assert "See [the filter](kalman) and [models](sub/linear_models.html#state) for details." in \
+            _fixed('qe-link-001', content)
+
+    def test_other_links_left_alone(self):
+        content = ("[Intro](https://intro.quantecon.org/linear_equations.html), "
+                   "[gone](https://python.quantecon.org/removed.html) and [NumPy](https://numpy.org/).\n")
+        assert _check('qe-link-001', content) == []
+
+    def test_unknown_series_skipped(self):
+        content = "See [the filter](https://python.quantecon.org/kalman.html) for details.\n"
+        assert _check('qe-link-001', content, LectureIndex(['kalman'])) == []
+
+
+class TestCrossSeriesLinks:
+    """qe-link-002"""
+
+    def test_urls_into_other_series(self):
+        content = "Read [linear equations](https://intro.quantecon.org/linear_equations.html#solving) first.\n"
+        assert "Read {doc}`linear equations<intro:linear_equations.html#solving>` first." in \
+            _fixed('qe-link-002', content)
+
+    def test_bare_links_found_in_inventory(self):
+        content = "Read [linear equations](linear_equations) and [the filter](kalman) first.\n"
+        assert "Read {doc}`linear equations<intro:linear_equations>` and [the filter](kalman) first." in \
+            _fixed('qe-link-002', content)
+
+    def test_doc_roles_without_prefix(self):
+        content = "Read {doc}`linear_equations`, {doc}`the DLE lecture<dle/growth>` and {doc}`kalman` first.\n"
+        assert ("Read {doc}`intro:linear_equations`, {doc}`the DLE lecture<dle:growth>` and {doc}`kalman` first."
+                in _fixed('qe-link-002', content))
+
+    def test_prefixed_and_unknown_links_left_alone(self):
+        content = "Read {doc}`intro:linear_equations`, [this](unknown_doc) and [NumPy](https://numpy.org/).\n"
+        assert _check('qe-link-002', content) == []
+
+
+class TestAnalyzedRules:
+    """Link rules in analyzers.is_analyzed()"""
+
+    def test_link_rules_need_an_index(self):
+        rule_ids = {r['rule_id'] for r in extract_individual_rules('links')}
+        assert {'qe-link-001', 'qe-link-002'} <= rule_ids
+        assert not is_analyzed('qe-link-001')
+        assert is_analyzed('qe-link-001', LectureIndex())
+        assert not is_analyzed('qe-link-003', LectureIndex())
@@ -12,7 +12,7 @@ import pytest
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from style_checker.reviewer import parse_markdown_response
+from style_checker.reviewer import parse_markdown_response, parse_tool_response
 
 
 @pytest.fixture
@@ -265,6 +265,61 @@ No code formatting violations found. The lecture follows all code guidelines.
     assert 'No code formatting violations found' in result['summary']
 
 
+def test_parse_document_id():
+    """Test parsing the document ID that packed prompts ask for"""
+    response = """## Issues Found
+1
+
+## Violations
+
+### Violation 1: qe-math-001 - Unicode Parameters
+- **Document:** doc-2
+- **Location:** Line 3
+- **Current text:**
+~~~markdown
+$\\alpha$
+~~~
+- **Suggested fix:**
+~~~markdown
+α
+~~~
+"""
+    [violation] = parse_markdown_response(response)['violations']
+    assert violation['document'] == 'doc-2'
+    assert violation['location'] == 'Line 3'
+
+
+def test_no_document_id_in_single_lecture_response(sample_markdown_response):
+    """Single-lecture responses carry no document ID"""
+    result = parse_markdown_response(sample_markdown_response)
+    assert all('document' not in v for v in result['violations'])
+
+
+def test_parse_tool_response():
+    """Test converting report_violations tool arguments to the parsed format"""
+    result = parse_tool_response({'violations': [
+        {'rule_id': 'qe-math-001', 'first_line': 3, 'last_line': 3, 'current_text': '$\\alpha$ ',
+         'suggested_fix': 'α', 'severity': 'error', 'explanation': 'Use Unicode.'},
+        {'rule_id': 'qe-math-002', 'document': 'doc-1', 'first_line': 5, 'last_line': 7,
+         'current_text': '$A^T$', 'suggested_fix': '$A^\\top$', 'explanation': 'Transpose.'},
+    ]})
+    assert result['issues_found'] == 2
+    first, second = result['violations']
+    assert first['current_text'] == '$\\alpha$'
+    assert (first['location'], first['severity']) == ('Line 3', 'error')
+    assert second['location'] == 'Lines 5-7'
+    assert second['document'] == 'doc-1'
+    assert 'error' not in result
+
+
+def test_parse_tool_response_without_call():
+    """A response with no tool call is a parse error, not a clean lecture"""
+    result = parse_tool_response(None)
+    assert result['violations'] == []
+    assert 'report_violations' in result['error']
+    assert 'error' not in parse_tool_response({'violations': []})
+
+
 if __name__ == '__main__':
     # Allow running directly for backwards compatibility
     pytest.main([__file__, '-v'])
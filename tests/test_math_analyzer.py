@@ -0,0 +1,132 @@
+"""
+Tests for math_analyzer.py — LaTeX tokenizer and static checks of math rules
+"""
+
+import pytest
+
+from style_checker.analyzers import ANALYZED_RULES, analyze_rule
+from style_checker.document import MystDocument
+from style_checker.fix_applier import apply_fixes
+from style_checker.math_analyzer import math_spans, tokenize_math
+from style_checker.reviewer import extract_individual_rules
+
+
+def _display(body):
+    return f"# Lecture\n\nSome prose.\n\n$$\n{body}\n$$\n"
+
+
+def _check(rule_id, content):
+    return analyze_rule(MystDocument(content), {'rule_id': rule_id, 'title': 'Title'})
+
+
+def _fixed(rule_id, content):
+    corrected, _, _ = apply_fixes(content, _check(rule_id, content))
+    return corrected
+
+
+class TestTokenizer:
+    """Test tokenize_math() and formula extraction"""
+
+    def test_token_kinds(self):
+        tokens = tokenize_math(r"\frac{a}{b}_t^2 % note")
+        assert [t['kind'] for t in tokens] == [
+            'command', 'open', 'char', 'close', 'open', 'char', 'close', 'sub', 'char', 'sup', 'char',
+            'space', 'comment',
+        ]
+        assert tokens[1]['match'] == 3 and tokens[3]['match'] == 1
+
+    def test_environment_stack(self):
+        tokens = tokenize_math(r"\begin{aligned} x \begin{bmatrix} 1 \end{bmatrix} \end{aligned}")
+        one = next(t for t in tokens if t['text'] == '1')
+        assert one['envs'] == ('aligned', 'bmatrix')
+        assert tokens[0]['env'] == 'aligned' and tokens[tokens[0]['match']]['kind'] == 'end'
+
+    def test_offsets(self):
+        tokens = tokenize_math(r"\alpha", offset=10)
+        assert (tokens[0]['start'], tokens[0]['end']) == (10, 16)
+
+    @pytest.mark.parametrize('text', [r"\frac{a}{b", r"x}", r"\begin{align} x", r"\begin{a} x \end{b}"])
+    def test_unbalanced_rejected(self, text):
+        with pytest.raises(ValueError):
+            tokenize_math(text)
+
+    def test_all_math_forms(self):
+        content = ("Inline $a$ and {math}`b`.\n\n$$\nc\n$$ (eq-c)\n\n"
+                   "```{math}\n:label: eq-d\n\nd\n```\n\n```{code-cell} python\n$x$\n```\n")
+        spans = math_spans(MystDocument(content))
+        assert [s.text.strip() for s in spans] == ['a', 'b', 'c', 'd']
+        assert [s.display for s in spans] == [False, False, True, True]
+
+    def test_unbalanced_formula_skipped(self):
+        assert _check('qe-math-004', _display(r"\mathbf{A} \frac{1}{2")) == []
+
+
+class TestTranspose:
+    """qe-math-002"""
+
+    def test_transpose_fixed(self):
+        fixed = _fixed('qe-math-002', _display(r"x_t^T A x_t + (B^{T})"))
+        assert r"x_t^\top A x_t + (B^{\top})" in fixed
+
+    @pytest.mark.parametrize('body', [
+        r"\sum_{t=0}^T \beta^t + x^T y",     # T is the horizon elsewhere
+        r"\beta^T",                          # A power of a Greek letter
+        r"x^{T-1}",                          # A power
+        r"e^T",
+    ])
+    def test_powers_left_alone(self, body):
+        assert _check('qe-math-002', _display(body)) == []
+
+
+class TestStructure:
+    """qe-math-003, qe-math-006 and qe-math-007"""
+
+    def test_matrix_brackets(self):
+        content = _display("\\begin{pmatrix}\n1 & 2\n\\end{pmatrix} "
+                           "\\left( \\begin{matrix} 1 \\\\ 2 \\end{matrix} \\right) "
+                           "\\begin{vmatrix} a \\end{vmatrix}")
+        fixed = _fixed('qe-math-003', content)
+        assert ("\\begin{bmatrix}\n1 & 2\n\\end{bmatrix} \\begin{bmatrix} 1 \\\\ 2 \\end{bmatrix} "
+                "\\begin{vmatrix} a \\end{vmatrix}") in fixed
+
+    def test_align_in_math(self):
+        content = _display("\\begin{align*}\nx &= 1 \\nonumber \\\\\ny &= 2\n\\end{align*}")
+        assert "\\begin{aligned}\nx &= 1 \\\\\ny &= 2\n\\end{aligned}" in _fixed('qe-math-006', content)
+
+    def test_labelled_align_left_alone(self):
+        assert _check('qe-math-006', _display("\\begin{align}\nx &= 1 \\label{eq}\n\\end{align}")) == []
+
+    def test_tags_removed(self):
+        violation, = _check('qe-math-007', _display(r"x^2 + y^2 = r^2 \tag{1}"))
+        assert violation['current_text'] == r"x^2 + y^2 = r^2 \tag{1}"
+        assert violation['suggested_fix'] == "x^2 + y^2 = r^2"
+
+
+class TestNotation:
+    """qe-math-004 and qe-math-005"""
+
+    def test_bold_removed(self):
+        content = "Let $\\mathbf{A} \\mathbf x = \\boldsymbol{\\beta}y$ and $\\mathbf{1}$.\n"
+        assert "Let $A x = \\beta y$ and $\\mathbb{1}$." in _fixed('qe-math-004', content)
+
+    def test_bold_group_kept_under_scripts(self):
+        assert r"{AB}^T" in _fixed('qe-math-004', _display(r"\mathbf{AB}^T"))
+
+    def test_sequences(self):
+        content = _display(r"[ x_t ]_{t=0}^{\infty} \quad \left( y_n \right)_{n \geq 1}")
+        fixed = _fixed('qe-math-005', content)
+        assert r"\{ x_t \}_{t=0}^{\infty} \quad \left\{ y_n \right\}_{n \geq 1}" in fixed
+
+    @pytest.mark.parametrize('body', [r"f(x)_{t=0}", r"[0, 1]_{i}", r"(a + b)^2"])
+    def test_non_sequences_left_alone(self, body):
+        assert _check('qe-math-005', _display(body)) == []
+
+
+class TestAnalyzedRules:
+    """Math rules in analyzers.ANALYZED_RULES"""
+
+    def test_mechanical_math_rules_analyzed(self):
+        rule_ids = {r['rule_id'] for r in extract_individual_rules('math')}
+        analyzed = {rule_id for rule_id in ANALYZED_RULES if rule_id.startswith('qe-math-')}
+        assert analyzed <= rule_ids
+        assert analyzed == {f'qe-math-00{n}' for n in range(2, 8)}
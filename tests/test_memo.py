@@ -0,0 +1,106 @@
+"""
+Tests for memo.py — the section-level memo of rule findings
+"""
+
+import json
+
+from style_checker import memo as memo_module
+from style_checker.document import MystDocument
+from style_checker.memo import MEMO_VERSION, CorpusIndex, ReviewMemo, memo_units, rule_key
+
+
+RULE = {'rule_id': 'qe-math-001', 'rule_type': 'rule', 'content': 'Rule text.'}
+
+class TestReviewMemo:
+    """Test storing, replaying and persisting findings"""
+
+    def test_rule_key_changes_with_rule_model_and_prompt(self):
+        key = rule_key(RULE, 'model', 'prompt')
+        assert key == rule_key(dict(RULE), 'model', 'prompt')
+        assert key != rule_key(dict(RULE, content='Other.'), 'model', 'prompt')
+        assert key != rule_key(RULE, 'other-model', 'prompt')
+        assert key != rule_key(RULE, 'model', 'other prompt')
+
+    def test_replay_at_current_offset(self):
+        memo = ReviewMemo()
+        section = "## Second\n\nWe take $A^T$ here.\n"
+        finding = {'rule_id': 'qe-math-002', 'current_text': '$A^T$', 'location': 'Line 12', 'position': 120}
+        memo.store('rule', section, start=100, line=10, violations=[finding])
+
+        # The section moved down by 5 lines and 50 characters
+        [replayed] = memo.lookup('rule', section, start=150, line=15)
+        assert replayed['position'] == 170
+        assert replayed['location'] == 'Line 17'
+        assert (memo.hits, memo.misses) == (1, 0)
+
+    def test_changed_section_misses(self):
+        memo = ReviewMemo()
+        memo.store('rule', 'Some text.\n', 0, 1, [])
+        assert memo.lookup('rule', 'Some text.\n', 0, 1) == []
+        assert memo.lookup('rule', 'Some other text.\n', 0, 1) is None
+        assert memo.lookup('other-rule', 'Some text.\n', 0, 1) is None
+        assert (memo.hits, memo.misses) == (1, 2)
+
+    def test_save_and_load(self, tmp_path):
+        path = tmp_path / 'cache' / 'memo.json'
+        memo = ReviewMemo(path)
+        memo.store('rule', 'Text.\n', 0, 1, [])
+        assert memo.save() == 1
+        assert ReviewMemo(path).lookup('rule', 'Text.\n', 0, 1) == []
+
+    def test_other_versions_ignored(self, tmp_path):
+        path = tmp_path / 'memo.json'
+        path.write_text(json.dumps({'version': MEMO_VERSION + 1, 'entries': {'x': {}}}))
+        assert len(ReviewMemo(path)) == 0
+        path.write_text('not json')
+        assert len(ReviewMemo(path)) == 0
+
+    def test_oldest_entries_dropped(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(memo_module, 'MAX_MEMO_ENTRIES', 2)
+        memo = ReviewMemo(tmp_path / 'memo.json')
+        for text in ('a', 'b', 'c'):
+            memo.store('rule', text, 0, 1, [])
+        memo.lookup('rule', 'a', 0, 1)  # Recently used
+        assert memo.save() == 2
+        reloaded = ReviewMemo(tmp_path / 'memo.json')
+        assert reloaded.lookup('rule', 'a', 0, 1) == []
+        assert reloaded.lookup('rule', 'b', 0, 1) is None
+
+
+INSTALL = "```{code-cell} ipython3\n!pip install quantecon\n```\n"
+
+
+def _lecture(title, body):
+    return f"# {title}\n\n{INSTALL}\n{body}\n"
+
+
+class TestUnits:
+    """Test how lectures are split into memo units"""
+
+    def test_code_rules_use_cells(self):
+        document = MystDocument(_lecture('A', "Text.\n\n```python\nx = 1\n```"))
+        units = memo_units(document, ['code'])
+        assert [document.content[s:e] for s, e in units] == [INSTALL, "```python\nx = 1\n```\n"]
+
+    def test_nested_blocks_belong_to_outer_directive(self):
+        content = "````{exercise}\n```{code-cell} ipython3\nx = 1\n```\n````\n"
+        assert memo_units(MystDocument(content), ['code', 'directives']) == [(0, len(content))]
+
+    def test_prose_rules_use_sections(self):
+        document = MystDocument(_lecture('A', "## Part\n\nText."))
+        assert memo_units(document, ['prose', 'code']) == document.sections()
+        assert memo_units(document, ['code'], whole=True) == [(0, len(document.content))]
+
+
+class TestCorpusIndex:
+    """Test the index of fragments shared between lectures"""
+
+    def test_shared_install_cell(self):
+        index = CorpusIndex()
+        index.add('a', _lecture('A', "First lecture."))
+        index.add('b', _lecture('B', "Second lecture."))
+        [shared] = index.shared()
+        assert shared['lectures'] == ['a', 'b']
+        assert shared['chars'] == len(INSTALL)
+        summary = index.summary()
+        assert (summary['shared_units'], summary['duplicate_chars']) == (1, len(INSTALL))
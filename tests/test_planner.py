@@ -0,0 +1,175 @@
+"""
+Tests for planner.py — token estimation, calibration, sharding and review plans
+"""
+
+from style_checker.analyzers import ANALYZED_RULES
+from style_checker.document import MystDocument
+from style_checker.planner import (
+    DEFAULT_CALIBRATION,
+    MAX_OUTPUT_TOKENS,
+    append_usage,
+    choose_max_tokens,
+    estimate_tokens,
+    format_plan,
+    pack_lectures,
+    load_calibration,
+    plan_lecture,
+    plan_review,
+    shard_fragments,
+)
+from style_checker.reviewer import RULE_EVALUATION_ORDER
+
+
+LECTURE = (
+    "# Title\n\n"
+    "Some prose with $x$ in it.\n\n"
+    "```{code-cell} ipython3\n"
+    "x = 1\n"
+    "```\n\n"
+    "## Section\n\n"
+    "More prose.\n"
+)
+
+
+def _record(prompt_chars=3500, input_tokens=1000, output_tokens=1000, seconds=20.0):
+    return {
+        'kind': 'check', 'prompt_chars': prompt_chars, 'input_tokens': input_tokens,
+        'output_tokens': output_tokens, 'thinking_chars': 3000, 'response_chars': 1000,
+        'seconds': seconds,
+    }
+
+
+class TestCalibration:
+    """Test the usage ledger and calibration fit"""
+
+    def test_defaults_without_ledger(self, tmp_path):
+        assert load_calibration(tmp_path / 'missing.jsonl') == DEFAULT_CALIBRATION
+        assert load_calibration() == DEFAULT_CALIBRATION
+
+    def test_too_few_samples_keep_defaults(self, tmp_path):
+        ledger = tmp_path / 'usage.jsonl'
+        append_usage(ledger, [_record()])
+        assert load_calibration(ledger) == DEFAULT_CALIBRATION
+
+    def test_fit_from_ledger(self, tmp_path):
+        ledger = tmp_path / 'usage.jsonl'
+        records = [_record(output_tokens=1000 * n, seconds=2.0 + 0.01 * 1000 * n) for n in range(1, 6)]
+        records.append({'kind': 'triage', 'prompt_chars': 10, 'input_tokens': 1, 'output_tokens': 1})
+        assert append_usage(ledger, records) == 6
+        ledger.open('a').write('not json\n')
+
+        calibration = load_calibration(ledger)
+
+        assert calibration['samples'] == 5
+        assert calibration['chars_per_token'] == 3.5
+        # 3/4 of the output characters were thinking
+        assert calibration['thinking_tokens'] == 2250
+        assert calibration['output_tokens'] == 750
+        assert abs(calibration['seconds_per_output_token'] - 0.01) < 1e-9
+        assert abs(calibration['seconds_overhead'] - 2.0) < 1e-9
+
+    def test_other_providers_not_fitted(self, tmp_path):
+        ledger = tmp_path / 'usage.jsonl'
+        append_usage(ledger, [dict(_record(), provider='openai-compatible') for _ in range(5)])
+        assert load_calibration(ledger) == DEFAULT_CALIBRATION
+
+    def test_cached_prompt_tokens_count(self, tmp_path):
+        ledger = tmp_path / 'usage.jsonl'
+        records = [dict(_record(input_tokens=200), cache_read_input_tokens=800) for _ in range(5)]
+        append_usage(ledger, records)
+        assert load_calibration(ledger)['chars_per_token'] == 3.5
+
+
+class TestSizing:
+    """Test token estimates and max_tokens choice"""
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens('x' * 35) == 10
+        assert estimate_tokens('x' * 36, {'chars_per_token': 4.0}) == 9
+
+    def test_choose_max_tokens(self):
+        assert choose_max_tokens(10000) == 10000 + 4096
+        assert choose_max_tokens(10000, dict(DEFAULT_CALIBRATION, output_tokens=2000)) == 18000
+        assert choose_max_tokens(60000, dict(DEFAULT_CALIBRATION, output_tokens=5000)) == MAX_OUTPUT_TOKENS
+
+
+class TestShardFragments:
+    """Test splitting oversized context at block boundaries"""
+
+    def test_whole_lecture_split_at_blocks(self):
+        document = MystDocument(LECTURE)
+        shards = shard_fragments(document, None, max_chars=40)
+        assert len(shards) > 1
+        # Shards cover the lecture in order, without gaps or overlap
+        assert ''.join(LECTURE[f['start']:f['end']] for shard in shards for f in shard) == LECTURE
+        assert shards[0][0]['first_line'] == 1
+
+    def test_fits_in_one_shard(self):
+        document = MystDocument(LECTURE)
+        assert len(shard_fragments(document, None, max_chars=len(LECTURE))) == 1
+
+
+class TestPackLectures:
+    """Test grouping short lectures into shared prompts"""
+
+    def test_greedy_in_order(self):
+        assert pack_lectures([10, 20, 5, 100, 3, 3], max_chars=40) == [[0, 1, 2], [3], [4, 5]]
+
+    def test_nothing_to_pack(self):
+        assert pack_lectures([], max_chars=40) == []
+
+
+class TestPlan:
+    """Test lecture and review plans"""
+
+    def test_out_of_scope_rules_not_counted(self):
+        calls = plan_lecture("Only prose here.\n", ['code', 'links'])
+        # Only the whole-lecture code rules remain
+        assert [c['rule_id'] for c in calls] == ['qe-code-003', 'qe-code-006']
+
+    def test_full_context_counts_every_rule(self):
+        calls = plan_lecture("Only prose here.\n", ['code'], scoped_context=False)
+        # Every rule but the timing rules, which have no trigger in the lecture
+        expected = [r for r in RULE_EVALUATION_ORDER['code'] if r not in ('qe-code-004', 'qe-code-005')]
+        assert [c['rule_id'] for c in calls] == expected
+
+    def test_static_analysis_makes_no_calls(self):
+        lecture = "Prose.\n\n```{code-cell} python\nax.plot(x, y)\nax.set_title('GDP')\n```\n"
+        with_llm = {c['rule_id'] for c in plan_lecture(lecture, ['code', 'figures'])}
+        static = {c['rule_id'] for c in plan_lecture(lecture, ['code', 'figures'], static_analysis=True)}
+        assert 'qe-fig-008' in with_llm
+        assert static == with_llm - ANALYZED_RULES
+
+    def test_untriggered_rules_not_counted(self):
+        timed = "Prose.\n\n```{code-cell} python\n%timeit f(1)\n```\n"
+        calls = plan_lecture(timed, ['code'], scoped_context=False)
+        rule_ids = [c['rule_id'] for c in calls]
+        assert 'qe-code-005' in rule_ids
+        assert 'qe-code-004' not in rule_ids
+
+    def test_review_totals(self):
+        plan = plan_review({'a': LECTURE, 'b': LECTURE}, ['math', 'code'])
+        assert plan['calls'] == 2 * plan['lectures'][0]['calls']
+        assert plan['input_tokens'] == sum(row['input_tokens'] for row in plan['lectures'])
+        assert plan['cost_usd'] > 0
+        assert plan['max_tokens'] == choose_max_tokens(10000)
+
+    def test_concurrent_schedules_are_faster(self):
+        lectures = {'a': LECTURE}
+        sequential = plan_review(lectures, schedule='sequential')['seconds']
+        speculative = plan_review(lectures, schedule='speculative')['seconds']
+        graph = plan_review(lectures, schedule='graph')['seconds']
+        assert speculative < sequential
+        assert graph < sequential
+
+    def test_haiku_is_cheaper(self):
+        sonnet = plan_review({'a': LECTURE}, model='claude-sonnet-4-5-20250929')['cost_usd']
+        haiku = plan_review({'a': LECTURE}, model='claude-haiku-4-5')['cost_usd']
+        assert haiku < sonnet
+
+    def test_format_plan(self):
+        report = format_plan(plan_review({'a': LECTURE}, ['code']))
+        assert report.startswith('# Review Plan')
+        assert '| a |' in report
+        assert '**Total**' in report
+        assert 'built-in defaults' in report
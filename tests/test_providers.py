@@ -0,0 +1,126 @@
+"""
+Tests for providers.py — the OpenAI-compatible backend, against a local HTTP server
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from style_checker import providers
+from style_checker.providers import OpenAICompatibleProvider, ProviderError
+from style_checker.reviewer import VIOLATION_TOOL_NAME
+
+
+def _completion(content='', tool_calls=None, finish_reason='stop'):
+    message = {'role': 'assistant', 'content': content}
+    if tool_calls:
+        message['tool_calls'] = tool_calls
+    return {
+        'choices': [{'message': message, 'finish_reason': finish_reason}],
+        'usage': {'prompt_tokens': 120, 'completion_tokens': 30},
+    }
+
+
+@pytest.fixture
+def server():
+    """A /v1/chat/completions endpoint replying with queued (status, body) pairs."""
+    replies, requests = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            requests.append({'path': self.path, 'headers': dict(self.headers), 'json': json.loads(body)})
+            status, reply = replies.pop(0)
+            data = json.dumps(reply).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}/v1', replies, requests
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestOpenAICompatibleProvider:
+    """Test rule checks, triage and retries over HTTP"""
+
+    def test_markdown_check(self, server):
+        url, replies, requests = server
+        replies.append((200, _completion('## Issues Found\n1\n\n## Violations\n\n'
+                                         '### Violation 1: qe-math-001 - Unicode\n'
+                                         '**Current text:**\n~~~markdown\n$\\alpha$\n~~~\n'
+                                         '**Suggested fix:**\n~~~markdown\nα\n~~~\n')))
+        provider = OpenAICompatibleProvider(url + '/', 'qwen-local', api_key='secret')
+
+        result = provider.check_single_rule([{'type': 'text', 'text': 'cached '}, {'type': 'text', 'text': 'rule'}])
+
+        assert result['violations'][0]['suggested_fix'] == 'α'
+        [request] = requests
+        assert request['path'] == '/v1/chat/completions'
+        assert request['headers']['Authorization'] == 'Bearer secret'
+        # Content blocks are flattened: the server has no prompt cache
+        assert request['json']['messages'] == [{'role': 'user', 'content': 'cached rule'}]
+        assert 'tools' not in request['json']
+        record = provider.usage_log[0]
+        assert (record['kind'], record['provider']) == ('check', 'openai-compatible')
+        assert (record['input_tokens'], record['output_tokens']) == (120, 30)
+
+    def test_tool_check(self, server):
+        url, replies, requests = server
+        arguments = {'violations': [{'rule_id': 'qe-math-001', 'first_line': 4, 'current_text': 'a',
+                                     'suggested_fix': 'b', 'explanation': 'Why.'}]}
+        replies.append((200, _completion(tool_calls=[{
+            'id': 'call-1', 'type': 'function',
+            'function': {'name': VIOLATION_TOOL_NAME, 'arguments': json.dumps(arguments)},
+        }])))
+        provider = OpenAICompatibleProvider(url, 'qwen-local')
+        provider.response_format = 'tool'
+
+        result = provider.check_single_rule('prompt')
+
+        assert result['violations'][0]['location'] == 'Line 4'
+        payload = requests[0]['json']
+        assert payload['tools'][0]['function']['name'] == VIOLATION_TOOL_NAME
+        assert payload['tool_choice'] == {'type': 'function', 'function': {'name': VIOLATION_TOOL_NAME}}
+        assert provider.usage_log[0]['parse_error'] is False
+
+    def test_triage(self, server):
+        url, replies, _ = server
+        replies.append((200, _completion('qe-math-001: no\nqe-math-002: yes')))
+        provider = OpenAICompatibleProvider(url, 'qwen-local')
+        decisions = provider.triage_rules('prompt', ['qe-math-001', 'qe-math-002', 'qe-math-003'])
+        assert decisions == {'qe-math-001': 'no', 'qe-math-002': 'yes', 'qe-math-003': 'maybe'}
+        assert provider.usage_log[0]['kind'] == 'triage'
+
+    def test_transient_errors_retried(self, server, monkeypatch):
+        url, replies, requests = server
+        monkeypatch.setattr(providers.time, 'sleep', lambda seconds: None)
+        replies.extend([(503, {'error': 'loading'}), (200, _completion('## Issues Found\n0'))])
+        provider = OpenAICompatibleProvider(url, 'qwen-local')
+        assert provider.check_single_rule('prompt')['violations'] == []
+        assert len(requests) == 2
+
+    def test_client_errors_raise(self, server):
+        url, replies, requests = server
+        replies.append((400, {'error': 'bad request'}))
+        provider = OpenAICompatibleProvider(url, 'qwen-local')
+        with pytest.raises(ProviderError, match='HTTP 400'):
+            provider.check_single_rule('prompt')
+        assert len(requests) == 1
+
+    def test_unreachable_server(self, monkeypatch):
+        monkeypatch.setattr(providers.time, 'sleep', lambda seconds: None)
+        provider = OpenAICompatibleProvider('http://127.0.0.1:9/v1', 'qwen-local')
+        provider.MAX_RETRIES = 1
+        with pytest.raises(ProviderError, match='Could not reach'):
+            provider.requote('prompt', 100)
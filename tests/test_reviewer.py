@@ -2,13 +2,48 @@
 Tests for reviewer.py — extract_individual_rules() and RULE_EVALUATION_ORDER
 """
 
+import json
+import re
+import threading
+import time
 from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
 
 import style_checker
+import style_checker.reviewer as reviewer_module
 from style_checker.categories import VALID_CATEGORIES
+from style_checker.analyzers import ANALYZED_RULES
+from style_checker.document import MystDocument
+from style_checker.citation_analyzer import Bibliography
+from style_checker.lecture_index import LectureIndex
+from style_checker.memo import ReviewMemo
+from style_checker.planner import MAX_OUTPUT_TOKENS
 from style_checker.reviewer import (
+    create_cached_rule_prompt,
+    create_packed_rule_prompt,
+    create_single_rule_prompt,
+    create_triage_prompt,
     extract_individual_rules,
+    extract_rule_context,
+    format_fragments,
+    latency_tier,
+    location_lines,
+    parse_requote_response,
+    parse_triage_response,
+    read_base_prompt,
+    rule_triggered,
+    schedule_rule_waves,
+    summarize_triage,
+    AnthropicProvider,
+    LatencyTracker,
+    StyleReviewer,
+    MECHANICAL_RULES,
+    MIN_HEDGE_SAMPLES,
     RULE_EVALUATION_ORDER,
+    RULE_REGIONS,
+    VIOLATION_TOOL_NAME,
 )
 
 
@@ -162,6 +197,13 @@ class TestPromptFile:
         assert "Prompt Version:" in content, \
             "prompt.md missing the 'Prompt Version: ...' header comment"
 
+    def test_tool_prompt_file(self):
+        """The tool-mode prompt is a separate file with the same header."""
+        content = read_base_prompt('tool')
+        assert "Prompt Version:" in content
+        assert "report_violations" in content
+        assert "## Issues Found" not in content
+
 
 class TestRuleTypeCounts:
     """Test that rule type distribution matches expectations"""
@@ -192,3 +234,936 @@ class TestRuleTypeCounts:
             if r['rule_type'] == 'migrate'
         )
         assert count == 4
+
+
+class TestAlreadyFixedHint:
+    """Test the skip hint listing edits made by earlier rules in a category"""
+
+    def test_no_hint_by_default(self):
+        rule = extract_individual_rules('math')[0]
+        prompt = create_single_rule_prompt('math', rule, 'Lecture text.')
+        assert '## Already Fixed' not in prompt
+
+    def test_hint_lists_earlier_fixes(self):
+        rule = extract_individual_rules('math')[1]
+        fixes = [{'rule_id': 'qe-math-001', 'current_text': '$\\alpha$ is\nthe rate',
+                  'suggested_fix': 'α is the rate'}]
+        prompt = create_single_rule_prompt('math', rule, 'Lecture text.', already_fixed=fixes)
+        assert '## Already Fixed' in prompt
+        assert '- qe-math-001: `$\\alpha$ is the rate` → `α is the rate`' in prompt
+        # The hint sits between the rule and the lecture
+        assert prompt.index('## Already Fixed') < prompt.index('## Lecture to Review')
+
+
+class FakeProvider:
+    """Stands in for AnthropicProvider: returns canned results per rule_id."""
+
+    model = 'fake-model'
+    capabilities = {'thinking': False}
+
+    def __init__(self, results=None, decisions=None):
+        self.results = results or {}
+        self.decisions = decisions or {}
+        self.checked = []
+        self.prompts = []
+
+    def check_single_rule(self, prompt):
+        self.prompts.append(prompt)
+        if isinstance(prompt, list):
+            # Cached prompt: the lecture prefix, then the edits and the rule
+            prompt = ''.join(block['text'] for block in prompt)
+        rule_id = re.search(r'### Rule: (qe-[a-z]+-\d+)', prompt).group(1)
+        self.checked.append(rule_id)
+        if '<!-- BEGIN DOCUMENT' in prompt:
+            # Packed prompt: report each violation against the lecture it appears in
+            violations = []
+            for doc_id, lecture in re.findall(
+                    r'<!-- BEGIN DOCUMENT ([\w-]+): .*? -->\n(.*?)<!-- END DOCUMENT', prompt, re.DOTALL):
+                violations += [dict(v, document=doc_id) for v in self.results.get(rule_id, [])
+                               if v['current_text'] in lecture]
+            return {'issues_found': len(violations), 'violations': violations}
+        # Like a real model, only report text that is present in the lecture it was sent
+        lecture = prompt.split('## Lecture to Review', 1)[1]
+        violations = [dict(v) for v in self.results.get(rule_id, [])
+                      if v['current_text'] in lecture]
+        return {'issues_found': len(violations), 'violations': violations}
+
+    def triage_rules(self, prompt, rule_ids):
+        return {rule_id: self.decisions.get(rule_id, 'maybe') for rule_id in rule_ids}
+
+
+class TestTriage:
+    """Test the optional two-stage triage cascade"""
+
+    LECTURE = "See [the docs](https://example.com).\n"
+
+    def test_parse_triage_response(self):
+        response = "qe-math-001: no\nqe-math-002: YES\n- qe-math-003 — maybe\nqe-math-999: no"
+        decisions = parse_triage_response(
+            response, ['qe-math-001', 'qe-math-002', 'qe-math-003', 'qe-math-004']
+        )
+        assert decisions == {
+            'qe-math-001': 'no',
+            'qe-math-002': 'yes',
+            'qe-math-003': 'maybe',
+            'qe-math-004': 'maybe',  # Missing answers fail open
+        }
+
+    def test_summarize_triage(self):
+        log = [
+            {'decision': 'yes', 'checked': True, 'violations': 2},
+            {'decision': 'maybe', 'checked': True, 'violations': 0},
+            {'decision': 'no', 'checked': False, 'violations': 0},
+            {'decision': 'no', 'checked': True, 'violations': 1},
+        ]
+        summary = summarize_triage(log)
+        assert summary['counts'] == {'yes': 1, 'maybe': 1, 'no': 2}
+        assert summary['skipped'] == 1
+        assert summary['audited'] == 1
+        assert summary['precision'] == 0.5
+        assert summary['recall'] == 0.5
+
+    def test_recall_unknown_without_audits(self):
+        log = [{'decision': 'yes', 'checked': True, 'violations': 1}]
+        assert summarize_triage(log)['recall'] is None
+
+    def test_triage_prompt_lists_all_rules(self):
+        rules = extract_individual_rules('links')
+        prompt = create_triage_prompt('links', rules, 'Lecture text.')
+        for rule in rules:
+            assert rule['rule_id'] in prompt
+        assert 'Lecture text.' in prompt
+
+    def test_no_rules_skipped(self):
+        reviewer = StyleReviewer(api_key='test-key', triage_model='claude-haiku-4-5')
+        reviewer.provider = FakeProvider()
+        reviewer.triage_provider = FakeProvider(decisions={'qe-link-002': 'no'})
+
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['links'], 'lecture')
+
+        assert reviewer.provider.checked == ['qe-link-001']
+        assert [(r['rule_id'], r['checked']) for r in result['triage_log']] == [
+            ('qe-link-002', False), ('qe-link-001', True),
+        ]
+        assert result['triage']['skipped'] == 1
+
+    def test_audit_rate_checks_no_rules(self):
+        reviewer = StyleReviewer(api_key='test-key', triage_model='claude-haiku-4-5',
+                                 triage_audit_rate=1.0)
+        reviewer.provider = FakeProvider()
+        reviewer.triage_provider = FakeProvider(decisions={'qe-link-002': 'no'})
+
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['links'], 'lecture')
+
+        assert reviewer.provider.checked == ['qe-link-002', 'qe-link-001']
+        assert result['triage']['audited'] == 1
+
+    def test_no_triage_by_default(self):
+        reviewer = StyleReviewer(api_key='test-key')
+        reviewer.provider = FakeProvider()
+
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['links'], 'lecture')
+
+        assert reviewer.provider.checked == ['qe-link-002', 'qe-link-001']
+        assert result['triage'] is None
+
+
+
+def _violation(rule_id, current_text, suggested_fix):
+    return {'rule_id': rule_id, 'current_text': current_text, 'suggested_fix': suggested_fix}
+
+
+class TestSpeculativeMode:
+    """Test concurrent rule checks with rebase-on-conflict"""
+
+    LECTURE = "The rate $\\alpha$ matters.\n\nWe take $A^T$ here.\n"
+
+    def _review(self, results, speculative=True):
+        schedule = 'speculative' if speculative else 'sequential'
+        reviewer = StyleReviewer(api_key='test-key', schedule=schedule)
+        reviewer.provider = FakeProvider(results=results)
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['math'], 'lecture')
+        return reviewer, result
+
+    def test_disjoint_fixes_all_applied(self):
+        results = {
+            'qe-math-001': [_violation('qe-math-001', 'The rate $\\alpha$ matters.', 'The rate α matters.')],
+            'qe-math-002': [_violation('qe-math-002', '$A^T$', '$A^\\top$')],
+        }
+        reviewer, result = self._review(results)
+        assert result['corrected_content'] == "The rate α matters.\n\nWe take $A^\\top$ here.\n"
+        # One call per rule — nothing needed a re-run
+        assert sorted(reviewer.provider.checked) == sorted(RULE_EVALUATION_ORDER['math'])
+
+    def test_matches_sequential_result(self):
+        results = {
+            'qe-math-001': [_violation('qe-math-001', 'The rate $\\alpha$ matters.', 'The rate α matters.')],
+            'qe-math-002': [_violation('qe-math-002', '$A^T$', '$A^\\top$')],
+        }
+        _, speculative = self._review(results)
+        _, sequential = self._review(results, speculative=False)
+        assert speculative['corrected_content'] == sequential['corrected_content']
+        assert speculative['fix_log'] == sequential['fix_log']
+
+    def test_conflicting_rule_rerun_on_updated_content(self):
+        results = {
+            'qe-math-001': [_violation('qe-math-001', 'The rate $\\alpha$ matters.', 'The rate α matters.')],
+            # Overlaps qe-math-001's edit; once re-run on the updated text it no longer applies
+            'qe-math-003': [_violation('qe-math-003', 'rate $\\alpha$', 'rates $\\alpha$')],
+        }
+        reviewer, result = self._review(results)
+        assert result['corrected_content'].startswith("The rate α matters.")
+        assert reviewer.provider.checked.count('qe-math-003') == 2
+        assert [f['rule_id'] for f in result['fix_log']] == ['qe-math-001']
+        assert result['warnings'] == []
+
+
+class TestRuleTouches:
+    """Test the **Touches:** regions declared by each rule"""
+
+    def test_every_rule_declares_touches(self):
+        for category in VALID_CATEGORIES:
+            for rule in extract_individual_rules(category):
+                assert '**Touches:**' in rule['content'], rule['rule_id']
+
+    def test_touches_use_known_regions(self):
+        for category in VALID_CATEGORIES:
+            for rule in extract_individual_rules(category):
+                assert rule['touches'], rule['rule_id']
+                assert set(rule['touches']) <= set(RULE_REGIONS), rule['rule_id']
+
+    def test_link_rules_only_touch_links(self):
+        for rule in extract_individual_rules('links'):
+            assert rule['touches'] == ['links']
+
+
+def _rule(rule_id, rule_type, touches):
+    return {'rule_id': rule_id, 'rule_type': rule_type, 'touches': touches}
+
+
+class TestScheduleRuleWaves:
+    """Test dependency-wave grouping of rules"""
+
+    def test_disjoint_rules_share_a_wave(self):
+        rules = [_rule('a', 'rule', ['math']), _rule('b', 'rule', ['links'])]
+        assert schedule_rule_waves(rules) == [[0, 1]]
+
+    def test_overlapping_mutations_are_ordered(self):
+        rules = [_rule('a', 'rule', ['math']), _rule('b', 'rule', ['math', 'prose'])]
+        assert schedule_rule_waves(rules) == [[0], [1]]
+
+    def test_style_rules_never_conflict_with_each_other(self):
+        rules = [_rule('a', 'style', ['prose']), _rule('b', 'style', ['prose'])]
+        assert schedule_rule_waves(rules) == [[0, 1]]
+
+    def test_style_rule_waits_for_earlier_fix(self):
+        rules = [_rule('a', 'rule', ['prose']), _rule('b', 'style', ['prose'])]
+        assert schedule_rule_waves(rules) == [[0], [1]]
+
+    def test_chain_depth(self):
+        rules = [
+            _rule('a', 'rule', ['prose']),
+            _rule('b', 'rule', ['code']),
+            _rule('c', 'rule', ['prose', 'code']),
+            _rule('d', 'rule', ['links']),
+        ]
+        assert schedule_rule_waves(rules) == [[0, 1, 3], [2]]
+
+    def test_missing_touches_conflicts_with_everything(self):
+        rules = [_rule('a', 'rule', ['links']), {'rule_id': 'b', 'rule_type': 'rule'}]
+        assert schedule_rule_waves(rules) == [[0], [1]]
+
+    def test_empty(self):
+        assert schedule_rule_waves([]) == []
+
+
+class TestGraphSchedule:
+    """Test the 'graph' schedule across categories"""
+
+    LECTURE = "The rate $\\alpha$ matters.\n\nSee [the docs](https://example.com).\n"
+
+    def test_unknown_schedule_rejected(self):
+        with pytest.raises(ValueError):
+            StyleReviewer(api_key='test-key', schedule='fastest')
+
+    def test_matches_sequential_result(self):
+        results = {
+            'qe-math-001': [_violation('qe-math-001', 'The rate $\\alpha$ matters.', 'The rate α matters.')],
+            'qe-link-002': [_violation('qe-link-002', '[the docs](https://example.com)', '[the documentation](https://example.com)')],
+        }
+        outputs = {}
+        for schedule in ('sequential', 'graph'):
+            reviewer = StyleReviewer(api_key='test-key', schedule=schedule)
+            reviewer.provider = FakeProvider(results=results)
+            outputs[schedule] = reviewer.review_lecture_single_rule(
+                self.LECTURE, ['math', 'links'], 'lecture'
+            )
+            # No rule needed a re-run
+            assert len(reviewer.provider.checked) == len(set(reviewer.provider.checked))
+        assert outputs['graph']['corrected_content'] == outputs['sequential']['corrected_content']
+        assert outputs['graph']['corrected_content'] == (
+            "The rate α matters.\n\nSee [the documentation](https://example.com).\n"
+        )
+        assert outputs['graph']['warnings'] == []
+
+
+class TestRuleContext:
+    """Test rule-scoped context extraction"""
+
+    LECTURE = (
+        "# Title\n\n"
+        "Set alpha = 0.5 in the prose.\n\n"
+        "```{code-cell} ipython3\n"
+        "alpha = 0.5\n"
+        "```\n\n"
+        + "A long paragraph of narrative text that no code rule needs to see.\n\n" * 5
+    )
+
+    def _code_rule(self):
+        return next(r for r in extract_individual_rules('code') if r['rule_id'] == 'qe-code-002')
+
+    def test_context_defaults_to_touches(self):
+        rule = self._code_rule()
+        assert rule['context'] == rule['touches'] == ['code']
+
+    def test_full_context_rules(self):
+        rules = {r['rule_id']: r for r in extract_individual_rules('code')}
+        assert rules['qe-code-003']['context'] == ['full']
+        assert extract_rule_context(MystDocument(self.LECTURE), rules['qe-code-003']) is None
+
+    def test_code_rule_sees_only_code_cells(self):
+        document = MystDocument(self.LECTURE)
+        fragments = extract_rule_context(document, self._code_rule())
+        excerpt = format_fragments(self.LECTURE, fragments)
+        assert excerpt == "<!-- Lines 5-7 -->\n```{code-cell} ipython3\nalpha = 0.5\n```\n"
+
+    def test_nothing_in_scope(self):
+        document = MystDocument("Only prose here.\n")
+        assert extract_rule_context(document, self._code_rule()) == []
+
+    def test_citation_rule_sees_manual_citations(self):
+        # A lecture without any {cite} role can still cite by hand
+        rule = next(r for r in extract_individual_rules('references') if r['rule_id'] == 'qe-ref-001')
+        document = MystDocument("# Lecture\n\nAs Keynes (1936) argued, demand matters.\n")
+        assert extract_rule_context(document, rule) != []
+
+    def test_large_excerpt_falls_back_to_full_lecture(self):
+        rule = {'rule_id': 'x', 'context': ['prose']}
+        assert extract_rule_context(MystDocument(self.LECTURE), rule) is None
+
+    def test_excerpt_prompt_explains_markers(self):
+        prompt = create_single_rule_prompt('code', self._code_rule(), 'excerpt', excerpt=True)
+        assert '<!-- Lines A-B -->' in prompt
+        assert '<!-- Lines A-B -->' not in create_single_rule_prompt('code', self._code_rule(), 'x')
+
+    def test_fix_anchors_inside_excerpt(self):
+        # 'alpha = 0.5' first occurs in prose; the code rule's fix must land in the cell
+        reviewer = StyleReviewer(api_key='test-key')
+        reviewer.provider = FakeProvider(results={
+            'qe-code-002': [_violation('qe-code-002', 'alpha = 0.5', 'α = 0.5')],
+        })
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['code'], 'lecture')
+        assert 'Set alpha = 0.5 in the prose.' in result['corrected_content']
+        assert '```{code-cell} ipython3\nα = 0.5\n```' in result['corrected_content']
+        assert all('position' not in v for v in result['violations'])
+
+    def test_scoped_context_can_be_disabled(self):
+        reviewer = StyleReviewer(api_key='test-key', scoped_context=False)
+        reviewer.provider = FakeProvider()
+        reviewer.review_lecture_single_rule("Only prose here.\n", ['code'], 'lecture')
+        # Only the timing rules stay unsent: they have no trigger in the lecture
+        untriggered = {'qe-code-004', 'qe-code-005'}
+        assert sorted(reviewer.provider.checked) == sorted(set(RULE_EVALUATION_ORDER['code']) - untriggered)
+
+
+class TestRuleTriggers:
+    """Test the **Triggers:** patterns that gate rule checks"""
+
+    def _rules(self):
+        return {r['rule_id']: r for c in ('code', 'figures', 'math') for r in extract_individual_rules(c)}
+
+    def test_triggers_parsed(self):
+        rules = self._rules()
+        assert [p.pattern for p in rules['qe-fig-003']['triggers']][:2] == ['set_title', 'suptitle']
+        assert rules['qe-code-001']['triggers'] == []
+
+    def test_trigger_matches_only_touched_regions(self):
+        rule = self._rules()['qe-fig-003']
+        prose = MystDocument("Call ax.set_title() to add a title.\n")
+        code = MystDocument("Prose.\n\n```{code-cell} python\nax.set_title('GDP')\n```\n")
+        assert not rule_triggered(prose, rule)
+        assert rule_triggered(code, rule)
+
+    def test_prime_trigger_ignores_apostrophes(self):
+        rule = self._rules()['qe-math-002']
+        assert not rule_triggered(MystDocument("The model's value $x$ isn't known.\n"), rule)
+        assert rule_triggered(MystDocument("The product $x'y$ is a scalar.\n"), rule)
+        assert rule_triggered(MystDocument("$$\nA^T B\n$$\n"), rule)
+
+    def test_rules_without_triggers_always_match(self):
+        assert rule_triggered(MystDocument("Only prose.\n"), {'rule_id': 'x', 'touches': ['code']})
+
+    def test_untriggered_rule_skipped_and_reported(self):
+        reviewer = StyleReviewer(api_key='test-key')
+        reviewer.provider = FakeProvider()
+        lecture = "Prose.\n\n```{code-cell} python\n%timeit f(1)\n```\n"
+        result = reviewer.review_lecture_single_rule(lecture, ['code'], 'lecture')
+        assert 'qe-code-005' in reviewer.provider.checked
+        assert 'qe-code-004' not in reviewer.provider.checked
+        assert result['skipped_rules'] == [
+            {'rule_id': 'qe-code-004', 'title': 'Use quantecon Timer context manager', 'reason': 'no trigger match'},
+        ]
+
+    def test_invalid_trigger_rejected(self, tmp_path, monkeypatch):
+        rules_dir = tmp_path / 'rules'
+        rules_dir.mkdir()
+        (rules_dir / 'bad-rules.md').write_text(
+            "### Rule: qe-bad-001\n**Type:** rule\n**Title:** Bad\n**Touches:** code\n"
+            "**Triggers:** `(unclosed`\n\nBody.\n"
+        )
+        monkeypatch.setattr(style_checker.reviewer, '__file__', str(tmp_path / 'reviewer.py'))
+        with pytest.raises(ValueError, match='qe-bad-001'):
+            extract_individual_rules('bad')
+
+
+class TestStaticAnalysis:
+    """Test checking rules with the static analyzers instead of the LLM"""
+
+    LECTURE = (
+        "# Lecture\n\n```{code-cell} ipython3\n"
+        "alpha = 0.5\nax.plot(x, alpha * x)\nax.set_title('GDP')\nplt.show()\n```\n"
+    )
+
+    def test_analyzed_rules_not_sent(self):
+        reviewer = StyleReviewer(api_key='test-key', static_analysis=True)
+        reviewer.provider = FakeProvider()
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['code', 'figures'], 'lecture')
+        assert not set(reviewer.provider.checked) & ANALYZED_RULES
+        assert "α = 0.5\nax.plot(x, α * x, lw=2)\nplt.show()" in result['corrected_content']
+        assert {v['rule_id'] for v in result['rule_violations']} == {'qe-code-002', 'qe-fig-003', 'qe-fig-008'}
+
+    def test_packed_review(self):
+        reviewer = StyleReviewer(api_key='test-key', static_analysis=True)
+        reviewer.provider = FakeProvider()
+        results = reviewer.review_lectures_packed([('a', self.LECTURE), ('b', self.LECTURE)], ['figures'])
+        assert all('lw=2' in result['corrected_content'] for result in results)
+        assert not set(reviewer.provider.checked) & ANALYZED_RULES
+
+    def test_math_rules(self):
+        reviewer = StyleReviewer(api_key='test-key', static_analysis=True)
+        reviewer.provider = FakeProvider()
+        lecture = "# Lecture\n\n$$\n\\mathbf{A} x = b \\tag{1}\n$$\n"
+        result = reviewer.review_lecture_single_rule(lecture, ['math'], 'lecture')
+        assert set(reviewer.provider.checked) == {'qe-math-001', 'qe-math-008', 'qe-math-009'}
+        assert "$$\nA x = b\n$$" in result['corrected_content']
+
+    def test_link_rules_with_index(self):
+        lecture = "# Lecture\n\nSee [the filter](https://python.quantecon.org/kalman.html) for details.\n"
+        index = LectureIndex(['kalman'], home_url='https://python.quantecon.org/')
+        reviewer = StyleReviewer(api_key='test-key', static_analysis=True, lecture_index=index)
+        reviewer.provider = FakeProvider()
+        result = reviewer.review_lecture_single_rule(lecture, ['links'], 'lecture')
+        assert not {'qe-link-001', 'qe-link-002'} & set(reviewer.provider.checked)
+        # qe-link-001 is a style rule: reported as a suggestion, not applied
+        suggestion, = result['style_violations']
+        assert suggestion['suggested_fix'] == "See [the filter](kalman) for details."
+
+    def test_citation_rule_with_bibliography(self):
+        bibliography = Bibliography({'Bellman1957': {'type': 'book', 'authors': ['Bellman'], 'year': '1957'}})
+        reviewer = StyleReviewer(api_key='test-key', static_analysis=True, bibliography=bibliography)
+        reviewer.provider = FakeProvider()
+        result = reviewer.review_lecture_single_rule(
+            "# Lecture\n\nThe work of {cite}`Bellman1957` matters.\n", ['references'], 'lecture')
+        assert 'qe-ref-001' not in reviewer.provider.checked
+        assert "The work of {cite:t}`Bellman1957` matters." in result['corrected_content']
+        # A citation the analyzer can't classify sends the rule to the model
+        reviewer.review_lecture_single_rule("# Lecture\n\nKeynes (1936) disagreed {cite}`Bellman1957`.\n", ['references'], 'lecture')
+        assert 'qe-ref-001' in reviewer.provider.checked
+
+    def test_off_by_default(self):
+        reviewer = StyleReviewer(api_key='test-key')
+        reviewer.provider = FakeProvider()
+        reviewer.review_lecture_single_rule(self.LECTURE, ['figures'], 'lecture')
+        assert 'qe-fig-008' in reviewer.provider.checked
+
+    def test_lecture_parsed_once(self, monkeypatch):
+        parsed = []
+        monkeypatch.setattr(reviewer_module, 'parse_document',
+                            lambda content: parsed.append(content) or MystDocument(content))
+        reviewer = StyleReviewer(api_key='test-key', static_analysis=True)
+        reviewer.provider = FakeProvider()
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['code'], 'lecture')
+        assert result['rule_violations']
+        # Fixed versions come from MystDocument.update(), not a fresh parse
+        assert parsed == [self.LECTURE]
+
+
+class TestPromptCache:
+    """Test cached lecture prefixes with delta edits"""
+
+    LECTURE = "The rate $\\alpha$ matters.\n\nWe take $A^T$ here.\n"
+
+    def _review(self, results, **kwargs):
+        reviewer = StyleReviewer(api_key='test-key', prompt_cache=True, **kwargs)
+        reviewer.provider = FakeProvider(results=results)
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['math'], 'lecture')
+        return reviewer, result
+
+    def test_prefix_marked_for_caching(self):
+        rule = extract_individual_rules('math')[0]
+        prefix, suffix = create_cached_rule_prompt('math', rule, 'Lecture text.')
+        assert prefix['cache_control'] == {'type': 'ephemeral'}
+        assert prefix['text'].rstrip().endswith('## Lecture to Review\n\nLecture text.')
+        assert rule['content'] in suffix['text']
+        assert 'cache_control' not in suffix
+
+    def test_prefix_unchanged_after_fixes(self):
+        reviewer, result = self._review({
+            'qe-math-001': [_violation('qe-math-001', '$\\alpha$', 'α')],
+            'qe-math-002': [_violation('qe-math-002', '$A^T$', '$A^\\top$')],
+        })
+        assert result['corrected_content'] == "The rate α matters.\n\nWe take $A^\\top$ here.\n"
+        prompts = reviewer.provider.prompts
+        assert len({prompt[0]['text'] for prompt in prompts}) == 1
+        # Later rules get the first fix as a line-anchored edit
+        later = prompts[1][1]['text']
+        assert '## Edits Since This Version' in later
+        assert '**Edit 1** (line 1):\n~~~before\n$\\alpha$\n~~~\n~~~after\nα\n~~~' in later
+        assert '## Already Fixed' not in later
+
+    def test_refresh_after_threshold(self):
+        reviewer, result = self._review({
+            'qe-math-001': [_violation('qe-math-001', '$\\alpha$', 'α')],
+            'qe-math-002': [_violation('qe-math-002', '$A^T$', '$A^\\top$')],
+        }, cache_refresh_edits=0)
+        prompts = reviewer.provider.prompts
+        assert 'The rate α matters.' in prompts[1][0]['text']
+        # Folded into the new prefix, the fix keeps its skip hint instead
+        assert '## Edits Since This Version' not in prompts[1][1]['text']
+        assert '## Already Fixed' in prompts[1][1]['text']
+        assert result['corrected_content'] == "The rate α matters.\n\nWe take $A^\\top$ here.\n"
+
+    def test_out_of_scope_rules_still_skipped(self):
+        reviewer = StyleReviewer(api_key='test-key', prompt_cache=True)
+        reviewer.provider = FakeProvider()
+        reviewer.review_lecture_single_rule("Only prose here.\n", ['code'], 'lecture')
+        assert reviewer.provider.checked == ['qe-code-003', 'qe-code-006']
+
+
+class TestToolResponseFormat:
+    """Test reviews whose findings come back as tool calls"""
+
+    def test_prompts_use_tool_prompt(self):
+        reviewer = StyleReviewer(api_key='test-key', response_format='tool')
+        reviewer.provider = FakeProvider(results={
+            'qe-math-001': [{'rule_id': 'qe-math-001', 'rule_title': '', 'current_text': '$\\alpha$',
+                             'suggested_fix': 'α', 'explanation': 'Use Unicode.'}],
+        })
+        result = reviewer.review_lecture_single_rule("The rate $\\alpha$ matters.\n", ['math'], 'lecture')
+        assert all(read_base_prompt('tool') in prompt for prompt in reviewer.provider.prompts)
+        assert result['corrected_content'] == "The rate α matters.\n"
+        # The tool schema has no title field; it is filled in from the rule
+        assert result['violations'][0]['rule_title'] == extract_individual_rules('math')[0]['title']
+
+    def test_packed_prompt_asks_for_document_field(self):
+        rule = extract_individual_rules('math')[0]
+        documents = [{'id': f'doc-{n}', 'name': f'l{n}', 'text': 'x\n', 'excerpt': False} for n in (1, 2)]
+        prompt = create_packed_rule_prompt('math', rule, documents, response_format='tool')
+        assert 'its `document` id' in prompt
+        assert '**Document:**' not in prompt
+
+    def test_unknown_format_rejected(self):
+        with pytest.raises(ValueError, match='response format'):
+            StyleReviewer(api_key='test-key', response_format='json')
+
+
+class TestMemoizedReview:
+    """Test re-reviews that only send changed sections"""
+
+    LECTURE = (
+        "# Title\n\n"
+        "The rate $\\alpha$ matters.\n\n"
+        "## Second\n\n"
+        "We take $A^T$ here.\n"
+    )
+
+    RESULTS = {
+        'qe-math-001': [_violation('qe-math-001', '$\\alpha$', 'α')],
+        'qe-math-002': [_violation('qe-math-002', '$A^T$', '$A^\\top$')],
+    }
+
+    def _review(self, memo, content):
+        reviewer = StyleReviewer(api_key='test-key', memo=memo)
+        reviewer.provider = FakeProvider(results=self.RESULTS)
+        result = reviewer.review_lecture_single_rule(content, ['math'], 'lecture')
+        return reviewer.provider, result
+
+    def test_unchanged_lecture_is_replayed(self):
+        memo = ReviewMemo()
+        first_provider, first = self._review(memo, self.LECTURE)
+        assert first_provider.checked
+
+        provider, second = self._review(memo, self.LECTURE)
+        assert provider.checked == []
+        assert second['corrected_content'] == first['corrected_content']
+        assert all('position' not in v for v in second['violations'])
+
+    def test_only_changed_section_is_sent(self):
+        memo = ReviewMemo()
+        self._review(memo, self.LECTURE)
+
+        edited = self.LECTURE.replace('We take $A^T$ here.', 'We take $A^T$ here, again.')
+        provider, result = self._review(memo, edited)
+        assert provider.checked
+        for prompt in provider.prompts:
+            assert 'The rate' not in prompt.split('## Lecture to Review', 1)[1]
+        # Findings in the untouched section are still applied
+        assert result['corrected_content'] == (
+            "# Title\n\nThe rate α matters.\n\n## Second\n\nWe take $A^\\top$ here, again.\n"
+        )
+
+    def test_shared_cell_checked_once_across_lectures(self):
+        install = "```{code-cell} ipython3\n!pip install quantecon\n```\n"
+        reviewer = StyleReviewer(api_key='test-key', memo=ReviewMemo())
+        reviewer.provider = FakeProvider(results={
+            'qe-code-002': [_violation('qe-code-002', '!pip install quantecon', '!pip install --upgrade quantecon')],
+        })
+        first = reviewer.review_lecture_single_rule(f"# A\n\n{install}", ['code'], 'a')
+        calls = len(reviewer.provider.checked)
+        second = reviewer.review_lecture_single_rule(f"# B\n\nIntro.\n\n{install}", ['code'], 'b')
+
+        # Only the whole-lecture rules are sent again; the cell's findings fan out
+        assert sorted(reviewer.provider.checked[calls:]) == ['qe-code-003', 'qe-code-006']
+        assert '!pip install --upgrade quantecon' in first['corrected_content']
+        assert second['corrected_content'] == f"# B\n\nIntro.\n\n{install.replace('install', 'install --upgrade')}"
+
+
+class MisquotingProvider(FakeProvider):
+    """Reports its canned violations verbatim, even when the quote isn't in the lecture."""
+
+    def __init__(self, results, requotes=()):
+        super().__init__(results=results)
+        self.requotes = list(requotes)
+        self.requote_prompts = []
+
+    def check_single_rule(self, prompt):
+        self.prompts.append(prompt)
+        rule_id = re.search(r'### Rule: (qe-[a-z]+-\d+)', prompt).group(1)
+        violations = [dict(v) for v in self.results.get(rule_id, [])]
+        return {'issues_found': len(violations), 'violations': violations}
+
+    def requote(self, prompt, max_tokens):
+        self.requote_prompts.append(prompt)
+        return self.requotes.pop(0)
+
+
+class TestProviderRouting:
+    """Test pluggable providers and the mechanical-rule backend"""
+
+    LECTURE = "The rate $\\alpha$ matters.\n\nWe take $A^T$ here.\n"
+
+    def test_mechanical_rules_are_ordered_rules(self):
+        ordered = {rule_id for rule_ids in RULE_EVALUATION_ORDER.values() for rule_id in rule_ids}
+        assert MECHANICAL_RULES <= ordered
+
+    def test_mechanical_rules_routed(self):
+        main, local = FakeProvider(), FakeProvider(results={
+            'qe-math-001': [_violation('qe-math-001', '$\\alpha$', 'α')],
+        })
+        reviewer = StyleReviewer(provider=main, mechanical_provider=local, scoped_context=False)
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['math'], 'lecture')
+        assert set(local.checked) == {r for r in RULE_EVALUATION_ORDER['math'] if r in MECHANICAL_RULES}
+        assert set(main.checked) == {r for r in RULE_EVALUATION_ORDER['math'] if r not in MECHANICAL_RULES}
+        assert result['corrected_content'].startswith("The rate α matters.")
+        assert result['provider'] == 'fake-model'
+        # Without extended thinking, max_tokens has no thinking budget in it
+        assert local.max_tokens < 10000
+
+    def test_triage_provider(self):
+        triage = FakeProvider(decisions={r: 'no' for r in RULE_EVALUATION_ORDER['math']})
+        reviewer = StyleReviewer(provider=FakeProvider(), triage_provider=triage)
+        reviewer.review_lecture_single_rule(self.LECTURE, ['math'], 'lecture')
+        assert reviewer.provider.checked == []
+
+
+class TestRequote:
+    """Test the re-quote repair call for fixes that fail to anchor"""
+
+    LECTURE = "# Title\n\nWe take\n$A^T$ here.\n\nMore text.\n"
+    MISQUOTED = dict(_violation('qe-math-002', 'We take $A^T$ here.', 'We take $A^\\top$ here.'),
+                     location='Line 3')
+
+    def _review(self, requotes, requote=True):
+        reviewer = StyleReviewer(api_key='test-key', requote=requote, scoped_context=False)
+        reviewer.provider = MisquotingProvider({'qe-math-002': [dict(self.MISQUOTED)]}, requotes)
+        result = reviewer.review_lecture_single_rule(self.LECTURE, ['math'], 'lecture')
+        return reviewer.provider, result
+
+    def test_location_lines(self):
+        assert location_lines('Line 7') == (7, 7)
+        assert location_lines('Lines 3-5 / Section "Intro"') == (3, 5)
+        assert location_lines('Section "Intro"') is None
+
+    def test_parse_requote_response(self):
+        response = "~~~current\nWe take\n$A^T$ here.\n~~~\n~~~fix\nWe take\n$A^\\top$ here.\n~~~\n"
+        assert parse_requote_response(response) == {
+            'current_text': 'We take\n$A^T$ here.', 'suggested_fix': 'We take\n$A^\\top$ here.',
+        }
+        assert parse_requote_response('NOT FOUND') is None
+
+    def test_unanchored_fix_recovered(self):
+        provider, result = self._review(
+            ["~~~current\nWe take\n$A^T$ here.\n~~~\n~~~fix\nWe take\n$A^\\top$ here.\n~~~\n"]
+        )
+        assert result['corrected_content'] == "# Title\n\nWe take\n$A^\\top$ here.\n\nMore text.\n"
+        [prompt] = provider.requote_prompts
+        # Only a window around the reported line is sent, not the lecture
+        assert '<!-- Lines 1-6 -->' in prompt
+        assert '### Rule:' not in prompt
+
+    def test_quote_outside_window_rejected(self):
+        provider, result = self._review(["~~~current\nNot in the lecture\n~~~\n~~~fix\nx\n~~~\n"])
+        assert result['corrected_content'] == self.LECTURE
+        assert any('not found verbatim' in w for w in result['warnings'])
+
+    def test_off_by_default(self):
+        provider, result = self._review([], requote=False)
+        assert provider.requote_prompts == []
+        assert result['corrected_content'] == self.LECTURE
+
+    def test_requote_without_thinking(self):
+        provider = AnthropicProvider('test-key')
+        provider.client = SimpleNamespace(messages=_FakeMessages([_response('NOT FOUND')]))
+        assert provider.requote('prompt', 200) == 'NOT FOUND'
+        [call] = provider.client.messages.calls
+        assert 'thinking' not in call and call['max_tokens'] == 200
+        assert provider.usage_log[0]['kind'] == 'requote'
+
+
+class TestPackedReview:
+    """Test reviewing several short lectures with one prompt per rule"""
+
+    LECTURES = [
+        ('a', "The rate $\\alpha$ matters.\n"),
+        ('b', "We take $A^T$ here.\n"),
+        ('c', "Both $\\alpha$ and $A^T$.\n"),
+    ]
+
+    RESULTS = {
+        'qe-math-001': [_violation('qe-math-001', '$\\alpha$', 'α')],
+        'qe-math-002': [_violation('qe-math-002', '$A^T$', '$A^\\top$')],
+    }
+
+    def _review(self, **kwargs):
+        reviewer = StyleReviewer(api_key='test-key')
+        reviewer.provider = FakeProvider(results=self.RESULTS)
+        results = reviewer.review_lectures_packed(self.LECTURES, ['math'], **kwargs)
+        return reviewer.provider, results
+
+    def test_prompt_delimits_documents(self):
+        rule = extract_individual_rules('math')[0]
+        prompt = create_packed_rule_prompt('math', rule, [
+            {'id': 'doc-1', 'name': 'a', 'text': 'First.\n', 'excerpt': False},
+            {'id': 'doc-2', 'name': 'b', 'text': 'Second.\n', 'excerpt': False},
+        ])
+        assert '<!-- BEGIN DOCUMENT doc-1: a -->\nFirst.\n<!-- END DOCUMENT doc-1 -->' in prompt
+        assert '**Document:**' in prompt
+        assert '<!-- Lines A-B -->' not in prompt
+
+    def test_one_request_per_rule(self):
+        provider, results = self._review()
+        # Every rule with anything in scope went out once, for all lectures in its scope
+        assert len(provider.checked) == len(set(provider.checked))
+        assert all('<!-- BEGIN DOCUMENT doc-2' in p for p in provider.prompts)
+        assert '<!-- BEGIN DOCUMENT doc-3' in provider.prompts[0]
+        assert [r['lecture_name'] for r in results] == ['a', 'b', 'c']
+
+    def test_fixes_applied_per_lecture(self):
+        _, results = self._review()
+        assert [r['corrected_content'] for r in results] == [
+            "The rate α matters.\n",
+            "We take $A^\\top$ here.\n",
+            "Both α and $A^\\top$.\n",
+        ]
+        assert [len(r['rule_violations']) for r in results] == [1, 1, 2]
+
+    def test_pack_size_limit(self):
+        provider, results = self._review(pack_tokens=10)
+        # Too small to pack: each lecture gets its own single-lecture prompt
+        assert not any('<!-- BEGIN DOCUMENT' in p for p in provider.prompts)
+        assert results[2]['corrected_content'] == "Both α and $A^\\top$.\n"
+
+
+class _FakeMessages:
+    """Stands in for client.messages, returning queued responses."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+def _response(text, stop_reason='end_turn'):
+    return SimpleNamespace(
+        content=[SimpleNamespace(type='thinking', thinking='hmm'), SimpleNamespace(type='text', text=text)],
+        usage=SimpleNamespace(input_tokens=100, output_tokens=50),
+        stop_reason=stop_reason,
+    )
+
+
+class TestProviderUsage:
+    """Test usage recording and the max_tokens retry"""
+
+    def _provider(self, responses):
+        provider = AnthropicProvider('test-key')
+        provider.client = SimpleNamespace(messages=_FakeMessages(responses))
+        provider.max_tokens = 14096
+        return provider
+
+    def test_records_usage(self):
+        provider = self._provider([_response('## Issues Found\n0')])
+        provider.check_single_rule('prompt')
+        [record] = provider.usage_log
+        assert record['kind'] == 'check'
+        assert (record['input_tokens'], record['output_tokens']) == (100, 50)
+        assert (record['thinking_chars'], record['prompt_chars'], record['max_tokens']) == (3, 6, 14096)
+        json.dumps(record)  # Ledger-serializable
+
+    def test_block_prompt_usage(self):
+        provider = self._provider([_response('## Issues Found\n0')])
+        provider.check_single_rule([
+            {'type': 'text', 'text': 'prefix', 'cache_control': {'type': 'ephemeral'}},
+            {'type': 'text', 'text': 'rule'},
+        ])
+        assert provider.usage_log[0]['prompt_chars'] == 10
+        assert provider.client.messages.calls[0]['messages'][0]['content'][0]['text'] == 'prefix'
+
+    def test_truncated_response_retried_uncapped(self):
+        provider = self._provider([_response('partial', 'max_tokens'), _response('## Issues Found\n0')])
+        provider.check_single_rule('prompt')
+        assert [c['max_tokens'] for c in provider.client.messages.calls] == [14096, MAX_OUTPUT_TOKENS]
+
+
+class TestToolResponses:
+    """Test the provider's structured tool-use response mode"""
+
+    def _provider(self, responses):
+        provider = AnthropicProvider('test-key')
+        provider.client = SimpleNamespace(messages=_FakeMessages(responses))
+        provider.response_format = 'tool'
+        provider.explanation_words = 12
+        return provider
+
+    def test_tool_call_parsed(self):
+        tool_use = SimpleNamespace(type='tool_use', name=VIOLATION_TOOL_NAME, input={'violations': [
+            {'rule_id': 'qe-math-001', 'first_line': 2, 'current_text': 'a', 'suggested_fix': 'b',
+             'explanation': 'Why.'},
+        ]})
+        response = _response('')
+        response.content.append(tool_use)
+        provider = self._provider([response])
+
+        result = provider.check_single_rule('prompt')
+
+        assert [v['location'] for v in result['violations']] == ['Line 2']
+        [tool] = provider.client.messages.calls[0]['tools']
+        assert tool['name'] == VIOLATION_TOOL_NAME
+        assert 'at most 12 words' in str(tool['input_schema'])
+        # Extended thinking rules out forcing the tool
+        assert provider.client.messages.calls[0]['tool_choice'] == {'type': 'auto'}
+        record = provider.usage_log[0]
+        assert (record['response_format'], record['parse_error']) == ('tool', False)
+
+    def test_missing_tool_call_recorded(self):
+        provider = self._provider([_response('No violations.')])
+        result = provider.check_single_rule('prompt')
+        assert result['violations'] == [] and 'error' in result
+        assert provider.usage_log[0]['parse_error'] is True
+
+
+class _FakeStream:
+    """A streamed call that takes `delay` seconds unless it is closed early."""
+
+    def __init__(self, delay, text, log):
+        self.delay, self.text, self.log = delay, text, log
+        self.finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.log.append((self.text, 'finished' if self.finished else 'cancelled'))
+
+    def __iter__(self):
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            time.sleep(0.005)
+            yield SimpleNamespace(type='ping')
+        self.finished = True
+
+    def get_final_message(self):
+        return _response(self.text)
+
+
+class _FakeStreamingMessages:
+    def __init__(self, script):
+        self.script = list(script)
+        self.log = []
+        self.lock = threading.Lock()
+
+    def stream(self, **kwargs):
+        with self.lock:
+            delay, text = self.script.pop(0)
+        return _FakeStream(delay, text, self.log)
+
+
+class TestHedging:
+    """Test hedged rule checks"""
+
+    def _provider(self, script, budget=1.0, samples=MIN_HEDGE_SAMPLES, seconds=0.05):
+        provider = AnthropicProvider('test-key')
+        provider.client = SimpleNamespace(messages=_FakeStreamingMessages(script))
+        provider.hedge_budget = budget
+        provider.HEDGE_MIN_SECONDS = 0.0
+        for _ in range(samples):
+            provider.latency.record(latency_tier(len('prompt')), seconds)
+        return provider
+
+    def test_tracker_needs_samples(self):
+        tracker = LatencyTracker()
+        for n in range(MIN_HEDGE_SAMPLES - 1):
+            tracker.record('excerpt', float(n))
+        assert tracker.percentile('excerpt', 0.95) is None
+        tracker.record('excerpt', 100.0)
+        assert tracker.percentile('excerpt', 0.95) == 100.0
+        assert tracker.percentile('lecture', 0.95) is None
+
+    def test_slow_call_is_hedged(self):
+        provider = self._provider([(2.0, 'slow'), (0.0, '## Issues Found\n0')])
+        started = time.monotonic()
+        provider.check_single_rule('prompt')
+        assert time.monotonic() - started < 1.0
+        assert provider.hedges_launched == 1
+        assert provider.usage_log[0]['hedged'] is True
+        time.sleep(0.05)
+        assert ('slow', 'cancelled') in provider.client.messages.log
+
+    def test_fast_call_not_hedged(self):
+        provider = self._provider([(0.0, '## Issues Found\n0')], seconds=1.0)
+        provider.check_single_rule('prompt')
+        assert provider.hedges_launched == 0
+        assert provider.usage_log[0]['hedged'] is False
+
+    def test_budget_caps_hedges(self):
+        provider = self._provider([(0.2, '## Issues Found\n0')], budget=0.5)
+        provider.check_single_rule('prompt')
+        # One check so far: a hedge would be 1 of 1 calls, over the 50% budget
+        assert provider.hedges_launched == 0
+
+    def test_no_hedging_without_latency_history(self):
+        provider = self._provider([(0.2, '## Issues Found\n0')], samples=0)
+        provider.check_single_rule('prompt')
+        assert provider.hedges_launched == 0